@@ -27,6 +27,7 @@ import json
 from version import BUILD_NUMBER  # Import the BUILD_NUMBER
 from app_utils import log_job_status, discover_and_register_blueprints  # Import the discover_and_register_blueprints function
 from services.gcp_toolkit import trigger_cloud_run_job
+from services.scratch_storage import job_scratch, start_storage_janitor
 
 MAX_QUEUE_LENGTH = int(os.environ.get('MAX_QUEUE_LENGTH', 0))
 
@@ -54,7 +55,9 @@ def create_app():
                 "response": None
             })
             
-            response = task_func()
+            # Run the task with its own scratch directory, removed when it finishes
+            with job_scratch(job_id):
+                response = task_func()
             run_time = time.time() - run_start_time
             total_time = time.time() - queue_start_time
 
@@ -92,6 +95,9 @@ def create_app():
     # Start the queue processing in a separate thread
     threading.Thread(target=process_queue, daemon=True).start()
 
+    # Periodically remove stale files from LOCAL_STORAGE_PATH
+    start_storage_janitor()
+
     # Decorator to add tasks to the queue or bypass it
     def queue_task(bypass_queue=False):
         def decorator(f):
@@ -119,7 +125,8 @@ def create_app():
                     })
 
                     # Execute the function directly (no queue)
-                    response = f(job_id=job_id, data=data, *args, **kwargs)
+                    with job_scratch(job_id):
+                        response = f(job_id=job_id, data=data, *args, **kwargs)
                     run_time = time.time() - start_time
 
                     # Build response object
@@ -253,7 +260,8 @@ def create_app():
                         "response": None
                     })
                     
-                    response = f(job_id=job_id, data=data, *args, **kwargs)
+                    with job_scratch(job_id):
+                        response = f(job_id=job_id, data=data, *args, **kwargs)
                     run_time = time.time() - start_time
 
                     response_obj = {
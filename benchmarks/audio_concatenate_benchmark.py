@@ -0,0 +1,162 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+Benchmark the single-pass audio concatenation engine on many short clips.
+
+The per-clip path converts every clip to a common format in its own ffmpeg
+process and then joins the intermediates with the concat demuxer. The
+single-pass engine decodes and resamples all clips in one filter graph
+(services.v1.audio.concatenate.build_audio_concat_filter). When all clips
+already share codec and parameters the stream-copy path is timed as well.
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/audio_concatenate_benchmark.py --clips 200
+    python benchmarks/audio_concatenate_benchmark.py --clips 200 --mixed
+
+Clips are generated with lavfi (sine). --mixed alternates sample rates and
+channel counts so the copy path is not applicable.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.v1.audio.concatenate import (
+    build_audio_concat_filter, plan_audio_concatenation, CONCAT_AUDIO_ARGS
+)
+
+FORMATS = [(44100, 2), (48000, 2), (44100, 1), (22050, 1)]
+
+
+def run(cmd):
+    start = time.time()
+    subprocess.run(cmd, check=True, capture_output=True)
+    return time.time() - start
+
+
+def generate_clips(work_dir, count, mixed, seed=42):
+    """Generate ``count`` MP3 clips of 2-15 seconds; returns [(path, duration, signature)]."""
+    rng = random.Random(seed)
+    clips = []
+    for i in range(count):
+        sample_rate, channels = FORMATS[i % len(FORMATS)] if mixed else FORMATS[0]
+        duration = round(rng.uniform(2, 15), 3)
+        path = os.path.join(work_dir, f"clip_{i:04d}.mp3")
+        run([
+            'ffmpeg', '-y',
+            '-f', 'lavfi', '-i', f'sine=frequency={220 + i}:sample_rate={sample_rate}:duration={duration}',
+            '-ac', str(channels), '-c:a', 'libmp3lame', '-b:a', '128k', path
+        ])
+        clips.append((path, duration, ('mp3', sample_rate, channels, 'fltp')))
+    return clips
+
+
+def per_clip_concat(paths, sample_rate, channels, work_dir):
+    """Convert every clip to a common WAV in its own process, then join the intermediates."""
+    intermediates = []
+    for i, path in enumerate(paths):
+        intermediate = os.path.join(work_dir, f"per_clip_{i:04d}.wav")
+        run(['ffmpeg', '-y', '-i', path, '-ar', str(sample_rate), '-ac', str(channels), intermediate])
+        intermediates.append(intermediate)
+    concat_file = os.path.join(work_dir, "per_clip_concat.txt")
+    with open(concat_file, 'w') as f:
+        for intermediate in intermediates:
+            f.write(f"file '{intermediate}'\n")
+    output = os.path.join(work_dir, "per_clip_output.mp3")
+    run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file] + CONCAT_AUDIO_ARGS + [output])
+    return output
+
+
+def single_pass_concat(paths, sample_rate, channels, work_dir):
+    output = os.path.join(work_dir, "single_pass_output.mp3")
+    cmd = ['ffmpeg', '-y']
+    for path in paths:
+        cmd += ['-i', path]
+    cmd += ['-filter_complex', build_audio_concat_filter(len(paths), sample_rate, channels), '-map', '[outa]']
+    run(cmd + CONCAT_AUDIO_ARGS + [output])
+    return output
+
+
+def copy_concat(paths, work_dir):
+    concat_file = os.path.join(work_dir, "copy_concat.txt")
+    with open(concat_file, 'w') as f:
+        for path in paths:
+            f.write(f"file '{path}'\n")
+    output = os.path.join(work_dir, "copy_output.mp3")
+    run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file, '-map', '0:a', '-c', 'copy', output])
+    return output
+
+
+def probe_duration(path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+        capture_output=True, text=True
+    )
+    return float(result.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', type=int, default=200, help='Number of clips')
+    parser.add_argument('--mixed', action='store_true', help='Mix sample rates and channel counts')
+    parser.add_argument('--skip-per-clip', action='store_true', help='Only time the single-pass engine')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Generating {args.clips} clips...")
+        clips = generate_clips(work_dir, args.clips, args.mixed)
+        paths = [path for path, _, _ in clips]
+        plan = plan_audio_concatenation([signature for _, _, signature in clips])
+        expected = sum(duration for _, duration, _ in clips)
+        print(f"Clips: {len(clips)}, {expected:.1f}s total, plan: {plan['method']} "
+              f"({plan['sample_rate']} Hz, {plan['channels']} ch)")
+
+        results = {}
+        start = time.time()
+        output = single_pass_concat(paths, plan['sample_rate'], plan['channels'], work_dir)
+        results['single_pass'] = (time.time() - start, probe_duration(output))
+
+        if plan['method'] == 'copy':
+            start = time.time()
+            output = copy_concat(paths, work_dir)
+            results['copy'] = (time.time() - start, probe_duration(output))
+
+        if not args.skip_per_clip:
+            start = time.time()
+            output = per_clip_concat(paths, plan['sample_rate'], plan['channels'], work_dir)
+            results['per_clip'] = (time.time() - start, probe_duration(output))
+
+        print(f"Expected output duration: {expected:.3f}s")
+        for name, (elapsed, output_duration) in results.items():
+            print(f"{name:>12}: {elapsed:8.1f}s wall, output {output_duration:.3f}s "
+                  f"(drift {output_duration - expected:+.3f}s)")
+        if 'per_clip' in results:
+            print(f"     speedup: {results['per_clip'][0] / results['single_pass'][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
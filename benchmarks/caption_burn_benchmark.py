@@ -0,0 +1,111 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Benchmark chunked subtitle burn-in against the single-pass render.
+
+A 1080p test video and an SRT with a caption every two seconds are
+generated, then burned in with services.subtitle_burn.burn_subtitles once
+per chunk count. Throughput is printed as seconds of video per second of
+wall time for each chunk count.
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/caption_burn_benchmark.py --duration 300
+    python benchmarks/caption_burn_benchmark.py --duration 600 --chunks 1 2 4 8 16
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.subtitle_burn import burn_subtitles
+
+
+def format_srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def generate_inputs(work_dir, duration, gop):
+    """Generate a 1080p30 H.264/AAC video and a matching SRT file."""
+    video_path = os.path.join(work_dir, "source.mp4")
+    subprocess.run([
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1920x1080:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(gop), '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', video_path
+    ], check=True, capture_output=True)
+
+    srt_path = os.path.join(work_dir, "captions.srt")
+    with open(srt_path, 'w') as f:
+        for i, start in enumerate(range(0, duration, 2)):
+            f.write(f"{i + 1}\n{format_srt_time(start)} --> {format_srt_time(start + 1.8)}\n")
+            f.write(f"Caption number {i + 1} at {start} seconds\n\n")
+    return video_path, srt_path
+
+
+def probe_frames(path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+         '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', path],
+        capture_output=True, text=True
+    )
+    return int(result.stdout.strip() or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=int, default=300, help='Length of the test video in seconds')
+    parser.add_argument('--gop', type=int, default=60, help='Keyframe interval of the test video in frames')
+    parser.add_argument('--chunks', type=int, nargs='+', default=[1, 2, 4, 8], help='Chunk counts to time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Generating a {args.duration}s 1080p test video...")
+        video_path, srt_path = generate_inputs(work_dir, args.duration, args.gop)
+        expected_frames = probe_frames(video_path)
+        subtitle_filter = f"subtitles='{srt_path}'"
+
+        results = []
+        for chunks in args.chunks:
+            output_path = os.path.join(work_dir, f"captioned_{chunks}.mp4")
+            report = burn_subtitles(video_path, subtitle_filter, output_path, chunks=chunks)
+            results.append((chunks, report, probe_frames(output_path)))
+            os.remove(output_path)
+
+        print(f"Source: {args.duration}s, {expected_frames} frames, {os.cpu_count()} CPUs")
+        print(f"{'requested':>10} {'used':>5} {'wall':>9} {'speed':>9} {'speedup':>8} {'frames':>8}")
+        baseline = results[0][1]['elapsed']
+        for chunks, report, frames in results:
+            print(f"{chunks:>10} {report['chunks']:>5} {report['elapsed']:>8.1f}s "
+                  f"{report['speed']:>8.2f}x {baseline / report['elapsed']:>7.2f}x {frames:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+Benchmark the single-pass cut engine against the previous per-segment path.
+
+The previous path re-encoded every kept segment to its own file with -ss
+after -i (decoding from the start of the file each time) and re-encoded
+everything again while concatenating. The single-pass engine builds one
+filter graph (services.v1.video.cut.build_cut_filter_graph).
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/cut_media_benchmark.py --duration 3600 --cuts 100
+
+A synthetic source is generated with lavfi (testsrc2 + sine) unless
+--source points at an existing file.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.v1.video.cut import build_cut_filter_graph, get_kept_segments, merge_cuts, format_seconds
+
+ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23', '-c:a', 'aac', '-b:a', '128k',
+               '-pix_fmt', 'yuv420p', '-vsync', 'cfr', '-r', '30']
+
+
+def run(cmd):
+    start = time.time()
+    subprocess.run(cmd, check=True, capture_output=True)
+    return time.time() - start
+
+
+def generate_source(path, duration):
+    run([
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60', '-c:a', 'aac',
+        '-shortest', path
+    ])
+
+
+def make_cuts(duration, count, seed=42):
+    """Spread ``count`` cuts of 1-5 seconds evenly over the source."""
+    rng = random.Random(seed)
+    spacing = duration / (count + 1)
+    cuts = []
+    for i in range(count):
+        start = spacing * (i + 1) + rng.uniform(-spacing / 4, spacing / 4)
+        cuts.append({"start": f"{start:.3f}", "end": f"{start + rng.uniform(1, 5):.3f}"})
+    return cuts
+
+
+def legacy_cut(source, segments, work_dir):
+    """Reproduces the previous implementation: one encode per segment, then a re-encoding concat."""
+    files = []
+    for i, (start, end) in enumerate(segments):
+        segment_file = os.path.join(work_dir, f"legacy_segment_{i}.mp4")
+        run(['ffmpeg', '-y', '-i', source, '-ss', str(start), '-t', str(end - start)] + ENCODE_ARGS +
+            ['-avoid_negative_ts', 'make_zero', segment_file])
+        files.append(segment_file)
+    concat_file = os.path.join(work_dir, "legacy_concat.txt")
+    with open(concat_file, 'w') as f:
+        for segment_file in files:
+            f.write(f"file '{segment_file}'\n")
+    output = os.path.join(work_dir, "legacy_output.mp4")
+    run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file] + ENCODE_ARGS +
+        ['-movflags', '+faststart', output])
+    return output
+
+
+def single_pass_cut(source, segments, work_dir):
+    output = os.path.join(work_dir, "single_pass_output.mp4")
+    input_args, filter_complex, map_args = build_cut_filter_graph(source, segments)
+    run(['ffmpeg', '-y'] + input_args + ['-filter_complex', filter_complex] + map_args + ENCODE_ARGS +
+        ['-movflags', '+faststart', output])
+    return output
+
+
+def probe_duration(path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+        capture_output=True, text=True
+    )
+    return float(result.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', help='Existing media file to cut (default: generate one)')
+    parser.add_argument('--duration', type=int, default=3600, help='Duration of the generated source in seconds')
+    parser.add_argument('--cuts', type=int, default=100, help='Number of cuts')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the single-pass engine')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = args.source
+        if not source:
+            source = os.path.join(work_dir, 'source.mp4')
+            print(f"Generating {args.duration}s source...")
+            generate_source(source, args.duration)
+
+        duration = probe_duration(source)
+        segments = get_kept_segments(merge_cuts(make_cuts(duration, args.cuts), duration), duration)
+        print(f"Source: {duration:.1f}s, {args.cuts} cuts, {len(segments)} kept segments")
+
+        results = {}
+        start = time.time()
+        output = single_pass_cut(source, segments, work_dir)
+        results['single_pass'] = (time.time() - start, probe_duration(output))
+
+        if not args.skip_legacy:
+            start = time.time()
+            output = legacy_cut(source, segments, work_dir)
+            results['legacy'] = (time.time() - start, probe_duration(output))
+
+        expected = sum(end - start for start, end in segments)
+        print(f"Expected output duration: {format_seconds(round(expected, 3))}s")
+        for name, (elapsed, output_duration) in results.items():
+            print(f"{name:>12}: {elapsed:8.1f}s wall, output {output_duration:.3f}s")
+        if 'legacy' in results:
+            print(f"     speedup: {results['legacy'][0] / results['single_pass'][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
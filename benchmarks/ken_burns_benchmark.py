@@ -0,0 +1,127 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Benchmark the Ken Burns renderer against the previous zoompan filter.
+
+The previous pipeline looped the still image, scaled every frame to an 8K
+intermediate and ran zoompan on it. The renderer in services.ken_burns
+crops each frame from a mip-mapped source in Pillow and pipes rawvideo to
+ffmpeg.
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/ken_burns_benchmark.py --length 30 --zoom-speed 3
+
+A synthetic 4000x3000 test image is generated with lavfi unless --image
+points at an existing file. Peak memory of each child process is reported
+where the platform supports it.
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.ken_burns import render_ken_burns, get_output_size
+from PIL import Image
+
+
+def generate_image(path, width, height):
+    subprocess.run([
+        'ffmpeg', '-y', '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=1',
+        '-frames:v', '1', path
+    ], check=True, capture_output=True)
+
+
+def zoompan_render(image_path, output_path, length, frame_rate, zoom_speed):
+    """Reproduces the previous implementation."""
+    with Image.open(image_path) as img:
+        width, height = img.size
+    output_width, output_height = get_output_size(width, height)
+    scale_dims = "7680:4320" if width > height else "4320:7680"
+    total_frames = int(length * frame_rate)
+    zoom_factor = 1 + (zoom_speed * length)
+    subprocess.run([
+        'ffmpeg', '-y', '-framerate', str(frame_rate), '-loop', '1', '-i', image_path,
+        '-vf', f"scale={scale_dims},zoompan=z='min(1+({zoom_speed}*{length})*on/{total_frames}, {zoom_factor})'"
+               f":d={total_frames}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+               f":s={output_width}x{output_height},fps={frame_rate}",
+        '-c:v', 'libx264', '-r', str(frame_rate), '-t', str(length), '-pix_fmt', 'yuv420p', output_path
+    ], check=True, capture_output=True)
+
+
+def peak_child_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='Existing image (default: generate one)')
+    parser.add_argument('--length', type=float, default=30, help='Clip length in seconds')
+    parser.add_argument('--frame-rate', type=int, default=30, help='Output frame rate')
+    parser.add_argument('--zoom-speed', type=float, default=3, help='Zoom speed as passed to the API (0-100)')
+    parser.add_argument('--skip-zoompan', action='store_true', help='Only time the new renderer')
+    args = parser.parse_args()
+    zoom_speed = args.zoom_speed / 100
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        image = args.image
+        if not image:
+            image = os.path.join(work_dir, 'source.png')
+            generate_image(image, 4000, 3000)
+
+        results = {}
+        start = time.time()
+        cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+        render_ken_burns(image, os.path.join(work_dir, 'renderer.mp4'), args.length, args.frame_rate, zoom_speed)
+        cpu_end = resource.getrusage(resource.RUSAGE_SELF)
+        results['renderer'] = (
+            time.time() - start,
+            (cpu_end.ru_utime - cpu_start.ru_utime) + (cpu_end.ru_stime - cpu_start.ru_stime)
+        )
+        print(f"renderer peak encoder RSS: {peak_child_rss_mb():.0f} MB, "
+              f"renderer process RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        if not args.skip_zoompan:
+            start = time.time()
+            child_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+            zoompan_render(image, os.path.join(work_dir, 'zoompan.mp4'), args.length, args.frame_rate, zoom_speed)
+            child_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+            results['zoompan'] = (
+                time.time() - start,
+                (child_end.ru_utime - child_start.ru_utime) + (child_end.ru_stime - child_start.ru_stime)
+            )
+            print(f"zoompan peak RSS: {peak_child_rss_mb():.0f} MB")
+
+        for name, (elapsed, cpu) in results.items():
+            print(f"{name:>10}: {elapsed:8.1f}s wall, {cpu:8.1f}s CPU (Python side for renderer)")
+        if 'zoompan' in results:
+            print(f"   speedup: {results['zoompan'][0] / results['renderer'][0]:.1f}x wall")
+
+
+if __name__ == '__main__':
+    main()
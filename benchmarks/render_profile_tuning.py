@@ -0,0 +1,191 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Tune the x264 preset and thread count of every render profile for this host.
+
+For each render profile (services.v1.autoedit.ffmpeg_builder.RENDER_PROFILES)
+a testsrc2/sine source is generated at the profile's resolution and stored
+losslessly, so source generation does not count against the encodes. It is
+then encoded at the profile's CRF and audio bitrate with every preset and
+thread count. Frame rate, speed, CPU time, output size and the SSIM against
+the source are recorded, and services.render_tuning.select_profile_settings
+picks the cheapest preset that meets the profile's estimated speed without
+a lower SSIM than the profile's hardcoded preset, moving to a costlier one
+only when it makes the output meaningfully smaller. With --no-ssim, no
+preset faster than the hardcoded one is chosen.
+
+The table is written to RENDER_PROFILE_TABLE (or --output) and loaded by the
+workers when they start, so restart the API after running this. Run it on
+the host (or instance type) that serves requests, with no other jobs running.
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/render_profile_tuning.py
+    python benchmarks/render_profile_tuning.py --profiles standard high --duration 20
+    python benchmarks/render_profile_tuning.py --presets veryfast fast medium slow --threads 2 4 8 --no-ssim
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from config import RENDER_PROFILE_TABLE
+from services.ffmpeg_runner import run_ffmpeg
+from services.render_tuning import TUNING_PRESETS, build_profile_table, get_host_info
+from services.v1.autoedit.ffmpeg_builder import RENDER_PROFILES
+
+FRAME_RATE = 30
+
+# Source resolution per profile; profiles without a target size keep the
+# source resolution, which is 1080p for most uploads
+PROFILE_SIZES = {
+    'preview': '854x480',
+    'preview_720p': '1280x720',
+    'standard': '1920x1080',
+    'high': '1920x1080',
+    '4k': '3840x2160'
+}
+
+
+def default_thread_counts():
+    cpus = os.cpu_count() or 1
+    counts = {cpus}
+    threads = 1
+    while threads < cpus:
+        counts.add(threads)
+        threads *= 2
+    return sorted(counts)
+
+
+def generate_source(work_dir, size, duration):
+    """Render testsrc2 and a sine tone to a lossless file."""
+    path = os.path.join(work_dir, f"source_{size}.mkv")
+    if not os.path.exists(path):
+        run_ffmpeg([
+            'ffmpeg', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={FRAME_RATE}:duration={duration}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-qp', '0', '-pix_fmt', 'yuv420p',
+            '-c:a', 'pcm_s16le', '-shortest', path
+        ], threads=None, description="tuning source")
+    return path
+
+
+def get_ffmpeg_version():
+    result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else None
+
+
+def measure_ssim(output_path, source_path):
+    result = run_ffmpeg(
+        ['ffmpeg', '-i', output_path, '-i', source_path, '-lavfi', 'ssim', '-f', 'null', '-'],
+        check=False, threads=None, description="tuning ssim"
+    )
+    match = re.search(r"All:(\d+(?:\.\d+)?)", result.stderr)
+    return float(match.group(1)) if match else None
+
+
+def encode(source_path, output_path, profile, preset, threads, duration):
+    """Encode the source with one preset and thread count and return the benchmark row."""
+    cmd = [
+        'ffmpeg', '-y', '-i', source_path,
+        '-c:v', profile['video_codec'], '-preset', preset, '-crf', str(profile['crf']),
+        '-pix_fmt', profile['pix_fmt'],
+        '-c:a', 'aac', '-b:a', profile['audio_bitrate'],
+        '-threads', str(threads), output_path
+    ]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.time()
+    run_ffmpeg(cmd, priority='high', threads=None, description=f"tuning {preset}/{threads}")
+    elapsed = time.time() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return {
+        "preset": preset,
+        "threads": threads,
+        "fps": round(duration * FRAME_RATE / elapsed, 2),
+        "speed": round(duration / elapsed, 3),
+        "cpu_seconds": round((after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime), 3),
+        "size": os.path.getsize(output_path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=list(RENDER_PROFILES), choices=list(RENDER_PROFILES),
+                        help='Render profiles to tune')
+    parser.add_argument('--presets', nargs='+', default=TUNING_PRESETS, help='x264 presets to compare')
+    parser.add_argument('--threads', type=int, nargs='+', default=default_thread_counts(),
+                        help='Thread counts to compare')
+    parser.add_argument('--duration', type=int, default=10, help='Length of the test source in seconds')
+    parser.add_argument('--no-ssim', dest='ssim', action='store_false',
+                        help='Skip the SSIM measurement; presets faster than the hardcoded ones are then never chosen')
+    parser.add_argument('--output', default=RENDER_PROFILE_TABLE, help='Where to write the profile table')
+    args = parser.parse_args()
+
+    host = get_host_info()
+    host['ffmpeg'] = get_ffmpeg_version()
+    print(f"Host: {host['cpu_count']} x {host['cpu_model']}, {host['ffmpeg']}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.profiles:
+            profile = RENDER_PROFILES[name]
+            size = PROFILE_SIZES.get(name, '1920x1080')
+            source_path = generate_source(work_dir, size, args.duration)
+            output_path = os.path.join(work_dir, "encoded.mp4")
+
+            print(f"\n{name} ({size}, crf {profile['crf']}, target {profile['estimated_speed']})")
+            print(f"{'preset':>10} {'threads':>8} {'fps':>8} {'speed':>8} {'cpu':>8} {'size':>10}"
+                  + (f" {'ssim':>8}" if args.ssim else ""))
+            rows = []
+            for preset in args.presets:
+                for threads in args.threads:
+                    row = encode(source_path, output_path, profile, preset, threads, args.duration)
+                    if args.ssim:
+                        row["ssim"] = measure_ssim(output_path, source_path)
+                    os.remove(output_path)
+                    rows.append(row)
+                    print(f"{preset:>10} {threads:>8} {row['fps']:>8.1f} {row['speed']:>7.2f}x "
+                          f"{row['cpu_seconds']:>7.1f}s {row['size'] / 1024:>8.0f}KB"
+                          + (f" {row['ssim']:>8.4f}" if args.ssim and row['ssim'] is not None else ""))
+            results[name] = rows
+
+    table = build_profile_table(results, RENDER_PROFILES, host)
+    with open(args.output, 'w') as f:
+        json.dump(table, f, indent=2)
+
+    print(f"\nDefault -> tuned settings (written to {args.output}):")
+    for name, tuned in table["profiles"].items():
+        print(f"{name:>14}: {RENDER_PROFILES[name]['preset']:>9} -> {tuned['preset']:<9} "
+              f"{tuned['threads']} threads, {tuned['speed']:.2f}x realtime")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Benchmark the streaming, audio-only silence engine against the previous one.
+
+The previous implementation downloaded the file and ran silencedetect with
+every stream mapped, so the video track was decoded for the full duration
+and the log was only parsed after ffmpeg exited. The new engine
+(services.v1.media.silence.build_silence_command) decodes only the first
+audio stream of the requested window at ANALYSIS_SAMPLE_RATE.
+
+Usage (inside the API container, from the repository root):
+
+    python benchmarks/silence_benchmark.py --duration 7200
+    python benchmarks/silence_benchmark.py --source talk.mp4 --start 3600 --end 4200
+
+A synthetic source (testsrc2 video plus a tone that is muted for 2 seconds
+every 30 seconds) is generated unless --source points at an existing file.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.v1.media.silence import build_silence_command, parse_silence_lines
+
+
+def generate_source(path, duration):
+    subprocess.run([
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-af', "volume=enable='lt(mod(t,30),2)':volume=0",
+        '-ac', '2',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60', '-c:a', 'aac',
+        '-shortest', path
+    ], check=True, capture_output=True)
+
+
+def legacy_detect(source, noise, min_duration):
+    """Reproduces the previous command: all streams decoded, stderr parsed after exit."""
+    cmd = ['ffmpeg', '-i', source, '-af',
+           f"pan=mono|c0=0.5*c0+0.5*c1,silencedetect=noise={noise}:d={min_duration}", '-f', 'null', '-']
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    return list(parse_silence_lines(result.stderr.splitlines()))
+
+
+def streaming_detect(source, noise, min_duration, start=None, end=None):
+    """Runs the new command and records when the first interval became available."""
+    cmd = build_silence_command(source, start, end, noise, min_duration, mono=True)
+    started = time.time()
+    first_result = None
+    intervals = []
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for interval in parse_silence_lines(process.stderr, offset=start or 0.0, window_end=end):
+        if first_result is None:
+            first_result = time.time() - started
+        intervals.append(interval)
+    process.wait()
+    return intervals, first_result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', help='Existing media file (default: generate one)')
+    parser.add_argument('--duration', type=int, default=7200, help='Duration of the generated source in seconds')
+    parser.add_argument('--noise', default='-30dB', help='silencedetect noise threshold')
+    parser.add_argument('--min-duration', type=float, default=0.5, help='Minimum silence duration')
+    parser.add_argument('--start', type=float, help='Window start in seconds (new engine only)')
+    parser.add_argument('--end', type=float, help='Window end in seconds (new engine only)')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the new engine')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = args.source
+        if not source:
+            source = os.path.join(work_dir, 'source.mp4')
+            print(f"Generating {args.duration}s source...")
+            generate_source(source, args.duration)
+
+        start = time.time()
+        intervals, first_result = streaming_detect(source, args.noise, args.min_duration, args.start, args.end)
+        streaming_time = time.time() - start
+        print(f" streaming: {streaming_time:8.1f}s wall, {len(intervals)} intervals, "
+              f"first after {first_result or 0:.1f}s")
+
+        if not args.skip_legacy:
+            start = time.time()
+            legacy_intervals = legacy_detect(source, args.noise, args.min_duration)
+            legacy_time = time.time() - start
+            print(f"    legacy: {legacy_time:8.1f}s wall, {len(legacy_intervals)} intervals")
+            print(f"   speedup: {legacy_time / streaming_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
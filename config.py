@@ -27,6 +27,49 @@ if not API_KEY:
 # Storage path setting
 LOCAL_STORAGE_PATH = os.environ.get('LOCAL_STORAGE_PATH', '/tmp')
 
+# Temporary storage housekeeping
+STORAGE_JANITOR_ENABLED = os.environ.get('STORAGE_JANITOR_ENABLED', 'true').lower() == 'true'
+STORAGE_JANITOR_INTERVAL = int(os.environ.get('STORAGE_JANITOR_INTERVAL', '600'))  # seconds between sweeps
+STORAGE_MAX_FILE_AGE = int(os.environ.get('STORAGE_MAX_FILE_AGE', '21600'))  # seconds, 0 disables age policy
+STORAGE_MAX_BYTES = int(os.environ.get('STORAGE_MAX_BYTES', '0'))  # 0 disables size policy
+JOB_DISK_QUOTA_BYTES = int(os.environ.get('JOB_DISK_QUOTA_BYTES', '0'))  # 0 = unlimited
+
+# RAM-backed (tmpfs) scratch tier for small files
+RAM_SCRATCH_PATH = os.environ.get('RAM_SCRATCH_PATH', '/dev/shm/nca-scratch')
+RAM_SCRATCH_MAX_FILE_BYTES = int(os.environ.get('RAM_SCRATCH_MAX_FILE_BYTES', str(16 * 1024 * 1024)))  # 0 disables the tier
+RAM_SCRATCH_BUDGET_BYTES = int(os.environ.get('RAM_SCRATCH_BUDGET_BYTES', str(256 * 1024 * 1024)))  # per worker process
+
+# Parallel downloads of the input files of a single job
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', '4'))
+
+# Parallel uploads of the output files of a single job
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '8'))
+
+# ffprobe metadata cache (entries per worker process)
+PROBE_CACHE_SIZE = int(os.environ.get('PROBE_CACHE_SIZE', '512'))  # 0 disables the cache
+PROBE_CACHE_URL_TTL = int(os.environ.get('PROBE_CACHE_URL_TTL', '300'))  # seconds, URLs without ETag/Last-Modified
+# URL probes are also kept in an SQLite file shared by all workers and kept across restarts
+PROBE_CACHE_PATH = os.environ.get('PROBE_CACHE_PATH', os.path.join(LOCAL_STORAGE_PATH, 'probe_cache.sqlite3'))  # empty disables the store
+PROBE_CACHE_STORE_SIZE = int(os.environ.get('PROBE_CACHE_STORE_SIZE', '100000'))  # entries
+
+# Parallel HEAD + ffprobe requests of one batch metadata job
+METADATA_CONCURRENCY = int(os.environ.get('METADATA_CONCURRENCY', '8'))
+
+# ffmpeg subprocesses (services/ffmpeg_runner.py)
+FFMPEG_CPU_BUDGET = int(os.environ.get('FFMPEG_CPU_BUDGET', '0'))  # threads shared by concurrent ffmpegs, 0 = CPU count
+FFMPEG_PRIORITY = os.environ.get('FFMPEG_PRIORITY', 'normal')  # high, normal or low
+FFMPEG_TIMEOUT = int(os.environ.get('FFMPEG_TIMEOUT', '0'))  # seconds per ffmpeg process, 0 = no deadline
+
+# Host-specific encoder presets per render profile, written by benchmarks/render_profile_tuning.py
+RENDER_PROFILE_TABLE = os.environ.get(
+    'RENDER_PROFILE_TABLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_profiles.json')
+)
+
+# Chunked compose rendering: other toolkit instances to send chunks to, and the target chunk length
+COMPOSE_PEERS = [peer.strip().rstrip('/') for peer in os.environ.get('COMPOSE_PEERS', '').split(',') if peer.strip()]
+COMPOSE_CHUNK_DURATION = float(os.environ.get('COMPOSE_CHUNK_DURATION', '30'))  # seconds
+
 # GCP environment variables
 GCP_SA_CREDENTIALS = os.environ.get('GCP_SA_CREDENTIALS', '')
 GCP_BUCKET_NAME = os.environ.get('GCP_BUCKET_NAME', '')
@@ -46,6 +46,8 @@ logger = logging.getLogger(__name__)
                 "required": ["option", "value"]
             }
         },
+        "chunks": {"type": "integer", "minimum": 1, "maximum": 32},
+        "include_report": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -62,6 +64,8 @@ def caption_video(job_id, data):
     caption_srt = data.get('srt')
     caption_ass = data.get('ass')
     options = data.get('options', [])
+    chunks = data.get('chunks', 1)
+    include_report = data.get('include_report', False)
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
@@ -76,7 +80,9 @@ def caption_video(job_id, data):
         caption_type = "srt"
 
     try:
-        output_filename = process_captioning(video_url, captions, caption_type, options, job_id)
+        output_filename, report = process_captioning(
+            video_url, captions, caption_type, options, job_id, chunks=chunks
+        )
         logger.info(f"Job {job_id}: Captioning process completed successfully")
 
         # Upload the captioned video using the unified upload_file() method
@@ -85,6 +91,8 @@ def caption_video(job_id, data):
         logger.info(f"Job {job_id}: Captioned video uploaded to cloud storage: {cloud_url}")
 
         # Return the cloud URL for the uploaded file
+        if include_report:
+            return {"file_url": cloud_url, **report}, "/caption-video", 200
         return cloud_url, "/caption-video", 200
 
     except Exception as e:
@@ -21,7 +21,7 @@ from app_utils import *
 import logging
 from services.extract_keyframes import process_keyframe_extraction
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
+from services.cloud_storage import upload_files
 
 extract_keyframes_bp = Blueprint('extract_keyframes', __name__)
 logger = logging.getLogger(__name__)
@@ -32,6 +32,8 @@ logger = logging.getLogger(__name__)
     "type": "object",
     "properties": {
         "video_url": {"type": "string", "format": "uri"},
+        "max_count": {"type": "integer", "minimum": 1},
+        "min_spacing": {"type": "number", "minimum": 0},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -41,6 +43,8 @@ logger = logging.getLogger(__name__)
 @queue_task_wrapper(bypass_queue=False)
 def extract_keyframes(job_id, data):
     video_url = data.get('video_url')
+    max_count = data.get('max_count')
+    min_spacing = data.get('min_spacing')
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
@@ -48,13 +52,12 @@ def extract_keyframes(job_id, data):
 
     try:
         # Process keyframe extraction
-        image_paths = process_keyframe_extraction(video_url, job_id)
+        image_paths = process_keyframe_extraction(
+            video_url, job_id, max_count=max_count, min_spacing=min_spacing
+        )
 
-        # Upload each extracted keyframe and collect the cloud URLs
-        image_urls = []
-        for image_path in image_paths:
-            cloud_url = upload_file(image_path)
-            image_urls.append({"image_url": cloud_url})
+        # Upload the extracted keyframes concurrently, keeping their order
+        image_urls = [{"image_url": cloud_url} for cloud_url in upload_files(image_paths)]
 
         logger.info(f"Job {job_id}: Keyframes uploaded to cloud storage")
 
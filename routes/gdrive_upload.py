@@ -20,6 +20,7 @@ import os
 import logging
 from flask import Blueprint, request, jsonify
 import threading
+import queue
 import requests
 import uuid
 import json
@@ -91,13 +92,155 @@ def initiate_resumable_upload(filename, folder_id, mime_type='application/octet-
     upload_url = response.headers['Location']
     return upload_url
 
-def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
+# Drive requires every chunk except the last to be a multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+MIN_CHUNK_SIZE = CHUNK_ALIGNMENT
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Adaptive sizing keeps each PUT within this many seconds
+TARGET_CHUNK_SECONDS = (2, 8)
+
+# Status codes after which the session can be resumed from the last acknowledged byte
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+def align_chunk_size(chunk_size):
+    """Round a chunk size to Drive's 256 KiB multiple, within the allowed bounds."""
+    aligned = (chunk_size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, aligned))
+
+def next_chunk_size(chunk_size, elapsed):
+    """Grow the chunk size on fast PUTs and shrink it on slow ones."""
+    if elapsed < TARGET_CHUNK_SECONDS[0]:
+        return align_chunk_size(chunk_size * 2)
+    if elapsed > TARGET_CHUNK_SECONDS[1]:
+        return align_chunk_size(chunk_size // 2)
+    return chunk_size
+
+def parse_acknowledged_bytes(response):
+    """Return the number of bytes Drive has persisted, from the Range header of a 308 response."""
+    range_header = response.headers.get('Range')
+    if not range_header:
+        return 0
+    # Format: "bytes=0-<last byte>"
+    return int(range_header.split('-')[-1]) + 1
+
+def query_upload_status(upload_url, total_size):
+    """
+    Ask Drive how much of a resumable upload it has received.
+
+    Returns:
+        tuple: (acknowledged bytes, file ID if the upload is already complete)
+    """
+    response = requests.put(
+        upload_url,
+        headers={'Content-Length': '0', 'Content-Range': f'bytes */{total_size}'},
+        timeout=60
+    )
+    if response.status_code in (200, 201):
+        return total_size, response.json()['id']
+    if response.status_code == 308:
+        return parse_acknowledged_bytes(response), None
+    raise Exception(f"Upload session cannot be resumed (status code {response.status_code})")
+
+class ChunkPrefetcher:
+    """
+    Reads the source stream in a background thread, one chunk ahead of the uploader.
+
+    The queue holds a single chunk, so chunk N+1 is downloaded while chunk N
+    is being uploaded without buffering more than a few chunks in memory. If
+    the source connection drops, the download continues from the current
+    offset with an HTTP Range request.
+    """
+
+    def __init__(self, file_url, chunk_size, job_id, max_retries=5, retry_delay=5):
+        self.file_url = file_url
+        self.chunk_size = chunk_size
+        self.job_id = job_id
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.bytes_read = 0
+        self.queue = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def get(self):
+        """Return the next chunk, or None at the end of the source."""
+        item = self.queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        buffer = bytearray()
+        attempt = 0
+        try:
+            while True:
+                headers = {'Range': f'bytes={self.bytes_read}-'} if self.bytes_read else None
+                try:
+                    with requests.get(self.file_url, stream=True, headers=headers, timeout=60) as r:
+                        r.raise_for_status()
+                        if self.bytes_read and r.status_code != 206:
+                            raise Exception("Source server does not support resuming the download")
+                        for data in r.iter_content(chunk_size=CHUNK_ALIGNMENT):
+                            if self.stop_event.is_set():
+                                return
+                            buffer.extend(data)
+                            self.bytes_read += len(data)
+                            attempt = 0
+                            if len(buffer) >= self.chunk_size:
+                                if not self._put(bytes(buffer)):
+                                    return
+                                buffer = bytearray()
+                    break
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as e:
+                    attempt += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning(
+                        f"Job {self.job_id}: Source download interrupted at byte {self.bytes_read} ({e}), "
+                        f"resuming in {self.retry_delay} seconds..."
+                    )
+                    time.sleep(self.retry_delay)
+
+            if buffer:
+                self._put(bytes(buffer))
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size, adaptive=True):
     """
     Uploads the file to Google Drive in chunks by streaming data directly from the source URL.
+
+    The source is downloaded one chunk ahead in a background thread, so the
+    download of chunk N+1 overlaps the upload of chunk N. With ``adaptive``
+    the chunk size grows or shrinks (in 256 KiB multiples) to keep each PUT
+    within TARGET_CHUNK_SECONDS. After a network error or a retryable status
+    code the session is queried and the upload resumes from the last byte
+    Drive acknowledged, using the data still in memory, so the source
+    download is never restarted.
     """
-    bytes_uploaded = 0
     max_retries = 5
     retry_delay = 5  # seconds
+    chunk_size = align_chunk_size(chunk_size)
 
     progress = UploadProgress(job_id, total_size)
 
@@ -105,55 +248,101 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
     with uploads_lock:
         active_uploads.append(progress)
 
+    prefetcher = ChunkPrefetcher(file_url, chunk_size, job_id, max_retries, retry_delay).start()
+
     try:
-        with requests.get(file_url, stream=True) as r:
-            r.raise_for_status()
-            iterator = r.iter_content(chunk_size=chunk_size)
-            for chunk in iterator:
-                if chunk:
-                    for attempt in range(max_retries):
-                        start = bytes_uploaded
-                        end = bytes_uploaded + len(chunk) - 1
-                        content_range = f'bytes {start}-{end}/{total_size}'
-                        headers = {
-                            'Content-Length': str(len(chunk)),
-                            'Content-Range': content_range,
-                        }
-                        try:
-                            upload_response = requests.put(
-                                upload_url,
-                                headers=headers,
-                                data=chunk
-                            )
-                            if upload_response.status_code in (200, 201):
-                                # Upload complete
-                                logger.info(f"Job {job_id}: Upload complete.")
-                                with progress.lock:
-                                    progress.bytes_uploaded = end + 1
-                                return upload_response.json()['id']
-                            elif upload_response.status_code == 308:
-                                # Resumable upload incomplete
-                                bytes_uploaded = end + 1
-                                with progress.lock:
-                                    progress.bytes_uploaded = bytes_uploaded
-                                break  # Break retry loop and continue with next chunk
-                            else:
-                                # Handle unexpected status codes
-                                logger.error(f"Job {job_id}: Unexpected status code: {upload_response.status_code}")
-                                raise Exception(f"Upload failed with status code {upload_response.status_code}")
-                        except requests.exceptions.RequestException as e:
-                            logger.error(f"Job {job_id}: Network error during upload: {e}")
-                            if attempt < max_retries - 1:
-                                logger.info(f"Job {job_id}: Retrying upload chunk after {retry_delay} seconds...")
-                                time.sleep(retry_delay)
-                                continue
-                            else:
-                                logger.error(f"Job {job_id}: Max retries reached. Upload failed.")
-                                raise
-                    else:
-                        # If we exhausted retries, exit the function
-                        raise Exception("Failed to upload chunk after multiple retries.")
+        bytes_uploaded = 0       # Bytes acknowledged by Drive
+        pending = bytearray()    # Downloaded bytes not yet acknowledged, starting at bytes_uploaded
+        source_done = False
+        attempt = 0
+
+        while True:
+            # Fill the buffer up to the current chunk size from the prefetched stream
+            while not source_done and len(pending) < chunk_size:
+                data = prefetcher.get()
+                if data is None:
+                    source_done = True
+                else:
+                    pending.extend(data)
+
+            is_last = source_done and bytes_uploaded + len(pending) >= total_size
+            if is_last:
+                send_size = len(pending)
+            else:
+                send_size = (min(len(pending), chunk_size) // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT
+
+            if send_size == 0:
+                if source_done:
+                    raise Exception(
+                        f"Source ended after {bytes_uploaded + len(pending)} of {total_size} bytes"
+                    )
+                continue
+
+            start = bytes_uploaded
+            end = bytes_uploaded + send_size - 1
+            headers = {
+                'Content-Length': str(send_size),
+                'Content-Range': f'bytes {start}-{end}/{total_size}',
+            }
+
+            put_start = time.time()
+            try:
+                upload_response = requests.put(
+                    upload_url,
+                    headers=headers,
+                    data=bytes(pending[:send_size]),
+                    timeout=max(120, TARGET_CHUNK_SECONDS[1] * 10)
+                )
+                status_code = upload_response.status_code
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Job {job_id}: Network error during upload: {e}")
+                upload_response = None
+                status_code = None
+
+            if status_code in (200, 201):
+                # Upload complete
+                logger.info(f"Job {job_id}: Upload complete.")
+                with progress.lock:
+                    progress.bytes_uploaded = total_size
+                return upload_response.json()['id']
+
+            if status_code == 308:
+                # Resumable upload incomplete; Drive may have kept fewer bytes than we sent
+                acknowledged = parse_acknowledged_bytes(upload_response)
+                attempt = 0
+                if adaptive:
+                    chunk_size = next_chunk_size(chunk_size, time.time() - put_start)
+                    prefetcher.chunk_size = chunk_size
+            elif status_code is None or status_code in RETRYABLE_STATUS_CODES:
+                attempt += 1
+                if attempt >= max_retries:
+                    logger.error(f"Job {job_id}: Max retries reached. Upload failed.")
+                    raise Exception("Failed to upload chunk after multiple retries.")
+                logger.info(f"Job {job_id}: Retrying upload from last acknowledged byte after {retry_delay} seconds...")
+                time.sleep(retry_delay)
+                acknowledged, file_id = query_upload_status(upload_url, total_size)
+                if file_id:
+                    with progress.lock:
+                        progress.bytes_uploaded = total_size
+                    return file_id
+                if adaptive:
+                    chunk_size = align_chunk_size(chunk_size // 2)
+                    prefetcher.chunk_size = chunk_size
+            else:
+                # Handle unexpected status codes
+                logger.error(f"Job {job_id}: Unexpected status code: {status_code}")
+                raise Exception(f"Upload failed with status code {status_code}")
+
+            if acknowledged < bytes_uploaded:
+                raise Exception(f"Drive acknowledged {acknowledged} bytes, fewer than previously confirmed {bytes_uploaded}")
+
+            # Drop acknowledged bytes; anything after them is resent from memory
+            del pending[:acknowledged - bytes_uploaded]
+            bytes_uploaded = acknowledged
+            with progress.lock:
+                progress.bytes_uploaded = bytes_uploaded
     finally:
+        prefetcher.stop()
         # Remove progress from active_uploads
         with uploads_lock:
             if progress in active_uploads:
@@ -169,6 +358,7 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
         "folder_id": {"type": "string"},
         "mime_type": {"type": "string"},
         "chunk_size": {"type": "integer", "minimum": 1},
+        "adaptive_chunk_size": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -188,7 +378,8 @@ def gdrive_upload(job_id, data):
         filename = data['filename']
         folder_id = data['folder_id']
         mime_type = data.get('mime_type', 'application/octet-stream')
-        chunk_size = data.get('chunk_size', 5 * 1024 * 1024)  # Default to 5 MB
+        chunk_size = align_chunk_size(data.get('chunk_size', 5 * 1024 * 1024))  # Default to 5 MB
+        adaptive = data.get('adaptive_chunk_size', True)
 
         # Get the total size of the file
         try:
@@ -199,6 +390,7 @@ def gdrive_upload(job_id, data):
             get_response = requests.get(file_url, stream=True, timeout=30)
             get_response.raise_for_status()
             total_size = int(get_response.headers.get('Content-Length', 0))
+            get_response.close()
             if total_size == 0:
                 raise ValueError("Content-Length header is missing or zero")
         except requests.exceptions.RequestException as e:
@@ -215,7 +407,7 @@ def gdrive_upload(job_id, data):
         logger.info(f"Job {job_id}: Resumable upload session initiated with chunk size {chunk_size} bytes.")
 
         # Upload file in chunks
-        file_id = upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size)
+        file_id = upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size, adaptive)
 
         return file_id, "/gdrive-upload", 200
 
@@ -24,6 +24,7 @@ logger = logging.getLogger(__name__)
                 },
                 "minItems": 1,
             },
+            "include_report": {"type": "boolean"},
             "webhook_url": {"type": "string", "format": "uri"},
             "id": {"type": "string"},
         },
@@ -42,7 +43,7 @@ def combine_audio(job_id, data):
     )
 
     try:
-        output_file = process_audio_concatenate(media_urls, job_id)
+        output_file, report = process_audio_concatenate(media_urls, job_id)
         logger.info(f"Job {job_id}: Audio combination process completed successfully")
 
         cloud_url = upload_file(output_file)
@@ -50,6 +51,8 @@ def combine_audio(job_id, data):
             f"Job {job_id}: Combined audio uploaded to cloud storage: {cloud_url}"
         )
 
+        if data.get("include_report"):
+            return {"file_url": cloud_url, **report}, "/v1/audio/concatenate", 200
         return cloud_url, "/v1/audio/concatenate", 200
 
     except Exception as e:
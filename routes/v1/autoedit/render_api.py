@@ -46,6 +46,7 @@ logger = logging.getLogger(__name__)
     "properties": {
         "quality": {"type": "string", "enum": ["standard", "high", "4k"]},
         "crossfade_duration": {"type": "number", "minimum": 0.01, "maximum": 0.5},
+        "smart_render": {"type": "boolean"},
         "async_render": {"type": "boolean", "default": True}
     },
     "additionalProperties": False
@@ -61,6 +62,7 @@ def approve_and_render(job_id, data, **kwargs):
         {
             "quality": "high",
             "crossfade_duration": 0.025,
+            "smart_render": false,
             "async_render": true
         }
 
@@ -71,6 +73,7 @@ def approve_and_render(job_id, data, **kwargs):
     workflow_id = request.view_args.get('workflow_id')
     quality = data.get('quality', 'high')
     crossfade_duration = data.get('crossfade_duration', 0.025)
+    smart_render = data.get('smart_render', False)
     async_render = data.get('async_render', True)
 
     logger.info(f"Starting final render for workflow {workflow_id} at {quality} quality (async={async_render})")
@@ -102,7 +105,8 @@ def approve_and_render(job_id, data, **kwargs):
                 enqueue_result = continue_after_hitl2(
                     workflow_id,
                     quality=quality,
-                    crossfade_duration=crossfade_duration
+                    crossfade_duration=crossfade_duration,
+                    smart_render=smart_render
                 )
 
                 if enqueue_result.get("success"):
@@ -137,7 +141,8 @@ def approve_and_render(job_id, data, **kwargs):
                 blocks=blocks,
                 video_duration_ms=video_duration_ms,
                 quality=quality,
-                fade_duration=crossfade_duration
+                fade_duration=crossfade_duration,
+                smart_render=smart_render
             )
 
             # Update workflow with output
@@ -291,7 +296,8 @@ def get_result(workflow_id):
     "type": "object",
     "properties": {
         "quality": {"type": "string", "enum": ["standard", "high", "4k"]},
-        "crossfade_duration": {"type": "number", "minimum": 0.01, "maximum": 0.5}
+        "crossfade_duration": {"type": "number", "minimum": 0.01, "maximum": 0.5},
+        "smart_render": {"type": "boolean"}
     },
     "additionalProperties": False
 })
@@ -304,7 +310,8 @@ def rerender(job_id, data, **kwargs):
     Request body:
         {
             "quality": "4k",
-            "crossfade_duration": 0.025
+            "crossfade_duration": 0.025,
+            "smart_render": false
         }
 
     Returns:
@@ -313,6 +320,7 @@ def rerender(job_id, data, **kwargs):
     workflow_id = request.view_args.get('workflow_id')
     quality = data.get('quality', 'high')
     crossfade_duration = data.get('crossfade_duration', 0.025)
+    smart_render = data.get('smart_render', False)
 
     logger.info(f"Re-rendering workflow {workflow_id} at {quality} quality")
 
@@ -348,7 +356,8 @@ def rerender(job_id, data, **kwargs):
             blocks=blocks,
             video_duration_ms=video_duration_ms,
             quality=quality,
-            fade_duration=crossfade_duration
+            fade_duration=crossfade_duration,
+            smart_render=smart_render
         )
 
         # Update workflow with new output
@@ -478,6 +478,7 @@ def task_render():
     workflow_id = data.get("workflow_id")
     quality = data.get("quality", "high")
     crossfade_duration = data.get("crossfade_duration", 0.025)
+    smart_render = data.get("smart_render", False)
 
     if not workflow_id:
         return jsonify({"error": "workflow_id required"}), 400
@@ -508,7 +509,8 @@ def task_render():
             blocks=blocks,
             video_duration_ms=video_duration_ms,
             quality=quality,
-            fade_duration=crossfade_duration
+            fade_duration=crossfade_duration,
+            smart_render=smart_render
         )
 
         # Update workflow with output
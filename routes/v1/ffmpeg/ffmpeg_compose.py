@@ -20,7 +20,8 @@ import os
 import logging
 from flask import Blueprint, request, jsonify
 from app_utils import *
-from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose
+from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose, process_ffmpeg_compose_streaming
+from services.v1.ffmpeg.chunked_render import process_ffmpeg_compose_chunked
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
 
@@ -106,6 +107,8 @@ logger = logging.getLogger(__name__)
                 "encoder": {"type": "boolean"}
             }
         },
+        "stream_output": {"type": "boolean"},
+        "chunked_render": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -117,7 +120,24 @@ def ffmpeg_api(job_id, data):
     logger.info(f"Job {job_id}: Received flexible FFmpeg request")
 
     try:
-        output_filenames, metadata = process_ffmpeg_compose(data, job_id)
+        # Streaming mode uploads the output while ffmpeg is still encoding.
+        # It returns None when the output needs a seekable file (e.g. +faststart).
+        if data.get("stream_output"):
+            output_urls = process_ffmpeg_compose_streaming(data, job_id)
+            if output_urls is not None:
+                logger.info(f"Job {job_id}: Output streamed to cloud storage")
+                return output_urls, "/v1/ffmpeg/compose", 200
+            logger.info(f"Job {job_id}: Streaming not possible, using file mode")
+
+        # Chunked mode renders keyframe-aligned chunks on local processes and
+        # COMPOSE_PEERS. It returns None when the request is not a single timeline.
+        result = None
+        if data.get("chunked_render"):
+            result = process_ffmpeg_compose_chunked(data, job_id)
+            if result is None:
+                logger.info(f"Job {job_id}: Chunked rendering not possible, using a single process")
+
+        output_filenames, metadata = result or process_ffmpeg_compose(data, job_id)
         
         # Upload output files to GCP and create result array
         output_urls = []
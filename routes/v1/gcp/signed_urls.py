@@ -0,0 +1,62 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from flask import Blueprint
+from services.authentication import authenticate
+from app_utils import validate_payload, queue_task_wrapper
+from services.v1.gcp.signed_url import generate_signed_urls_batch, MAX_BATCH_SIZE
+import logging
+
+logger = logging.getLogger(__name__)
+v1_gcp_signed_urls_bp = Blueprint('v1_gcp_signed_urls', __name__)
+
+
+@v1_gcp_signed_urls_bp.route('/v1/gcp/signed-urls', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "items": {
+            "type": "array",
+            "minItems": 1,
+            "maxItems": MAX_BATCH_SIZE,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "method": {"type": "string", "enum": ["upload", "download"]},
+                    "filename": {"type": "string"},
+                    "blob_path": {"type": "string"},
+                    "content_type": {"type": "string"},
+                    "expiration_minutes": {"type": "integer", "minimum": 1, "maximum": 1440},
+                    "folder": {"type": "string"}
+                },
+                "additionalProperties": False
+            }
+        },
+        "check_exists": {"type": "boolean"}
+    },
+    "required": ["items"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=True)
+def gcp_signed_urls_endpoint(job_id, data):
+    """Generate signed upload and/or download URLs for many files in one call."""
+    try:
+        result = generate_signed_urls_batch(
+            items=data['items'],
+            check_exists=data.get('check_exists', False)
+        )
+
+        logger.info(f"Job {job_id}: Generated {result['succeeded']} signed URLs ({result['failed']} failed)")
+        return result, "/v1/gcp/signed-urls", 200
+
+    except ValueError as e:
+        logger.error(f"Job {job_id}: Validation error - {str(e)}")
+        return {"error": str(e)}, "/v1/gcp/signed-urls", 400
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error generating signed URLs - {str(e)}")
+        return {"error": str(e)}, "/v1/gcp/signed-urls", 500
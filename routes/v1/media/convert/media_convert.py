@@ -19,6 +19,7 @@ from app_utils import validate_payload, queue_task_wrapper
 import logging
 from services.v1.media.convert.media_convert import process_media_convert
 from services.authentication import authenticate
+from services.render_tuning import get_tuned_settings
 from services.cloud_storage import upload_file
 import os
 
@@ -37,6 +38,8 @@ logger = logging.getLogger(__name__)
         "video_crf": {"type": "number", "minimum": 0, "maximum": 51},
         "audio_codec": {"type": "string"},
         "audio_bitrate": {"type": "string"},
+        "remux": {"type": "boolean"},
+        "include_report": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -48,17 +51,18 @@ def convert_media_format(job_id, data):
     media_url = data['media_url']
     output_format = data['format']
     video_codec = data.get('video_codec', 'libx264')
-    video_preset = data.get('video_preset', 'medium')
     video_crf = data.get('video_crf', 23)
+    video_preset = data.get('video_preset', get_tuned_settings('standard', 'medium', video_crf)['preset'])
     audio_codec = data.get('audio_codec', 'aac')
     audio_bitrate = data.get('audio_bitrate', '128k')
+    remux = data.get('remux', True)
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
     logger.info(f"Job {job_id}: Received media conversion request for media URL: {media_url} to format: {output_format}")
 
     try:
-        output_file = process_media_convert(
+        output_file, plan = process_media_convert(
             media_url, 
             job_id, 
             output_format, 
@@ -67,13 +71,16 @@ def convert_media_format(job_id, data):
             video_crf,
             audio_codec,
             audio_bitrate,
-            webhook_url
+            webhook_url,
+            remux=remux
         )
-        logger.info(f"Job {job_id}: Media format conversion completed successfully")
+        logger.info(f"Job {job_id}: Media format conversion completed successfully ({plan['method']})")
 
         cloud_url = upload_file(output_file)
         logger.info(f"Job {job_id}: Converted media uploaded to cloud storage: {cloud_url}")
         
+        if data.get('include_report'):
+            return {"file_url": cloud_url, **plan}, "/v1/media/convert", 200
         return cloud_url, "/v1/media/convert", 200
 
     except Exception as e:
@@ -19,7 +19,7 @@
 from flask import Blueprint, request, jsonify
 from app_utils import validate_payload, queue_task_wrapper
 import logging
-from services.v1.media.metadata import get_media_metadata
+from services.v1.media.metadata import get_media_metadata, get_media_metadata_batch, MAX_BATCH_URLS
 from services.authentication import authenticate
 
 # Set up logger
@@ -69,4 +69,51 @@ def media_metadata(job_id, data):
     except Exception as e:
         error_message = str(e)
         logger.error(f"Job {job_id}: Error extracting metadata - {error_message}")
-        return error_message, "/v1/media/metadata", 500
\ No newline at end of file
+        return error_message, "/v1/media/metadata", 500
+
+@v1_media_metadata_bp.route('/v1/media/metadata/batch', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "media_urls": {
+            "type": "array",
+            "items": {"type": "string", "format": "uri"},
+            "minItems": 1,
+            "maxItems": MAX_BATCH_URLS
+        },
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["media_urls"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=False)
+def media_metadata_batch(job_id, data):
+    """
+    Extract metadata for many media files in one request.
+
+    Expected input:
+    {
+        "media_urls": ["https://example.com/a.mp4", "https://example.com/b.mp3"],
+        "webhook_url": "https://example.com/webhook" (optional),
+        "id": "custom-id" (optional)
+    }
+
+    Returns one item per URL, in request order, with either "metadata"
+    (same fields as /v1/media/metadata) or "error".
+    """
+    media_urls = data['media_urls']
+    logger.info(f"Job {job_id}: Received batch metadata request for {len(media_urls)} URLs")
+
+    try:
+        results = get_media_metadata_batch(media_urls, job_id)
+        failed = sum(1 for item in results if "error" in item)
+        logger.info(f"Job {job_id}: Batch metadata completed, {failed} of {len(results)} failed")
+
+        return {"results": results, "succeeded": len(results) - failed, "failed": failed}, "/v1/media/metadata/batch", 200
+
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Job {job_id}: Error extracting batch metadata - {error_message}")
+        return error_message, "/v1/media/metadata/batch", 500
@@ -0,0 +1,39 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import logging
+from flask import Blueprint
+from services.authentication import authenticate
+from services.scratch_storage import get_storage_metrics
+from app_utils import queue_task_wrapper
+
+v1_toolkit_storage_bp = Blueprint('v1_toolkit_storage', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_storage_bp.route('/v1/toolkit/storage', methods=['GET'])
+@authenticate
+@queue_task_wrapper(bypass_queue=True)
+def storage_metrics(job_id, data):
+    logger.info(f"Job {job_id}: Collecting local storage metrics")
+
+    try:
+        return get_storage_metrics(), "/v1/toolkit/storage", 200
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error collecting storage metrics - {str(e)}")
+        return str(e), "/v1/toolkit/storage", 500
@@ -97,6 +97,8 @@ logger = logging.getLogger(__name__)
                 "additionalProperties": False
             }
         },
+        "chunks": {"type": "integer", "minimum": 1, "maximum": 32},
+        "include_report": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"},
         "language": {"type": "string"}
@@ -114,6 +116,8 @@ def caption_video_v1(job_id, data):
     webhook_url = data.get('webhook_url')
     id = data.get('id')
     language = data.get('language', 'auto')
+    chunks = data.get('chunks', 1)
+    include_report = data.get('include_report', False)
 
     logger.info(f"Job {job_id}: Received v1 captioning request for {video_url}")
     logger.info(f"Job {job_id}: Settings received: {settings}")
@@ -158,12 +162,8 @@ def caption_video_v1(job_id, data):
 
         # Render the video with subtitles using FFmpeg
         try:
-            import ffmpeg
-            ffmpeg.input(video_path).output(
-                output_path,
-                vf=f"subtitles='{ass_path}'",
-                acodec='copy'
-            ).run(overwrite_output=True)
+            from services.subtitle_burn import burn_subtitles
+            report = burn_subtitles(video_path, f"subtitles='{ass_path}'", output_path, chunks=chunks)
             logger.info(f"Job {job_id}: FFmpeg processing completed. Output saved to {output_path}")
         except Exception as e:
             logger.error(f"Job {job_id}: FFmpeg error: {str(e)}")
@@ -180,6 +180,8 @@ def caption_video_v1(job_id, data):
         os.remove(output_path)
         logger.info(f"Job {job_id}: Cleaned up local output file")
 
+        if include_report:
+            return {"file_url": cloud_url, **report}, "/v1/video/caption", 200
         return cloud_url, "/v1/video/caption", 200
 
     except Exception as e:
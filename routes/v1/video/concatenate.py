@@ -42,6 +42,7 @@ logger = logging.getLogger(__name__)
             },
             "minItems": 1
         },
+        "include_report": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -57,12 +58,14 @@ def combine_videos(job_id, data):
     logger.info(f"Job {job_id}: Received combine-videos request for {len(media_urls)} videos")
 
     try:
-        output_file = process_video_concatenate(media_urls, job_id)
+        output_file, report = process_video_concatenate(media_urls, job_id)
         logger.info(f"Job {job_id}: Video combination process completed successfully")
 
         cloud_url = upload_file(output_file)
         logger.info(f"Job {job_id}: Combined video uploaded to cloud storage: {cloud_url}")
 
+        if data.get('include_report'):
+            return {"file_url": cloud_url, **report}, "/v1/video/concatenate", 200
         return cloud_url, "/v1/video/concatenate", 200
 
     except Exception as e:
@@ -21,6 +21,7 @@ from app_utils import *
 import logging
 from services.v1.video.cut import cut_media
 from services.authentication import authenticate
+from services.render_tuning import get_tuned_settings
 
 v1_video_cut_bp = Blueprint('v1_video_cut', __name__)
 logger = logging.getLogger(__name__)
@@ -49,6 +50,7 @@ logger = logging.getLogger(__name__)
         "video_crf": {"type": "number", "minimum": 0, "maximum": 51},
         "audio_codec": {"type": "string"},
         "audio_bitrate": {"type": "string"},
+        "smart_cut": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -63,10 +65,11 @@ def video_cut(job_id, data):
     
     # Extract encoding settings with defaults
     video_codec = data.get('video_codec', 'libx264')
-    video_preset = data.get('video_preset', 'medium')
     video_crf = data.get('video_crf', 23)
+    video_preset = data.get('video_preset', get_tuned_settings('standard', 'medium', video_crf)['preset'])
     audio_codec = data.get('audio_codec', 'aac')
     audio_bitrate = data.get('audio_bitrate', '128k')
+    smart_cut = data.get('smart_cut', False)
     
     logger.info(f"Job {job_id}: Received video cut request for {video_url}")
     
@@ -80,7 +83,8 @@ def video_cut(job_id, data):
             video_preset=video_preset,
             video_crf=video_crf,
             audio_codec=audio_codec,
-            audio_bitrate=audio_bitrate
+            audio_bitrate=audio_bitrate,
+            smart_cut=smart_cut
         )
         
         # Upload the processed file to cloud storage
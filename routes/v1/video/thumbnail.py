@@ -19,9 +19,9 @@
 from flask import Blueprint, jsonify
 from app_utils import *
 import logging
-from services.v1.video.thumbnail import extract_thumbnail
+from services.v1.video.thumbnail import extract_thumbnail, extract_thumbnails, write_thumbnail_vtt, MAX_THUMBNAILS
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
+from services.cloud_storage import upload_file, upload_files
 
 v1_video_thumbnail_bp = Blueprint('v1_video_thumbnail', __name__)
 logger = logging.getLogger(__name__)
@@ -33,6 +33,17 @@ logger = logging.getLogger(__name__)
     "properties": {
         "video_url": {"type": "string", "format": "uri"},
         "second": {"type": "number", "minimum": 0},
+        "timestamps": {
+            "type": "array",
+            "items": {"type": "number", "minimum": 0},
+            "minItems": 1,
+            "maxItems": MAX_THUMBNAILS
+        },
+        "interval": {"type": "number", "exclusiveMinimum": 0},
+        "images": {"type": "boolean"},
+        "sprite": {"type": "boolean"},
+        "tile_width": {"type": "integer", "minimum": 16, "maximum": 640},
+        "columns": {"type": "integer", "minimum": 1, "maximum": 50},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -45,6 +56,9 @@ def generate_thumbnail(job_id, data):
     second = data.get('second', 0)  # Default to 0 if not provided
     webhook_url = data.get('webhook_url')
 
+    if data.get('timestamps') or data.get('interval'):
+        return generate_thumbnails(job_id, data)
+
     logger.info(f"Job {job_id}: Received thumbnail extraction request for {video_url} at {second} seconds")
 
     try:
@@ -62,3 +76,48 @@ def generate_thumbnail(job_id, data):
     except Exception as e:
         logger.error(f"Job {job_id}: Error during thumbnail extraction - {str(e)}")
         return str(e), "/v1/video/thumbnail", 500
+
+def generate_thumbnails(job_id, data):
+    """Many thumbnails and/or a sprite sheet with a WebVTT track from one job."""
+    video_url = data.get('video_url')
+    images = data.get('images', True)
+    sprite = data.get('sprite', False)
+    columns = data.get('columns', 10)
+
+    logger.info(f"Job {job_id}: Received multi-thumbnail request for {video_url}")
+
+    if not images and not sprite:
+        return "At least one of images or sprite must be enabled", "/v1/video/thumbnail", 400
+
+    try:
+        result = extract_thumbnails(
+            video_url,
+            job_id,
+            timestamps=data.get('timestamps'),
+            interval=data.get('interval'),
+            images=images,
+            sprite=sprite,
+            tile_width=data.get('tile_width', 160),
+            columns=columns
+        )
+
+        response = {"thumbnails": []}
+        image_urls = upload_files(result["images"])
+        for index, second in enumerate(result["timestamps"]):
+            thumbnail = {"second": second}
+            if image_urls:
+                thumbnail["image_url"] = image_urls[index]
+            response["thumbnails"].append(thumbnail)
+
+        if sprite:
+            sprite_urls = upload_files(result["sprites"])
+            response["sprite_urls"] = sprite_urls
+            response["tile_width"], response["tile_height"] = result["tile_size"]
+            response["vtt_url"] = upload_file(write_thumbnail_vtt(result, sprite_urls, job_id, columns))
+
+        logger.info(f"Job {job_id}: {len(result['timestamps'])} thumbnails uploaded to cloud storage")
+        return response, "/v1/video/thumbnail", 200
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error during thumbnail extraction - {str(e)}")
+        return str(e), "/v1/video/thumbnail", 500
@@ -21,6 +21,7 @@ from app_utils import *
 import logging
 from services.v1.video.trim import trim_video
 from services.authentication import authenticate
+from services.render_tuning import get_tuned_settings
 
 v1_video_trim_bp = Blueprint('v1_video_trim', __name__)
 logger = logging.getLogger(__name__)
@@ -38,6 +39,7 @@ logger = logging.getLogger(__name__)
         "video_crf": {"type": "number", "minimum": 0, "maximum": 51},
         "audio_codec": {"type": "string"},
         "audio_bitrate": {"type": "string"},
+        "mode": {"type": "string", "enum": ["accurate", "copy", "smart"]},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -53,16 +55,17 @@ def video_trim(job_id, data):
     
     # Extract encoding settings with defaults
     video_codec = data.get('video_codec', 'libx264')
-    video_preset = data.get('video_preset', 'medium')
     video_crf = data.get('video_crf', 23)
+    video_preset = data.get('video_preset', get_tuned_settings('standard', 'medium', video_crf)['preset'])
     audio_codec = data.get('audio_codec', 'aac')
     audio_bitrate = data.get('audio_bitrate', '128k')
+    mode = data.get('mode')
     
     logger.info(f"Job {job_id}: Received video trim request for {video_url}")
     
     try:
         # Process the video file and get local file paths
-        output_filename, input_filename = trim_video(
+        output_filename, input_filename, trim_info = trim_video(
             video_url=video_url,
             start=start,
             end=end,
@@ -71,7 +74,8 @@ def video_trim(job_id, data):
             video_preset=video_preset,
             video_crf=video_crf,
             audio_codec=audio_codec,
-            audio_bitrate=audio_bitrate
+            audio_bitrate=audio_bitrate,
+            mode=mode or 'accurate'
         )
         
         # Upload the processed file to cloud storage
@@ -86,6 +90,11 @@ def video_trim(job_id, data):
         logger.info(f"Job {job_id}: Removed temporary files")
         
         logger.info(f"Job {job_id}: Video trim operation completed successfully")
+
+        # Requests that choose a mode also get the effective boundaries; the
+        # plain URL response is kept for existing callers
+        if mode:
+            return {"file_url": cloud_url, **trim_info}, "/v1/video/trim", 200
         return cloud_url, "/v1/video/trim", 200
         
     except Exception as e:
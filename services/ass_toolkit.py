@@ -17,7 +17,6 @@
 
 
 import os
-import ffmpeg
 import logging
 import subprocess
 import whisper
@@ -26,6 +25,7 @@ import srt
 import re
 from services.file_management import download_file
 from services.cloud_storage import upload_file  # Ensure this import is present
+from services.media_probe import get_media_probe
 import requests  # Ensure requests is imported for webhook handling
 from urllib.parse import urlparse
 from config import LOCAL_STORAGE_PATH
@@ -80,11 +80,9 @@ def generate_transcription(video_path, language='auto'):
 
 def get_video_resolution(video_path):
     try:
-        probe = ffmpeg.probe(video_path)
-        video_streams = [s for s in probe['streams'] if s['codec_type'] == 'video']
-        if video_streams:
-            width = int(video_streams[0]['width'])
-            height = int(video_streams[0]['height'])
+        probe = get_media_probe(video_path)
+        if probe.has_video:
+            width, height = probe.width, probe.height
             logger.info(f"Video resolution determined: {width}x{height}")
             return width, height
         else:
@@ -17,40 +17,61 @@
 
 
 import os
-import subprocess
+import math
 from services.file_management import download_file
+from services.media_probe import get_media_probe
+from services.ffmpeg_runner import run_ffmpeg
 
 STORAGE_PATH = "/tmp/"
 
 def get_duration(file_path):
-    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    return float(result.stdout)
-
-def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
-    video_path = download_file(video_url, STORAGE_PATH)
-    audio_path = download_file(audio_url, STORAGE_PATH)
-    output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
-
-    video_duration = get_duration(video_path)
-    audio_duration = get_duration(audio_path)
-
-    # Explicitly set output duration based on output_length
-    output_duration = video_duration if output_length == 'video' else audio_duration
-
-    # Prepare FFmpeg command
+    duration = get_media_probe(file_path).duration
+    if duration is None:
+        raise ValueError(f"Could not determine the duration of {file_path}")
+    return duration
+
+def build_loop_list(video_path, video_duration, target_duration):
+    """
+    Build a concat demuxer list that repeats the video until ``target_duration``.
+
+    Whole loops are listed as they are; the last, partial loop gets an
+    outpoint so only the needed part of it is read.
+
+    Returns:
+        list: Lines of the concat list
+    """
+    loops = max(1, math.ceil(target_duration / video_duration))
+    path = os.path.abspath(video_path).replace("'", "'\\''")
+    lines = []
+    for i in range(loops):
+        lines.append(f"file '{path}'")
+        remaining = target_duration - i * video_duration
+        if remaining < video_duration:
+            lines.append(f"outpoint {remaining:.6f}")
+    return lines
+
+def build_mixing_command(video_path, audio_path, output_path, audio_vol, output_length, video_duration,
+                         output_duration, concat_list_path=None):
+    """
+    Build the ffmpeg command that lays the audio under the video.
+
+    With ``concat_list_path`` (see build_loop_list) the video is read through
+    the concat demuxer instead of ``video_path``, which loops it.
+
+    Returns:
+        list: The ffmpeg command
+    """
     cmd = ['ffmpeg', '-y']
 
     # Input video
-    cmd.extend(['-i', video_path])
+    if concat_list_path:
+        cmd.extend(['-f', 'concat', '-safe', '0', '-i', concat_list_path])
+    else:
+        cmd.extend(['-i', video_path])
 
     # Input audio
     cmd.extend(['-i', audio_path])
 
-    # Video settings
-    if output_length == 'audio' and audio_duration > video_duration:
-        cmd.extend(['-stream_loop', '-1'])  # Loop video only if output_length is 'audio' and audio is longer
-
     # Audio settings
     audio_filter = f'[1:a]volume={audio_vol/100}'
     if output_length == 'video':
@@ -62,20 +83,47 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.extend(['-map', '0:v'])  # Map video from first input
     cmd.extend(['-map', '[a]'])  # Map processed audio
 
-    if output_length == 'audio' and audio_duration > video_duration:
-        cmd.extend(['-c:v', 'libx264'])  # Re-encode video if looping
-    else:
-        cmd.extend(['-c:v', 'copy'])  # Copy video codec otherwise
+    cmd.extend(['-c:v', 'copy'])  # The video track is never re-encoded, looped or not
 
     cmd.extend(['-c:a', 'aac'])  # Always encode audio to AAC
-    
+
     # Explicitly set output duration
     cmd.extend(['-t', str(output_duration)])
 
     cmd.append(output_path)
+    return cmd
+
+def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
+    video_path = download_file(video_url, STORAGE_PATH)
+    audio_path = download_file(audio_url, STORAGE_PATH)
+    output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
+
+    video_duration = get_duration(video_path)
+    audio_duration = get_duration(audio_path)
+
+    # Explicitly set output duration based on output_length
+    output_duration = video_duration if output_length == 'video' else audio_duration
+
+    # Loop the video only if output_length is 'audio' and the audio is longer
+    loop_video = output_length == 'audio' and audio_duration > video_duration
+    concat_list_path = os.path.join(STORAGE_PATH, f"{job_id}_loop.txt")
+
+    if loop_video:
+        # Repeat the source through the concat demuxer so the loop is stream-copied
+        with open(concat_list_path, 'w') as f:
+            f.write('\n'.join(build_loop_list(video_path, video_duration, audio_duration)) + '\n')
+
+    cmd = build_mixing_command(
+        video_path, audio_path, output_path, audio_vol, output_length, video_duration, output_duration,
+        concat_list_path=concat_list_path if loop_video else None
+    )
 
     # Run FFmpeg command
-    subprocess.run(cmd, check=True)
+    try:
+        run_ffmpeg(cmd, description="audio mixing")
+    finally:
+        if os.path.exists(concat_list_path):
+            os.remove(concat_list_path)
 
     # Clean up input files
     os.remove(video_path)
@@ -17,11 +17,12 @@
 
 
 import os
-import ffmpeg
 import logging
 import requests
 import subprocess
 from services.file_management import download_file
+from services.scratch_storage import get_scratch_path, SMALL_FILE_SIZE_HINT
+from services.subtitle_burn import burn_subtitles
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
@@ -104,15 +105,23 @@ def generate_style_line(options):
     }
     return f"Style: {','.join(str(v) for v in style_options.values())}"
 
-def process_captioning(file_url, caption_srt, caption_type, options, job_id):
-    """Process video captioning using FFmpeg."""
+def process_captioning(file_url, caption_srt, caption_type, options, job_id, chunks=1):
+    """
+    Process video captioning using FFmpeg.
+
+    With ``chunks`` > 1 the video is rendered in keyframe-aligned chunks in
+    parallel (see services.subtitle_burn.burn_subtitles).
+
+    Returns:
+        tuple: (output_path, render report dict)
+    """
     try:
         logger.info(f"Job {job_id}: Starting download of file from {file_url}")
         video_path = download_file(file_url, STORAGE_PATH)
         logger.info(f"Job {job_id}: File downloaded to {video_path}")
 
         subtitle_extension = '.' + caption_type
-        srt_path = os.path.join(STORAGE_PATH, f"{job_id}{subtitle_extension}")
+        srt_path = get_scratch_path(f"{job_id}{subtitle_extension}", SMALL_FILE_SIZE_HINT)
         options = convert_array_to_collection(options)
         caption_style = ""
 
@@ -200,28 +209,12 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             subtitle_filter += "'"
             logger.info(f"Job {job_id}: Using subtitle filter: {subtitle_filter}")
 
-        try:
-            # Log the FFmpeg command for debugging
-            logger.info(f"Job {job_id}: Running FFmpeg with filter: {subtitle_filter}")
-
-            # Run FFmpeg to add subtitles to the video
-            ffmpeg.input(video_path).output(
-                output_path,
-                vf=subtitle_filter,
-                acodec='copy'
-            ).run()
-            logger.info(f"Job {job_id}: FFmpeg processing completed, output file at {output_path}")
-        except ffmpeg.Error as e:
-            # Log the FFmpeg stderr output
-            if e.stderr:
-                error_message = e.stderr.decode('utf8')
-            else:
-                error_message = 'Unknown FFmpeg error'
-            logger.error(f"Job {job_id}: FFmpeg error: {error_message}")
-            raise
+        logger.info(f"Job {job_id}: Running FFmpeg with filter: {subtitle_filter}")
+        report = burn_subtitles(video_path, subtitle_filter, output_path, chunks=chunks)
+        logger.info(f"Job {job_id}: FFmpeg processing completed, output file at {output_path}")
 
         # The upload process will be handled by the calling function
-        return output_path
+        return output_path, report
 
         # Clean up local files
         os.remove(video_path)
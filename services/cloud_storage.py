@@ -19,10 +19,11 @@
 import os
 import logging
 from abc import ABC, abstractmethod
-from services.gcp_toolkit import upload_to_gcs
-from services.s3_toolkit import upload_to_s3
-from config import validate_env_vars
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from services.gcp_toolkit import upload_to_gcs, stream_to_gcs, delete_from_gcs
+from services.s3_toolkit import upload_to_s3, stream_to_s3, delete_from_s3
+from config import validate_env_vars, UPLOAD_CONCURRENCY
+from urllib.parse import urlparse, unquote
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,14 @@ class CloudStorageProvider(ABC):
     def upload_file(self, file_path: str) -> str:
         pass
 
+    @abstractmethod
+    def upload_stream(self, stream, filename: str, content_type: str = None, should_commit=None) -> str:
+        pass
+
+    @abstractmethod
+    def delete_file(self, filename: str) -> None:
+        pass
+
 class GCPStorageProvider(CloudStorageProvider):
     def __init__(self):
         self.bucket_name = os.getenv('GCP_BUCKET_NAME')
@@ -50,6 +59,12 @@ class GCPStorageProvider(CloudStorageProvider):
     def upload_file(self, file_path: str) -> str:
         return upload_to_gcs(file_path, self.bucket_name)
 
+    def upload_stream(self, stream, filename: str, content_type: str = None, should_commit=None) -> str:
+        return stream_to_gcs(stream, filename, self.bucket_name, content_type=content_type, should_commit=should_commit)
+
+    def delete_file(self, filename: str) -> None:
+        delete_from_gcs(filename, self.bucket_name)
+
 class S3CompatibleProvider(CloudStorageProvider):
     def __init__(self):
 
@@ -86,6 +101,13 @@ class S3CompatibleProvider(CloudStorageProvider):
     def upload_file(self, file_path: str) -> str:
         return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key, self.bucket_name, self.region)
 
+    def upload_stream(self, stream, filename: str, content_type: str = None, should_commit=None) -> str:
+        return stream_to_s3(stream, filename, self.endpoint_url, self.access_key, self.secret_key,
+                            self.bucket_name, self.region, content_type=content_type, should_commit=should_commit)
+
+    def delete_file(self, filename: str) -> None:
+        delete_from_s3(filename, self.endpoint_url, self.access_key, self.secret_key, self.bucket_name, self.region)
+
 def get_storage_provider() -> CloudStorageProvider:
     
     if os.getenv('S3_ENDPOINT_URL'):
@@ -115,4 +137,59 @@ def upload_file(file_path: str) -> str:
     except Exception as e:
         logger.error(f"Error uploading file to cloud storage: {e}")
         raise
-    
\ No newline at end of file
+
+def upload_files(file_paths, max_workers=UPLOAD_CONCURRENCY):
+    """
+    Upload several files concurrently with a bounded pool.
+
+    Returns:
+        list: URLs in the order of ``file_paths``
+    """
+    if not file_paths:
+        return []
+    workers = max(1, min(max_workers, len(file_paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(upload_file, file_paths))
+
+def upload_stream(stream, filename: str, content_type: str = None, should_commit=None) -> str:
+    """
+    Upload a byte stream (e.g. ffmpeg stdout) to cloud storage as it is produced.
+
+    Args:
+        stream: File-like object with a blocking ``read(n)`` method
+        filename (str): Object name in the bucket
+        content_type (str, optional): MIME type of the object
+        should_commit (callable, optional): Called once the stream is exhausted;
+            the upload is only finalized if it returns True
+
+    Returns:
+        str: URL of the uploaded object, or None if the upload was not committed
+    """
+    provider = get_storage_provider()
+    try:
+        logger.info(f"Streaming upload to cloud storage: {filename}")
+        url = provider.upload_stream(stream, filename, content_type=content_type, should_commit=should_commit)
+        if url:
+            logger.info(f"Stream uploaded successfully: {url}")
+        return url
+    except Exception as e:
+        logger.error(f"Error streaming upload to cloud storage: {e}")
+        raise
+
+def delete_file(file_url: str) -> bool:
+    """
+    Delete an object this toolkit uploaded, given the URL upload_file returned.
+
+    Uploaded objects are named after the local file, so the object name is
+    the last component of the URL path.
+
+    Returns:
+        bool: True if the object was deleted
+    """
+    filename = unquote(urlparse(file_url).path.rsplit('/', 1)[-1])
+    try:
+        get_storage_provider().delete_file(filename)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not delete {file_url} from cloud storage: {e}")
+        return False
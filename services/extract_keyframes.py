@@ -17,37 +17,63 @@
 
 
 import os
-import subprocess
-import json
 from services.file_management import download_file
+from services.scratch_storage import get_job_scratch_dir
+from services.ffmpeg_runner import run_ffmpeg
 
-STORAGE_PATH = "/tmp/"
+def build_keyframe_command(video_path, output_pattern, max_count=None, min_spacing=None):
+    """
+    Build the ffmpeg command that writes the keyframes of a video as JPEGs.
 
-def process_keyframe_extraction(video_url, job_id):
-    video_path = download_file(video_url, STORAGE_PATH)
+    ``-skip_frame nokey`` makes the decoder drop every non-key frame, so only
+    the keyframes are decoded instead of the whole video.
+
+    Args:
+        video_path (str): Local video file
+        output_pattern (str): Output path pattern with a frame number placeholder
+        max_count (int, optional): Stop after this many keyframes
+        min_spacing (float, optional): Minimum seconds between two extracted keyframes
+    """
+    filters = []
+    if min_spacing:
+        filters.append(f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{min_spacing})'")
+    filters += ["scale=iw*sar:ih", "setsar=1"]
 
-    # Extract keyframes
-    output_pattern = os.path.join(STORAGE_PATH, f"{job_id}_%03d.jpg")
     cmd = [
         'ffmpeg',
+        '-skip_frame', 'nokey',
         '-i', video_path,
-        '-vf', f"select='eq(pict_type,I)',scale=iw*sar:ih,setsar=1",
-        '-vsync', 'vfr',
-        output_pattern
+        '-an',
+        '-vf', ','.join(filters),
+        '-vsync', 'vfr'
     ]
+    if max_count:
+        cmd += ['-frames:v', str(max_count)]
+    cmd.append(output_pattern)
+    return cmd
+
+def process_keyframe_extraction(video_url, job_id, max_count=None, min_spacing=None):
+    # Everything lives in the job's scratch directory, removed when the job ends
+    work_dir = os.path.join(get_job_scratch_dir(), f"{job_id}_keyframes")
+    video_path = download_file(video_url, work_dir)
 
-    print(f"Images: {cmd}")
+    try:
+        # Extract keyframes
+        output_pattern = os.path.join(work_dir, f"{job_id}_%03d.jpg")
+        cmd = build_keyframe_command(video_path, output_pattern, max_count, min_spacing)
 
-    subprocess.run(cmd, check=True)
+        print(f"Images: {cmd}")
 
-    # Upload keyframes to GCS and get URLs
+        run_ffmpeg(cmd, description="keyframes")
+    finally:
+        # Clean up input file
+        os.remove(video_path)
+
+    # Collect the keyframes from the job's own directory
     output_filenames = []
-    for filename in sorted(os.listdir(STORAGE_PATH)):
+    for filename in sorted(os.listdir(work_dir)):
         if filename.startswith(f"{job_id}_") and filename.endswith(".jpg"):
-            file_path = os.path.join(STORAGE_PATH, filename)
+            file_path = os.path.join(work_dir, filename)
             output_filenames.append(file_path)
 
-    # Clean up input file
-    os.remove(video_path)
-
-    return output_filenames
\ No newline at end of file
+    return output_filenames
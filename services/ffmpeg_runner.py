@@ -0,0 +1,425 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Shared runner for ffmpeg subprocesses.
+
+Every service starts ffmpeg through run_ffmpeg() (or start_ffmpeg() when it
+needs the process's pipes). The runner:
+
+- shares the CPU budget between the ffmpeg processes of this worker: a
+  command without -threads gets FFMPEG_CPU_BUDGET divided by the number of
+  ffmpeg processes running when it starts;
+- runs ffmpeg at a lower priority than the API (see PRIORITY_NICENESS);
+- enforces a deadline and kills the whole process group when it expires;
+- keeps the start and the end of stderr in bounded buffers instead of
+  capturing it all, and reports progress lines to a callback;
+- records the wall time of every invocation (see get_ffmpeg_stats).
+"""
+
+import os
+import re
+import time
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+from config import FFMPEG_CPU_BUDGET, FFMPEG_PRIORITY, FFMPEG_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Niceness of the ffmpeg process per priority class. The API process itself
+# runs at 0, so requests keep being answered while encodes use every core.
+PRIORITY_NICENESS = {'high': 0, 'normal': 5, 'low': 10}
+
+# stderr lines kept from the start (stream and output headers) and the end
+# (the error) of a run; progress lines are not kept except for the last one
+STDERR_HEAD_LINES = 100
+STDERR_TAIL_LINES = 200
+
+HISTORY_SIZE = 500
+
+# Global flags without an argument that may follow the last output
+TRAILING_GLOBAL_FLAGS = ('-y', '-n', '-nostdin', '-hide_banner')
+
+# ffmpeg options that take no argument (booleans also accept a "-no" prefix);
+# every other option is followed by its argument
+FLAG_OPTIONS = frozenset(TRAILING_GLOBAL_FLAGS + (
+    '-stdin', '-an', '-vn', '-sn', '-dn', '-shortest', '-re', '-stats', '-copyts', '-start_at_zero',
+    '-accurate_seek', '-seek_timestamp', '-autorotate', '-autoscale', '-ignore_unknown', '-copy_unknown',
+    '-copyinkf', '-bitexact', '-benchmark', '-benchmark_all', '-dump', '-hex', '-xerror', '-debug_ts',
+    '-fix_sub_duration', '-find_stream_info',
+))
+
+PROGRESS_PATTERN = re.compile(r"(frame|fps|size|time|bitrate|speed)=\s*(\S+)")
+
+_active = 0
+_active_lock = threading.Lock()
+_history = deque(maxlen=HISTORY_SIZE)
+
+
+class FFmpegError(Exception):
+    """Raised when ffmpeg exits with an error; ``stderr`` holds the kept part of its log."""
+
+    def __init__(self, message, returncode=None, stderr=''):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegTimeout(FFmpegError):
+    """Raised when ffmpeg is killed because its deadline expired."""
+    pass
+
+
+def get_thread_budget(active, cpu_budget=None):
+    """Threads for one ffmpeg process when ``active`` processes (itself included) share the CPUs."""
+    cpu_budget = cpu_budget or FFMPEG_CPU_BUDGET or os.cpu_count() or 1
+    return max(1, cpu_budget // max(1, active))
+
+
+def _is_option(token):
+    token = str(token)
+    return token.startswith('-') and len(token) > 1
+
+
+def find_output_indexes(cmd):
+    """
+    Return the positions of the output files of an ffmpeg command, or None if unsure.
+
+    Every token that is neither an option nor an option's argument is an
+    output. An option missing from FLAG_OPTIONS would be taken to consume
+    the next token, so a parse in which an output is directly followed by
+    another positional token is rejected rather than trusted.
+    """
+    outputs = []
+    i = 1
+    while i < len(cmd):
+        if _is_option(cmd[i]):
+            name = str(cmd[i]).split(':')[0]
+            flag = name in FLAG_OPTIONS or (name.startswith('-no') and f"-{name[3:]}" in FLAG_OPTIONS)
+            i += 1 if flag else 2
+        else:
+            outputs.append(i)
+            i += 1
+    if any(index + 1 < len(cmd) and not _is_option(cmd[index + 1]) for index in outputs):
+        return None
+    return outputs or None
+
+
+def apply_thread_budget(cmd, threads):
+    """
+    Add ``-threads`` before every output of an ffmpeg command.
+
+    Each output (for example the main encode and an extra thumbnail image)
+    gets its own encoder, so each one is limited. When the outputs cannot be
+    told apart with certainty, only the last output is limited; global flags
+    after it, such as the ``-y`` ffmpeg-python's
+    compile(overwrite_output=True) appends, are skipped. Commands that
+    already choose a thread count, and commands that are not ffmpeg
+    (ffprobe), are returned unchanged.
+    """
+    cmd = list(cmd)
+    if not threads or not cmd or os.path.basename(cmd[0]) != 'ffmpeg' or '-threads' in cmd:
+        return cmd
+    outputs = find_output_indexes(cmd)
+    if not outputs:
+        end = len(cmd)
+        while end > 2 and cmd[end - 1] in TRAILING_GLOBAL_FLAGS:
+            end -= 1
+        outputs = [end - 1]
+    for index in reversed(outputs):
+        cmd[index:index] = ['-threads', str(threads)]
+    return cmd
+
+
+def parse_time_value(value):
+    """Convert an ffmpeg HH:MM:SS.xx time to seconds, or None."""
+    match = re.match(r"(-?\d+):(\d+):(\d+(?:\.\d+)?)$", value)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_progress(line, duration=None):
+    """
+    Parse an ffmpeg statistics line.
+
+    Returns:
+        dict: frame, fps, time (seconds), speed and, with ``duration``, percent;
+        None if the line is not a statistics line
+    """
+    if 'time=' not in line:
+        return None
+    values = dict(PROGRESS_PATTERN.findall(line))
+    progress = {"time": parse_time_value(values.get('time', ''))}
+    try:
+        progress["frame"] = int(values['frame']) if 'frame' in values else None
+        progress["fps"] = float(values['fps']) if 'fps' in values else None
+    except ValueError:
+        progress["frame"] = progress["fps"] = None
+    speed = values.get('speed', '').rstrip('x')
+    progress["speed"] = float(speed) if re.match(r"^\d+(\.\d+)?$", speed) else None
+    if duration and progress["time"] is not None:
+        progress["percent"] = min(100.0, round(progress["time"] / duration * 100, 1))
+    return progress
+
+
+def split_stderr_lines(stream):
+    """Yield decoded stderr lines; progress updates end with \\r and count as lines too."""
+    buffer = b''
+    while True:
+        chunk = stream.read1(65536)
+        if not chunk:
+            break
+        parts = re.split(rb'[\r\n]', buffer + chunk)
+        buffer = parts.pop()
+        for part in parts:
+            if part.strip():
+                yield part.decode('utf-8', errors='replace')
+    if buffer.strip():
+        yield buffer.decode('utf-8', errors='replace')
+
+
+class FFmpegProcess:
+    """
+    A running ffmpeg started by start_ffmpeg().
+
+    stdin/stdout are the process's pipes when they were requested. stderr is
+    drained by a background thread unless the process was started with
+    ``stream_stderr``; the caller then reads it through iter_stderr().
+    """
+
+    def __init__(self, cmd, stdin=None, stdout=None, priority=None, timeout=None, threads='auto',
+                 progress_callback=None, duration=None, description=None, stream_stderr=False):
+        global _active
+        with _active_lock:
+            _active += 1
+            active = _active
+        self.threads = get_thread_budget(active) if threads == 'auto' else threads
+        self.cmd = apply_thread_budget(cmd, self.threads)
+        self.description = description or os.path.basename(self.cmd[0])
+        self.priority = priority or FFMPEG_PRIORITY
+        self.timeout = FFMPEG_TIMEOUT if timeout is None else timeout
+        self.progress_callback = progress_callback
+        self.duration = duration
+        self.head = []
+        self.tail = deque(maxlen=STDERR_TAIL_LINES)
+        self.dropped = 0
+        self.last_progress = None
+        self.returncode = None
+        self.started = time.time()
+        self._finished = False
+        self._drain_thread = None
+
+        logger.info(f"Running FFmpeg ({self.description}, {self.threads or 'default'} threads): {' '.join(self.cmd)}")
+        try:
+            self.process = subprocess.Popen(
+                self.cmd,
+                stdin=stdin if stdin is not None else subprocess.DEVNULL,
+                stdout=stdout if stdout is not None else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                start_new_session=True
+            )
+        except Exception:
+            self._release()
+            raise
+        self.stdin = self.process.stdin
+        self.stdout = self.process.stdout
+        self.pid = self.process.pid
+
+        niceness = PRIORITY_NICENESS.get(self.priority, PRIORITY_NICENESS['normal'])
+        if niceness:
+            try:
+                os.setpriority(os.PRIO_PROCESS, self.pid, niceness)
+            except OSError as e:
+                logger.debug(f"Could not lower the priority of ffmpeg {self.pid}: {str(e)}")
+
+        if not stream_stderr:
+            self._drain_thread = threading.Thread(target=lambda: [None for _ in self.iter_stderr()], daemon=True)
+            self._drain_thread.start()
+
+    def iter_stderr(self):
+        """Yield stderr lines as ffmpeg writes them, keeping the head and tail of the log."""
+        for line in split_stderr_lines(self.process.stderr):
+            progress = parse_progress(line, self.duration)
+            if progress is not None:
+                self.last_progress = line
+                if self.progress_callback:
+                    try:
+                        self.progress_callback(progress)
+                    except Exception as e:
+                        logger.warning(f"Progress callback failed: {str(e)}")
+            elif len(self.head) < STDERR_HEAD_LINES:
+                self.head.append(line)
+            else:
+                if len(self.tail) == self.tail.maxlen:
+                    self.dropped += 1
+                self.tail.append(line)
+            yield line
+
+    @property
+    def stderr(self):
+        """The kept part of the log: its first lines, its last lines and the last progress line."""
+        lines = list(self.head)
+        if self.dropped:
+            lines.append(f"[... {self.dropped} lines omitted ...]")
+        lines += list(self.tail)
+        if self.last_progress:
+            lines.append(self.last_progress)
+        return '\n'.join(lines)
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    def poll(self):
+        return self.process.poll()
+
+    def kill(self):
+        """Kill ffmpeg and every process it started."""
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            if self.process.poll() is None:
+                self.process.kill()
+
+    def wait(self):
+        """
+        Wait for ffmpeg to exit and return its exit code.
+
+        Raises:
+            FFmpegTimeout: The deadline expired; the process tree was killed.
+        """
+        try:
+            if self.timeout:
+                remaining = max(0.0, self.timeout - self.elapsed)
+                try:
+                    self.process.wait(timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    self.kill()
+                    self.process.wait()
+                    self._finish()
+                    raise FFmpegTimeout(
+                        f"FFmpeg ({self.description}) exceeded its {self.timeout}s deadline: {self.stderr}",
+                        self.process.returncode, self.stderr
+                    )
+            else:
+                self.process.wait()
+            self._finish()
+            return self.returncode
+        except BaseException:
+            if self.process.poll() is None:
+                self.kill()
+                self.process.wait()
+                self._finish()
+            raise
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        if self._drain_thread:
+            self._drain_thread.join(timeout=5)
+        self.returncode = self.process.returncode
+        self._release()
+        elapsed = self.elapsed
+        _history.append({
+            "description": self.description,
+            "elapsed": round(elapsed, 3),
+            "threads": self.threads,
+            "priority": self.priority,
+            "returncode": self.returncode,
+            "finished_at": time.time()
+        })
+        logger.info(f"FFmpeg ({self.description}) exited with {self.returncode} after {elapsed:.2f}s")
+
+    def _release(self):
+        global _active
+        with _active_lock:
+            _active -= 1
+
+
+def start_ffmpeg(cmd, **kwargs):
+    """
+    Start ffmpeg and return the FFmpegProcess without waiting for it.
+
+    Keyword arguments are those of FFmpegProcess: stdin/stdout (e.g.
+    subprocess.PIPE), priority ('high', 'normal', 'low'), timeout (seconds,
+    0 for none), threads ('auto', a number or None to leave ffmpeg's
+    default), progress_callback(progress dict), duration (seconds, for
+    progress percentages), description (used in logs and statistics) and
+    stream_stderr.
+    """
+    return FFmpegProcess(cmd, **kwargs)
+
+
+class FFmpegResult:
+    """Outcome of run_ffmpeg(); ``stderr`` holds the kept part of the log."""
+
+    def __init__(self, returncode, stderr, elapsed, threads):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.threads = threads
+
+
+def run_ffmpeg(cmd, check=True, **kwargs):
+    """
+    Run ffmpeg to completion.
+
+    Args:
+        cmd (list): Complete command
+        check (bool): Raise FFmpegError when ffmpeg exits with an error
+        **kwargs: See start_ffmpeg
+
+    Returns:
+        FFmpegResult: returncode, stderr, elapsed and threads
+    """
+    process = start_ffmpeg(cmd, **kwargs)
+    returncode = process.wait()
+    result = FFmpegResult(returncode, process.stderr, process.elapsed, process.threads)
+    if check and returncode != 0:
+        raise FFmpegError(f"FFmpeg command failed: {result.stderr}", returncode, result.stderr)
+    return result
+
+
+def get_ffmpeg_stats():
+    """
+    Return the running process count and timing statistics per description.
+
+    Returns:
+        dict: {"running": int, "invocations": {description: {"count", "failed",
+        "total", "mean", "max"}}} over the last HISTORY_SIZE invocations
+    """
+    invocations = {}
+    for record in list(_history):
+        stats = invocations.setdefault(record["description"], {"count": 0, "failed": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["failed"] += record["returncode"] != 0
+        stats["total"] += record["elapsed"]
+        stats["max"] = max(stats["max"], record["elapsed"])
+    for stats in invocations.values():
+        stats["total"] = round(stats["total"], 3)
+        stats["mean"] = round(stats["total"] / stats["count"], 3)
+    with _active_lock:
+        running = _active
+    return {"running": running, "invocations": invocations}
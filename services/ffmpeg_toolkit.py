@@ -20,6 +20,7 @@ import os
 import ffmpeg
 import requests
 from services.file_management import download_file
+from services.ffmpeg_runner import run_ffmpeg
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
@@ -32,12 +33,13 @@ def process_conversion(media_url, job_id, bitrate='128k', webhook_url=None):
 
     try:
         # Convert media file to MP3 with specified bitrate
-        (
+        run_ffmpeg(
             ffmpeg
             .input(input_filename)
             .output(output_path, acodec='libmp3lame', audio_bitrate=bitrate)
             .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+            .compile(),
+            description="mp3 conversion"
         )
         os.remove(input_filename)
         print(f"Conversion successful: {output_path} with bitrate {bitrate}")
@@ -73,10 +75,11 @@ def process_video_combination(media_urls, job_id, webhook_url=None):
                 concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
 
         # Use the concat demuxer to concatenate the videos
-        (
+        run_ffmpeg(
             ffmpeg.input(concat_file_path, format='concat', safe=0).
                 output(output_path, c='copy').
-                run(overwrite_output=True)
+                compile(overwrite_output=True),
+            description="video combination"
         )
 
         # Clean up input files
@@ -21,6 +21,16 @@ import uuid
 import requests
 from urllib.parse import urlparse, parse_qs
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from config import DOWNLOAD_CONCURRENCY
+from services.scratch_storage import (
+    ensure_job_quota,
+    charge_job_quota,
+    release_job_quota,
+    allocate_download_dir,
+    release_download_reservation,
+    bind_job_scratch
+)
 
 def get_extension_from_url(url):
     """Extract file extension from URL or content type.
@@ -56,26 +66,81 @@ def get_extension_from_url(url):
     raise ValueError(f"Could not determine file extension from URL: {url}")
 
 def download_file(url, storage_path="/tmp/"):
-    """Download a file from URL to local storage."""
-    # Create storage directory if it doesn't exist
-    os.makedirs(storage_path, exist_ok=True)
-    
+    """Download a file from URL to local storage.
+
+    When called inside a job, the download is charged against the job's disk
+    quota and aborted with DiskQuotaExceeded as soon as it would exceed it.
+    Small downloads of a job with a known size are written to the RAM-backed
+    scratch tier instead of ``storage_path`` when it is a transient location.
+    """
     file_id = str(uuid.uuid4())
     extension = get_extension_from_url(url)
-    local_filename = os.path.join(storage_path, f"{file_id}{extension}")
+    local_filename = None
+    charged = 0
+    ram_reserved = 0
 
     try:
         response = requests.get(url, stream=True)
         response.raise_for_status()
 
+        # Reject oversized downloads before writing anything when the size is known
+        content_length = int(response.headers.get('content-length') or 0)
+        ensure_job_quota(content_length)
+
+        # Content-Length is only the on-disk size when the body is not content-encoded
+        if not response.headers.get('content-encoding'):
+            storage_path, ram_reserved = allocate_download_dir(storage_path, content_length)
+
+        # Create storage directory if it doesn't exist
+        os.makedirs(storage_path, exist_ok=True)
+        local_filename = os.path.join(storage_path, f"{file_id}{extension}")
+
         with open(local_filename, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 if chunk:
+                    charge_job_quota(len(chunk))
+                    charged += len(chunk)
                     f.write(chunk)
 
         return local_filename
     except Exception as e:
-        if os.path.exists(local_filename):
+        if local_filename and os.path.exists(local_filename):
             os.remove(local_filename)
+        release_job_quota(charged)
+        release_download_reservation(ram_reserved)
         raise e
 
+
+def download_files(urls, storage_path="/tmp/", max_workers=DOWNLOAD_CONCURRENCY):
+    """Download several URLs concurrently with a bounded pool.
+
+    Each distinct URL is downloaded once. If any download fails, the files
+    that were already downloaded are removed and the first error is raised.
+
+    Returns:
+        dict: url -> local file path
+    """
+    distinct_urls = list(dict.fromkeys(urls))
+    if not distinct_urls:
+        return {}
+
+    workers = max(1, min(max_workers, len(distinct_urls)))
+    fetch = bind_job_scratch(download_file)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {url: executor.submit(fetch, url, storage_path) for url in distinct_urls}
+
+    local_paths = {}
+    errors = []
+    for url, future in futures.items():
+        try:
+            local_paths[url] = future.result()
+        except Exception as e:
+            errors.append(e)
+
+    if errors:
+        for path in local_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise errors[0]
+
+    return local_paths
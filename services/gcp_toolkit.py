@@ -72,6 +72,51 @@ def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
         logger.error(f"Error uploading file to GCS: {e}")
         raise
 
+def stream_to_gcs(stream, blob_name, bucket_name=GCP_BUCKET_NAME, content_type=None,
+                  chunk_size=8 * 1024 * 1024, should_commit=None):
+    """
+    Upload a non-seekable byte stream to GCS while it is being produced.
+
+    Data is sent through a resumable upload session in chunks of ``chunk_size``
+    bytes (must be a multiple of 256 KiB). The object is only finalized once the
+    stream is exhausted and ``should_commit`` (if given) returns True; otherwise
+    the session is abandoned and no object is created.
+
+    Returns:
+        str: Public URL of the uploaded blob, or None if the upload was not committed
+    """
+    if not gcs_client:
+        raise ValueError("GCS client is not initialized. Skipping file upload.")
+
+    logger.info(f"Streaming upload to Google Cloud Storage: {blob_name}")
+    bucket = gcs_client.bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+    writer = blob.open("wb", chunk_size=chunk_size, content_type=content_type)
+
+    # The writer is deliberately not used as a context manager: closing it
+    # finalizes the object, which must not happen for a failed encode.
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        writer.write(data)
+
+    if should_commit is not None and not should_commit():
+        logger.warning(f"Streaming upload of {blob_name} abandoned before commit")
+        return None
+
+    writer.close()
+    logger.info(f"Stream uploaded successfully to GCS: {blob.public_url}")
+    return blob.public_url
+
+def delete_from_gcs(blob_name, bucket_name=GCP_BUCKET_NAME):
+    """Delete an object uploaded by upload_to_gcs or stream_to_gcs."""
+    if not gcs_client:
+        raise ValueError("GCS client is not initialized. Skipping file deletion.")
+
+    gcs_client.bucket(bucket_name).blob(blob_name).delete()
+    logger.info(f"Deleted {blob_name} from GCS")
+
 
 def trigger_cloud_run_job(job_name, location="us-central1", overrides=None):
     # Retrieve service account credentials
@@ -0,0 +1,154 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+import os
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from services.ffmpeg_runner import start_ffmpeg, FFmpegError
+
+logger = logging.getLogger(__name__)
+
+# Source pixels sampled per output pixel. Crop windows are positioned with
+# sub-pixel precision, so 2x is enough for smooth motion; the previous
+# zoompan pipeline needed an 8K intermediate (4x) to hide integer rounding.
+SUPERSAMPLE = 2
+
+# Frames rendered ahead of the encoder (bounds memory use)
+RENDER_BATCH_SIZE = 16
+
+def get_output_size(width, height):
+    """Landscape images render at 1920x1080, portrait and square ones at 1080x1920."""
+    return (1920, 1080) if width > height else (1080, 1920)
+
+def get_zoom(frame_index, frame_rate, zoom_speed, zoom_factor):
+    """Zoom of a frame; same curve as the zoompan expression it replaces."""
+    return min(1 + zoom_speed * frame_index / frame_rate, zoom_factor)
+
+def get_crop_box(width, height, zoom):
+    """Centered crop window (left, upper, right, lower) in float source pixels."""
+    crop_width = width / zoom
+    crop_height = height / zoom
+    left = (width - crop_width) / 2
+    upper = (height - crop_height) / 2
+    return (left, upper, left + crop_width, upper + crop_height)
+
+def choose_mip_level(level_sizes, crop_fraction, output_size, supersample=SUPERSAMPLE):
+    """
+    Pick the smallest pyramid level that still has ``supersample`` source
+    pixels per output pixel inside the crop window.
+
+    Args:
+        level_sizes (list): (width, height) of each level, largest first
+        crop_fraction (float): Crop size as a fraction of the image size (1/zoom)
+        output_size (tuple): Output frame (width, height)
+    """
+    chosen = 0
+    for index, (level_width, level_height) in enumerate(level_sizes):
+        if (level_width * crop_fraction >= output_size[0] * supersample
+                and level_height * crop_fraction >= output_size[1] * supersample):
+            chosen = index
+        else:
+            break
+    return chosen
+
+def build_mipmaps(image, output_size, supersample=SUPERSAMPLE):
+    """Halve the image while it stays above the supersampled output size."""
+    levels = [image]
+    min_width = output_size[0] * supersample
+    min_height = output_size[1] * supersample
+    while levels[-1].width // 2 >= min_width and levels[-1].height // 2 >= min_height:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+def render_frame(levels, frame_index, frame_rate, zoom_speed, zoom_factor, output_size):
+    """Render one frame as raw RGB bytes."""
+    zoom = get_zoom(frame_index, frame_rate, zoom_speed, zoom_factor)
+    level = levels[choose_mip_level([l.size for l in levels], 1 / zoom, output_size)]
+    box = get_crop_box(level.width, level.height, zoom)
+    # Pillow's resize takes a float box, so the window moves smoothly between pixels
+    return level.resize(output_size, Image.BILINEAR, box=box).tobytes()
+
+def render_ken_burns(image_path, output_path, length, frame_rate, zoom_speed, threads=None):
+    """
+    Render a centered zoom over a still image and encode it to H.264.
+
+    Each frame is cropped and scaled from a mip-mapped copy of the source in
+    Pillow and piped to ffmpeg as rawvideo, so only the pixels each frame
+    needs are touched and no 8K intermediate is ever created. Like the
+    zoompan pipeline it replaces, the image is stretched to the output
+    aspect ratio.
+
+    Args:
+        image_path (str): Local image file
+        output_path (str): Output .mp4 path
+        length (float): Duration in seconds
+        frame_rate (int): Output frame rate
+        zoom_speed (float): Zoom increase per second (0.03 = 3%/s)
+        threads (int, optional): Frame render threads (default: CPU count)
+
+    Returns:
+        dict: {"frames": int, "width": int, "height": int}
+    """
+    with Image.open(image_path) as img:
+        image = img.convert('RGB')
+
+    output_size = get_output_size(image.width, image.height)
+    total_frames = int(length * frame_rate)
+    zoom_factor = 1 + (zoom_speed * length)
+    levels = build_mipmaps(image, output_size)
+    logger.info(
+        f"Rendering {total_frames} frames at {output_size[0]}x{output_size[1]} "
+        f"from {len(levels)} mip levels, final zoom {zoom_factor}"
+    )
+
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        '-s', f"{output_size[0]}x{output_size[1]}", '-framerate', str(frame_rate),
+        '-i', 'pipe:0',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-r', str(frame_rate),
+        output_path
+    ]
+
+    process = start_ffmpeg(cmd, stdin=subprocess.PIPE, description="ken burns")
+    try:
+        # Pillow releases the GIL while resizing, so frames render in parallel
+        with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as executor:
+            for batch_start in range(0, total_frames, RENDER_BATCH_SIZE):
+                batch = range(batch_start, min(batch_start + RENDER_BATCH_SIZE, total_frames))
+                frames = executor.map(
+                    lambda index: render_frame(levels, index, frame_rate, zoom_speed, zoom_factor, output_size),
+                    batch
+                )
+                for frame in frames:
+                    process.stdin.write(frame)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+    returncode = process.wait()
+    if returncode != 0:
+        raise FFmpegError(f"FFmpeg command failed: {process.stderr}", returncode, process.stderr)
+
+    return {"frames": total_frames, "width": output_size[0], "height": output_size[1]}
@@ -0,0 +1,337 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+Cached ffprobe metadata.
+
+Every service that needs the duration, resolution or codecs of a file goes
+through get_media_probe(). The full ffprobe JSON (format and all streams) is
+cached per process in an LRU, keyed by the identity of the content:
+
+- local files: real path plus device, inode, mtime and size, so a file that
+  is rewritten in place is probed again;
+- URLs: the URL plus its ETag or Last-Modified validator from a HEAD
+  request. Content-Length is not a validator (a replaced file may keep its
+  size); URLs without one are cached for PROBE_CACHE_URL_TTL seconds only.
+
+URL probes are also written to an SQLite store at PROBE_CACHE_PATH, shared
+by all workers and kept across restarts, so re-indexing a catalog only
+probes the URLs that changed. Local files are job scratch files whose keys
+never repeat, so they stay in memory only.
+
+Fast probes (reduced probesize, used for metadata of remote files) are
+cached separately; a full probe of the same content also satisfies them.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+import requests
+from config import PROBE_CACHE_SIZE, PROBE_CACHE_URL_TTL, PROBE_CACHE_PATH, PROBE_CACHE_STORE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for the HEAD request that validates a cached URL probe
+URL_VALIDATOR_TIMEOUT = 10
+
+# Seconds a writer waits for the SQLite store lock held by another worker
+STORE_LOCK_TIMEOUT = 5
+
+# The store is trimmed to PROBE_CACHE_STORE_SIZE once every this many writes
+STORE_PRUNE_INTERVAL = 500
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "store_hits": 0, "misses": 0, "evictions": 0, "store_writes": 0}
+_store_local = threading.local()
+
+
+class ProbeError(Exception):
+    """Raised when ffprobe cannot read a file or URL."""
+    pass
+
+
+def _parse_rate(rate):
+    try:
+        num, den = str(rate).split('/')
+        return float(num) / float(den) if float(den) else None
+    except ValueError:
+        try:
+            return float(rate) or None
+        except (TypeError, ValueError):
+            return None
+    except TypeError:
+        return None
+
+
+class MediaProbe:
+    """Typed, read-only accessors over the ffprobe JSON of one file."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def format(self):
+        return self.data.get('format', {})
+
+    @property
+    def streams(self):
+        return self.data.get('streams', [])
+
+    @property
+    def video_stream(self):
+        """First real video stream (cover art is reported as video but is skipped)."""
+        for stream in self.streams:
+            if stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic'):
+                return stream
+        return None
+
+    @property
+    def audio_stream(self):
+        for stream in self.streams:
+            if stream.get('codec_type') == 'audio':
+                return stream
+        return None
+
+    @property
+    def has_video(self):
+        return self.video_stream is not None
+
+    @property
+    def has_audio(self):
+        return self.audio_stream is not None
+
+    @property
+    def duration(self):
+        """Container duration in seconds, falling back to the longest stream; None if unknown."""
+        for value in [self.format.get('duration')] + [s.get('duration') for s in self.streams]:
+            try:
+                if value is not None and float(value) > 0:
+                    return float(value)
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    @property
+    def bit_rate(self):
+        try:
+            return int(self.format.get('bit_rate'))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def width(self):
+        return int((self.video_stream or {}).get('width') or 0)
+
+    @property
+    def height(self):
+        return int((self.video_stream or {}).get('height') or 0)
+
+    @property
+    def frame_rate(self):
+        """Average frame rate of the video stream, falling back to r_frame_rate; None if unknown."""
+        stream = self.video_stream or {}
+        return _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+
+    @property
+    def video_codec(self):
+        return (self.video_stream or {}).get('codec_name')
+
+    @property
+    def audio_codec(self):
+        return (self.audio_stream or {}).get('codec_name')
+
+
+def _is_url(source):
+    return str(source).startswith(('http://', 'https://'))
+
+
+def get_content_key(source):
+    """
+    Return the cache key for a local path or URL, and whether it has a validator.
+
+    Returns:
+        tuple: (key tuple, validated bool)
+    """
+    if not _is_url(source):
+        path = os.path.realpath(source)
+        stat = os.stat(path)
+        return ('file', path, stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size), True
+
+    try:
+        response = requests.head(source, allow_redirects=True, timeout=URL_VALIDATOR_TIMEOUT)
+        headers = response.headers if response.ok else {}
+    except requests.RequestException:
+        headers = {}
+    validator = headers.get('etag') or headers.get('last-modified')
+    return ('url', source, validator), validator is not None
+
+
+def _get_store():
+    """Return this thread's connection to the persistent probe store, or None if it is disabled."""
+    if not PROBE_CACHE_PATH or PROBE_CACHE_STORE_SIZE <= 0:
+        return None
+    connection = getattr(_store_local, 'connection', None)
+    if connection is None:
+        os.makedirs(os.path.dirname(os.path.abspath(PROBE_CACHE_PATH)), exist_ok=True)
+        connection = sqlite3.connect(PROBE_CACHE_PATH, timeout=STORE_LOCK_TIMEOUT)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS probes (key TEXT PRIMARY KEY, data TEXT NOT NULL, probed_at REAL NOT NULL)'
+        )
+        _store_local.connection = connection
+    return connection
+
+
+def _load_from_store(keys):
+    """Return (key, MediaProbe, probed_at) of the first key in the persistent store, or None."""
+    try:
+        store = _get_store()
+        if store is None:
+            return None
+        for key in keys:
+            row = store.execute('SELECT data, probed_at FROM probes WHERE key = ?', (json.dumps(key),)).fetchone()
+            if row:
+                return key, MediaProbe(json.loads(row[0])), row[1]
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.warning(f"Probe store {PROBE_CACHE_PATH} unavailable: {e}")
+    return None
+
+
+def _save_to_store(key, probe, probed_at):
+    with _cache_lock:
+        _cache_stats["store_writes"] += 1
+        prune = _cache_stats["store_writes"] % STORE_PRUNE_INTERVAL == 0
+    try:
+        store = _get_store()
+        if store is None:
+            return
+        with store:
+            store.execute(
+                'INSERT OR REPLACE INTO probes (key, data, probed_at) VALUES (?, ?, ?)',
+                (json.dumps(key), json.dumps(probe.data), probed_at)
+            )
+            if prune:
+                store.execute(
+                    'DELETE FROM probes WHERE key NOT IN (SELECT key FROM probes ORDER BY probed_at DESC LIMIT ?)',
+                    (PROBE_CACHE_STORE_SIZE,)
+                )
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Probe store {PROBE_CACHE_PATH} unavailable: {e}")
+
+
+def _remember(key, probe, probed_at):
+    if PROBE_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = (probe, probed_at)
+        _cache.move_to_end(key)
+        while len(_cache) > PROBE_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _cache_stats["evictions"] += 1
+
+
+# Reduced probing: reads ~100 KB instead of several MB of a remote file
+FAST_PROBE_ARGS = ['-analyzeduration', '100K', '-probesize', '100K']
+
+
+def _run_ffprobe(source, timeout, fast=False):
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams'
+    ] + (FAST_PROBE_ARGS if fast else []) + [source]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise ProbeError(f"ffprobe timed out after {timeout}s for {source}")
+    if result.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {source}: {result.stderr.strip()}")
+    try:
+        return json.loads(result.stdout or '{}')
+    except ValueError:
+        raise ProbeError(f"ffprobe returned invalid JSON for {source}")
+
+
+def get_media_probe(source, timeout=60, fast=False):
+    """
+    Return the cached ffprobe metadata of a local file or URL, probing it on a miss.
+
+    Args:
+        source (str): Local path or http(s) URL
+        timeout (int): Seconds allowed for ffprobe
+        fast (bool): Probe with FAST_PROBE_ARGS; stream details such as
+            frame rates may be less accurate
+
+    Returns:
+        MediaProbe
+
+    Raises:
+        ProbeError: If ffprobe fails
+    """
+    try:
+        key, validated = get_content_key(source)
+    except OSError as e:
+        raise ProbeError(f"Cannot probe {source}: {e}")
+
+    now = time.time()
+    keys = [key, key + ('fast',)] if fast else [key]
+    with _cache_lock:
+        for candidate in keys:
+            entry = _cache.get(candidate)
+            if entry and (validated or now - entry[1] < PROBE_CACHE_URL_TTL):
+                _cache.move_to_end(candidate)
+                _cache_stats["hits"] += 1
+                return entry[0]
+
+    persistent = key[0] == 'url'
+    if persistent:
+        stored = _load_from_store(keys)
+        if stored and (validated or now - stored[2] < PROBE_CACHE_URL_TTL):
+            stored_key, probe, probed_at = stored
+            _remember(stored_key, probe, probed_at)
+            with _cache_lock:
+                _cache_stats["store_hits"] += 1
+            return probe
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+    probe = MediaProbe(_run_ffprobe(source, timeout, fast))
+    key = keys[-1]
+    _remember(key, probe, now)
+    if persistent:
+        _save_to_store(key, probe, now)
+    return probe
+
+
+def clear_probe_cache():
+    """Empty this worker's in-memory cache; the persistent store is kept."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_probe_cache_stats():
+    with _cache_lock:
+        return dict(_cache_stats, entries=len(_cache), max_entries=PROBE_CACHE_SIZE)
@@ -0,0 +1,240 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Host-specific encoder settings for the render profiles.
+
+The x264 preset that gives the best quality per CPU-second depends on the
+host: core count, cache sizes and SIMD support move the point where a slower
+preset stops paying for itself. benchmarks/render_profile_tuning.py encodes
+a synthetic source at every render profile across presets and thread counts,
+measures the SSIM of every encode and writes the winners to
+RENDER_PROFILE_TABLE. A preset never replaces the profile's hardcoded one
+if its quality is lower (see select_profile_settings). The table is loaded once per
+worker at import; services ask get_tuned_settings() for the preset to use
+(the AutoEdit render profiles also take its thread count; other encodes
+keep the runner's CPU budget), and fall back to their hardcoded defaults
+when no table exists or it was measured on a different host.
+
+The CRF of a profile is never changed: it is the quality target. A table
+entry is only used if it was measured at the CRF the caller asks for.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import logging
+from config import RENDER_PROFILE_TABLE
+
+logger = logging.getLogger(__name__)
+
+# x264 presets compared by the benchmark, fastest first
+TUNING_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower']
+
+# A preset that costs more CPU is only chosen if its output is at least this
+# much smaller (at the same CRF) per doubling of the CPU time
+MIN_SIZE_SAVING = 0.03
+
+# Threads used for a preset: the fewest that reach this fraction of the best
+# frame rate measured for it. More threads than that mostly add overhead
+# that concurrent jobs could have used.
+THREAD_EFFICIENCY = 0.9
+
+
+def get_host_info():
+    """Return the properties of this host a profile table is only valid for."""
+    cpu_model = None
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu_model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {"cpu_count": os.cpu_count(), "cpu_model": cpu_model}
+
+
+def parse_min_speed(estimated_speed):
+    """Return the lower bound of an estimated_speed string such as '2-4x realtime'."""
+    match = re.match(r"\s*(\d+(?:\.\d+)?)", estimated_speed or '')
+    return float(match.group(1)) if match else None
+
+
+def pick_threads(results):
+    """
+    Pick the thread count for one preset.
+
+    Args:
+        results (list): Benchmark rows of one preset, each with 'threads' and 'fps'
+
+    Returns:
+        dict: The row with the fewest threads that reaches THREAD_EFFICIENCY
+        of the best frame rate
+    """
+    best_fps = max(row['fps'] for row in results)
+    efficient = [row for row in results if row['fps'] >= best_fps * THREAD_EFFICIENCY]
+    return min(efficient, key=lambda row: row['threads'])
+
+
+def select_profile_settings(results, min_speed=None, default_preset=None):
+    """
+    Choose the preset and thread count for one render profile.
+
+    x264's CRF does not give the same quality with every preset, so a preset
+    is only considered if its quality is at least that of the profile's
+    hardcoded preset: its SSIM against the source must not be lower, or,
+    when the results have no SSIM, it must not be a faster preset. Presets
+    are compared at the thread count pick_threads() chooses for them.
+
+    Starting from the cheapest of those presets that keeps the profile's
+    minimum speed, a preset that costs more CPU is only taken if it shrinks
+    the output by at least MIN_SIZE_SAVING per doubling of CPU time. If no
+    preset qualifies, the hardcoded preset is kept.
+
+    Args:
+        results (list): Benchmark rows of one profile, each with 'preset',
+            'threads', 'fps', 'speed', 'cpu_seconds', 'size' and optionally 'ssim'
+        min_speed (float, optional): Required encode speed (x realtime)
+        default_preset (str, optional): The profile's hardcoded preset
+
+    Returns:
+        dict: The chosen row, or None if the hardcoded preset should be kept
+        and was not measured
+    """
+    by_preset = {}
+    for row in results:
+        by_preset.setdefault(row['preset'], []).append(row)
+    if not by_preset:
+        return None
+
+    rows = sorted((pick_threads(rows) for rows in by_preset.values()), key=lambda row: row['cpu_seconds'])
+    reference = next((row for row in rows if row['preset'] == default_preset), None)
+    if reference and all(row.get('ssim') is not None for row in rows):
+        eligible = [row for row in rows if row['ssim'] >= reference['ssim']]
+    elif default_preset in TUNING_PRESETS:
+        floor = TUNING_PRESETS.index(default_preset)
+        eligible = [row for row in rows
+                    if row['preset'] in TUNING_PRESETS and TUNING_PRESETS.index(row['preset']) >= floor]
+    else:
+        eligible = rows
+    eligible = [row for row in eligible if min_speed is None or row['speed'] >= min_speed]
+    if not eligible:
+        return reference
+
+    chosen = eligible[0]
+    for row in eligible[1:]:
+        if row['size'] >= chosen['size']:
+            continue
+        saving = (chosen['size'] - row['size']) / chosen['size']
+        doublings = math.log2(max(row['cpu_seconds'], 1e-6) / max(chosen['cpu_seconds'], 1e-6))
+        if doublings <= 0 or saving / doublings >= MIN_SIZE_SAVING:
+            chosen = row
+    return chosen
+
+
+def build_profile_table(results, profiles, host=None):
+    """
+    Build the JSON table written to RENDER_PROFILE_TABLE.
+
+    Args:
+        results (dict): Benchmark rows per profile name
+        profiles (dict): The render profiles (RENDER_PROFILES) that were benchmarked
+        host (dict, optional): Host properties, defaults to get_host_info()
+
+    Returns:
+        dict: {"host", "created", "profiles": {name: {"preset", "crf",
+        "threads", "fps", "speed", "size", "ssim"}}, "results"}
+    """
+    table = {
+        "host": host or get_host_info(),
+        "created": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "profiles": {},
+        "results": results
+    }
+    for name, rows in results.items():
+        chosen = select_profile_settings(
+            rows, parse_min_speed(profiles[name].get('estimated_speed')), profiles[name]['preset']
+        )
+        if chosen:
+            table["profiles"][name] = {
+                "preset": chosen['preset'],
+                "crf": profiles[name]['crf'],
+                "threads": chosen['threads'],
+                "fps": chosen['fps'],
+                "speed": chosen['speed'],
+                "size": chosen['size'],
+                "ssim": chosen.get('ssim')
+            }
+    return table
+
+
+def load_profile_table(path):
+    """
+    Load the tuned profiles from a table written by the benchmark.
+
+    Returns:
+        dict: Settings per profile name; empty if the file does not exist,
+        cannot be read or was measured on a different host
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            table = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring render profile table {path}: {e}")
+        return {}
+
+    host = table.get("host") or {}
+    current = get_host_info()
+    if any(host.get(key) != current[key] for key in current):
+        logger.warning(
+            f"Ignoring render profile table {path}: measured on {host.get('cpu_count')} x "
+            f"{host.get('cpu_model')}, this host has {current['cpu_count']} x {current['cpu_model']}"
+        )
+        return {}
+
+    profiles = table.get("profiles") or {}
+    logger.info(f"Loaded tuned render profiles from {path}: {', '.join(sorted(profiles))}")
+    return profiles
+
+
+_tuned_profiles = load_profile_table(RENDER_PROFILE_TABLE)
+
+
+def get_tuned_settings(profile_name, preset, crf):
+    """
+    Return the encoder settings to use for a render profile on this host.
+
+    Args:
+        profile_name (str): Render profile the encode corresponds to
+        preset (str): Preset to use when the profile is not tuned
+        crf (int): CRF of the encode; the tuned entry is only used if it
+            was measured at the same CRF
+
+    Returns:
+        dict: {"preset": str, "threads": int or None}
+    """
+    tuned = _tuned_profiles.get(profile_name) or {}
+    if not tuned.get("preset") or tuned.get("crf") != crf:
+        return {"preset": preset, "threads": None}
+    return {"preset": tuned["preset"], "threads": tuned.get("threads")}
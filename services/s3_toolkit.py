@@ -47,3 +47,78 @@ def upload_to_s3(file_path, s3_url, access_key, secret_key, bucket_name, region)
     except Exception as e:
         logger.error(f"Error uploading file to S3: {e}")
         raise
+
+def stream_to_s3(stream, key, s3_url, access_key, secret_key, bucket_name, region,
+                 content_type=None, part_size=8 * 1024 * 1024, should_commit=None):
+    """
+    Upload a non-seekable byte stream to S3 with a multipart upload, sending each
+    part as soon as ``part_size`` bytes have been produced.
+
+    The multipart upload is only completed once the stream is exhausted and
+    ``should_commit`` (if given) returns True; otherwise it is aborted.
+
+    Returns:
+        str: URL of the uploaded object, or None if the upload was not committed
+    """
+    session = boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region
+    )
+    client = session.client('s3', endpoint_url=s3_url)
+
+    create_args = {'Bucket': bucket_name, 'Key': key, 'ACL': 'public-read'}
+    if content_type:
+        create_args['ContentType'] = content_type
+    upload_id = client.create_multipart_upload(**create_args)['UploadId']
+
+    parts = []
+    try:
+        part_number = 1
+        while True:
+            # S3 requires every part except the last to be at least 5 MB
+            data = stream.read(max(part_size, 5 * 1024 * 1024))
+            if not data:
+                break
+            logger.info(f"Uploading part {part_number} of {key}")
+            part = client.upload_part(
+                Bucket=bucket_name,
+                Key=key,
+                PartNumber=part_number,
+                UploadId=upload_id,
+                Body=data
+            )
+            parts.append({'PartNumber': part_number, 'ETag': part['ETag']})
+            part_number += 1
+
+        if not parts or (should_commit is not None and not should_commit()):
+            logger.warning(f"Streaming upload of {key} aborted before commit")
+            client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+            return None
+
+        client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception as e:
+        logger.error(f"Error streaming upload to S3: {e}")
+        try:
+            client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        except Exception:
+            pass
+        raise
+
+    return f"{s3_url}/{bucket_name}/{quote(key)}"
+
+def delete_from_s3(key, s3_url, access_key, secret_key, bucket_name, region):
+    """Delete an object uploaded by upload_to_s3 or stream_to_s3."""
+    session = boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region
+    )
+    client = session.client('s3', endpoint_url=s3_url)
+    client.delete_object(Bucket=bucket_name, Key=key)
+    logger.info(f"Deleted {key} from S3")
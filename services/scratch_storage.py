@@ -0,0 +1,543 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from config import (
+    LOCAL_STORAGE_PATH,
+    STORAGE_JANITOR_ENABLED,
+    STORAGE_JANITOR_INTERVAL,
+    STORAGE_MAX_FILE_AGE,
+    STORAGE_MAX_BYTES,
+    JOB_DISK_QUOTA_BYTES,
+    RAM_SCRATCH_PATH,
+    RAM_SCRATCH_MAX_FILE_BYTES,
+    RAM_SCRATCH_BUDGET_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-job scratch directories live under LOCAL_STORAGE_PATH/scratch/<job_id>
+SCRATCH_ROOT = os.path.join(LOCAL_STORAGE_PATH, 'scratch')
+
+# Size assumed for small outputs whose size is not known before they are written
+# (subtitle files, single thumbnails)
+SMALL_FILE_SIZE_HINT = 1024 * 1024
+
+# Top-level entries of LOCAL_STORAGE_PATH the janitor may remove: the files and
+# directories named after a job ID or a download ID (``<uuid>...``). Anything
+# else is a persistent store (jobs, AutoEdit projects and workflows, FAISS
+# indexes) or belongs to another program sharing /tmp, and is left alone.
+JOB_ENTRY_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Job statuses whose files must survive a sweep
+ACTIVE_JOB_STATUSES = ('queued', 'running', 'submitted')
+
+_current = threading.local()
+_active_jobs = {}
+_active_lock = threading.Lock()
+_ram_lock = threading.Lock()
+_ram_reserved = 0
+_ram_available = None
+_janitor_started = False
+_janitor_stats = {
+    "runs": 0,
+    "last_run": None,
+    "last_duration_sec": None,
+    "files_removed": 0,
+    "bytes_reclaimed": 0
+}
+
+
+class DiskQuotaExceeded(Exception):
+    """Raised when a job tries to use more local disk than its quota allows."""
+    pass
+
+
+class JobScratch:
+    """Scratch directory and disk accounting for a single job.
+
+    The directory is created lazily on first use and removed with all its
+    contents when the job finishes. Bytes downloaded by the job are charged
+    against ``quota_bytes`` (0 means unlimited).
+    """
+
+    def __init__(self, job_id, quota_bytes=JOB_DISK_QUOTA_BYTES, root=SCRATCH_ROOT):
+        self.job_id = job_id
+        self.quota_bytes = quota_bytes or 0
+        self.root = root
+        self.used_bytes = 0
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self._path = os.path.join(root, job_id)
+        self.ram_reserved_bytes = 0
+        self._ram_path = os.path.join(RAM_SCRATCH_PATH, job_id)
+
+    @property
+    def path(self):
+        os.makedirs(self._path, exist_ok=True)
+        return self._path
+
+    @property
+    def ram_path(self):
+        os.makedirs(self._ram_path, exist_ok=True)
+        return self._ram_path
+
+    def exists(self):
+        return os.path.isdir(self._path)
+
+    def reserve_ram(self, num_bytes):
+        """Reserve ``num_bytes`` of the RAM tier for this job. Returns False if it does not fit."""
+        if not reserve_ram_scratch(num_bytes):
+            return False
+        with self.lock:
+            self.ram_reserved_bytes += num_bytes
+        return True
+
+    def release_ram(self, num_bytes):
+        with self.lock:
+            num_bytes = min(num_bytes, self.ram_reserved_bytes)
+            self.ram_reserved_bytes -= num_bytes
+        release_ram_scratch(num_bytes)
+
+    def ensure_capacity(self, num_bytes):
+        """Raise DiskQuotaExceeded if ``num_bytes`` more would not fit in the quota."""
+        if self.quota_bytes and self.used_bytes + num_bytes > self.quota_bytes:
+            raise DiskQuotaExceeded(
+                f"Job {self.job_id} disk quota exceeded: {self.used_bytes + num_bytes} bytes "
+                f"requested, quota is {self.quota_bytes} bytes"
+            )
+
+    def charge(self, num_bytes):
+        with self.lock:
+            self.ensure_capacity(num_bytes)
+            self.used_bytes += num_bytes
+
+    def release(self, num_bytes):
+        with self.lock:
+            self.used_bytes = max(0, self.used_bytes - num_bytes)
+
+    def teardown(self):
+        if self.exists():
+            shutil.rmtree(self._path, ignore_errors=True)
+            logger.info(f"Job {self.job_id}: Removed scratch directory {self._path}")
+        if os.path.isdir(self._ram_path):
+            shutil.rmtree(self._ram_path, ignore_errors=True)
+        self.release_ram(self.ram_reserved_bytes)
+
+
+@contextmanager
+def job_scratch(job_id, quota_bytes=None):
+    """
+    Run a block of code with a per-job scratch directory and disk quota.
+
+    Inside the block, ``get_job_scratch_dir()`` returns the job's directory and
+    ``download_file`` charges downloads against the job quota. The directory
+    is removed when the block exits, whether it succeeded or not.
+    """
+    scratch = JobScratch(job_id, JOB_DISK_QUOTA_BYTES if quota_bytes is None else quota_bytes)
+    previous = getattr(_current, 'scratch', None)
+    _current.scratch = scratch
+    with _active_lock:
+        _active_jobs[job_id] = scratch
+    try:
+        yield scratch
+    finally:
+        _current.scratch = previous
+        with _active_lock:
+            _active_jobs.pop(job_id, None)
+        scratch.teardown()
+
+
+def get_current_job_scratch():
+    """Return the JobScratch of the job running in this thread, or None."""
+    return getattr(_current, 'scratch', None)
+
+
+def bind_job_scratch(func):
+    """
+    Wrap ``func`` so it runs with the calling thread's job scratch.
+
+    The current job is tracked per thread; work handed to a thread pool has
+    to be wrapped so its downloads and scratch files are accounted to the job.
+    """
+    scratch = get_current_job_scratch()
+
+    def wrapper(*args, **kwargs):
+        previous = getattr(_current, 'scratch', None)
+        _current.scratch = scratch
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.scratch = previous
+    return wrapper
+
+
+def get_job_scratch_dir():
+    """Return the current job's scratch directory, or LOCAL_STORAGE_PATH outside a job."""
+    scratch = get_current_job_scratch()
+    return scratch.path if scratch else LOCAL_STORAGE_PATH
+
+
+def get_scratch_path(filename, size_hint=None):
+    """
+    Return a path for a temporary file of the current job.
+
+    Files whose expected size is at most RAM_SCRATCH_MAX_FILE_BYTES are placed
+    in the RAM-backed tier while its budget allows; everything else goes to
+    the job's disk scratch directory.
+
+    Args:
+        filename (str): Name of the file
+        size_hint (int, optional): Expected size in bytes; unknown sizes use disk
+    """
+    scratch = get_current_job_scratch()
+    if scratch and size_hint and scratch.reserve_ram(size_hint):
+        return os.path.join(scratch.ram_path, filename)
+    return os.path.join(get_job_scratch_dir(), filename)
+
+
+def allocate_download_dir(storage_path, num_bytes):
+    """
+    Pick the directory a download of ``num_bytes`` should be written to.
+
+    Downloads of the current job that target a transient location
+    (LOCAL_STORAGE_PATH, /tmp, the job scratch directory or a
+    ``LOCAL_STORAGE_PATH/<job_id>...`` directory) go to the RAM tier when they
+    are small enough. Any other ``storage_path`` is returned unchanged.
+
+    Returns:
+        tuple: (directory, bytes reserved in the RAM tier)
+    """
+    scratch = get_current_job_scratch()
+    if not scratch or not num_bytes or not _is_transient_dir(storage_path, scratch):
+        return storage_path, 0
+    if scratch.reserve_ram(num_bytes):
+        return scratch.ram_path, num_bytes
+    return storage_path, 0
+
+
+def release_download_reservation(num_bytes):
+    """Give back a RAM tier reservation made by ``allocate_download_dir``."""
+    scratch = get_current_job_scratch()
+    if scratch and num_bytes:
+        scratch.release_ram(num_bytes)
+
+
+def _is_transient_dir(storage_path, scratch):
+    path = os.path.normpath(os.path.abspath(storage_path))
+    local = os.path.normpath(os.path.abspath(LOCAL_STORAGE_PATH))
+    if path in (local, '/tmp', os.path.normpath(scratch._path)):
+        return True
+    return os.path.dirname(path) == local and os.path.basename(path).startswith(scratch.job_id)
+
+
+def ensure_job_quota(num_bytes):
+    """Check that the current job can store ``num_bytes`` more (no-op outside a job)."""
+    scratch = get_current_job_scratch()
+    if scratch:
+        scratch.ensure_capacity(num_bytes)
+
+
+def charge_job_quota(num_bytes):
+    """Charge ``num_bytes`` to the current job's quota (no-op outside a job)."""
+    scratch = get_current_job_scratch()
+    if scratch:
+        scratch.charge(num_bytes)
+
+
+def release_job_quota(num_bytes):
+    """Give back ``num_bytes`` to the current job's quota (e.g. after deleting a partial download)."""
+    scratch = get_current_job_scratch()
+    if scratch:
+        scratch.release(num_bytes)
+
+
+# =============================================================================
+# RAM TIER
+# =============================================================================
+
+def _ram_tier_available():
+    """Check once per process that the RAM scratch directory can be used."""
+    global _ram_available
+    if _ram_available is None:
+        try:
+            os.makedirs(RAM_SCRATCH_PATH, exist_ok=True)
+            _ram_available = os.access(RAM_SCRATCH_PATH, os.W_OK)
+        except OSError:
+            _ram_available = False
+        if not _ram_available:
+            logger.info(f"RAM scratch tier disabled: {RAM_SCRATCH_PATH} is not writable")
+    return _ram_available
+
+
+def reserve_ram_scratch(num_bytes):
+    """
+    Reserve ``num_bytes`` of the RAM tier budget.
+
+    Fails for files above RAM_SCRATCH_MAX_FILE_BYTES, when the per-process
+    budget is used up or when the tmpfs itself is nearly full (Docker only
+    gives /dev/shm 64 MB by default, and it is shared by all workers).
+    """
+    global _ram_reserved
+    if not RAM_SCRATCH_MAX_FILE_BYTES or not 0 < num_bytes <= RAM_SCRATCH_MAX_FILE_BYTES:
+        return False
+    if not _ram_tier_available():
+        return False
+    with _ram_lock:
+        if _ram_reserved + num_bytes > RAM_SCRATCH_BUDGET_BYTES:
+            return False
+        try:
+            if shutil.disk_usage(RAM_SCRATCH_PATH).free < 2 * num_bytes:
+                return False
+        except OSError:
+            return False
+        _ram_reserved += num_bytes
+    return True
+
+
+def release_ram_scratch(num_bytes):
+    global _ram_reserved
+    with _ram_lock:
+        _ram_reserved = max(0, _ram_reserved - num_bytes)
+
+
+# =============================================================================
+# JANITOR
+# =============================================================================
+
+def get_path_size(path):
+    """Return the size of a file or the total size of a directory tree in bytes."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def get_last_modified(path):
+    """Return the newest mtime of a file or of anything inside a directory tree."""
+    latest = os.path.getmtime(path)
+    if os.path.isdir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in dirnames + filenames:
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(dirpath, name)))
+                except OSError:
+                    pass
+    return latest
+
+
+def _is_job_active(name, jobs_dir):
+    """Check the job status file for entries named after a job ID (``<job_id>...``)."""
+    job_id = name[:36]
+    if job_id in _active_jobs:
+        return True
+    status_file = os.path.join(jobs_dir, f"{job_id}.json")
+    if len(job_id) != 36 or not os.path.exists(status_file):
+        return False
+    try:
+        with open(status_file, 'r') as f:
+            return json.load(f).get("job_status") in ACTIVE_JOB_STATUSES
+    except (OSError, ValueError):
+        return False
+
+
+def _collect_candidates(storage_path, scratch_root, ram_root=None):
+    """List removable entries as dicts with path, size and mtime."""
+    jobs_dir = os.path.join(storage_path, 'jobs')
+    scratch_name = os.path.basename(scratch_root)
+    candidates = []
+
+    def add(path, name):
+        if name.startswith('.') or _is_job_active(name, jobs_dir):
+            return
+        try:
+            if not (os.path.isfile(path) or os.path.isdir(path)) or os.path.islink(path):
+                return
+            if os.stat(path).st_uid != os.getuid():
+                return  # LOCAL_STORAGE_PATH may be a shared /tmp; only touch our own files
+            candidates.append({
+                "path": path,
+                "size": get_path_size(path),
+                "mtime": get_last_modified(path)
+            })
+        except OSError:
+            pass  # Removed while we were looking at it
+
+    if not os.path.isdir(storage_path):
+        return candidates
+
+    for name in os.listdir(storage_path):
+        path = os.path.join(storage_path, name)
+        if name == scratch_name and os.path.isdir(path):
+            # Job scratch directories are judged individually
+            for job_dir in os.listdir(path):
+                add(os.path.join(path, job_dir), job_dir)
+            continue
+        if not JOB_ENTRY_PATTERN.match(name):
+            continue
+        add(path, name)
+
+    # Job directories left in the RAM tier by crashed workers
+    if ram_root and os.path.isdir(ram_root):
+        for job_dir in os.listdir(ram_root):
+            add(os.path.join(ram_root, job_dir), job_dir)
+
+    return candidates
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+def run_janitor(max_age=STORAGE_MAX_FILE_AGE, max_bytes=STORAGE_MAX_BYTES,
+                storage_path=LOCAL_STORAGE_PATH, scratch_root=SCRATCH_ROOT, ram_root=RAM_SCRATCH_PATH):
+    """
+    Sweep the local storage directory once.
+
+    Entries untouched for more than ``max_age`` seconds are removed. If the
+    remaining entries still exceed ``max_bytes``, the oldest ones are removed
+    until the total fits. Only top-level files and directories named after a
+    job or download ID and the scratch tree are considered: persistent stores such as the job
+    status files, AutoEdit projects and workflows and the FAISS indexes,
+    hidden entries, entries owned by other users and files belonging to
+    queued/running jobs are never removed.
+
+    Returns:
+        dict: Number of files removed and bytes reclaimed by this sweep
+    """
+    start = time.time()
+    removed = 0
+    reclaimed = 0
+
+    candidates = sorted(_collect_candidates(storage_path, scratch_root, ram_root), key=lambda c: c["mtime"])
+    total_bytes = sum(c["size"] for c in candidates)
+
+    for candidate in candidates:
+        too_old = max_age and start - candidate["mtime"] > max_age
+        too_big = max_bytes and total_bytes > max_bytes
+        if not (too_old or too_big):
+            continue
+        try:
+            _remove(candidate["path"])
+        except OSError as e:
+            logger.warning(f"Janitor could not remove {candidate['path']}: {e}")
+            continue
+        removed += 1
+        reclaimed += candidate["size"]
+        total_bytes -= candidate["size"]
+
+    duration = time.time() - start
+    _janitor_stats["runs"] += 1
+    _janitor_stats["last_run"] = start
+    _janitor_stats["last_duration_sec"] = round(duration, 3)
+    _janitor_stats["files_removed"] += removed
+    _janitor_stats["bytes_reclaimed"] += reclaimed
+
+    if removed:
+        logger.info(f"Storage janitor removed {removed} entries ({reclaimed} bytes) in {duration:.2f}s")
+    return {"files_removed": removed, "bytes_reclaimed": reclaimed}
+
+
+def _janitor_loop():
+    lock_path = os.path.join(LOCAL_STORAGE_PATH, '.janitor.lock')
+    while True:
+        time.sleep(STORAGE_JANITOR_INTERVAL)
+        try:
+            # Several gunicorn workers share the directory; only one sweeps at a time
+            import fcntl
+            with open(lock_path, 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                run_janitor()
+        except Exception as e:
+            logger.error(f"Storage janitor failed: {e}")
+
+
+def start_storage_janitor():
+    """Start the background janitor thread once per process (if enabled)."""
+    global _janitor_started
+    if _janitor_started or not STORAGE_JANITOR_ENABLED:
+        return
+    _janitor_started = True
+    threading.Thread(target=_janitor_loop, daemon=True).start()
+    logger.info(
+        f"Storage janitor started: interval={STORAGE_JANITOR_INTERVAL}s, "
+        f"max_age={STORAGE_MAX_FILE_AGE}s, max_bytes={STORAGE_MAX_BYTES or 'unlimited'}"
+    )
+
+
+def get_storage_metrics():
+    """Return disk usage of the local storage directory, active job scratch usage and janitor stats."""
+    disk = shutil.disk_usage(LOCAL_STORAGE_PATH)
+    with _active_lock:
+        jobs = [
+            {
+                "job_id": scratch.job_id,
+                "downloaded_bytes": scratch.used_bytes,
+                "scratch_bytes": get_path_size(scratch._path) if scratch.exists() else 0,
+                "ram_scratch_bytes": get_path_size(scratch._ram_path) if os.path.isdir(scratch._ram_path) else 0,
+                "quota_bytes": scratch.quota_bytes or None,
+                "age_sec": round(time.time() - scratch.started_at, 1)
+            }
+            for scratch in _active_jobs.values()
+        ]
+
+    return {
+        "storage_path": LOCAL_STORAGE_PATH,
+        "disk_total_bytes": disk.total,
+        "disk_used_bytes": disk.used,
+        "disk_free_bytes": disk.free,
+        "disk_used_percent": round(disk.used / disk.total * 100, 2) if disk.total else 0,
+        "reclaimable_bytes": sum(
+            c["size"] for c in _collect_candidates(LOCAL_STORAGE_PATH, SCRATCH_ROOT, RAM_SCRATCH_PATH)
+        ),
+        "active_jobs": jobs,
+        "job_quota_bytes": JOB_DISK_QUOTA_BYTES or None,
+        "ram_tier": {
+            "enabled": bool(RAM_SCRATCH_MAX_FILE_BYTES) and _ram_tier_available(),
+            "path": RAM_SCRATCH_PATH,
+            "max_file_bytes": RAM_SCRATCH_MAX_FILE_BYTES,
+            "budget_bytes": RAM_SCRATCH_BUDGET_BYTES,
+            "reserved_bytes": _ram_reserved
+        },
+        "janitor": {
+            "enabled": STORAGE_JANITOR_ENABLED,
+            "interval_sec": STORAGE_JANITOR_INTERVAL,
+            "max_file_age_sec": STORAGE_MAX_FILE_AGE,
+            "max_bytes": STORAGE_MAX_BYTES or None,
+            **_janitor_stats
+        }
+    }
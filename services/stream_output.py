@@ -0,0 +1,150 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import subprocess
+import logging
+from services.cloud_storage import upload_stream
+from services.ffmpeg_runner import start_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Formats that can be muxed to a non-seekable pipe. MP4/MOV are written as
+# fragmented files so the moov atom does not need to be rewritten at the end.
+FRAGMENTED_MOVFLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+STREAMABLE_FORMATS = {
+    'mp4': {'muxer': 'mp4', 'movflags': FRAGMENTED_MOVFLAGS, 'content_type': 'video/mp4'},
+    'mov': {'muxer': 'mov', 'movflags': FRAGMENTED_MOVFLAGS, 'content_type': 'video/quicktime'},
+    'mkv': {'muxer': 'matroska', 'movflags': None, 'content_type': 'video/x-matroska'},
+    'webm': {'muxer': 'webm', 'movflags': None, 'content_type': 'video/webm'},
+    'ts': {'muxer': 'mpegts', 'movflags': None, 'content_type': 'video/mp2t'},
+    'mp3': {'muxer': 'mp3', 'movflags': None, 'content_type': 'audio/mpeg'},
+    'aac': {'muxer': 'adts', 'movflags': None, 'content_type': 'audio/aac'},
+    'flac': {'muxer': 'flac', 'movflags': None, 'content_type': 'audio/flac'},
+    'ogg': {'muxer': 'ogg', 'movflags': None, 'content_type': 'audio/ogg'},
+}
+
+# movflags that require the muxer to seek back into the output file
+SEEKABLE_MOVFLAGS = ('faststart', 'global_sidx')
+
+def get_streaming_plan(extension, output_options):
+    """
+    Decide whether an output can be written to a pipe instead of a local file.
+
+    Args:
+        extension (str): Output file extension (e.g. 'mp4')
+        output_options (list): Output option dicts ({"option": ..., "argument": ...})
+
+    Returns:
+        tuple: (plan dict or None, reason str). The plan contains the muxer,
+        the movflags to apply and the content type of the output.
+    """
+    plan = STREAMABLE_FORMATS.get((extension or '').lower())
+    if not plan:
+        return None, f"format '{extension}' requires a seekable output"
+
+    for option in output_options:
+        if option.get("option") == "-movflags":
+            flags = str(option.get("argument") or '')
+            for flag in SEEKABLE_MOVFLAGS:
+                if flag in flags:
+                    return None, f"movflags '{flag}' requires a seekable output"
+        if option.get("option") == "-pass":
+            return None, "multi-pass encoding requires a local output"
+
+    return dict(plan), None
+
+
+def build_streaming_options(output_options, plan):
+    """
+    Rewrite output options so ffmpeg muxes a streamable format to stdout.
+
+    Any user supplied -f/-movflags are replaced by the ones from the plan,
+    keeping additional movflags that are safe for non-seekable outputs.
+    """
+    options = []
+    extra_flags = []
+    for option in output_options:
+        if option.get("option") == "-f":
+            continue
+        if option.get("option") == "-movflags":
+            extra_flags.extend(
+                flag for flag in str(option.get("argument") or '').lstrip('+').split('+')
+                if flag and flag not in FRAGMENTED_MOVFLAGS.split('+')
+            )
+            continue
+        options.append(option)
+
+    options.append({"option": "-f", "argument": plan['muxer']})
+    if plan.get('movflags'):
+        movflags = '+'.join([plan['movflags']] + extra_flags)
+        options.append({"option": "-movflags", "argument": movflags})
+    return options
+
+
+class _CountingReader:
+    """Wraps a pipe and counts the bytes read from it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def run_ffmpeg_to_storage(command, filename, content_type=None):
+    """
+    Run an ffmpeg command whose single output is stdout and upload the output
+    to cloud storage while the encode is still running.
+
+    Args:
+        command (list): Complete ffmpeg command without the output target
+        filename (str): Object name for the uploaded output
+        content_type (str, optional): MIME type of the output
+
+    Returns:
+        dict: {"file_url": str, "filesize": int}
+
+    Raises:
+        Exception: If ffmpeg fails or the upload cannot be completed. Nothing
+        is committed to storage for a failed encode.
+    """
+    cmd = list(command) + ['pipe:1']
+    process = start_ffmpeg(cmd, stdout=subprocess.PIPE, description="stream output")
+
+    reader = _CountingReader(process.stdout)
+    try:
+        file_url = upload_stream(
+            reader,
+            filename,
+            content_type=content_type,
+            should_commit=lambda: process.wait() == 0
+        )
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+
+    if process.wait() != 0 or not file_url:
+        raise Exception(f"FFmpeg command failed: {process.stderr}")
+
+    logger.info(f"Streamed {reader.bytes_read} bytes to {file_url}")
+    return {"file_url": file_url, "filesize": reader.bytes_read}
@@ -0,0 +1,213 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from services.media_probe import get_media_probe, ProbeError
+from services.scratch_storage import bind_job_scratch, get_scratch_path, SMALL_FILE_SIZE_HINT
+from services.v1.video.smart_cut import build_keyframe_index
+from services.v1.video.split import get_split_parallelism
+from services.ffmpeg_runner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+MAX_BURN_CHUNKS = 32
+
+# Shorter chunks spend more time in process start-up and encoder ramp-up
+# than they save by running in parallel
+MIN_CHUNK_DURATION = 10
+
+# Matches what ffmpeg picks for an MP4 output when no codec is given, so a
+# chunked render looks the same as a single-pass one
+CHUNK_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23']
+
+
+def plan_burn_chunks(keyframes, duration, chunk_count, min_chunk_duration=MIN_CHUNK_DURATION):
+    """
+    Split the timeline into up to ``chunk_count`` ranges that start on keyframes.
+
+    Each boundary is the keyframe closest to an equal split of the duration,
+    so every chunk can be seeked to exactly and the stitched output has no
+    duplicated or missing frames.
+
+    Args:
+        keyframes (list): Keyframe times in seconds, relative to the start of the file
+        duration (float): Duration of the video in seconds
+        chunk_count (int): Requested number of chunks
+        min_chunk_duration (float): Chunks are not made shorter than this on average
+
+    Returns:
+        list: (start, end) tuples in seconds covering [0, duration]
+    """
+    chunk_count = max(1, min(chunk_count, MAX_BURN_CHUNKS, int(duration // min_chunk_duration)))
+    candidates = sorted(t for t in keyframes if 0 < t < duration)
+
+    boundaries = [0.0]
+    for i in range(1, chunk_count):
+        target = duration * i / chunk_count
+        later = [t for t in candidates if t > boundaries[-1]]
+        if not later:
+            break
+        boundary = min(later, key=lambda t: abs(t - target))
+        boundaries.append(boundary)
+    boundaries.append(duration)
+
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+
+def build_offset_subtitle_filter(subtitle_filter, offset):
+    """
+    Wrap a subtitles filter so it renders a chunk that starts ``offset`` seconds in.
+
+    The frames are moved back onto the original timeline before the filter
+    and returned to zero afterwards, so the full subtitle file is reused for
+    every chunk instead of writing a time-shifted copy per chunk.
+    """
+    if not offset:
+        return subtitle_filter
+    return f"setpts=PTS+{offset:.6f}/TB,{subtitle_filter},setpts=PTS-STARTPTS"
+
+
+def build_chunk_command(video_path, start, end, subtitle_filter, output_path, threads=None):
+    """Build the ffmpeg command that burns subtitles into one chunk (video only)."""
+    thread_args = ['-threads', str(threads)] if threads else []
+    return (
+        ['ffmpeg', '-y']
+        + ['-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', video_path]
+        + ['-vf', build_offset_subtitle_filter(subtitle_filter, start), '-an']
+        + CHUNK_VIDEO_ARGS
+        + thread_args
+        + [output_path]
+    )
+
+
+def build_stitch_command(concat_list_path, video_path, output_path):
+    """Join the chunks with the concat demuxer and copy the audio from the source."""
+    return [
+        'ffmpeg', '-y',
+        '-f', 'concat', '-safe', '0', '-i', concat_list_path,
+        '-i', video_path,
+        '-map', '0:v', '-map', '1:a?',
+        '-c', 'copy',
+        output_path
+    ]
+
+
+def _run(cmd, description):
+    process = run_ffmpeg(cmd, check=False, description=description)
+    if process.returncode != 0:
+        logger.error(f"Error during {description}: {process.stderr}")
+        raise Exception(f"FFmpeg error during {description}: {process.stderr}")
+
+
+def get_chunk_layout(video_path, chunks):
+    """Return the chunk ranges for ``video_path``, or None when it cannot be chunked."""
+    try:
+        probe = get_media_probe(video_path)
+    except ProbeError as e:
+        logger.warning(f"Could not probe {video_path}, burning in a single pass: {str(e)}")
+        return None
+    if not probe.has_video or not probe.duration:
+        return None
+
+    # Packet times are on the file's timeline; ffmpeg seeks relative to its start
+    start_time = float(probe.format.get('start_time') or 0)
+    keyframes = [t - start_time for t in build_keyframe_index(video_path)]
+    return plan_burn_chunks(keyframes, probe.duration, chunks)
+
+
+def burn_subtitles(video_path, subtitle_filter, output_path, chunks=1):
+    """
+    Burn subtitles into a video, optionally rendering keyframe-aligned chunks in parallel.
+
+    With ``chunks`` > 1 the timeline is split at keyframes (see
+    plan_burn_chunks), every chunk is rendered by its own ffmpeg process with
+    the CPU shared out between them, and the chunks are joined with the concat
+    demuxer while the source audio is copied once. Sources that cannot be
+    split fall back to the single-pass render.
+
+    Args:
+        video_path (str): Local video file
+        subtitle_filter (str): ffmpeg ``subtitles`` filter with its options
+        output_path (str): Path of the MP4 to write
+        chunks (int): Requested number of chunks (default: 1)
+
+    Returns:
+        dict: Render report with the number of chunks used, the video
+        duration, the wall time and the speed (seconds of video per second)
+    """
+    started = time.time()
+    layout = get_chunk_layout(video_path, chunks) if chunks > 1 else None
+
+    if not layout or len(layout) < 2:
+        _run(
+            ['ffmpeg', '-y', '-i', video_path, '-vf', subtitle_filter, '-c:a', 'copy', output_path],
+            "subtitle burn"
+        )
+        elapsed = time.time() - started
+        try:
+            duration = get_media_probe(video_path).duration
+        except ProbeError:
+            duration = None
+        return {
+            "chunks": 1,
+            "duration": duration,
+            "elapsed": round(elapsed, 3),
+            "speed": round(duration / elapsed, 2) if duration and elapsed else None
+        }
+
+    workers, threads = get_split_parallelism(len(layout))
+    base = os.path.splitext(os.path.basename(output_path))[0]
+    chunk_paths = [get_scratch_path(f"{base}_chunk{i:03d}.mp4") for i in range(len(layout))]
+    concat_list_path = get_scratch_path(f"{base}_chunks.txt", SMALL_FILE_SIZE_HINT)
+    logger.info(f"Burning subtitles in {len(layout)} chunks with {workers} workers, {threads} threads each")
+
+    def render_chunk(index):
+        start, end = layout[index]
+        cmd = build_chunk_command(video_path, start, end, subtitle_filter, chunk_paths[index], threads=threads)
+        _run(cmd, f"chunk {index + 1}/{len(layout)}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(bind_job_scratch(render_chunk), i) for i in range(len(layout))]
+            for future in futures:
+                future.result()
+
+        with open(concat_list_path, 'w') as f:
+            for path in chunk_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        _run(build_stitch_command(concat_list_path, video_path, output_path), "chunk stitching")
+    finally:
+        for path in chunk_paths + [concat_list_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    elapsed = time.time() - started
+    duration = layout[-1][1]
+    report = {
+        "chunks": len(layout),
+        "duration": duration,
+        "elapsed": round(elapsed, 3),
+        "speed": round(duration / elapsed, 2) if elapsed else None
+    }
+    logger.info(f"Burned subtitles into {duration:.1f}s of video in {elapsed:.1f}s "
+                f"({report['speed']}x realtime, {len(layout)} chunks)")
+    return report
@@ -22,6 +22,7 @@ import srt
 from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
+from services.scratch_storage import get_job_scratch_dir, get_scratch_path
 import logging
 import uuid
 
@@ -35,7 +36,7 @@ STORAGE_PATH = "/tmp/"
 def process_transcription(media_url, output_type, max_chars=56, language=None,):
     """Transcribe media and return the transcript, SRT or ASS file path."""
     logger.info(f"Starting transcription for media URL: {media_url} with output type: {output_type}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
+    input_filename = download_file(media_url, os.path.join(get_job_scratch_dir(), 'input_media'))
     logger.info(f"Downloaded media to local file: {input_filename}")
 
     try:
@@ -62,7 +63,7 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
             output_content = srt.compose(srt_subtitles)
             
             # Write the output to a file
-            output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
+            output_filename = get_scratch_path(f"{uuid.uuid4()}.{output_type}", len(output_content.encode()))
             with open(output_filename, 'w') as f:
                 f.write(output_content)
             
@@ -84,7 +85,7 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
             output_content = ass_content
 
             # Write the ASS content to a file
-            output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
+            output_filename = get_scratch_path(f"{uuid.uuid4()}.{output_type}", len(output_content.encode()))
             with open(output_filename, 'w') as f:
                f.write(output_content) 
             output = output_filename
@@ -92,13 +93,15 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
         else:
             raise ValueError("Invalid output type. Must be 'transcript', 'srt', or 'vtt'.")
 
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
         logger.info(f"Transcription successful, output type: {output_type}")
         return output
     except Exception as e:
         logger.error(f"Transcription failed: {str(e)}")
         raise
+    finally:
+        if os.path.exists(input_filename):
+            os.remove(input_filename)
+            logger.info(f"Removed local file: {input_filename}")
 
 
 def generate_ass_subtitle(result, max_chars):
@@ -17,42 +17,141 @@
 
 
 import os
-import ffmpeg
-from services.file_management import download_file
+import logging
+from collections import Counter
+from services.file_management import download_files
+from services.media_probe import get_media_probe
+from services.ffmpeg_runner import run_ffmpeg
 from config import LOCAL_STORAGE_PATH
 
+logger = logging.getLogger(__name__)
+
+# Codecs that can be stream-copied, with the container used for the output
+COPY_EXTENSIONS = {
+    'mp3': 'mp3',
+    'aac': 'm4a',
+    'alac': 'm4a',
+    'flac': 'flac',
+    'opus': 'ogg',
+    'vorbis': 'ogg',
+    'pcm_s16le': 'wav',
+    'pcm_s24le': 'wav',
+}
+
+# Encoding used when the inputs cannot be stream-copied
+CONCAT_AUDIO_ARGS = ['-c:a', 'libmp3lame', '-b:a', '192k']
+
+def get_audio_signature(probe):
+    """Return the audio parameters that must be identical for a concat stream copy."""
+    audio = probe.audio_stream
+    if not audio:
+        return None
+    return (
+        audio.get('codec_name'),
+        int(audio.get('sample_rate') or 0),
+        int(audio.get('channels') or 0),
+        audio.get('sample_fmt'),
+    )
+
+def plan_audio_concatenation(signatures):
+    """
+    Decide between a stream copy and a single decode-resample-concat encode.
+
+    Returns:
+        dict: {"method": "copy"|"reencode", "codec": codec_name or None,
+               "sample_rate": int, "channels": int, "extension": str}
+    """
+    if any(signature is None for signature in signatures):
+        raise ValueError("All inputs must contain an audio stream")
+
+    # The most common rate and channel count is the target of the resample
+    sample_rate, channels = Counter((sig[1], sig[2]) for sig in signatures).most_common(1)[0][0]
+    codec = signatures[0][0]
+    if len(set(signatures)) == 1 and codec in COPY_EXTENSIONS:
+        return {
+            "method": "copy",
+            "codec": codec,
+            "sample_rate": sample_rate,
+            "channels": channels,
+            "extension": COPY_EXTENSIONS[codec]
+        }
+    return {
+        "method": "reencode",
+        "codec": None,
+        "sample_rate": sample_rate or 44100,
+        "channels": channels or 2,
+        "extension": 'mp3'
+    }
+
+def build_audio_concat_filter(input_count, sample_rate, channels):
+    """
+    Build one filter graph that converts every input to a common sample format and joins them.
+
+    aresample/aformat bring each input to the same rate, sample format and
+    channel layout so the concat filter can join them back to back without
+    gaps; all inputs are decoded and the result encoded exactly once.
+    """
+    layout = {1: 'mono', 2: 'stereo'}.get(channels, f"{channels}c")
+    filters = [
+        f"[{i}:a:0]aresample={sample_rate},aformat=sample_fmts=fltp:channel_layouts={layout}[a{i}]"
+        for i in range(input_count)
+    ]
+    filters.append(f"{''.join(f'[a{i}]' for i in range(input_count))}concat=n={input_count}:v=0:a=1[outa]")
+    return ';'.join(filters)
+
 def process_audio_concatenate(media_urls, job_id, webhook_url=None):
-    """Combine multiple audio files into one."""
+    """
+    Combine multiple audio files into one.
+
+    Inputs are downloaded concurrently and probed. When they all share codec,
+    sample rate, channels and sample format they are joined with the concat
+    demuxer without re-encoding (the output keeps their container, e.g. .m4a
+    for AAC). Otherwise a single ffmpeg pass decodes and resamples every input
+    and encodes the joined result to MP3.
+
+    Returns:
+        tuple: (output path, report dict describing the decision)
+    """
     input_files = []
-    output_filename = f"{job_id}.mp3"
-    output_path = os.path.join(LOCAL_STORAGE_PATH, output_filename)
+    concat_file_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat_list.txt")
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['audio_url']
-            input_filename = download_file(url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
-
-        # Generate an absolute path concat list file for FFmpeg
-        concat_file_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat_list.txt")
-        with open(concat_file_path, 'w') as concat_file:
+        # Download all media files concurrently, keeping the request order
+        urls = [media_item['audio_url'] for media_item in media_urls]
+        local_paths = download_files(urls, LOCAL_STORAGE_PATH)
+        input_files = [local_paths[url] for url in urls]
+
+        signatures = [get_audio_signature(get_media_probe(input_file)) for input_file in input_files]
+        plan = plan_audio_concatenation(signatures)
+        output_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.{plan['extension']}")
+        logger.info(f"Job {job_id}: Concatenating {len(input_files)} audio files with method '{plan['method']}'")
+
+        if plan["method"] == "copy":
+            # Generate an absolute path concat list file for FFmpeg
+            with open(concat_file_path, 'w') as concat_file:
+                for input_file in input_files:
+                    # Write absolute paths to the concat list
+                    concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
+
+            # Use the concat demuxer to concatenate the audio files without re-encoding
+            cmd = [
+                'ffmpeg', '-y',
+                '-f', 'concat', '-safe', '0', '-i', concat_file_path,
+                '-map', '0:a', '-c', 'copy',
+                output_path
+            ]
+        else:
+            cmd = ['ffmpeg', '-y']
             for input_file in input_files:
-                # Write absolute paths to the concat list
-                concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
-
-        # Use the concat demuxer to concatenate the audio files without re-encoding
-        (
-            ffmpeg.input(concat_file_path, format='concat', safe=0).
-                output(output_path, c='copy').
-                run(overwrite_output=True)
-        )
-
-        # Clean up input files
-        for f in input_files:
-            os.remove(f)
-            
-        os.remove(concat_file_path)  # Remove the concat list file after the operation
+                cmd += ['-i', input_file]
+            cmd += [
+                '-filter_complex', build_audio_concat_filter(len(input_files), plan["sample_rate"], plan["channels"]),
+                '-map', '[outa]'
+            ] + CONCAT_AUDIO_ARGS + [output_path]
+
+        process = run_ffmpeg(cmd, check=False, description="audio concatenate")
+        if process.returncode != 0:
+            raise Exception(f"FFmpeg error: {process.stderr}")
 
         print(f"Audio combination successful: {output_path}")
 
@@ -60,7 +159,19 @@ def process_audio_concatenate(media_urls, job_id, webhook_url=None):
         if not os.path.exists(output_path):
             raise FileNotFoundError(f"Output file {output_path} does not exist after combination.")
 
-        return output_path
+        report = {
+            "method": plan["method"],
+            "sample_rate": plan["sample_rate"],
+            "channels": plan["channels"]
+        }
+        return output_path, report
     except Exception as e:
         print(f"Audio combination failed: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+    finally:
+        # Clean up input files and the concat list
+        for f in set(input_files):
+            if os.path.exists(f):
+                os.remove(f)
+        if os.path.exists(concat_file_path):
+            os.remove(concat_file_path)
@@ -23,10 +23,11 @@ CROSSFADE TECHNIQUE:
 """
 
 import logging
-import subprocess
-import json
 from typing import List, Dict, Any, Optional, Tuple
 
+from services.media_probe import get_media_probe, ProbeError
+from services.render_tuning import get_tuned_settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,7 +36,7 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 
 def get_video_dimensions_from_url(video_url: str) -> Tuple[int, int]:
-    """Get video dimensions from a remote URL using ffprobe.
+    """Get video dimensions from a remote URL (cached ffprobe, see services.media_probe).
 
     Args:
         video_url: URL of the video file
@@ -44,25 +45,13 @@ def get_video_dimensions_from_url(video_url: str) -> Tuple[int, int]:
         Tuple of (width, height). Returns (0, 0) on error.
     """
     try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "json",
-            video_url
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            stream = data.get("streams", [{}])[0]
-            width = int(stream.get("width", 0))
-            height = int(stream.get("height", 0))
-            logger.info(f"Video dimensions: {width}x{height}")
-            return width, height
-
-        logger.warning(f"ffprobe failed: {result.stderr}")
+        probe = get_media_probe(video_url, timeout=30)
+        width, height = probe.width, probe.height
+        logger.info(f"Video dimensions: {width}x{height}")
+        return width, height
+
+    except ProbeError as e:
+        logger.warning(f"ffprobe failed: {e}")
         return 0, 0
 
     except Exception as e:
@@ -171,6 +160,10 @@ def get_render_profile(profile_name: str) -> Dict[str, Any]:
     Args:
         profile_name: One of 'preview', 'preview_720p', 'standard', 'high', '4k'
 
+    The preset is replaced by the one tuned for this host, if a render
+    profile table exists (see services.render_tuning); 'threads' is then
+    set to the tuned thread count, otherwise it is None.
+
     Returns:
         Dict with render settings
 
@@ -180,7 +173,9 @@ def get_render_profile(profile_name: str) -> Dict[str, Any]:
     if profile_name not in RENDER_PROFILES:
         valid_profiles = ", ".join(RENDER_PROFILES.keys())
         raise ValueError(f"Unknown render profile '{profile_name}'. Valid: {valid_profiles}")
-    return RENDER_PROFILES[profile_name].copy()
+    profile = RENDER_PROFILES[profile_name].copy()
+    profile.update(get_tuned_settings(profile_name, profile["preset"], profile["crf"]))
+    return profile
 
 
 # =============================================================================
@@ -284,6 +279,8 @@ def _build_single_cut_encode_payload(
         {"option": "-c:a", "argument": "aac"},
         {"option": "-b:a", "argument": render_settings["audio_bitrate"]}
     ]
+    if render_settings.get("threads"):
+        output_options.append({"option": "-threads", "argument": str(render_settings["threads"])})
 
     # Add scale filter if specified
     if render_settings["scale"]:
@@ -418,6 +415,8 @@ def _build_crossfade_payload(
         {"option": "-b:a", "argument": render_settings["audio_bitrate"]},
         {"option": "-movflags", "argument": "+faststart"}
     ]
+    if render_settings.get("threads"):
+        output_options.append({"option": "-threads", "argument": str(render_settings["threads"])})
 
     return {
         "inputs": inputs,
@@ -13,14 +13,16 @@ Uses FFmpeg for efficient frame extraction at configurable intervals.
 """
 
 import os
-import subprocess
+import shutil
 import tempfile
 import logging
 import base64
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
-from config import LOCAL_STORAGE_PATH
+from services.scratch_storage import get_job_scratch_dir
+from services.media_probe import get_media_probe, ProbeError
+from services.ffmpeg_runner import run_ffmpeg, FFmpegTimeout
 
 logger = logging.getLogger(__name__)
 
@@ -55,11 +57,12 @@ class FrameExtractor:
         self.max_frames = max_frames
         self.output_width = output_width
         self.quality = quality
-        self.temp_dir = Path(LOCAL_STORAGE_PATH) / "frames"
+        # Frames live in the job's scratch directory so they never outlive the job
+        self.temp_dir = Path(get_job_scratch_dir()) / "frames"
         self.temp_dir.mkdir(parents=True, exist_ok=True)
 
     def get_video_duration(self, video_path: str) -> float:
-        """Get video duration in seconds using ffprobe.
+        """Get video duration in seconds (cached ffprobe, see services.media_probe).
 
         Args:
             video_path: Path to video file (local or URL)
@@ -68,24 +71,10 @@ class FrameExtractor:
             Duration in seconds
         """
         try:
-            cmd = [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                video_path
-            ]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0:
-                return float(result.stdout.strip())
-            else:
-                logger.error(f"ffprobe error: {result.stderr}")
-                return 0.0
+            return get_media_probe(video_path, timeout=30).duration or 0.0
+        except ProbeError as e:
+            logger.error(f"ffprobe error: {e}")
+            return 0.0
         except Exception as e:
             logger.error(f"Error getting video duration: {e}")
             return 0.0
@@ -120,7 +109,7 @@ class FrameExtractor:
         duration = self.get_video_duration(video_path)
         if duration <= 0:
             logger.error("Could not determine video duration")
-            return []
+            return self._discard_frame_dir(frame_dir, output_dir)
 
         if end_time is None:
             end_time = min(duration, MAX_VIDEO_DURATION_SEC)
@@ -136,7 +125,7 @@ class FrameExtractor:
 
         if not frame_times:
             logger.warning("No frames to extract")
-            return []
+            return self._discard_frame_dir(frame_dir, output_dir)
 
         logger.info(f"Extracting {len(frame_times)} frames from {video_path}")
 
@@ -158,24 +147,20 @@ class FrameExtractor:
         ]
 
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=120  # 2 minute timeout
-            )
+            result = run_ffmpeg(cmd, check=False, timeout=120, description="autoedit frames")  # 2 minute timeout
 
             if result.returncode != 0:
                 logger.warning(f"FFmpeg select failed, trying fps method: {result.stderr[:200]}")
                 # Fallback to fps-based extraction
-                return self._extract_frames_fps(video_path, frame_dir, start_time, end_time)
+                frames = self._extract_frames_fps(video_path, frame_dir, start_time, end_time)
+                return frames or self._discard_frame_dir(frame_dir, output_dir)
 
-        except subprocess.TimeoutExpired:
+        except FFmpegTimeout:
             logger.error("FFmpeg extraction timed out")
-            return []
+            return self._discard_frame_dir(frame_dir, output_dir)
         except Exception as e:
             logger.error(f"Error extracting frames: {e}")
-            return []
+            return self._discard_frame_dir(frame_dir, output_dir)
 
         # Collect extracted frames
         frames = []
@@ -193,6 +178,18 @@ class FrameExtractor:
         logger.info(f"Extracted {len(frames)} frames successfully")
         return frames
 
+    def _discard_frame_dir(self, frame_dir: Path, output_dir: Optional[str]) -> List[Dict[str, Any]]:
+        """Remove a temporary frame directory after a failed extraction.
+
+        Caller-provided output directories are left alone.
+
+        Returns:
+            An empty frame list, so callers can ``return self._discard_frame_dir(...)``
+        """
+        if not output_dir:
+            shutil.rmtree(frame_dir, ignore_errors=True)
+        return []
+
     def _extract_frames_fps(
         self,
         video_path: str,
@@ -229,12 +226,7 @@ class FrameExtractor:
         ]
 
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
+            result = run_ffmpeg(cmd, check=False, timeout=120, description="autoedit frames fps")
 
             if result.returncode != 0:
                 logger.error(f"FFmpeg fps extraction failed: {result.stderr[:500]}")
@@ -304,12 +296,14 @@ class FrameExtractor:
                 except Exception as e:
                     logger.warning(f"Could not delete frame {frame_path}: {e}")
 
-        # Try to remove the directory if empty
+        # Remove the extraction directory: fully if we created it, otherwise only if empty
         if frames:
-            first_path = Path(frames[0].get("path", ""))
-            if first_path.parent.exists():
+            frame_dir = Path(frames[0].get("path", "")).parent
+            if frame_dir.parent == self.temp_dir and frame_dir.name.startswith("extract_"):
+                shutil.rmtree(frame_dir, ignore_errors=True)
+            elif frame_dir.exists():
                 try:
-                    first_path.parent.rmdir()
+                    frame_dir.rmdir()
                 except OSError:
                     pass  # Directory not empty
 
@@ -387,7 +381,7 @@ def extract_frames_for_analysis(
 
 
 def get_video_info(video_path: str) -> Dict[str, Any]:
-    """Get video metadata using ffprobe.
+    """Get video metadata (cached ffprobe, see services.media_probe).
 
     Args:
         video_path: Path to video file
@@ -396,43 +390,16 @@ def get_video_info(video_path: str) -> Dict[str, Any]:
         Dict with duration, resolution, fps, etc.
     """
     try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,r_frame_rate,duration:format=duration",
-            "-of", "json",
-            video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-
-        if result.returncode == 0:
-            import json
-            data = json.loads(result.stdout)
-
-            # Extract values
-            stream = data.get("streams", [{}])[0]
-            format_info = data.get("format", {})
-
-            # Parse frame rate (e.g., "30000/1001" -> 29.97)
-            fps_str = stream.get("r_frame_rate", "30/1")
-            if "/" in fps_str:
-                num, den = fps_str.split("/")
-                fps = float(num) / float(den) if float(den) > 0 else 30.0
-            else:
-                fps = float(fps_str)
-
-            duration = float(format_info.get("duration", 0)) or float(stream.get("duration", 0))
-
-            return {
-                "width": int(stream.get("width", 0)),
-                "height": int(stream.get("height", 0)),
-                "fps": round(fps, 2),
-                "duration_sec": duration,
-                "duration_ms": int(duration * 1000)
-            }
-
-        return {"error": result.stderr}
+        probe = get_media_probe(video_path, timeout=30)
+        duration = probe.duration or 0.0
+
+        return {
+            "width": probe.width,
+            "height": probe.height,
+            "fps": round(probe.frame_rate or 30.0, 2),
+            "duration_sec": duration,
+            "duration_ms": int(duration * 1000)
+        }
 
     except Exception as e:
         return {"error": str(e)}
@@ -25,11 +25,14 @@ from typing import Dict, Any, List, Optional, Tuple
 
 from config import LOCAL_STORAGE_PATH
 from services.cloud_storage import upload_file
+from services.file_management import download_file
+from services.scratch_storage import get_job_scratch_dir
 from services.v1.autoedit.ffmpeg_builder import (
     build_preview_payload,
     build_final_render_payload,
     blocks_to_cuts,
     estimate_render_time,
+    get_render_profile,
     get_video_dimensions_from_url
 )
 from services.v1.autoedit.blocks import (
@@ -135,10 +138,17 @@ def generate_final_render(
     quality: str = "high",
     fade_duration: float = 0.025,
     video_width: Optional[int] = None,
-    video_height: Optional[int] = None
+    video_height: Optional[int] = None,
+    smart_render: bool = False
 ) -> Dict[str, Any]:
     """Generate the final high-quality render.
 
+    With smart_render, the source is cut locally: whole GOPs inside the kept
+    blocks are stream-copied and only the GOPs at block boundaries are
+    re-encoded with the quality profile's CRF and preset. When the source
+    does not allow it (unsupported codec, too few whole GOPs), the regular
+    compose render is used.
+
     Args:
         workflow_id: Workflow identifier
         video_url: Source video URL
@@ -148,12 +158,31 @@ def generate_final_render(
         fade_duration: Crossfade duration in seconds
         video_width: Original video width (for aspect ratio preservation)
         video_height: Original video height (for aspect ratio preservation)
+        smart_render: Copy untouched GOPs instead of re-encoding the whole output
 
     Returns:
         Dict with output_url and stats
     """
     start_time = time.time()
 
+    if smart_render:
+        smart_result = _smart_render(workflow_id, video_url, blocks, quality, fade_duration)
+        if smart_result:
+            output_url, report = smart_result
+            stats = calculate_stats(blocks, video_duration_ms)
+            render_time = time.time() - start_time
+            stats["render_time_sec"] = round(render_time, 2)
+            stats["output_quality"] = quality
+            stats["smart_render"] = report
+
+            logger.info(f"Smart render completed in {render_time:.2f}s: {output_url}")
+
+            return {
+                "output_url": output_url,
+                "output_duration_ms": stats["result_duration_ms"],
+                "stats": stats
+            }
+
     # Get video dimensions if not provided (for aspect ratio preservation)
     if video_width is None or video_height is None:
         logger.info(f"Getting video dimensions for aspect ratio preservation...")
@@ -196,6 +225,61 @@ def generate_final_render(
     }
 
 
+def _smart_render(
+    workflow_id: str,
+    video_url: str,
+    blocks: List[Dict[str, Any]],
+    quality: str,
+    fade_duration: float
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Render the kept blocks with a GOP-aware smart cut.
+
+    Returns:
+        (output_url, report), or None if the compose render should be used
+    """
+    from services.v1.video.cut import merge_cuts, probe_media
+    from services.v1.video.smart_cut import smart_cut
+
+    profile = get_render_profile(quality)
+    work_dir = get_job_scratch_dir()
+    input_path = None
+    output_path = os.path.join(work_dir, f"final_{workflow_id}.mp4")
+
+    try:
+        input_path = download_file(video_url, work_dir)
+        media_info = probe_media(input_path)
+        if not media_info["has_video"] or media_info["duration"] is None:
+            return None
+
+        # Blocks are the kept ranges; merge_cuts sorts, clamps and merges them
+        segments = merge_cuts(blocks_to_cuts(blocks), media_info["duration"])
+        report = smart_cut(
+            input_path,
+            segments,
+            output_path,
+            video_preset=profile["preset"],
+            video_crf=profile["crf"],
+            audio_bitrate=profile["audio_bitrate"],
+            fade_duration=fade_duration,
+            has_audio=media_info["has_audio"],
+            duration=media_info["duration"]
+        )
+        if report is None:
+            logger.info(f"Smart render not applicable for workflow {workflow_id}, using compose")
+            return None
+
+        return upload_file(output_path), report
+
+    except Exception as e:
+        logger.warning(f"Smart render failed for workflow {workflow_id}, using compose: {e}")
+        return None
+
+    finally:
+        for path in (input_path, output_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
 def _call_ffmpeg_compose(payload: Dict[str, Any], job_id: str) -> str:
     """Call the FFmpeg compose endpoint.
 
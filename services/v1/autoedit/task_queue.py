@@ -240,7 +240,12 @@ def continue_after_hitl1(workflow_id: str, config: Optional[Dict] = None) -> Dic
     )
 
 
-def continue_after_hitl2(workflow_id: str, quality: str = "high", crossfade_duration: float = 0.025) -> Dict[str, Any]:
+def continue_after_hitl2(
+    workflow_id: str,
+    quality: str = "high",
+    crossfade_duration: float = 0.025,
+    smart_render: bool = False
+) -> Dict[str, Any]:
     """
     Continue the pipeline after HITL 2 (preview review).
 
@@ -250,6 +255,7 @@ def continue_after_hitl2(workflow_id: str, quality: str = "high", crossfade_dura
         workflow_id: The workflow ID
         quality: Render quality (standard, high, 4k)
         crossfade_duration: Crossfade duration in seconds
+        smart_render: Copy untouched GOPs instead of re-encoding the whole output
 
     Returns:
         Result of enqueueing render task
@@ -261,7 +267,8 @@ def continue_after_hitl2(workflow_id: str, quality: str = "high", crossfade_dura
         workflow_id=workflow_id,
         payload={
             "quality": quality,
-            "crossfade_duration": crossfade_duration
+            "crossfade_duration": crossfade_duration,
+            "smart_render": smart_render
         }
     )
 
@@ -0,0 +1,531 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""
+Chunked rendering of single-timeline compose requests.
+
+A request that decodes one input, filters it and encodes one output can be
+cut into keyframe-aligned chunks that are encoded independently: by local
+ffmpeg processes and, when COMPOSE_PEERS is set, by other toolkit instances
+through their own /v1/ffmpeg/compose endpoint. The audio is encoded once over
+the whole timeline and the video chunks are joined with the concat demuxer
+without re-encoding.
+"""
+
+import os
+import time
+import logging
+import statistics
+import threading
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.file_management import download_file
+from services.cloud_storage import delete_file
+from services.media_probe import get_media_probe, ProbeError
+from services.scratch_storage import bind_job_scratch, get_scratch_path, SMALL_FILE_SIZE_HINT
+from services.ffmpeg_runner import run_ffmpeg, start_ffmpeg
+from services.v1.video.smart_cut import build_keyframe_index
+from services.v1.video.split import get_split_parallelism
+from services.v1.ffmpeg.ffmpeg_compose import (
+    append_options, get_output_extension, get_metadata, process_ffmpeg_compose, SHARED_GRAPH_OPTIONS
+)
+from config import API_KEY, COMPOSE_PEERS, COMPOSE_CHUNK_DURATION, LOCAL_STORAGE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Containers the concat demuxer output can be muxed into with stream copy
+CHUNKED_EXTENSIONS = ('mp4', 'mov', 'mkv', 'webm')
+
+# Options that change which part of the timeline is read or written; the
+# coordinator sets these itself per chunk
+TIMELINE_OPTIONS = ('-ss', '-t', '-to', '-sseof', '-stream_loop', '-itsoffset',
+                    '-frames', '-vframes', '-shortest', '-map', '-vn')
+
+# Output options that belong to the final mux rather than to an encoder
+MUX_OPTIONS = ('-f', '-movflags', '-metadata', '-brand', '-tag', '-fflags')
+
+AUDIO_OPTIONS = ('-af', '-acodec', '-ar', '-ac', '-ab', '-aq', '-an')
+
+# Encoders ffmpeg picks by default for each output container. Chunks and
+# audio are encoded into Matroska, whose defaults differ (e.g. Vorbis audio,
+# which mp4 does not accept), so these are pinned unless the request names
+# its own codecs. MKV outputs already get the Matroska defaults.
+CONTAINER_ENCODERS = {
+    'mp4': ('libx264', 'aac'),
+    'mov': ('libx264', 'aac'),
+    'webm': ('libvpx-vp9', 'libopus'),
+}
+
+# A running chunk is dispatched a second time once it has taken this many
+# times longer than the median chunk of the same length
+STRAGGLER_FACTOR = 2.0
+STRAGGLER_POLL_INTERVAL = 1.0
+MAX_CHUNK_ATTEMPTS = 3
+
+# Longest a peer may take for one chunk, including its download and upload
+PEER_TIMEOUT = 3600
+
+
+def split_output_options(options):
+    """
+    Sort output options into (video, audio, mux) lists.
+
+    Options with an ``a`` stream specifier or that only apply to audio go to
+    the audio encode, muxer options to the final stitch and everything else
+    to the video chunks. ``-c`` without a specifier applies to both encodes.
+    """
+    video, audio, mux = [], [], []
+    for option in options:
+        name, _, spec = option["option"].partition(':')
+        if name in MUX_OPTIONS:
+            mux.append(option)
+        elif name in AUDIO_OPTIONS or spec.startswith('a'):
+            audio.append(option)
+        elif name in ('-c', '-codec') and not spec:
+            video.append(option)
+            audio.append(option)
+        else:
+            video.append(option)
+    return video, audio, mux
+
+
+def has_codec_option(options, stream):
+    """True when ``options`` choose the encoder of ``stream`` ('v' or 'a')."""
+    for option in options:
+        name, _, spec = option["option"].partition(':')
+        if name == f'-{stream}codec' or (name in ('-c', '-codec') and (not spec or spec.startswith(stream))):
+            return True
+    return False
+
+
+def get_chunked_render_plan(data):
+    """
+    Check whether a compose request renders one timeline that can be chunked.
+
+    Returns:
+        tuple: (plan dict or None, reason str). The plan holds the output
+        extension, the video, audio and mux options of the output (with the
+        container's default encoders, see CONTAINER_ENCODERS) and whether
+        the output has audio.
+    """
+    if len(data["inputs"]) != 1 or len(data["outputs"]) != 1:
+        return None, "chunked rendering needs exactly one input and one output"
+    if data.get("filters"):
+        return None, "filter graphs are rendered in a single process"
+
+    output = data["outputs"][0]
+    extension = get_output_extension(output)
+    if extension not in CHUNKED_EXTENSIONS:
+        return None, f"format '{extension}' is not supported for chunked rendering"
+
+    options = list(data.get("global_options", [])) + list(data["inputs"][0].get("options", []))
+    options += output["options"]
+    for option in options:
+        name = option["option"].partition(':')[0]
+        if option["option"] in SHARED_GRAPH_OPTIONS or name in TIMELINE_OPTIONS:
+            return None, f"option {option['option']} is not supported for chunked rendering"
+
+    video, audio, mux = split_output_options(output["options"])
+    for option in video:
+        if option["option"] in ('-c:v', '-vcodec', '-c', '-codec') and option.get("argument") == 'copy':
+            return None, "stream copy does not need rendering"
+
+    video_encoder, audio_encoder = CONTAINER_ENCODERS.get(extension, (None, None))
+    if video_encoder and not has_codec_option(video, 'v'):
+        video = [{"option": "-c:v", "argument": video_encoder}] + video
+    if audio_encoder and not has_codec_option(audio, 'a'):
+        audio = [{"option": "-c:a", "argument": audio_encoder}] + audio
+
+    return {
+        "extension": extension,
+        "video_options": video,
+        "audio_options": audio,
+        "mux_options": mux,
+        "audio": all(option["option"] != '-an' for option in audio)
+    }, None
+
+
+def plan_render_chunks(keyframes, duration, chunk_duration):
+    """
+    Partition the timeline into chunks of about ``chunk_duration`` seconds.
+
+    Every chunk starts on a source keyframe, so a chunk is decoded from its
+    first frame without reading the previous GOP, and the chunks together
+    cover every frame exactly once.
+
+    Args:
+        keyframes (list): Keyframe times in seconds, relative to the start of the file
+        duration (float): Duration of the input in seconds
+        chunk_duration (float): Target chunk length in seconds
+
+    Returns:
+        list: (start, end) tuples in seconds covering [0, duration]
+    """
+    boundaries = [0.0]
+    for keyframe in sorted(keyframes):
+        if keyframe >= boundaries[-1] + chunk_duration and duration - keyframe >= chunk_duration / 2:
+            boundaries.append(keyframe)
+    boundaries.append(duration)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+
+def apply_chunk_offset(video_options, offset):
+    """
+    Run the video filters of a chunk on the source timeline.
+
+    The chunk's frames are moved to their original timestamps before the
+    filters and back to zero after them, so time-based expressions (fades,
+    drawtext with ``t``, enable=) behave as in a single-process render.
+    """
+    options = []
+    for option in video_options:
+        if option["option"] in ('-vf', '-filter:v') and offset:
+            option = {
+                "option": option["option"],
+                "argument": f"setpts=PTS+{offset:.6f}/TB,{option['argument']},setpts=PTS-STARTPTS"
+            }
+        options.append(option)
+    return options
+
+
+def build_chunk_request(data, plan, start, end):
+    """Build the compose payload that renders one video chunk on a peer."""
+    input_data = data["inputs"][0]
+    return {
+        "inputs": [{
+            "file_url": input_data["file_url"],
+            "options": list(input_data.get("options", [])) + [
+                {"option": "-ss", "argument": f"{start:.6f}"},
+                {"option": "-t", "argument": f"{end - start:.6f}"}
+            ]
+        }],
+        "outputs": [{
+            "options": apply_chunk_offset(plan["video_options"], start) + [
+                {"option": "-an"},
+                {"option": "-f", "argument": "matroska"}
+            ]
+        }],
+        "global_options": list(data.get("global_options", []))
+    }
+
+
+def build_local_chunk_command(data, input_path, plan, start, end, output_path, threads=None):
+    """Build the ffmpeg command that renders one video chunk locally."""
+    command = ['ffmpeg', '-y']
+    append_options(command, data.get("global_options", []))
+    append_options(command, data["inputs"][0].get("options", []))
+    command += ['-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', input_path]
+    append_options(command, apply_chunk_offset(plan["video_options"], start))
+    if threads:
+        command += ['-threads', str(threads)]
+    return command + ['-an', '-f', 'matroska', output_path]
+
+
+def build_audio_command(data, input_path, plan, output_path):
+    """Build the ffmpeg command that encodes the audio of the whole timeline."""
+    command = ['ffmpeg', '-y']
+    append_options(command, data.get("global_options", []))
+    append_options(command, data["inputs"][0].get("options", []))
+    command += ['-i', input_path, '-vn']
+    append_options(command, plan["audio_options"])
+    return command + ['-f', 'matroska', output_path]
+
+
+def build_render_stitch_command(concat_list_path, audio_path, plan, output_path):
+    """Join the video chunks and the audio with stream copy into the final output."""
+    command = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_list_path]
+    if audio_path:
+        command += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+    command += ['-c', 'copy']
+    append_options(command, plan["mux_options"])
+    return command + [output_path]
+
+
+def find_straggler(running, weights, rates, straggler_factor):
+    """
+    Return the index of the running chunk that is furthest behind, or None.
+
+    A chunk is behind when it has run longer than ``straggler_factor`` times
+    the median wall time per second of video of the finished chunks. Chunks
+    that already run more than once are not dispatched again.
+    """
+    if not rates:
+        return None
+    median_rate = statistics.median(rates)
+    copies = {}
+    for index, _, _, _ in running.values():
+        copies[index] = copies.get(index, 0) + 1
+
+    now = time.time()
+    worst, worst_ratio = None, straggler_factor
+    for index, _, _, started in running.values():
+        if copies[index] > 1:
+            continue
+        ratio = (now - started) / (median_rate * weights[index] or 1e-6)
+        if ratio > worst_ratio:
+            worst, worst_ratio = index, ratio
+    return worst
+
+
+def dispatch_chunks(weights, slots, run_chunk, cancel_attempt=None, straggler_factor=STRAGGLER_FACTOR,
+                    max_attempts=MAX_CHUNK_ATTEMPTS, poll_interval=STRAGGLER_POLL_INTERVAL):
+    """
+    Run every chunk on a free slot, re-dispatching failed and straggling chunks.
+
+    Each slot runs one chunk at a time. When no chunk is waiting, a free slot
+    takes a second copy of the chunk that is furthest behind (see
+    find_straggler); whichever copy finishes first is used and the other one
+    is cancelled. A failed chunk goes back to the front of the queue; a slot
+    that fails ``max_attempts`` times in a row is not used again.
+
+    Args:
+        weights (list): Length of each chunk in seconds
+        slots (list): Hashable slot descriptions, passed to ``run_chunk``
+        run_chunk (callable): run_chunk(index, slot, attempt) -> result
+        cancel_attempt (callable, optional): cancel_attempt(index, attempt)
+            stops a copy that is no longer needed
+
+    Returns:
+        tuple: (results in chunk order, stats dict)
+    """
+    pending = deque(range(len(weights)))
+    free = list(slots)
+    running = {}  # future -> (index, slot, attempt, started)
+    results = {}
+    attempts = [0] * len(weights)
+    failures = [0] * len(weights)
+    slot_failures = {slot: 0 for slot in slots}
+    rates = []
+    stats = {"chunks": len(weights), "redispatched": 0, "failed_attempts": 0, "by_slot": {}}
+
+    executor = ThreadPoolExecutor(max_workers=len(slots))
+    try:
+        while len(results) < len(weights):
+            while free:
+                if pending:
+                    index = pending.popleft()
+                else:
+                    index = find_straggler(running, weights, rates, straggler_factor)
+                    if index is None:
+                        break
+                    stats["redispatched"] += 1
+                    logger.info(f"Chunk {index} is straggling, dispatching it again")
+                slot = free.pop(0)
+                attempts[index] += 1
+                future = executor.submit(run_chunk, index, slot, attempts[index])
+                running[future] = (index, slot, attempts[index], time.time())
+
+            if not running:
+                raise Exception("No render slot is left to run the remaining chunks")
+
+            finished, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, slot, attempt, started = running.pop(future)
+                if index in results:
+                    free.append(slot)
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures[index] += 1
+                    slot_failures[slot] += 1
+                    stats["failed_attempts"] += 1
+                    logger.warning(f"Chunk {index} attempt {attempt} failed on {slot}: {str(e)}")
+                    if failures[index] >= max_attempts:
+                        raise Exception(f"Chunk {index} failed {failures[index]} times: {str(e)}")
+                    if slot_failures[slot] < max_attempts:
+                        free.append(slot)
+                    else:
+                        logger.warning(f"Not using {slot} for further chunks")
+                    if all(other[0] != index for other in running.values()):
+                        pending.appendleft(index)
+                    continue
+
+                free.append(slot)
+                slot_failures[slot] = 0
+                results[index] = result
+                rates.append((time.time() - started) / (weights[index] or 1e-6))
+                stats["by_slot"][str(slot)] = stats["by_slot"].get(str(slot), 0) + 1
+                for other_index, _, other_attempt, _ in running.values():
+                    if other_index == index and cancel_attempt:
+                        cancel_attempt(index, other_attempt)
+    finally:
+        if cancel_attempt:
+            for index, _, attempt, _ in running.values():
+                cancel_attempt(index, attempt)
+        executor.shutdown(wait=False)
+
+    return [results[index] for index in range(len(weights))], stats
+
+
+def render_chunk_on_peer(peer, payload):
+    """
+    Render one chunk through a peer's compose endpoint and download the result.
+
+    The peer uploads the chunk to the shared bucket; the object is deleted
+    as soon as it has been downloaded.
+    """
+    response = requests.post(
+        f"{peer}/v1/ffmpeg/compose",
+        json=payload,
+        headers={'X-API-Key': API_KEY},
+        timeout=PEER_TIMEOUT
+    )
+    response.raise_for_status()
+    body = response.json()
+    if body.get("code") != 200 or not body.get("response"):
+        raise Exception(f"Peer {peer} failed: {body.get('message')}")
+    file_url = body["response"][0]["file_url"]
+    try:
+        return download_file(file_url, LOCAL_STORAGE_PATH)
+    finally:
+        delete_file(file_url)
+
+
+def _run(cmd, description):
+    process = run_ffmpeg(cmd, check=False, description=description)
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg error during {description}: {process.stderr}")
+
+
+def process_ffmpeg_compose_chunked(data, job_id):
+    """
+    Render a compose request in keyframe-aligned chunks on local processes and peers.
+
+    The input URL is probed before anything is downloaded. When the input
+    turns out to be a single chunk only after it was downloaded (keyframes
+    too far apart), the request is rendered by process_ffmpeg_compose with
+    the downloaded file instead of downloading it again.
+
+    Returns:
+        tuple: (output_filenames, metadata) as process_ffmpeg_compose, or None
+        if the request cannot be chunked and must be rendered in one process.
+    """
+    plan, reason = get_chunked_render_plan(data)
+    if not plan:
+        logger.info(f"Job {job_id}: Chunked rendering not possible: {reason}")
+        return None
+
+    input_url = data["inputs"][0]["file_url"]
+    try:
+        remote_probe = get_media_probe(input_url)
+    except ProbeError as e:
+        logger.info(f"Job {job_id}: Chunked rendering not possible: {str(e)}")
+        return None
+    if not remote_probe.has_video or not remote_probe.duration:
+        logger.info(f"Job {job_id}: Chunked rendering not possible: no video or unknown duration")
+        return None
+    # plan_render_chunks never makes a chunk shorter than half the target
+    if remote_probe.duration < COMPOSE_CHUNK_DURATION * 1.5:
+        logger.info(f"Job {job_id}: Chunked rendering not possible: input is a single chunk")
+        return None
+
+    input_path = download_file(input_url, LOCAL_STORAGE_PATH)
+    chunk_paths = []
+    concat_list_path = None
+    audio_path = None
+    finished = threading.Event()
+    try:
+        try:
+            probe = get_media_probe(input_path)
+            start_time = float(probe.format.get('start_time') or 0)
+            keyframes = [t - start_time for t in build_keyframe_index(input_path)]
+            chunks = plan_render_chunks(keyframes, probe.duration, COMPOSE_CHUNK_DURATION)
+        except ProbeError as e:
+            chunks, reason = [], str(e)
+        else:
+            reason = "input is a single chunk"
+        if len(chunks) < 2:
+            logger.info(f"Job {job_id}: Chunked rendering not possible ({reason}), "
+                        f"rendering the downloaded input in a single process")
+            local_path = input_path
+            input_path = None  # Owned and removed by process_ffmpeg_compose from here on
+            return process_ffmpeg_compose(data, job_id, local_paths={input_url: local_path})
+
+        workers, threads = get_split_parallelism(len(chunks))
+        slots = [f"local-{i}" for i in range(workers)] + list(COMPOSE_PEERS)
+        logger.info(f"Job {job_id}: Rendering {len(chunks)} chunks on {workers} local processes "
+                    f"and {len(COMPOSE_PEERS)} peers")
+
+        processes = {}
+        processes_lock = threading.Lock()
+
+        def run_chunk(index, slot, attempt):
+            start, end = chunks[index]
+            if slot in COMPOSE_PEERS:
+                path = render_chunk_on_peer(slot, build_chunk_request(data, plan, start, end))
+                if finished.is_set():
+                    # A straggler copy that finished after the job
+                    os.remove(path)
+                    return path
+                chunk_paths.append(path)
+                return path
+
+            path = get_scratch_path(f"{job_id}_chunk{index:04d}_{attempt}.mkv")
+            chunk_paths.append(path)
+            cmd = build_local_chunk_command(data, input_path, plan, start, end, path, threads=threads)
+            process = start_ffmpeg(cmd, description="compose chunk", threads=threads)
+            with processes_lock:
+                processes[(index, attempt)] = process
+            if process.wait() != 0:
+                raise Exception(f"FFmpeg error for chunk {index}: {process.stderr}")
+            return path
+
+        def cancel_attempt(index, attempt):
+            with processes_lock:
+                process = processes.get((index, attempt))
+            if process and process.poll() is None:
+                process.kill()
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=1) as audio_executor:
+            audio_future = None
+            if probe.has_audio and plan["audio"]:
+                audio_path = get_scratch_path(f"{job_id}_audio.mka")
+                audio_future = audio_executor.submit(
+                    bind_job_scratch(_run), build_audio_command(data, input_path, plan, audio_path), "audio encode"
+                )
+            results, stats = dispatch_chunks(
+                [end - start for start, end in chunks], slots, bind_job_scratch(run_chunk), cancel_attempt
+            )
+            if audio_future:
+                audio_future.result()
+
+        concat_list_path = get_scratch_path(f"{job_id}_chunks.txt", SMALL_FILE_SIZE_HINT)
+        with open(concat_list_path, 'w') as f:
+            for path in results:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output_0.{plan['extension']}")
+        _run(build_render_stitch_command(concat_list_path, audio_path, plan, output_filename), "chunk stitching")
+        elapsed = time.time() - started
+        logger.info(f"Job {job_id}: Rendered {probe.duration:.1f}s in {elapsed:.1f}s "
+                    f"({probe.duration / elapsed:.2f}x realtime), {stats['redispatched']} re-dispatched, "
+                    f"chunks per slot: {stats['by_slot']}")
+    finally:
+        finished.set()
+        for path in chunk_paths + [concat_list_path, audio_path, input_path]:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    metadata = []
+    if data.get("metadata"):
+        metadata.append(get_metadata(output_filename, data["metadata"], job_id))
+    return [output_filename], metadata
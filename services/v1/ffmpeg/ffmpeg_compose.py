@@ -20,7 +20,11 @@ import os
 import subprocess
 import json
 import re
-from services.file_management import download_file
+from concurrent.futures import ThreadPoolExecutor
+from services.file_management import download_files
+from services.stream_output import get_streaming_plan, build_streaming_options, run_ffmpeg_to_storage
+from services.scratch_storage import get_scratch_path, SMALL_FILE_SIZE_HINT
+from services.ffmpeg_runner import run_ffmpeg, FFmpegError
 from config import LOCAL_STORAGE_PATH
 
 def get_extension_from_format(format_name):
@@ -46,28 +50,169 @@ def get_extension_from_format(format_name):
     }
     return format_to_extension.get(format_name.lower(), 'mp4')  # Default to mp4 if unknown
 
-def get_metadata(filename, metadata_requests, job_id):
+# Filters whose name starts with "a" but that output video
+VIDEO_FILTERS_STARTING_WITH_A = ('alphaextract', 'alphamerge', 'amplify', 'atadenoise', 'avgblur', 'avectorscope', 'ahistogram')
+# Audio filters whose name does not start with "a"
+AUDIO_FILTERS = ('volume', 'pan', 'loudnorm', 'dynaudnorm', 'highpass', 'lowpass', 'bandpass', 'equalizer',
+                 'silenceremove', 'channelsplit', 'channelmap', 'join', 'sidechaincompress', 'rubberband',
+                 'bass', 'treble', 'earwax', 'extrastereo', 'stereotools', 'compand', 'firequalizer')
+# Filters that can output video and audio, or whose output type depends on options
+MIXED_FILTERS = ('concat', 'aphasemeter', 'ebur128', 'movie', 'amovie')
+
+# Output options that change the frames of the output video; the thumbnail gets them too
+THUMBNAIL_VIDEO_OPTIONS = ('-vf', '-filter:v', '-s', '-ss', '-aspect')
+
+def get_pad_filter(filter_complex, label):
+    """Return the name of the filter that produces the output pad ``[label]``, or None."""
+    for chain in filter_complex.split(';'):
+        chain = chain.strip()
+        trailing = re.search(r'((?:\[[^\]]+\]\s*)+)$', chain)
+        if not trailing or f"[{label}]" not in trailing.group(1).replace(' ', ''):
+            continue
+        last_filter = chain[:trailing.start()].split(',')[-1].strip()
+        last_filter = re.sub(r'^(\[[^\]]+\]\s*)+', '', last_filter)
+        return last_filter.split('=')[0].split('@')[0].strip()
+    return None
+
+def is_video_pad(filter_complex, label):
+    """True only when the pad ``[label]`` is known to carry video."""
+    name = get_pad_filter(filter_complex, label)
+    if not name or name in MIXED_FILTERS or name in AUDIO_FILTERS:
+        return False
+    return not name.startswith('a') or name in VIDEO_FILTERS_STARTING_WITH_A
+
+def plan_thumbnail_output(options, filter_complex, index, thumbnail_path):
+    """
+    Add a one-frame image output to the encode so the thumbnail needs no second decode.
+
+    A filter graph pad can only be consumed once, so a mapped video pad is
+    split in two: one branch feeds the output, the other the thumbnail.
+    Stream specifiers can simply be mapped a second time. The video source is
+    decided from the maps alone, without probing the inputs: an image output
+    without a video stream would make ffmpeg reject the whole command, so
+    outputs without a mandatory video map get the thumbnail after the encode.
+
+    Args:
+        options (list): Output option dicts of the output
+        filter_complex (str or None): The request's filter graph
+        index (int): Output index, used to name the new pads
+        thumbnail_path (str): Image file to write
+
+    Returns:
+        tuple: (output options, thumbnail args, filter_complex), or None if
+        the video source of the output cannot be determined safely.
+    """
+    maps = [o for o in options if o.get("option") == "-map" and not str(o.get("argument", '')).startswith('-')]
+    thumbnail_map = None
+    new_options = list(options)
+
+    if not maps:
+        # Unlabeled graph outputs go to the first output and cannot be shared,
+        # and automatic selection may find no video stream at all
+        return None
+
+    for position, option in enumerate(options):
+        if option not in maps:
+            continue
+        spec = str(option.get("argument"))
+        label = spec.strip('[]')
+        if spec.startswith('['):
+            if filter_complex and is_video_pad(filter_complex, label):
+                main, thumb = f"{label}_main{index}", f"{label}_thumb{index}"
+                filter_complex = f"{filter_complex};[{label}]split=2[{main}][{thumb}]"
+                new_options[position] = {"option": "-map", "argument": f"[{main}]"}
+                thumbnail_map = f"[{thumb}]"
+                break
+        elif re.fullmatch(r'\d+:v(:\d+)?', spec):
+            # Mandatory maps only: an optional one (0:v?) may select nothing
+            thumbnail_map = spec
+            if thumbnail_map.count(':') == 1:
+                thumbnail_map += ':0'
+            break
+    if not thumbnail_map:
+        return None
+
+    thumbnail_args = ['-map', thumbnail_map]
+    for option in options:
+        if option.get("option") in THUMBNAIL_VIDEO_OPTIONS and option.get("argument") is not None:
+            thumbnail_args += [option["option"], str(option["argument"])]
+    thumbnail_args += ['-frames:v', '1', '-an', '-sn', '-dn', thumbnail_path]
+    return new_options, thumbnail_args, filter_complex
+
+def parse_encode_stats(stderr):
+    """
+    Read the output stream codecs and the encoded duration from ffmpeg's log.
+
+    Returns:
+        dict: {"time": seconds or None, "outputs": {path: {"video": codec, "audio": codec}}}
+    """
+    outputs = {}
+    current = None
+    for line in stderr.splitlines():
+        output_match = re.match(r"Output #\d+, [^,]+, to '(.*)':", line)
+        if output_match:
+            current = outputs.setdefault(output_match.group(1), {})
+            continue
+        if line.startswith('Input #') or line.startswith('Stream mapping:'):
+            current = None
+            continue
+        stream_match = re.search(r"Stream #\d+:\d+\S*: (Video|Audio): (\w+)", line)
+        if current is not None and stream_match:
+            current.setdefault(stream_match.group(1).lower(), stream_match.group(2))
+
+    times = re.findall(r"time=\s*(\d+):(\d+):(\d+(?:\.\d+)?)", stderr)
+    duration = None
+    if times:
+        hours, minutes, seconds = times[-1]
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return {"time": duration, "outputs": outputs}
+
+def get_metadata(filename, metadata_requests, job_id, encode_info=None, thumbnail_filename=None):
+    """
+    Collect the requested metadata of an output.
+
+    Values that the encode already produced are used as is: the thumbnail
+    written by the encode's image output, the stream codecs and duration from
+    its log. A single ffprobe (and, without an encode thumbnail, a one-frame
+    decode) is only run for whatever is still missing.
+
+    Args:
+        encode_info (dict, optional): {"duration": float or None, "encoder": {...}}
+        thumbnail_filename (str, optional): Thumbnail produced during the encode
+    """
     metadata = {}
+    encode_info = encode_info or {}
     if metadata_requests.get('thumbnail'):
-        thumbnail_filename = f"{os.path.splitext(filename)[0]}_thumbnail.jpg"
-        thumbnail_command = [
-            'ffmpeg',
-            '-i', filename,
-            '-vf', 'select=eq(n\,0)',
-            '-vframes', '1',
-            thumbnail_filename
-        ]
-        try:
-            subprocess.run(thumbnail_command, check=True, capture_output=True, text=True)
-            if os.path.exists(thumbnail_filename):
-                metadata['thumbnail'] = thumbnail_filename  # Return local path instead of URL
-        except subprocess.CalledProcessError as e:
-            print(f"Thumbnail generation failed: {e.stderr}")
+        if thumbnail_filename and os.path.exists(thumbnail_filename):
+            metadata['thumbnail'] = thumbnail_filename
+        else:
+            # Kept in the job scratch directory so it is removed with the job
+            thumbnail_name = f"{os.path.splitext(os.path.basename(filename))[0]}_thumbnail.jpg"
+            thumbnail_filename = get_scratch_path(thumbnail_name, SMALL_FILE_SIZE_HINT)
+            thumbnail_command = [
+                'ffmpeg',
+                '-y',
+                '-i', filename,
+                '-vf', 'select=eq(n\\,0)',
+                '-vframes', '1',
+                thumbnail_filename
+            ]
+            try:
+                run_ffmpeg(thumbnail_command, description="compose thumbnail")
+                if os.path.exists(thumbnail_filename):
+                    metadata['thumbnail'] = thumbnail_filename  # Return local path instead of URL
+            except FFmpegError as e:
+                print(f"Thumbnail generation failed: {e.stderr}")
 
-    if metadata_requests.get('filesize'):
-        metadata['filesize'] = os.path.getsize(filename)
+    if metadata_requests.get('filesize') or metadata_requests.get('bitrate'):
+        filesize = os.path.getsize(filename)
+        if metadata_requests.get('filesize'):
+            metadata['filesize'] = filesize
 
-    if metadata_requests.get('encoder') or metadata_requests.get('duration') or metadata_requests.get('bitrate'):
+    duration = encode_info.get('duration')
+    encoder = encode_info.get('encoder')
+    need_duration = metadata_requests.get('duration') or metadata_requests.get('bitrate')
+    if (need_duration and not duration) or (metadata_requests.get('encoder') and not encoder):
         ffprobe_command = [
             'ffprobe',
             '-v', 'quiet',
@@ -78,49 +223,98 @@ def get_metadata(filename, metadata_requests, job_id):
         ]
         result = subprocess.run(ffprobe_command, capture_output=True, text=True)
         probe_data = json.loads(result.stdout)
-        
-        if metadata_requests.get('duration'):
-            metadata['duration'] = float(probe_data['format']['duration'])
-        if metadata_requests.get('bitrate'):
-            metadata['bitrate'] = int(probe_data['format']['bit_rate'])
-        
-        if metadata_requests.get('encoder'):
-            metadata['encoder'] = {}
+
+        if need_duration and not duration:
+            duration = float(probe_data['format']['duration'])
+            if metadata_requests.get('bitrate') and probe_data['format'].get('bit_rate'):
+                metadata['bitrate'] = int(probe_data['format']['bit_rate'])
+        if metadata_requests.get('encoder') and not encoder:
+            encoder = {}
             for stream in probe_data['streams']:
                 if stream['codec_type'] == 'video':
-                    metadata['encoder']['video'] = stream.get('codec_name', 'unknown')
+                    encoder['video'] = stream.get('codec_name', 'unknown')
                 elif stream['codec_type'] == 'audio':
-                    metadata['encoder']['audio'] = stream.get('codec_name', 'unknown')
+                    encoder['audio'] = stream.get('codec_name', 'unknown')
+
+    if metadata_requests.get('duration'):
+        metadata['duration'] = duration
+    if metadata_requests.get('bitrate') and 'bitrate' not in metadata:
+        # Same definition as the container bit_rate reported by ffprobe
+        metadata['bitrate'] = int(filesize * 8 / duration) if duration else 0
+    if metadata_requests.get('encoder'):
+        metadata['encoder'] = encoder
 
     return metadata
 
-def process_ffmpeg_compose(data, job_id):
-    output_filenames = []
-    
-    # Build FFmpeg command
-    command = ["ffmpeg"]
-    
-    # Add global options
-    for option in data.get("global_options", []):
+def append_options(command, options):
+    """Append a list of {"option", "argument"} dicts to an ffmpeg command."""
+    for option in options:
         command.append(option["option"])
         if "argument" in option and option["argument"] is not None:
             command.append(str(option["argument"]))
+
+def get_output_extension(output):
+    format_name = None
+    for option in output["options"]:
+        if option["option"] == "-f":
+            format_name = option.get("argument")
+            break
+    return get_extension_from_format(format_name) if format_name else 'mp4'
+
+# Regex: (.*?)(subtitles|ass)=(['"])(https?://[^'\"]+)(['"])(.*)
+FILTER_URL_PATTERN = r"(.*?)(subtitles|ass)=([\'\"])(https?://[^'\"]+)([\'\"])(.*)"
+
+# Options that make several outputs share one filter graph or one encoder state
+SHARED_GRAPH_OPTIONS = ('-filter_complex', '-lavfi', '-filter_complex_script', '-pass', '-passlogfile')
+
+def get_compose_urls(data):
+    """Return every distinct URL a compose request needs: inputs first, then filter files."""
+    urls = [input_data["file_url"] for input_data in data["inputs"]]
+    for filter_obj in data.get("filters") or []:
+        urls += [match[3] for match in re.findall(FILTER_URL_PATTERN, filter_obj["filter"]) if match[3].strip()]
+    return list(dict.fromkeys(urls))
+
+def outputs_are_independent(data):
+    """
+    True when each output can be produced by its own ffmpeg process.
+
+    Outputs are independent when there is more than one and nothing ties
+    them together: no filter graph, and no multi-pass state.
+    """
+    if len(data["outputs"]) < 2 or data.get("filters"):
+        return False
+    options = list(data.get("global_options", []))
+    for output in data["outputs"]:
+        options += output["options"]
+    return not any(option.get("option") in SHARED_GRAPH_OPTIONS for option in options)
+
+def build_compose_command(data, local_paths=None):
+    """
+    Build the input and filter part of the FFmpeg command, downloading every
+    input and every subtitle/ASS file referenced by the filters.
+
+    All distinct URLs are downloaded concurrently before the command is built,
+    except those already in ``local_paths`` (url -> local file).
+
+    Returns:
+        tuple: (command, input_paths, subtitles_paths)
+    """
+    command = ["ffmpeg"]
     
+    # Add global options
+    append_options(command, data.get("global_options", []))
+    
+    local_paths = dict(local_paths or {})
+    missing_urls = [url for url in get_compose_urls(data) if url not in local_paths]
+    local_paths.update(download_files(missing_urls, LOCAL_STORAGE_PATH))
+    input_urls = set(input_data["file_url"] for input_data in data["inputs"])
+
     # Add inputs
     input_paths = []
-    download_cache = {}  # cache of url -> local_path
     for input_data in data["inputs"]:
         if "options" in input_data:
-            for option in input_data["options"]:
-                command.append(option["option"])
-                if "argument" in option and option["argument"] is not None:
-                    command.append(str(option["argument"]))
-        file_url = input_data["file_url"]
-        if file_url in download_cache:
-            input_path = download_cache[file_url]
-        else:
-            input_path = download_file(file_url, LOCAL_STORAGE_PATH)
-            download_cache[file_url] = input_path
+            append_options(command, input_data["options"])
+        input_path = local_paths[input_data["file_url"]]
         input_paths.append(input_path)
         command.extend(["-i", input_path])
     
@@ -141,41 +335,19 @@ def process_ffmpeg_compose(data, job_id):
                     print(f"[DEBUG] Skipping empty URL for filter: {match.group(0)}")
                     return match.group(0)
                 print(f"[DEBUG] Parsed URL for filter: {url}")
-                local_path = download_file(url, LOCAL_STORAGE_PATH)
-                subtitles_paths.append(local_path)
+                local_path = local_paths[url]
+                if url not in input_urls and local_path not in subtitles_paths:
+                    subtitles_paths.append(local_path)
                 fixed_path = local_path.replace('\\', '/')
                 return f"{prefix}{filter_type}={quote}{fixed_path}{closing_quote}{trailing}"
-            # Regex: (.*?)(subtitles|ass)=(['"])(https?://[^'\"]+)(['"])(.*)
-            pattern = r"(.*?)(subtitles|ass)=([\'\"])(https?://[^'\"]+)([\'\"])(.*)"
-            filter_str = re.sub(pattern, replace_url, filter_str)
+            filter_str = re.sub(FILTER_URL_PATTERN, replace_url, filter_str)
             new_filters.append(filter_str)
         filter_complex = ";".join(new_filters)
         command.extend(["-filter_complex", filter_complex])
-    
-    # Add outputs
-    for i, output in enumerate(data["outputs"]):
-        format_name = None
-        for option in output["options"]:
-            if option["option"] == "-f":
-                format_name = option.get("argument")
-                break
-        
-        extension = get_extension_from_format(format_name) if format_name else 'mp4'
-        output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output_{i}.{extension}")
-        output_filenames.append(output_filename)
-        
-        for option in output["options"]:
-            command.append(option["option"])
-            if "argument" in option and option["argument"] is not None:
-                command.append(str(option["argument"]))
-        command.append(output_filename)
-    
-    # Execute FFmpeg command
-    try:
-        subprocess.run(command, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"FFmpeg command failed: {e.stderr}")
-    
+
+    return command, input_paths, subtitles_paths
+
+def cleanup_compose_inputs(input_paths, subtitles_paths):
     # Clean up input files
     for input_path in input_paths:
         if os.path.exists(input_path):
@@ -184,10 +356,139 @@ def process_ffmpeg_compose(data, job_id):
     for subtitles_path in subtitles_paths:
         if os.path.exists(subtitles_path):
             os.remove(subtitles_path)
+
+def run_ffmpeg_command(command):
+    """Run an ffmpeg command and return its log (stderr, head and tail kept)."""
+    return run_ffmpeg(command, description="compose").stderr
+
+def get_encode_info(stats, output_filename, single_output):
+    """Metadata of one output taken from the log of the ffmpeg run that wrote it."""
+    return {
+        # The progress time is the longest output of the run, so it is only
+        # the duration of this output when the run had no other main output
+        "duration": stats["time"] if single_output else None,
+        "encoder": stats["outputs"].get(output_filename) or None
+    }
+
+def process_ffmpeg_compose(data, job_id, local_paths=None):
+    output_filenames = []
+    metadata_requests = data.get("metadata") or {}
+    
+    # Build FFmpeg command (inputs in local_paths are already downloaded)
+    command, input_paths, subtitles_paths = build_compose_command(data, local_paths)
+    filter_index = len(command) - command[::-1].index("-filter_complex") if data.get("filters") else None
+    filter_complex = command[filter_index] if filter_index else None
+    
+    # Add outputs. Independent outputs get their own ffmpeg process each.
+    # Requested thumbnails are written by an extra image output of the same run.
+    output_commands = []
+    thumbnail_filenames = {}
+    for i, output in enumerate(data["outputs"]):
+        extension = get_output_extension(output)
+        output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output_{i}.{extension}")
+        output_filenames.append(output_filename)
+
+        options = output["options"]
+        thumbnail_args = []
+        if metadata_requests.get('thumbnail'):
+            thumbnail_filename = get_scratch_path(f"{job_id}_output_{i}_thumbnail.jpg", SMALL_FILE_SIZE_HINT)
+            plan = plan_thumbnail_output(options, filter_complex, i, thumbnail_filename)
+            if plan:
+                options, thumbnail_args, filter_complex = plan
+                thumbnail_filenames[output_filename] = thumbnail_filename
+        
+        output_args = []
+        append_options(output_args, options)
+        output_commands.append(output_args + [output_filename] + thumbnail_args)
+
+    if filter_index:
+        command[filter_index] = filter_complex
+    
+    # Execute FFmpeg command
+    encode_info = {}
+    try:
+        if outputs_are_independent(data):
+            workers = min(len(output_commands), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_ffmpeg_command, command + args) for args in output_commands]
+                errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                raise errors[0]
+            for output_filename, future in zip(output_filenames, futures):
+                stats = parse_encode_stats(future.result())
+                encode_info[output_filename] = get_encode_info(stats, output_filename, True)
+        else:
+            for args in output_commands:
+                command.extend(args)
+            stats = parse_encode_stats(run_ffmpeg_command(command))
+            for output_filename in output_filenames:
+                encode_info[output_filename] = get_encode_info(stats, output_filename, len(output_filenames) == 1)
+    finally:
+        cleanup_compose_inputs(input_paths, subtitles_paths)
+
     # Get metadata if requested
     metadata = []
     if data.get("metadata"):
         for output_filename in output_filenames:
-            metadata.append(get_metadata(output_filename, data["metadata"], job_id))
+            metadata.append(get_metadata(
+                output_filename,
+                data["metadata"],
+                job_id,
+                encode_info=encode_info.get(output_filename),
+                thumbnail_filename=thumbnail_filenames.get(output_filename)
+            ))
     
     return output_filenames, metadata
+
+def get_compose_streaming_plan(data):
+    """
+    Check whether a compose request can stream its output to cloud storage.
+
+    Streaming is used for a single output in a streamable format when no
+    metadata other than the file size is requested (thumbnail, duration,
+    bitrate and encoder need the finished file on local disk).
+
+    Returns:
+        tuple: (plan dict or None, reason str)
+    """
+    if len(data["outputs"]) != 1:
+        return None, "streaming supports a single output"
+
+    metadata_requests = data.get("metadata") or {}
+    local_only = [key for key in ('thumbnail', 'duration', 'bitrate', 'encoder') if metadata_requests.get(key)]
+    if local_only:
+        return None, f"metadata {', '.join(local_only)} requires a local output file"
+
+    output = data["outputs"][0]
+    return get_streaming_plan(get_output_extension(output), output["options"])
+
+def process_ffmpeg_compose_streaming(data, job_id):
+    """
+    Run a compose request writing the output to a pipe that is uploaded to
+    cloud storage while ffmpeg is still encoding.
+
+    Returns:
+        list: Output info dicts ({"file_url": ..., optional "filesize"}), or None
+        if the request is not eligible for streaming and must use file mode.
+    """
+    plan, reason = get_compose_streaming_plan(data)
+    if not plan:
+        print(f"Streaming output not possible for job {job_id}: {reason}. Falling back to file mode.")
+        return None
+
+    output = data["outputs"][0]
+    extension = get_output_extension(output)
+    filename = f"{job_id}_output_0.{extension}"
+
+    command, input_paths, subtitles_paths = build_compose_command(data)
+    append_options(command, build_streaming_options(output["options"], plan))
+
+    try:
+        result = run_ffmpeg_to_storage(command, filename, content_type=plan['content_type'])
+    finally:
+        cleanup_compose_inputs(input_paths, subtitles_paths)
+
+    output_info = {"file_url": result["file_url"]}
+    if (data.get("metadata") or {}).get('filesize'):
+        output_info['filesize'] = result['filesize']
+    return [output_info]
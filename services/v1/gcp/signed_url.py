@@ -18,34 +18,66 @@ import os
 import logging
 import json
 import uuid
+import threading
 from datetime import timedelta
 from google.cloud import storage
 from google.oauth2 import service_account
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of URLs signed by a single batch request
+MAX_BATCH_SIZE = 500
+
+# Process-wide client and credentials, rebuilt only if GCP_SA_CREDENTIALS changes
+_client_cache = {"key": None, "client": None, "credentials": None}
+_client_lock = threading.Lock()
+
 
 def get_gcs_client_with_credentials():
     """
-    Create and return a Google Cloud Storage client with signing credentials.
+    Return the process-wide Google Cloud Storage client with signing credentials.
     Returns tuple of (client, credentials) for signed URL generation.
+
+    The service account key is parsed once; signing with it is a local RSA
+    operation, so generating a URL does not need a new client per request.
     """
     credentials_json = os.environ.get('GCP_SA_CREDENTIALS')
     if not credentials_json:
         raise ValueError("GCP_SA_CREDENTIALS environment variable is not set")
 
-    try:
-        credentials_info = json.loads(credentials_json)
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/devstorage.full_control']
-        )
-        client = storage.Client(credentials=credentials)
+    with _client_lock:
+        if _client_cache["key"] == credentials_json:
+            return _client_cache["client"], _client_cache["credentials"]
+
+        try:
+            credentials_info = json.loads(credentials_json)
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_info,
+                scopes=['https://www.googleapis.com/auth/devstorage.full_control']
+            )
+            client = storage.Client(credentials=credentials, project=credentials_info.get('project_id'))
+        except json.JSONDecodeError:
+            raise ValueError("GCP_SA_CREDENTIALS is not valid JSON")
+        except Exception as e:
+            raise ValueError(f"Failed to create GCS client: {str(e)}")
+
+        _client_cache.update(key=credentials_json, client=client, credentials=credentials)
+        logger.info("Created cached GCS client for signed URLs")
         return client, credentials
-    except json.JSONDecodeError:
-        raise ValueError("GCP_SA_CREDENTIALS is not valid JSON")
-    except Exception as e:
-        raise ValueError(f"Failed to create GCS client: {str(e)}")
+
+
+def _get_bucket_name(bucket_name=None):
+    if not bucket_name:
+        bucket_name = os.environ.get('GCP_BUCKET_NAME')
+        if not bucket_name:
+            raise ValueError("GCP_BUCKET_NAME environment variable is not set")
+    return bucket_name
+
+
+def _build_blob_path(filename, folder=None):
+    if folder:
+        return f"{folder.strip('/')}/{filename}"
+    return filename
 
 
 def generate_signed_upload_url(
@@ -70,20 +102,14 @@ def generate_signed_upload_url(
     """
     try:
         # Get bucket name from env if not provided
-        if not bucket_name:
-            bucket_name = os.environ.get('GCP_BUCKET_NAME')
-            if not bucket_name:
-                raise ValueError("GCP_BUCKET_NAME environment variable is not set")
+        bucket_name = _get_bucket_name(bucket_name)
 
         # Get client and credentials
         client, credentials = get_gcs_client_with_credentials()
         bucket = client.bucket(bucket_name)
 
         # Build the blob path
-        if folder:
-            blob_path = f"{folder.strip('/')}/{filename}"
-        else:
-            blob_path = filename
+        blob_path = _build_blob_path(filename, folder)
 
         blob = bucket.blob(blob_path)
 
@@ -123,7 +149,8 @@ def generate_signed_upload_url(
 def generate_signed_download_url(
     blob_path: str,
     expiration_minutes: int = 60,
-    bucket_name: str = None
+    bucket_name: str = None,
+    check_exists: bool = True
 ) -> dict:
     """
     Generate a signed URL for downloading a file from GCS.
@@ -132,22 +159,20 @@ def generate_signed_download_url(
         blob_path: Path to the blob in the bucket
         expiration_minutes: How long the URL is valid (default: 60 minutes)
         bucket_name: GCS bucket name (default: from GCP_BUCKET_NAME env var)
+        check_exists: Verify the blob exists first (one GCS request per URL)
 
     Returns:
         dict with download_url, blob_path, bucket, expires_in_minutes
     """
     try:
-        if not bucket_name:
-            bucket_name = os.environ.get('GCP_BUCKET_NAME')
-            if not bucket_name:
-                raise ValueError("GCP_BUCKET_NAME environment variable is not set")
+        bucket_name = _get_bucket_name(bucket_name)
 
         client, credentials = get_gcs_client_with_credentials()
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(blob_path)
 
         # Check if blob exists
-        if not blob.exists():
+        if check_exists and not blob.exists():
             raise ValueError(f"Blob {blob_path} does not exist in bucket {bucket_name}")
 
         # Generate signed URL for GET (download)
@@ -170,3 +195,72 @@ def generate_signed_download_url(
     except Exception as e:
         logger.error(f"Error generating signed download URL: {e}")
         raise
+
+
+def generate_signed_urls_batch(
+    items: list,
+    bucket_name: str = None,
+    check_exists: bool = False
+) -> dict:
+    """
+    Sign many upload and/or download URLs in one call.
+
+    Signing is done locally with the cached service account key, so the cost
+    per URL is one RSA signature. A failing item does not fail the batch; its
+    entry carries an "error" instead of a URL.
+
+    Args:
+        items: List of dicts. Upload items: {"method": "upload", "filename",
+            "content_type", "folder", "expiration_minutes"}. Download items:
+            {"method": "download", "blob_path", "expiration_minutes"}
+        bucket_name: GCS bucket name (default: from GCP_BUCKET_NAME env var)
+        check_exists: Verify download blobs exist (one GCS request per item)
+
+    Returns:
+        dict with results (in request order), succeeded and failed counts
+    """
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large: {len(items)} items (maximum {MAX_BATCH_SIZE})")
+
+    bucket_name = _get_bucket_name(bucket_name)
+    # Fail fast on bad credentials instead of once per item
+    get_gcs_client_with_credentials()
+
+    results = []
+    failed = 0
+    for index, item in enumerate(items):
+        method = item.get("method", "upload")
+        try:
+            if method == "upload":
+                result = generate_signed_upload_url(
+                    filename=item["filename"],
+                    content_type=item.get("content_type", "video/mp4"),
+                    expiration_minutes=item.get("expiration_minutes", 15),
+                    bucket_name=bucket_name,
+                    folder=item.get("folder")
+                )
+            elif method == "download":
+                result = generate_signed_download_url(
+                    blob_path=item["blob_path"],
+                    expiration_minutes=item.get("expiration_minutes", 60),
+                    bucket_name=bucket_name,
+                    check_exists=check_exists
+                )
+            else:
+                raise ValueError(f"Unknown method '{method}' (expected 'upload' or 'download')")
+            results.append({"index": index, "method": method, **result})
+        except KeyError as e:
+            failed += 1
+            results.append({"index": index, "method": method, "error": f"Missing field {e}"})
+        except Exception as e:
+            failed += 1
+            results.append({"index": index, "method": method, "error": str(e)})
+
+    logger.info(f"Signed {len(items) - failed}/{len(items)} URLs in bucket {bucket_name}")
+
+    return {
+        "results": results,
+        "bucket": bucket_name,
+        "succeeded": len(items) - failed,
+        "failed": failed
+    }
@@ -17,32 +17,16 @@
 import os
 import logging
 import requests
-import json
-from google.cloud import storage
-from google.oauth2 import service_account
+from services.v1.gcp.signed_url import get_gcs_client_with_credentials
 from urllib.parse import urlparse, unquote
 import uuid
 
 logger = logging.getLogger(__name__)
 
 def get_gcs_client():
-    """Create and return a Google Cloud Storage client using service account credentials."""
-    credentials_json = os.environ.get('GCP_SA_CREDENTIALS')
-    if not credentials_json:
-        raise ValueError("GCP_SA_CREDENTIALS environment variable is not set")
-    
-    try:
-        # Parse the JSON credentials
-        credentials_info = json.loads(credentials_json)
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/devstorage.full_control']
-        )
-        return storage.Client(credentials=credentials)
-    except json.JSONDecodeError:
-        raise ValueError("GCP_SA_CREDENTIALS is not valid JSON")
-    except Exception as e:
-        raise ValueError(f"Failed to create GCS client: {str(e)}")
+    """Return the process-wide Google Cloud Storage client (shared with signed URL generation)."""
+    client, _ = get_gcs_client_with_credentials()
+    return client
 
 def get_filename_from_url(url):
     """Extract filename from URL."""
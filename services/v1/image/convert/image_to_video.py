@@ -17,10 +17,9 @@
 
 
 import os
-import subprocess
 import logging
 from services.file_management import download_file
-from PIL import Image
+from services.ken_burns import render_ken_burns
 from config import LOCAL_STORAGE_PATH
 logger = logging.getLogger(__name__)
 
@@ -30,44 +29,14 @@ def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, we
         image_path = download_file(image_url, LOCAL_STORAGE_PATH)
         logger.info(f"Downloaded image to {image_path}")
 
-        # Get image dimensions using Pillow
-        with Image.open(image_path) as img:
-            width, height = img.size
-        logger.info(f"Original image dimensions: {width}x{height}")
-
         # Prepare the output path
         output_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.mp4")
 
-        # Determine orientation and set appropriate dimensions
-        if width > height:
-            scale_dims = "7680:4320"
-            output_dims = "1920x1080"
-        else:
-            scale_dims = "4320:7680"
-            output_dims = "1080x1920"
-
-        # Calculate total frames and zoom factor
-        total_frames = int(length * frame_rate)
-        zoom_factor = 1 + (zoom_speed * length)
-
-        logger.info(f"Using scale dimensions: {scale_dims}, output dimensions: {output_dims}")
-        logger.info(f"Video length: {length}s, Frame rate: {frame_rate}fps, Total frames: {total_frames}")
-        logger.info(f"Zoom speed: {zoom_speed}/s, Final zoom factor: {zoom_factor}")
-
-        # Prepare FFmpeg command with fps filter to ensure correct frame rate
-        cmd = [
-            'ffmpeg', '-framerate', str(frame_rate), '-loop', '1', '-i', image_path,
-            '-vf', f"scale={scale_dims},zoompan=z='min(1+({zoom_speed}*{length})*on/{total_frames}, {zoom_factor})':d={total_frames}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={output_dims},fps={frame_rate}",
-            '-c:v', 'libx264', '-r', str(frame_rate), '-t', str(length), '-pix_fmt', 'yuv420p', output_path
-        ]
-
-        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
+        logger.info(f"Video length: {length}s, Frame rate: {frame_rate}fps, Zoom speed: {zoom_speed}/s")
 
-        # Run FFmpeg command
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error(f"FFmpeg command failed. Error: {result.stderr}")
-            raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        # Render the pan/zoom frames and encode them in a single pass
+        render_info = render_ken_burns(image_path, output_path, length, frame_rate, zoom_speed)
+        logger.info(f"Rendered {render_info['frames']} frames at {render_info['width']}x{render_info['height']}")
 
         logger.info(f"Video created successfully: {output_path}")
 
@@ -19,15 +19,90 @@ import ffmpeg
 import subprocess
 import logging
 from services.file_management import download_file
+from services.ffmpeg_runner import run_ffmpeg
+from services.media_probe import get_media_probe, ProbeError
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def process_media_convert(media_url, job_id, output_format='mp4', video_codec='libx264', video_preset='medium', video_crf=23, audio_codec='aac', audio_bitrate='128k', webhook_url=None):
+# Audio-only output formats and the audio codec each one is encoded with
+AUDIO_FORMAT_CODECS = {
+    'mp3': 'libmp3lame',
+    'aac': 'aac',
+    'opus': 'libopus',
+    'flac': 'flac',
+    'ogg': 'libvorbis',
+    'wav': 'pcm_s16le',
+}
+
+# Codec produced by each encoder (the codec_name ffprobe reports)
+ENCODER_CODECS = {
+    'libx264': 'h264', 'h264': 'h264', 'h264_nvenc': 'h264',
+    'libx265': 'hevc', 'hevc': 'hevc', 'hevc_nvenc': 'hevc',
+    'libvpx': 'vp8', 'libvpx-vp9': 'vp9', 'vp9': 'vp9',
+    'libaom-av1': 'av1', 'libsvtav1': 'av1', 'librav1e': 'av1',
+    'mpeg4': 'mpeg4', 'libxvid': 'mpeg4', 'prores_ks': 'prores', 'prores': 'prores',
+    'aac': 'aac', 'libfdk_aac': 'aac', 'libmp3lame': 'mp3', 'mp3': 'mp3',
+    'libopus': 'opus', 'opus': 'opus', 'libvorbis': 'vorbis', 'vorbis': 'vorbis',
+    'flac': 'flac', 'alac': 'alac', 'ac3': 'ac3', 'eac3': 'eac3',
+    'pcm_s16le': 'pcm_s16le', 'pcm_s24le': 'pcm_s24le',
+}
+
+# Codecs each container can hold without re-encoding; formats not listed
+# (e.g. mkv) accept any codec
+CONTAINER_CODECS = {
+    'mp4': {'h264', 'hevc', 'av1', 'vp9', 'mpeg4', 'aac', 'mp3', 'ac3', 'eac3', 'opus', 'alac', 'flac'},
+    'm4v': {'h264', 'hevc', 'mpeg4', 'aac', 'mp3', 'ac3', 'alac'},
+    'mov': {'h264', 'hevc', 'mpeg4', 'prores', 'aac', 'mp3', 'ac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    'webm': {'vp8', 'vp9', 'av1', 'opus', 'vorbis'},
+    'ts': {'h264', 'hevc', 'mpeg2video', 'aac', 'mp3', 'ac3', 'eac3', 'opus'},
+    'avi': {'h264', 'mpeg4', 'mp3', 'ac3', 'pcm_s16le'},
+    'flv': {'h264', 'aac', 'mp3'},
+}
+
+def plan_stream_handling(output_format, video_codec, audio_codec, source_video_codec, source_audio_codec):
+    """
+    Decide per stream whether to copy it or encode it.
+
+    A stream is copied when the user asked for 'copy', or when the source
+    codec already is what the requested encoder would produce and the output
+    container can hold it.
+
+    Returns:
+        dict: {"video": "copy"|"encode"|None, "audio": "copy"|"encode"|None,
+               "method": "remux"|"partial"|"transcode"}
+    """
+    allowed = CONTAINER_CODECS.get(output_format)
+
+    def handle(requested, source_codec):
+        if source_codec is None:
+            return None
+        if requested == 'copy':
+            return 'copy'
+        if ENCODER_CODECS.get(requested) == source_codec and (allowed is None or source_codec in allowed):
+            return 'copy'
+        return 'encode'
+
+    video = None if output_format in AUDIO_FORMAT_CODECS else handle(video_codec, source_video_codec)
+    audio = handle(audio_codec, source_audio_codec)
+    actions = [action for action in (video, audio) if action]
+    if actions and all(action == 'copy' for action in actions):
+        method = 'remux'
+    elif 'copy' in actions:
+        method = 'partial'
+    else:
+        method = 'transcode'
+    return {"video": video, "audio": audio, "method": method}
+
+def process_media_convert(media_url, job_id, output_format='mp4', video_codec='libx264', video_preset='medium', video_crf=23, audio_codec='aac', audio_bitrate='128k', webhook_url=None, remux=True):
     """
     Convert media to specified format with customizable encoding settings.
+
+    With remux, the input is probed first and every stream whose codec
+    already matches the requested encoder is stream-copied (e.g. mkv->mp4 with
+    h264/aac), so only the streams that actually change are encoded.
     
     Args:
         media_url (str): URL of the media file to convert
@@ -39,9 +114,10 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
         audio_codec (str): Audio codec to use (default: 'aac')
         audio_bitrate (str): Audio bitrate (default: '128k')
         webhook_url (str, optional): URL to send completion webhook
+        remux (bool): Copy streams that already have the target codec (default: True)
         
     Returns:
-        str: Path to the converted output file
+        tuple: (path to the converted output file, dict with the method and per-stream handling)
     """
     input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
     output_filename = f"{job_id}.{output_format}"
@@ -57,31 +133,35 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
             output_options['format'] = output_format
         
         # Handle audio-only formats
-        audio_only_formats = ['mp3', 'aac', 'wav', 'flac', 'ogg', 'opus']
-        
-        if output_format in audio_only_formats:
+        if output_format in AUDIO_FORMAT_CODECS:
             # Always override the audio codec for audio-only formats
             # to ensure format compatibility, regardless of what was requested
-            if output_format == 'mp3':
-                audio_codec = 'libmp3lame'
-            elif output_format == 'aac':
-                audio_codec = 'aac'
-            elif output_format == 'opus':
-                audio_codec = 'libopus'
-            elif output_format == 'flac':
-                audio_codec = 'flac'
-            elif output_format == 'ogg':
-                audio_codec = 'libvorbis'
-            elif output_format == 'wav':
-                audio_codec = 'pcm_s16le'
-            
+            audio_codec = AUDIO_FORMAT_CODECS[output_format]
+
+        # Probe the input to find out which streams can be copied
+        plan = {"video": None, "audio": None, "method": "transcode"}
+        source_video_codec = None
+        if remux:
+            try:
+                probe = get_media_probe(input_filename)
+                source_video_codec = probe.video_codec
+                plan = plan_stream_handling(output_format, video_codec, audio_codec, source_video_codec, probe.audio_codec)
+            except ProbeError as e:
+                logger.warning(f"Could not probe input, transcoding all streams: {str(e)}")
+        logger.info(f"Conversion method: {plan['method']} (video: {plan['video']}, audio: {plan['audio']})")
+
+        if output_format in AUDIO_FORMAT_CODECS:
             # For audio-only output, we don't need video codec
-            output_options['acodec'] = audio_codec
+            output_options['acodec'] = 'copy' if plan['audio'] == 'copy' else audio_codec
             
             # Use the -vn flag to remove video stream
             output_options['vn'] = None
         else:
             # For video formats, apply both video and audio codec settings
+            if plan['video'] == 'copy':
+                video_codec = 'copy'
+            if plan['audio'] == 'copy':
+                audio_codec = 'copy'
             output_options['vcodec'] = video_codec
             output_options['acodec'] = audio_codec
             
@@ -89,6 +169,9 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
             if video_codec != 'copy':
                 output_options['preset'] = video_preset
                 output_options['crf'] = str(video_crf)
+            elif output_format in ('mp4', 'mov', 'm4v') and source_video_codec == 'hevc':
+                # Apple players only accept copied HEVC tagged as hvc1
+                output_options['tag:v'] = 'hvc1'
                 
             # Apply audio bitrate when not using copy
             if audio_codec != 'copy':
@@ -97,12 +180,8 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
         # Configure output
         stream = ffmpeg.output(stream, output_path, **output_options)
         
-        # Get the ffmpeg command for logging
-        cmd = ffmpeg.compile(stream)
-        logger.info(f"Running ffmpeg command: {' '.join(cmd)}")
-        
         # Run the conversion
-        ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        run_ffmpeg(ffmpeg.compile(stream, overwrite_output=True), description="media convert")
         
         # Clean up input file
         os.remove(input_filename)
@@ -112,7 +191,7 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
         if not os.path.exists(output_path):
             raise FileNotFoundError(f"Output file {output_path} does not exist after conversion.")
 
-        return output_path
+        return output_path, plan
 
     except Exception as e:
         error_msg = f"Media conversion failed: {str(e)}"
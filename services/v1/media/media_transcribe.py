@@ -23,6 +23,7 @@ from datetime import timedelta
 from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
 import logging
+from services.scratch_storage import get_scratch_path, SMALL_FILE_SIZE_HINT
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -130,21 +131,21 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         else:
             
             if include_text is True:
-                text_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.txt")
+                text_filename = get_scratch_path(f"{job_id}.txt", len(text.encode()))
                 with open(text_filename, 'w') as f:
                     f.write(text)
             else:
                 text_file = None
             
             if include_srt is True:
-                srt_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.srt")
+                srt_filename = get_scratch_path(f"{job_id}.srt", len(srt_text.encode()))
                 with open(srt_filename, 'w') as f:
                     f.write(srt_text)
             else:
                 srt_filename = None
 
             if include_segments is True:
-                segments_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.json")
+                segments_filename = get_scratch_path(f"{job_id}.json", SMALL_FILE_SIZE_HINT)
                 with open(segments_filename, 'w') as f:
                     f.write(str(segments_json))
             else:
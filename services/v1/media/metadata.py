@@ -16,152 +16,167 @@
 
 
 
-import os
-import subprocess
-import json
 import logging
-import requests
-from config import LOCAL_STORAGE_PATH
+from concurrent.futures import ThreadPoolExecutor
+from services.media_probe import get_media_probe
+from config import METADATA_CONCURRENCY
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def get_media_metadata(media_url, job_id=None):
+# Upper bound on URLs per batch request
+MAX_BATCH_URLS = 1000
+
+def build_media_metadata(probe_data):
     """
-    Extract metadata from a media file including video/audio properties.
-    Uses ffprobe direct streaming to avoid downloading the entire file.
+    Build the metadata response from ffprobe JSON (format and streams).
 
     Args:
-        media_url (str): URL of the media file to analyze
-        job_id (str, optional): Unique job identifier
+        probe_data (dict): ffprobe output
 
     Returns:
         dict: Dictionary containing all available metadata for the media file
     """
-    logger.info(f"Starting metadata extraction for {media_url}")
+    metadata = {}
 
-    try:
-        # Initialize metadata dictionary
-        metadata = {}
+    # File size as reported by the container (Content-Length for URLs)
+    size = probe_data.get('format', {}).get('size')
+    if size:
+        metadata['filesize'] = int(size)
+        metadata['filesize_mb'] = round(metadata['filesize'] / (1024 * 1024), 2)  # Convert to MB
 
-        # Get file size from HTTP HEAD request (without downloading)
-        try:
-            head_response = requests.head(media_url, allow_redirects=True, timeout=10)
-            if 'content-length' in head_response.headers:
-                metadata['filesize'] = int(head_response.headers['content-length'])
-                metadata['filesize_mb'] = round(metadata['filesize'] / (1024 * 1024), 2)  # Convert to MB
-        except Exception as e:
-            logger.warning(f"Could not retrieve file size from HEAD request: {str(e)}")
-
-        # Run ffprobe directly on the URL with reduced probing
-        ffprobe_command = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
-            '-analyzeduration', '100K',
-            '-probesize', '100K',
-            media_url
-        ]
-
-        logger.info(f"Running ffprobe command on URL")
-        result = subprocess.run(ffprobe_command, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            logger.error(f"Error during ffprobe: {result.stderr}")
-            raise Exception(f"ffprobe error: {result.stderr}")
-
-        probe_data = json.loads(result.stdout)
+    # Get format information
+    if 'format' in probe_data:
+        format_data = probe_data['format']
         
-        # Get format information
-        if 'format' in probe_data:
-            format_data = probe_data['format']
-            
-            # Get duration if available
-            if 'duration' in format_data:
-                metadata['duration'] = float(format_data['duration'])
-                # Format duration as HH:MM:SS.mm
-                mins, secs = divmod(metadata['duration'], 60)
-                hours, mins = divmod(mins, 60)
-                metadata['duration_formatted'] = f"{int(hours):02d}:{int(mins):02d}:{secs:.2f}"
+        # Get duration if available
+        if 'duration' in format_data:
+            metadata['duration'] = float(format_data['duration'])
+            # Format duration as HH:MM:SS.mm
+            mins, secs = divmod(metadata['duration'], 60)
+            hours, mins = divmod(mins, 60)
+            metadata['duration_formatted'] = f"{int(hours):02d}:{int(mins):02d}:{secs:.2f}"
+        
+        # Get format/container type
+        if 'format_name' in format_data:
+            metadata['format'] = format_data['format_name']
             
-            # Get format/container type
-            if 'format_name' in format_data:
-                metadata['format'] = format_data['format_name']
-                
-            # Get overall bitrate if available
-            if 'bit_rate' in format_data:
-                metadata['overall_bitrate'] = int(format_data['bit_rate'])
-                metadata['overall_bitrate_mbps'] = round(metadata['overall_bitrate'] / 1000000, 2)  # Convert to Mbps
+        # Get overall bitrate if available
+        if 'bit_rate' in format_data:
+            metadata['overall_bitrate'] = int(format_data['bit_rate'])
+            metadata['overall_bitrate_mbps'] = round(metadata['overall_bitrate'] / 1000000, 2)  # Convert to Mbps
+    
+    # Process streams information
+    if 'streams' in probe_data:
+        has_video = False
+        has_audio = False
         
-        # Process streams information
-        if 'streams' in probe_data:
-            has_video = False
-            has_audio = False
+        for stream in probe_data['streams']:
+            stream_type = stream.get('codec_type')
             
-            for stream in probe_data['streams']:
-                stream_type = stream.get('codec_type')
+            if stream_type == 'video' and not has_video:
+                has_video = True
                 
-                if stream_type == 'video' and not has_video:
-                    has_video = True
-                    
-                    # Basic video properties
-                    metadata['video_codec'] = stream.get('codec_name', 'unknown')
-                    metadata['video_codec_long'] = stream.get('codec_long_name', 'unknown')
-                    
-                    # Resolution
-                    if 'width' in stream and 'height' in stream:
-                        metadata['width'] = stream['width']
-                        metadata['height'] = stream['height']
-                        metadata['resolution'] = f"{stream['width']}x{stream['height']}"
-                    
-                    # Frame rate
-                    if 'r_frame_rate' in stream:
-                        try:
-                            num, den = map(int, stream['r_frame_rate'].split('/'))
-                            if den != 0:  # Avoid division by zero
-                                metadata['fps'] = round(num / den, 2)
-                        except (ValueError, ZeroDivisionError):
-                            logger.warning("Unable to parse frame rate")
-                    
-                    # Bitrate
-                    if 'bit_rate' in stream:
-                        metadata['video_bitrate'] = int(stream['bit_rate'])
-                        metadata['video_bitrate_mbps'] = round(metadata['video_bitrate'] / 1000000, 2)  # Convert to Mbps
-                    
-                    # Pixel format
-                    if 'pix_fmt' in stream:
-                        metadata['pixel_format'] = stream['pix_fmt']
-                    
-                elif stream_type == 'audio' and not has_audio:
-                    has_audio = True
-                    
-                    # Basic audio properties
-                    metadata['audio_codec'] = stream.get('codec_name', 'unknown')
-                    metadata['audio_codec_long'] = stream.get('codec_long_name', 'unknown')
-                    
-                    # Audio channels
-                    if 'channels' in stream:
-                        metadata['audio_channels'] = stream['channels']
-                    
-                    # Sample rate
-                    if 'sample_rate' in stream:
-                        metadata['audio_sample_rate'] = int(stream['sample_rate'])
-                        metadata['audio_sample_rate_khz'] = round(metadata['audio_sample_rate'] / 1000, 1)  # Convert to kHz
-                    
-                    # Bitrate
-                    if 'bit_rate' in stream:
-                        metadata['audio_bitrate'] = int(stream['bit_rate'])
-                        metadata['audio_bitrate_kbps'] = round(metadata['audio_bitrate'] / 1000, 0)  # Convert to kbps
-            
-            # Add flags indicating presence of streams
-            metadata['has_video'] = has_video
-            metadata['has_audio'] = has_audio
+                # Basic video properties
+                metadata['video_codec'] = stream.get('codec_name', 'unknown')
+                metadata['video_codec_long'] = stream.get('codec_long_name', 'unknown')
+                
+                # Resolution
+                if 'width' in stream and 'height' in stream:
+                    metadata['width'] = stream['width']
+                    metadata['height'] = stream['height']
+                    metadata['resolution'] = f"{stream['width']}x{stream['height']}"
+                
+                # Frame rate
+                if 'r_frame_rate' in stream:
+                    try:
+                        num, den = map(int, stream['r_frame_rate'].split('/'))
+                        if den != 0:  # Avoid division by zero
+                            metadata['fps'] = round(num / den, 2)
+                    except (ValueError, ZeroDivisionError):
+                        logger.warning("Unable to parse frame rate")
+                
+                # Bitrate
+                if 'bit_rate' in stream:
+                    metadata['video_bitrate'] = int(stream['bit_rate'])
+                    metadata['video_bitrate_mbps'] = round(metadata['video_bitrate'] / 1000000, 2)  # Convert to Mbps
+                
+                # Pixel format
+                if 'pix_fmt' in stream:
+                    metadata['pixel_format'] = stream['pix_fmt']
+                
+            elif stream_type == 'audio' and not has_audio:
+                has_audio = True
+                
+                # Basic audio properties
+                metadata['audio_codec'] = stream.get('codec_name', 'unknown')
+                metadata['audio_codec_long'] = stream.get('codec_long_name', 'unknown')
+                
+                # Audio channels
+                if 'channels' in stream:
+                    metadata['audio_channels'] = stream['channels']
+                
+                # Sample rate
+                if 'sample_rate' in stream:
+                    metadata['audio_sample_rate'] = int(stream['sample_rate'])
+                    metadata['audio_sample_rate_khz'] = round(metadata['audio_sample_rate'] / 1000, 1)  # Convert to kHz
+                
+                # Bitrate
+                if 'bit_rate' in stream:
+                    metadata['audio_bitrate'] = int(stream['bit_rate'])
+                    metadata['audio_bitrate_kbps'] = round(metadata['audio_bitrate'] / 1000, 0)  # Convert to kbps
+        
+        # Add flags indicating presence of streams
+        metadata['has_video'] = has_video
+        metadata['has_audio'] = has_audio
 
-        return metadata
+    return metadata
 
+def get_media_metadata(media_url, job_id=None):
+    """
+    Extract metadata from a media file including video/audio properties.
+    Uses a fast ffprobe directly on the URL to avoid downloading the entire
+    file; results are cached per URL and validator in the probe store shared
+    by all workers (see services.media_probe).
+
+    Args:
+        media_url (str): URL of the media file to analyze
+        job_id (str, optional): Unique job identifier
+
+    Returns:
+        dict: Dictionary containing all available metadata for the media file
+    """
+    logger.info(f"Starting metadata extraction for {media_url}")
+
+    try:
+        probe = get_media_probe(media_url, fast=True)
+        return build_media_metadata(probe.data)
     except Exception as e:
         logger.error(f"Metadata extraction failed: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def get_media_metadata_batch(media_urls, job_id=None, max_workers=METADATA_CONCURRENCY):
+    """
+    Extract metadata for many URLs concurrently with a bounded pool.
+
+    A failing URL does not fail the batch; its item carries the error instead.
+    Unchanged URLs indexed before, by any worker or before a restart, are
+    answered from the persistent probe store after a HEAD request.
+
+    Returns:
+        list: {"media_url": str, "metadata": dict} or {"media_url": str, "error": str}
+            per URL, in request order
+    """
+    def probe_one(media_url):
+        try:
+            return {"media_url": media_url, "metadata": get_media_metadata(media_url, job_id)}
+        except Exception as e:
+            return {"media_url": media_url, "error": str(e)}
+
+    if not media_urls:
+        return []
+    workers = max(1, min(max_workers, len(media_urls)))
+    logger.info(f"Job {job_id}: Extracting metadata for {len(media_urls)} URLs with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(probe_one, media_urls))
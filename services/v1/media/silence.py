@@ -17,20 +17,123 @@
 
 
 import os
-import json
-import subprocess
 import logging
 import re
-from services.file_management import download_file
-from config import LOCAL_STORAGE_PATH
+from services.ffmpeg_runner import start_ffmpeg
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Audio is downmixed/resampled to this rate before analysis. It keeps the
+# speech band and cuts the samples silencedetect has to look at.
+ANALYSIS_SAMPLE_RATE = 16000
+
+SILENCE_START_PATTERN = re.compile(r'silence_start: (-?\d+\.?\d*(?:e[-+]?\d+)?)')
+SILENCE_END_PATTERN = re.compile(r'silence_end: (-?\d+\.?\d*(?:e[-+]?\d+)?) \| silence_duration: (\d+\.?\d*(?:e[-+]?\d+)?)')
+
+def parse_time(value):
+    """Parse HH:MM:SS[.mmm], MM:SS[.mmm] or plain seconds; returns None if it cannot be parsed."""
+    if value is None or value == '':
+        return None
+    try:
+        parts = str(value).split(':')
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+def build_silence_command(media_url, start_seconds=None, end_seconds=None, noise_threshold="-30dB",
+                          min_duration=0.5, mono=False):
+    """
+    Build an ffmpeg command that analyzes only the requested window of the first audio stream.
+
+    The input is seeked before decoding (-ss before -i, which also avoids
+    downloading the skipped part of a URL), video/subtitle/data streams are
+    never decoded, and the audio is resampled to ANALYSIS_SAMPLE_RATE (and
+    downmixed to mono when requested) before silencedetect.
+    """
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-nostats']
+    if start_seconds:
+        cmd += ['-ss', str(start_seconds)]
+    cmd += ['-vn', '-sn', '-dn', '-i', media_url]
+    if end_seconds is not None:
+        cmd += ['-t', str(max(0.0, end_seconds - (start_seconds or 0)))]
+
+    filters = [f"aresample={ANALYSIS_SAMPLE_RATE}"]
+    if mono:
+        filters.append("aformat=channel_layouts=mono")
+    filters.append(f"silencedetect=noise={noise_threshold}:d={min_duration}")
+
+    cmd += ['-map', '0:a:0', '-af', ','.join(filters), '-f', 'null', '-']
+    return cmd
+
+def parse_silence_lines(lines, offset=0.0, window_end=None):
+    """
+    Turn silencedetect log lines into intervals as soon as each one closes.
+
+    Args:
+        lines (iterable): ffmpeg stderr lines
+        offset (float): Seconds added to every timestamp (the input seek)
+        window_end (float, optional): Closes a silence still open at the end of the input
+
+    Yields:
+        dict: {"start": float, "end": float, "duration": float} in source time
+    """
+    pending_start = None
+    for line in lines:
+        match = SILENCE_START_PATTERN.search(line)
+        if match:
+            pending_start = max(0.0, float(match.group(1))) + offset
+            continue
+        match = SILENCE_END_PATTERN.search(line)
+        if match:
+            end = float(match.group(1)) + offset
+            duration = float(match.group(2))
+            start = pending_start if pending_start is not None else max(offset, end - duration)
+            pending_start = None
+            yield {"start": start, "end": end, "duration": duration}
+
+    if pending_start is not None and window_end is not None and window_end > pending_start:
+        yield {"start": pending_start, "end": window_end, "duration": window_end - pending_start}
+
+def iter_silence(media_url, start_time=None, end_time=None, noise_threshold="-30dB", min_duration=0.5, mono=False):
+    """
+    Run the silence analysis and yield each interval while ffmpeg is still decoding.
+
+    Yields:
+        dict: {"start": float, "end": float, "duration": float} in seconds
+    """
+    start_seconds = parse_time(start_time)
+    if start_time and start_seconds is None:
+        logger.warning(f"Could not parse start time '{start_time}', using 0")
+    end_seconds = parse_time(end_time)
+    if end_time and end_seconds is None:
+        logger.warning(f"Could not parse end time '{end_time}', processing until the end")
+
+    cmd = build_silence_command(media_url, start_seconds, end_seconds, noise_threshold, min_duration, mono)
+    process = start_ffmpeg(cmd, stream_stderr=True, description="silence detection")
+
+    try:
+        yield from parse_silence_lines(process.iter_stderr(), offset=start_seconds or 0.0, window_end=end_seconds)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise Exception(f"FFmpeg error: {process.stderr}")
+
 def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-30dB", min_duration=0.5, mono=False, job_id=None):
     """
     Detect silence in media files using FFmpeg's silencedetect filter.
+
+    Only the first audio stream of the requested window is decoded, read
+    directly from the URL, and silencedetect output is parsed while the
+    process runs (see iter_silence). Silences crossing the window edges are
+    clipped to the window.
     
     Args:
         media_url (str): URL of the media file to analyze
@@ -45,125 +148,23 @@ def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-
         list: List of dictionaries containing silence intervals with start, end, and duration
     """
     logger.info(f"Starting silence detection for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
-    logger.info(f"Downloaded media to local file: {input_filename}")
-    
+
+    silence_intervals = []
     try:
-        # For reliable silence detection with time constraints, we need a different approach
-        # We'll use FFmpeg without any time constraints and process the results later
-        cmd = ['ffmpeg', '-i', input_filename]
-        
-        # We won't use audio trim filters as they're causing issues with silence detection
-        # Instead, we'll filter the results after the analysis is complete
-        segment_filter = ""
-        
-        # Save the start and end times for post-processing
-        start_seconds = 0
-        end_seconds = float('inf')
-        
-        if start_time:
-            try:
-                # Parse the start time to seconds
-                h, m, s = start_time.split(':')
-                start_seconds = int(h) * 3600 + int(m) * 60 + float(s)
-                logger.info(f"Will filter results starting from {start_seconds} seconds")
-            except ValueError:
-                logger.warning(f"Could not parse start time '{start_time}', using 0")
-                
-        if end_time:
-            try:
-                # Parse the end time to seconds
-                h, m, s = end_time.split(':')
-                end_seconds = int(h) * 3600 + int(m) * 60 + float(s)
-                logger.info(f"Will filter results ending at {end_seconds} seconds")
-            except ValueError:
-                logger.warning(f"Could not parse end time '{end_time}', using infinity")
-            
-        # Add audio processing options
-        cmd.extend(['-af'])
-        
-        # Build the filter string
-        filter_string = ""
-        
-        # First add the segment filter if needed
-        filter_string += segment_filter
-        
-        # Then add mono conversion if needed
-        if mono:
-            filter_string += "pan=mono|c0=0.5*c0+0.5*c1,"
-            
-        # Add the silencedetect filter
-        filter_string += f"silencedetect=noise={noise_threshold}:d={min_duration}"
-        cmd.append(filter_string)
-        
-        # Output to null, we only want the filter output
-        cmd.extend(['-f', 'null', '-'])
-        
-        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-        
-        # Run the FFmpeg command and capture stderr for silence detection output
-        result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
-        
-        # Parse the silence detection output
-        silence_intervals = []
-        
-        # Regular expressions to match the silence detection output
-        silence_start_pattern = r'silence_start: (\d+\.?\d*)'
-        silence_end_pattern = r'silence_end: (\d+\.?\d*) \| silence_duration: (\d+\.?\d*)'
-        
-        # Find all silence start times
-        silence_starts = re.findall(silence_start_pattern, result.stderr)
-        
-        # Find all silence end times and durations
-        silence_ends_durations = re.findall(silence_end_pattern, result.stderr)
-        
-        # Combine the results into a list of silence intervals
-        for i, (end, duration) in enumerate(silence_ends_durations):
-            # For the first silence period, the start time might not be detected correctly
-            # if the media starts with silence
-            start = silence_starts[i] if i < len(silence_starts) else "0.0"
-            
-            # Convert to float 
-            start_time_float = float(start) 
-            end_time_float = float(end)
-            duration_float = float(duration)
-            
-            # Filter the results based on the specified time range
-            # Only include silence periods that overlap with our requested range
-            
-            # Skip if silence ends before our start time
-            if end_time_float < start_seconds:
-                logger.info(f"Skipping silence at {start_time_float}-{end_time_float} as it ends before requested start time {start_seconds}")
-                continue
-                
-            # Skip if silence starts after our end time
-            if start_time_float > end_seconds:
-                logger.info(f"Skipping silence at {start_time_float}-{end_time_float} as it starts after requested end time {end_seconds}")
-                continue
-                
-            # Format time as HH:MM:SS.mmm
-            start_formatted = format_time(start_time_float)
-            end_formatted = format_time(end_time_float)
-            
+        for interval in iter_silence(media_url, start_time, end_time, noise_threshold, min_duration, mono):
             silence_intervals.append({
-                "start": start_formatted,
-                "end": end_formatted,
-                "duration": round(duration_float, 2)
+                "start": format_time(interval["start"]),
+                "end": format_time(interval["end"]),
+                "duration": round(interval["duration"], 2)
             })
-        
-        # Clean up the downloaded file
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
-        
-        return silence_intervals
-        
+            logger.debug(f"Job {job_id}: Silence {silence_intervals[-1]}")
     except Exception as e:
         logger.error(f"Silence detection failed: {str(e)}")
-        # Make sure to clean up even on error
-        if os.path.exists(input_filename):
-            os.remove(input_filename)
         raise
 
+    logger.info(f"Job {job_id}: Found {len(silence_intervals)} silence intervals")
+    return silence_intervals
+
 def format_time(seconds):
     """
     Format time in seconds to HH:MM:SS.mmm format
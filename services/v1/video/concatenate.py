@@ -17,43 +17,209 @@
 
 
 import os
-import ffmpeg
-import requests
-from services.file_management import download_file
+import logging
+from collections import Counter
+from services.file_management import download_files
+from services.media_probe import get_media_probe
+from services.ffmpeg_runner import run_ffmpeg
+from services.render_tuning import get_tuned_settings
 from config import LOCAL_STORAGE_PATH
 
+logger = logging.getLogger(__name__)
+
+# Encoding used when the inputs cannot be stream-copied: the 'standard' render
+# profile, with the preset tuned for this host if a profile table exists
+CONCAT_VIDEO_PRESET = 'medium'
+CONCAT_VIDEO_CRF = 23
+CONCAT_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+def get_stream_signature(probe):
+    """
+    Return the stream parameters that must be identical for a concat stream copy.
+
+    Returns:
+        dict: {"video": tuple or None, "audio": tuple or None}
+    """
+    video = probe.video_stream
+    audio = probe.audio_stream
+    video_signature = None
+    if video:
+        sar = video.get('sample_aspect_ratio')
+        video_signature = (
+            video.get('codec_name'),
+            video.get('profile'),
+            int(video.get('width') or 0),
+            int(video.get('height') or 0),
+            video.get('pix_fmt'),
+            sar if sar and sar != '0:1' else '1:1',
+            video.get('r_frame_rate'),
+        )
+    audio_signature = None
+    if audio:
+        audio_signature = (
+            audio.get('codec_name'),
+            int(audio.get('sample_rate') or 0),
+            int(audio.get('channels') or 0),
+        )
+    return {"video": video_signature, "audio": audio_signature}
+
+def plan_concatenation(signatures):
+    """
+    Decide between a stream copy and a normalize-and-concat encode.
+
+    The most common signature among the inputs with video (the first one on a
+    tie) is the reference; inputs that differ from it in video or audio are
+    normalized to it.
+
+    Returns:
+        dict: {"method": "copy"|"reencode", "reference": index,
+               "normalize_video": [indexes], "normalize_audio": [indexes]}
+    """
+    keys = [(sig["video"], sig["audio"]) for sig in signatures]
+    counts = Counter(keys)
+    reference = max(
+        range(len(keys)),
+        key=lambda i: (signatures[i]["video"] is not None, counts[keys[i]], -i)
+    )
+    ref = signatures[reference]
+
+    normalize_video = [i for i, sig in enumerate(signatures) if sig["video"] != ref["video"]]
+    normalize_audio = [i for i, sig in enumerate(signatures) if sig["audio"] != ref["audio"]]
+    method = "copy" if not normalize_video and not normalize_audio else "reencode"
+    return {
+        "method": method,
+        "reference": reference,
+        "normalize_video": normalize_video,
+        "normalize_audio": normalize_audio
+    }
+
+def _parse_channel_layout(audio, channels):
+    return audio.get('channel_layout') or {1: 'mono', 2: 'stereo'}.get(channels, 'stereo')
+
+def build_concat_filter(probes, plan):
+    """
+    Build one filter graph that normalizes only the mismatched inputs and concatenates all of them.
+
+    Matching inputs are fed to the concat filter untouched. Mismatched video is
+    scaled and padded to the reference size, resampled to its frame rate and
+    pixel format; mismatched audio is resampled to the reference rate and
+    layout. Missing streams are filled with black video or silence.
+
+    Returns:
+        tuple: (filter_complex string, has_video, has_audio)
+    """
+    ref = probes[plan["reference"]]
+    ref_video = ref.video_stream
+    ref_audio = ref.audio_stream
+    has_video = ref_video is not None
+    has_audio = any(p.has_audio for p in probes)
+
+    if has_video:
+        width, height = int(ref_video['width']), int(ref_video['height'])
+        fps = ref_video.get('r_frame_rate') or '30/1'
+        pix_fmt = ref_video.get('pix_fmt') or 'yuv420p'
+        sar = ref_video.get('sample_aspect_ratio')
+        sar = sar.replace(':', '/') if sar and sar != '0:1' else '1'
+    if has_audio:
+        audio_source = ref_audio or next(p.audio_stream for p in probes if p.has_audio)
+        sample_rate = int(audio_source.get('sample_rate') or 48000)
+        layout = _parse_channel_layout(audio_source, int(audio_source.get('channels') or 2))
+
+    filters = []
+    pads = []
+    for i, probe in enumerate(probes):
+        duration = probe.duration or 0
+        if has_video:
+            if not probe.has_video:
+                filters.append(f"color=c=black:s={width}x{height}:r={fps}:d={duration:.6f},format={pix_fmt},setsar={sar}[v{i}]")
+                pads.append(f"[v{i}]")
+            elif i in plan["normalize_video"]:
+                filters.append(
+                    f"[{i}:v:0]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar={sar},fps={fps},format={pix_fmt}[v{i}]"
+                )
+                pads.append(f"[v{i}]")
+            else:
+                pads.append(f"[{i}:v:0]")
+        if has_audio:
+            if not probe.has_audio:
+                filters.append(f"anullsrc=r={sample_rate}:cl={layout},atrim=duration={duration:.6f}[a{i}]")
+                pads.append(f"[a{i}]")
+            elif i in plan["normalize_audio"]:
+                filters.append(f"[{i}:a:0]aresample={sample_rate},aformat=channel_layouts={layout}[a{i}]")
+                pads.append(f"[a{i}]")
+            else:
+                pads.append(f"[{i}:a:0]")
+
+    outputs = ("[outv]" if has_video else "") + ("[outa]" if has_audio else "")
+    filters.append(f"{''.join(pads)}concat=n={len(probes)}:v={int(has_video)}:a={int(has_audio)}{outputs}")
+    return ';'.join(filters), has_video, has_audio
+
+def _run(cmd):
+    process = run_ffmpeg(cmd, check=False, description="video concatenate")
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg error: {process.stderr}")
+
 def process_video_concatenate(media_urls, job_id, webhook_url=None):
-    """Combine multiple videos into one."""
+    """
+    Combine multiple videos into one.
+
+    Inputs are downloaded concurrently and probed. When every input has the
+    same stream parameters they are joined with the concat demuxer without
+    re-encoding; otherwise a single ffmpeg pass normalizes the mismatched
+    inputs and concatenates everything.
+
+    Returns:
+        tuple: (output path, report dict describing the decision)
+    """
     input_files = []
     output_filename = f"{job_id}.mp4"
     output_path = os.path.join(LOCAL_STORAGE_PATH, output_filename)
+    concat_file_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat_list.txt")
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
-
-        # Generate an absolute path concat list file for FFmpeg
-        concat_file_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat_list.txt")
-        with open(concat_file_path, 'w') as concat_file:
-            for input_file in input_files:
-                # Write absolute paths to the concat list
-                concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
-
-        # Use the concat demuxer to concatenate the videos
-        (
-            ffmpeg.input(concat_file_path, format='concat', safe=0).
-                output(output_path, c='copy').
-                run(overwrite_output=True)
-        )
+        # Download all media files concurrently, keeping the request order
+        urls = [media_item['video_url'] for media_item in media_urls]
+        local_paths = download_files(urls, LOCAL_STORAGE_PATH)
+        input_files = [local_paths[url] for url in urls]
 
-        # Clean up input files
-        for f in input_files:
-            os.remove(f)
-            
-        os.remove(concat_file_path)  # Remove the concat list file after the operation
+        probes = [get_media_probe(input_file) for input_file in input_files]
+        plan = plan_concatenation([get_stream_signature(probe) for probe in probes])
+        report = {
+            "method": plan["method"],
+            "reference_input": plan["reference"],
+            "normalized_video_inputs": plan["normalize_video"],
+            "normalized_audio_inputs": plan["normalize_audio"]
+        }
+        logger.info(f"Job {job_id}: Concatenation plan for {len(input_files)} inputs: {report}")
+
+        if plan["method"] == "copy":
+            # Generate an absolute path concat list file for FFmpeg
+            with open(concat_file_path, 'w') as concat_file:
+                for input_file in input_files:
+                    # Write absolute paths to the concat list
+                    concat_file.write(f"file '{os.path.abspath(input_file)}'\n")
+
+            # Use the concat demuxer to concatenate the videos
+            _run([
+                'ffmpeg', '-y',
+                '-f', 'concat', '-safe', '0', '-i', concat_file_path,
+                '-c', 'copy',
+                output_path
+            ])
+        else:
+            filter_complex, has_video, has_audio = build_concat_filter(probes, plan)
+            cmd = ['ffmpeg', '-y']
+            for input_file in input_files:
+                cmd += ['-i', input_file]
+            cmd += ['-filter_complex', filter_complex]
+            if has_video:
+                preset = get_tuned_settings('standard', CONCAT_VIDEO_PRESET, CONCAT_VIDEO_CRF)['preset']
+                cmd += ['-map', '[outv]', '-c:v', 'libx264', '-preset', preset, '-crf', str(CONCAT_VIDEO_CRF)]
+            if has_audio:
+                cmd += ['-map', '[outa]'] + CONCAT_AUDIO_ARGS
+            cmd += ['-movflags', '+faststart', output_path]
+            _run(cmd)
 
         print(f"Video combination successful: {output_path}")
 
@@ -61,7 +227,14 @@ def process_video_concatenate(media_urls, job_id, webhook_url=None):
         if not os.path.exists(output_path):
             raise FileNotFoundError(f"Output file {output_path} does not exist after combination.")
 
-        return output_path
+        return output_path, report
     except Exception as e:
         print(f"Video combination failed: {str(e)}")
-        raise 
+        raise
+    finally:
+        # Clean up input files and the concat list
+        for f in set(input_files):
+            if os.path.exists(f):
+                os.remove(f)
+        if os.path.exists(concat_file_path):
+            os.remove(concat_file_path)
@@ -18,12 +18,14 @@
 
 import os
 import json
-import subprocess
 import logging
 import uuid
 import tempfile
 from services.file_management import download_file
 from services.cloud_storage import upload_file
+from services.media_probe import get_media_probe, ProbeError
+from services.ffmpeg_runner import run_ffmpeg
+from services.v1.video.smart_cut import smart_cut as run_smart_cut
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -53,10 +55,167 @@ def time_to_seconds(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
+# Up to this many kept segments, each one gets its own input seeked with
+# -ss/-t so only the kept material is decoded. Above it, a single input is
+# decoded once and split with trim/atrim, which avoids opening a demuxer and
+# decoder per segment.
+MAX_SEEK_INPUTS = 8
+
+def probe_media(filename):
+    """
+    Get the duration and stream layout of a local media file (cached, see services.media_probe).
+
+    Returns:
+        dict: {"duration": float or None, "has_video": bool, "has_audio": bool}
+    """
+    try:
+        probe = get_media_probe(filename)
+    except ProbeError as e:
+        logger.warning(str(e))
+        return {"duration": None, "has_video": False, "has_audio": False}
+
+    return {
+        "duration": probe.duration,
+        # Cover art is reported as a video stream but cannot be trimmed
+        "has_video": probe.has_video,
+        "has_audio": probe.has_audio
+    }
+
+def merge_cuts(cuts, file_duration):
+    """
+    Convert cut timestamps to seconds, clamp them to the file and merge overlaps.
+
+    Args:
+        cuts (list): List of dictionaries with 'start' and 'end' timestamps
+        file_duration (float): Duration of the input in seconds
+
+    Returns:
+        list: Sorted, non-overlapping (start, end) tuples in seconds
+    """
+    cuts_in_seconds = []
+    for cut in cuts:
+        start_seconds = time_to_seconds(cut['start'])
+        end_seconds = time_to_seconds(cut['end'])
+
+        # Validate cut times
+        if start_seconds >= end_seconds:
+            raise ValueError(f"Invalid cut: start time ({cut['start']}) must be before end time ({cut['end']})")
+
+        if start_seconds < 0:
+            logger.warning(f"Cut start time {cut['start']} is negative, using 0 instead")
+            start_seconds = 0
+
+        if end_seconds > file_duration:
+            logger.warning(f"Cut end time {cut['end']} exceeds file duration, using file duration instead")
+            end_seconds = file_duration
+
+        # Only add valid cuts
+        if start_seconds < end_seconds:
+            cuts_in_seconds.append((start_seconds, end_seconds))
+
+    # Sort cuts by start time and merge overlapping segments
+    cuts_in_seconds.sort()
+    merged_cuts = []
+
+    if cuts_in_seconds:
+        current_start, current_end = cuts_in_seconds[0]
+        for start, end in cuts_in_seconds[1:]:
+            if start <= current_end:  # Overlapping segments
+                current_end = max(current_end, end)
+            else:  # Non-overlapping, add the previous merged segment
+                merged_cuts.append((current_start, current_end))
+                current_start, current_end = start, end
+        # Add the last segment
+        merged_cuts.append((current_start, current_end))
+
+    return merged_cuts
+
+def get_kept_segments(merged_cuts, file_duration):
+    """Return the (start, end) ranges in seconds that remain after removing the cuts."""
+    segments = []
+    last_end = 0
+    for start, end in merged_cuts:
+        if start > last_end:
+            segments.append((last_end, start))
+        last_end = end
+    if last_end < file_duration:
+        segments.append((last_end, file_duration))
+    return segments
+
+def format_seconds(seconds):
+    return f"{seconds:.6f}".rstrip('0').rstrip('.') or '0'
+
+def build_cut_filter_graph(input_filename, segments, has_video=True, has_audio=True):
+    """
+    Build the ffmpeg inputs and a single filter graph that joins the kept segments.
+
+    Few segments use one input per segment with input seeking (-ss before -i),
+    so decoding starts at the keyframe before each segment. Many segments use
+    one input, seeked to the first kept frame, split into trim/atrim branches.
+    Either way the kept material is decoded and encoded exactly once.
+
+    Returns:
+        tuple: (input args list, filter_complex string, output map args list)
+    """
+    input_args = []
+    filters = []
+    concat_pads = []
+
+    if len(segments) <= MAX_SEEK_INPUTS:
+        for i, (start, end) in enumerate(segments):
+            input_args += ['-ss', format_seconds(start), '-t', format_seconds(end - start), '-i', input_filename]
+            if has_video:
+                filters.append(f"[{i}:v]setpts=PTS-STARTPTS[v{i}]")
+                concat_pads.append(f"[v{i}]")
+            if has_audio:
+                filters.append(f"[{i}:a]asetpts=PTS-STARTPTS[a{i}]")
+                concat_pads.append(f"[a{i}]")
+    else:
+        # Skip everything before the first kept frame and after the last one
+        offset = segments[0][0]
+        input_args += [
+            '-ss', format_seconds(offset),
+            '-t', format_seconds(segments[-1][1] - offset),
+            '-i', input_filename
+        ]
+        count = len(segments)
+        if has_video:
+            filters.append("[0:v]split=" + str(count) + "".join(f"[vs{i}]" for i in range(count)))
+        if has_audio:
+            filters.append("[0:a]asplit=" + str(count) + "".join(f"[as{i}]" for i in range(count)))
+        for i, (start, end) in enumerate(segments):
+            trim = f"start={format_seconds(start - offset)}:end={format_seconds(end - offset)}"
+            if has_video:
+                filters.append(f"[vs{i}]trim={trim},setpts=PTS-STARTPTS[v{i}]")
+                concat_pads.append(f"[v{i}]")
+            if has_audio:
+                filters.append(f"[as{i}]atrim={trim},asetpts=PTS-STARTPTS[a{i}]")
+                concat_pads.append(f"[a{i}]")
+
+    outputs = ("[outv]" if has_video else "") + ("[outa]" if has_audio else "")
+    filters.append(
+        f"{''.join(concat_pads)}concat=n={len(segments)}:v={int(has_video)}:a={int(has_audio)}{outputs}"
+    )
+
+    map_args = []
+    if has_video:
+        map_args += ['-map', '[outv]']
+    if has_audio:
+        map_args += ['-map', '[outa]']
+
+    return input_args, ';'.join(filters), map_args
+
 def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset='medium', 
-           video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+           video_crf=23, audio_codec='aac', audio_bitrate='128k', smart_cut=False):
     """
     Cuts specified segments from a video file with customizable encoding settings.
+
+    The kept segments are joined by a single ffmpeg invocation (see
+    build_cut_filter_graph), so the output is encoded exactly once. With
+    smart_cut, whole GOPs of the source are stream-copied and only the GOPs
+    at cut boundaries are re-encoded (see services.v1.video.smart_cut); the
+    output then keeps the source codec, resolution and frame rate. Sources
+    smart cut cannot handle fall back to the single-pass encode.
     
     Args:
         video_url (str): URL of the video file to cut
@@ -67,6 +226,7 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        smart_cut (bool, optional): Copy untouched GOPs instead of re-encoding them (default: False)
         
     Returns:
         str: Path to the processed local file
@@ -75,8 +235,6 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
     input_filename = download_file(video_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
     logger.info(f"Downloaded video to local file: {input_filename}")
     
-    temp_files = []
-    
     try:
         # Get the file extension
         _, ext = os.path.splitext(input_filename)
@@ -84,59 +242,17 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
         # Create output filename
         output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output{ext}")
         
-        # Get the duration of the input file
-        probe_cmd = [
-            'ffprobe', 
-            '-v', 'error', 
-            '-show_entries', 'format=duration', 
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            input_filename
-        ]
-        duration_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        try:
-            file_duration = float(duration_result.stdout.strip())
+        # Get the duration and streams of the input file
+        media_info = probe_media(input_filename)
+        file_duration = media_info["duration"]
+        if file_duration is not None:
             logger.info(f"File duration: {file_duration} seconds")
-        except (ValueError, IndexError):
+        else:
             logger.warning("Could not determine file duration, using a large value")
             file_duration = 86400  # 24 hours as a fallback
         
         # Validate and process cuts
-        cuts_in_seconds = []
-        for cut in cuts:
-            start_seconds = time_to_seconds(cut['start'])
-            end_seconds = time_to_seconds(cut['end'])
-            
-            # Validate cut times
-            if start_seconds >= end_seconds:
-                raise ValueError(f"Invalid cut: start time ({cut['start']}) must be before end time ({cut['end']})")
-            
-            if start_seconds < 0:
-                logger.warning(f"Cut start time {cut['start']} is negative, using 0 instead")
-                start_seconds = 0
-                
-            if end_seconds > file_duration:
-                logger.warning(f"Cut end time {cut['end']} exceeds file duration, using file duration instead")
-                end_seconds = file_duration
-                
-            # Only add valid cuts
-            if start_seconds < end_seconds:
-                cuts_in_seconds.append((start_seconds, end_seconds))
-        
-        # Sort cuts by start time and merge overlapping segments
-        cuts_in_seconds.sort()
-        merged_cuts = []
-        
-        if cuts_in_seconds:
-            current_start, current_end = cuts_in_seconds[0]
-            for start, end in cuts_in_seconds[1:]:
-                if start <= current_end:  # Overlapping segments
-                    current_end = max(current_end, end)
-                else:  # Non-overlapping, add the previous merged segment
-                    merged_cuts.append((current_start, current_end))
-                    current_start, current_end = start, end
-            # Add the last segment
-            merged_cuts.append((current_start, current_end))
-        
+        merged_cuts = merge_cuts(cuts, file_duration)
         logger.info(f"Processing cuts: {merged_cuts}")
         
         if not merged_cuts:
@@ -147,107 +263,60 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
                 '-c', 'copy',
                 output_filename
             ]
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            run_ffmpeg(cmd, description="cut copy")
         else:
-            # Switch to a different approach: extract segments and concatenate
-            segment_files = []
-            
-            # Create segments to keep
-            last_end = 0
-            for i, (start, end) in enumerate(merged_cuts):
-                # If there's a gap between last segment end and current segment start, extract it
-                if start > last_end:
-                    segment_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_segment_{i}{ext}")
-                    segment_files.append(segment_file)
-                    temp_files.append(segment_file)
-                    
-                    # Extract segment from last_end to start
-                    duration = start - last_end
-                    cmd = [
-                        'ffmpeg',
-                        '-i', input_filename,
-                        '-ss', str(last_end),
-                        '-t', str(duration),
+            segments = get_kept_segments(merged_cuts, file_duration)
+
+            smart_report = None
+            if segments and smart_cut and media_info["has_video"]:
+                try:
+                    smart_report = run_smart_cut(
+                        input_filename,
+                        segments,
+                        output_filename,
+                        video_preset=video_preset,
+                        video_crf=video_crf,
+                        audio_codec=audio_codec,
+                        audio_bitrate=audio_bitrate,
+                        has_audio=media_info["has_audio"],
+                        duration=media_info["duration"]
+                    )
+                except Exception as e:
+                    logger.warning(f"Smart cut failed, falling back to a full encode: {str(e)}")
+                if smart_report is None:
+                    logger.info("Smart cut not applicable, using a full encode")
+                    if os.path.exists(output_filename):
+                        os.remove(output_filename)
+
+            if smart_report:
+                logger.info(f"Smart cut copied {smart_report['copy_ratio']:.0%} of the output")
+            elif segments:
+                input_args, filter_complex, map_args = build_cut_filter_graph(
+                    input_filename,
+                    segments,
+                    has_video=media_info["has_video"],
+                    has_audio=media_info["has_audio"]
+                )
+
+                cmd = ['ffmpeg', '-y'] + input_args + ['-filter_complex', filter_complex] + map_args
+                if media_info["has_video"]:
+                    cmd += [
                         '-c:v', video_codec,
                         '-preset', video_preset,
                         '-crf', str(video_crf),
-                        '-c:a', audio_codec,
-                        '-b:a', audio_bitrate,
-                        '-pix_fmt', 'yuv420p',
                         '-vsync', 'cfr',
                         '-r', '30',
-                        '-avoid_negative_ts', 'make_zero',
-                        segment_file
+                        '-pix_fmt', 'yuv420p'
                     ]
-                    logger.info(f"Extracting segment {i}: {' '.join(cmd)}")
-                    process = subprocess.run(cmd, capture_output=True, text=True)
-                    
-                    if process.returncode != 0:
-                        logger.error(f"Error during segment {i} extraction: {process.stderr}")
-                        raise Exception(f"FFmpeg error: {process.stderr}")
-                
-                last_end = end
-            
-            # Add final segment if needed
-            if last_end < file_duration:
-                segment_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_segment_final{ext}")
-                segment_files.append(segment_file)
-                temp_files.append(segment_file)
-                
-                cmd = [
-                    'ffmpeg',
-                    '-i', input_filename,
-                    '-ss', str(last_end),
-                    '-c:v', video_codec,
-                    '-preset', video_preset,
-                    '-crf', str(video_crf),
-                    '-c:a', audio_codec,
-                    '-b:a', audio_bitrate,
-                    '-pix_fmt', 'yuv420p',
-                    '-vsync', 'cfr',
-                    '-r', '30',
-                    '-avoid_negative_ts', 'make_zero',
-                    segment_file
-                ]
-                logger.info(f"Extracting final segment: {' '.join(cmd)}")
-                process = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if process.returncode != 0:
-                    logger.error(f"Error during final segment extraction: {process.stderr}")
-                    raise Exception(f"FFmpeg error: {process.stderr}")
-            
-            # If we have segments to concatenate
-            if segment_files:
-                # Create a concat file
-                concat_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat.txt")
-                temp_files.append(concat_file)
-                
-                with open(concat_file, 'w') as f:
-                    for segment in segment_files:
-                        f.write(f"file '{segment}'\n")
-                
-                # Concatenate the segments
-                cmd = [
-                    'ffmpeg',
-                    '-f', 'concat',
-                    '-safe', '0',
-                    '-i', concat_file,
-                    '-c:v', video_codec,
-                    '-preset', video_preset,
-                    '-crf', str(video_crf),
-                    '-c:a', audio_codec,
-                    '-b:a', audio_bitrate,
-                    '-vsync', 'cfr',
-                    '-r', '30',
-                    '-pix_fmt', 'yuv420p',
-                    '-movflags', '+faststart',
-                    output_filename
-                ]
-                logger.info(f"Concatenating segments: {' '.join(cmd)}")
-                process = subprocess.run(cmd, capture_output=True, text=True)
+                if media_info["has_audio"]:
+                    cmd += ['-c:a', audio_codec, '-b:a', audio_bitrate]
+                cmd += ['-movflags', '+faststart', output_filename]
+
+                logger.info(f"Joining {len(segments)} kept segments in a single pass")
+                process = run_ffmpeg(cmd, check=False, description="cut")
                 
                 if process.returncode != 0:
-                    logger.error(f"Error during concatenation: {process.stderr}")
+                    logger.error(f"Error during cut: {process.stderr}")
                     raise Exception(f"FFmpeg error: {process.stderr}")
             else:
                 # No segments to keep
@@ -255,25 +324,14 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
                     # Create an empty file
                     pass
         
-        # Clean up temporary files
-        for temp_file in temp_files:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                logger.info(f"Removed temporary file: {temp_file}")
-        
         return output_filename, input_filename
         
     except Exception as e:
         logger.error(f"Video cut operation failed: {str(e)}")
-        # Clean up all temporary files if they exist
-        for temp_file in temp_files:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                
         if 'input_filename' in locals() and os.path.exists(input_filename):
             os.remove(input_filename)
                     
         if 'output_filename' in locals() and os.path.exists(output_filename):
             os.remove(output_filename)
             
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,356 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+GOP-aware smart cut.
+
+Keeps a list of time ranges from a source video while re-encoding as little
+as possible:
+
+- A keyframe index of the source is built from packet flags (no decoding).
+- Whole GOPs that lie inside a kept range are stream-copied. They are split
+  out of the source in one demux pass with the segment muxer, which only
+  splits on keyframes, so copied pieces start exactly on a GOP boundary.
+- The partial GOPs at both ends of each kept range are re-encoded with the
+  source codec, profile, pixel format and resolution.
+- The audio track is rendered in a single pass (atrim + concat), because
+  audio frames never line up with video keyframes.
+- Everything is joined with the concat demuxer and muxed without re-encoding.
+
+Pieces are written as MPEG-TS so the parameter sets of re-encoded pieces
+travel in-band with their frames.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+import tempfile
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from services.scratch_storage import get_job_scratch_dir
+from services.media_probe import get_media_probe, ProbeError
+from services.ffmpeg_runner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Source codecs we can re-encode boundary GOPs for: codec -> (encoder, profile names)
+SMART_CUT_ENCODERS = {
+    'h264': ('libx264', {
+        'Constrained Baseline': 'baseline',
+        'Baseline': 'baseline',
+        'Main': 'main',
+        'High': 'high',
+        'High 10': 'high10',
+        'High 4:2:2': 'high422',
+        'High 4:4:4 Predictive': 'high444',
+    }),
+    'hevc': ('libx265', {
+        'Main': 'main',
+        'Main 10': 'main10',
+        'Main Still Picture': 'mainstillpicture',
+    }),
+}
+
+# Smart cut is skipped when less than this share of the output can be copied
+MIN_COPY_RATIO = 0.2
+
+# Parallel boundary encodes (each one is short and uses its own threads)
+MAX_PARALLEL_ENCODES = 4
+
+# Segment times are placed this much before a keyframe so the split lands on it
+KEYFRAME_EPSILON = 0.001
+
+
+def build_keyframe_index(input_path, read_interval=None):
+    """
+    List the presentation times of the keyframes of the first video stream.
+
+    Only packet headers are read, so this costs a demux pass, not a decode.
+
+    Args:
+        input_path (str): Local media file
+        read_interval (tuple, optional): (start, end) in seconds to limit the
+            scan to; reading starts at the keyframe before ``start``
+
+    Returns:
+        list: Sorted keyframe times in seconds
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+    ]
+    if read_interval:
+        cmd += ['-read_intervals', f"{read_interval[0]:.6f}%{read_interval[1]:.6f}"]
+    cmd.append(input_path)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not index keyframes: {result.stderr}")
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1]:
+            try:
+                keyframes.append(float(parts[0]))
+            except ValueError:
+                continue  # pts_time can be N/A
+    return sorted(keyframes)
+
+
+def get_video_params(input_path):
+    """Return codec parameters of the first video stream, or None if there is none."""
+    try:
+        return get_media_probe(input_path).video_stream
+    except ProbeError as e:
+        logger.warning(str(e))
+        return None
+
+
+def _parse_rate(rate):
+    try:
+        num, den = rate.split('/')
+        return float(num) / float(den) if float(den) else 0.0
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+def plan_smart_cut(segments, keyframes, duration=None):
+    """
+    Split each kept range into encode / copy / encode pieces.
+
+    For a kept range [start, end), whole GOPs from the first keyframe at or
+    after ``start`` to the last keyframe at or before ``end`` are copied; the
+    parts before and after are re-encoded. A range that runs to the end of
+    the source (``duration``) copies its last GOP too. Ranges without a whole
+    GOP are re-encoded entirely.
+
+    Returns:
+        list: Pieces as dicts {"type": "copy"|"encode", "start", "end"}
+    """
+    pieces = []
+    for start, end in segments:
+        first_index = bisect_left(keyframes, start)
+        last_index = bisect_right(keyframes, end) - 1
+        first_kf = keyframes[first_index] if first_index < len(keyframes) else None
+        last_kf = keyframes[last_index] if last_index >= 0 else None
+        if duration and end >= duration and first_kf is not None:
+            last_kf = end
+
+        if first_kf is None or last_kf is None or first_kf >= last_kf:
+            pieces.append({"type": "encode", "start": start, "end": end})
+            continue
+
+        if first_kf > start:
+            pieces.append({"type": "encode", "start": start, "end": first_kf})
+        pieces.append({"type": "copy", "start": first_kf, "end": last_kf})
+        if last_kf < end:
+            pieces.append({"type": "encode", "start": last_kf, "end": end})
+
+    return pieces
+
+
+def _run(cmd, what):
+    process = run_ffmpeg(cmd, check=False, description=f"smart cut {what}")
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg error during {what}: {process.stderr[-2000:]}")
+
+
+def _split_copy_pieces(input_path, copy_pieces, work_dir):
+    """
+    Stream-copy all GOP-aligned pieces in one pass with the segment muxer.
+
+    Returns:
+        list: Paths of the copied pieces, in the order of ``copy_pieces``
+    """
+    split_times = []
+    for piece in copy_pieces:
+        split_times += [piece["start"], piece["end"]]
+    # The first split is implicit at time 0
+    times = [max(0.0, t - KEYFRAME_EPSILON) for t in split_times]
+    starts_at_zero = times[0] == 0.0
+    if starts_at_zero:
+        times = times[1:]
+
+    pattern = os.path.join(work_dir, 'split_%05d.ts')
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-map', '0:v:0',
+        '-c', 'copy',
+        '-f', 'segment',
+        '-segment_format', 'mpegts',
+        '-segment_times', ','.join(f"{t:.6f}" for t in times),
+        '-reset_timestamps', '1',
+        pattern
+    ]
+    _run(cmd, "GOP split")
+
+    # With an implicit split at 0, segment k starts at the k-th split time
+    offset = 0 if starts_at_zero else 1
+    return [pattern % (offset + 2 * i) for i in range(len(copy_pieces))]
+
+
+def _encode_piece(input_path, piece, output_path, encoder_args):
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', f"{piece['start']:.6f}",
+        '-t', f"{piece['end'] - piece['start']:.6f}",
+        '-i', input_path,
+        '-map', '0:v:0',
+        '-an',
+    ] + encoder_args + ['-f', 'mpegts', output_path]
+    _run(cmd, f"boundary encode {piece['start']:.3f}-{piece['end']:.3f}")
+
+
+def _render_audio(input_path, segments, output_path, audio_codec, audio_bitrate, fade_duration):
+    """Render the kept audio ranges in a single decode/encode pass."""
+    offset = segments[0][0]
+    filters = ["[0:a]asplit=" + str(len(segments)) + "".join(f"[as{i}]" for i in range(len(segments)))]
+    for i, (start, end) in enumerate(segments):
+        chain = f"[as{i}]atrim=start={start - offset:.6f}:end={end - offset:.6f},asetpts=PTS-STARTPTS"
+        length = end - start
+        if fade_duration and length > 2 * fade_duration:
+            # Short fades at the joins avoid clicks without changing the duration
+            chain += f",afade=t=in:d={fade_duration},afade=t=out:st={length - fade_duration:.6f}:d={fade_duration}"
+        filters.append(f"{chain}[a{i}]")
+    filters.append("".join(f"[a{i}]" for i in range(len(segments))) + f"concat=n={len(segments)}:v=0:a=1[outa]")
+
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', f"{offset:.6f}",
+        '-t', f"{segments[-1][1] - offset:.6f}",
+        '-i', input_path,
+        '-filter_complex', ';'.join(filters),
+        '-map', '[outa]',
+        '-c:a', audio_codec,
+        '-b:a', audio_bitrate,
+        '-f', 'mp4',
+        output_path
+    ]
+    _run(cmd, "audio render")
+
+
+def smart_cut(input_path, segments, output_path, video_preset='medium', video_crf=23,
+              audio_codec='aac', audio_bitrate='128k', fade_duration=0.0, has_audio=True,
+              duration=None, work_dir=None):
+    """
+    Join the kept ranges of a video, copying whole GOPs and re-encoding only cut boundaries.
+
+    Args:
+        input_path (str): Local source file
+        segments (list): Kept (start, end) ranges in seconds, sorted and non-overlapping
+        output_path (str): Output file
+        video_preset (str): Encoder preset for boundary GOPs
+        video_crf (int): CRF for boundary GOPs
+        audio_codec (str): Audio codec for the audio track
+        audio_bitrate (str): Audio bitrate
+        fade_duration (float): Audio fade at each join in seconds (0 disables)
+        has_audio (bool): Whether the source has an audio stream
+        duration (float, optional): Source duration, lets ranges that reach the
+            end of the source copy their last GOP
+        work_dir (str, optional): Directory for intermediate pieces
+
+    Returns:
+        dict: Report of what was copied and re-encoded, or None when smart cut
+        does not apply (unsupported codec, no whole GOPs to copy). The caller
+        should then fall back to a regular encode.
+    """
+    if not segments:
+        return None
+
+    params = get_video_params(input_path)
+    if not params:
+        logger.info("Smart cut skipped: no video stream")
+        return None
+    if params.get('codec_name') not in SMART_CUT_ENCODERS:
+        logger.info(f"Smart cut skipped: unsupported codec {params.get('codec_name')}")
+        return None
+
+    keyframes = build_keyframe_index(input_path)
+    pieces = plan_smart_cut(segments, keyframes, duration)
+
+    copied = sum(p["end"] - p["start"] for p in pieces if p["type"] == "copy")
+    total = sum(end - start for start, end in segments)
+    copy_ratio = copied / total if total else 0
+    if copy_ratio < MIN_COPY_RATIO:
+        logger.info(f"Smart cut skipped: only {copy_ratio:.0%} of the output could be copied")
+        return None
+
+    encoder, profiles = SMART_CUT_ENCODERS[params['codec_name']]
+    encoder_args = ['-c:v', encoder, '-preset', video_preset, '-crf', str(video_crf)]
+    if params.get('pix_fmt'):
+        encoder_args += ['-pix_fmt', params['pix_fmt']]
+    if profiles.get(params.get('profile')):
+        encoder_args += ['-profile:v', profiles[params['profile']]]
+    if encoder == 'libx264' and params.get('level', 0) > 0:
+        encoder_args += ['-level:v', f"{params['level'] / 10:.1f}"]
+    for rate in (params.get('avg_frame_rate'), params.get('r_frame_rate')):
+        if _parse_rate(rate):
+            encoder_args += ['-r', rate]
+            break
+
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='smartcut_', dir=get_job_scratch_dir())
+    try:
+        copy_pieces = [p for p in pieces if p["type"] == "copy"]
+        encode_pieces = [p for p in pieces if p["type"] == "encode"]
+
+        for piece, path in zip(copy_pieces, _split_copy_pieces(input_path, copy_pieces, work_dir)):
+            piece["path"] = path
+
+        for i, piece in enumerate(encode_pieces):
+            piece["path"] = os.path.join(work_dir, f"encode_{i:05d}.ts")
+        workers = max(1, min(MAX_PARALLEL_ENCODES, os.cpu_count() or 1, len(encode_pieces)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_encode_piece, input_path, piece, piece["path"], encoder_args)
+                for piece in encode_pieces
+            ]
+            for future in futures:
+                future.result()
+
+        concat_file = os.path.join(work_dir, 'concat.txt')
+        with open(concat_file, 'w') as f:
+            for piece in pieces:
+                f.write(f"file '{piece['path']}'\n")
+
+        cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file]
+        if has_audio:
+            audio_path = os.path.join(work_dir, 'audio.m4a')
+            _render_audio(input_path, segments, audio_path, audio_codec, audio_bitrate, fade_duration)
+            cmd += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+        cmd += ['-c', 'copy', '-movflags', '+faststart', output_path]
+        _run(cmd, "smart cut concat")
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "mode": "smart",
+        "copied_gop_ranges": len(copy_pieces),
+        "boundary_encodes": len(encode_pieces),
+        "copied_duration": round(copied, 3),
+        "encoded_duration": round(total - copied, 3),
+        "copy_ratio": round(copy_ratio, 3)
+    }
+    logger.info(f"Smart cut finished: {report}")
+    return report
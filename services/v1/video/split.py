@@ -18,11 +18,13 @@
 
 import os
 import json
-import subprocess
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from services.file_management import download_file
 from services.cloud_storage import upload_file
+from services.media_probe import get_media_probe, ProbeError
+from services.ffmpeg_runner import run_ffmpeg
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -52,10 +54,82 @@ def time_to_seconds(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
+# Each concurrent split encoder gets at least this many threads. libx264 scales
+# poorly past a few threads at small resolutions, so several narrow encoders
+# use the cores better than one wide one.
+MIN_THREADS_PER_SPLIT = 2
+
+def get_split_parallelism(split_count, cpu_count=None):
+    """
+    Return (workers, threads per ffmpeg process) for encoding splits concurrently.
+
+    The CPU budget is shared out so that workers * threads never exceeds the
+    number of cores.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = max(1, min(split_count, cpu_count // MIN_THREADS_PER_SPLIT))
+    threads = max(1, cpu_count // workers)
+    return workers, threads
+
+def is_contiguous(valid_splits):
+    """True when each split starts exactly where the previous one ends."""
+    return all(
+        valid_splits[i][1] == valid_splits[i - 1][2]
+        for i in range(1, len(valid_splits))
+    )
+
+def build_split_command(input_filename, start_seconds, end_seconds, output_filename, encode_args, threads=None):
+    """Build the ffmpeg command for one split, seeking on the input side."""
+    thread_args = ['-threads', str(threads)] if threads else []
+    return (
+        ['ffmpeg', '-y']
+        + thread_args
+        + ['-ss', str(start_seconds), '-t', str(end_seconds - start_seconds), '-i', input_filename]
+        + encode_args
+        + thread_args
+        + ['-avoid_negative_ts', 'make_zero', output_filename]
+    )
+
+def build_segment_command(input_filename, valid_splits, output_pattern):
+    """
+    Build one stream-copy ffmpeg command that writes contiguous splits with the segment muxer.
+
+    Returns:
+        tuple: (command, offset) where split k is written to file number k + offset
+    """
+    first_start = valid_splits[0][1]
+    times = [start for _, start, _, _ in valid_splits]
+    # The segment muxer always starts a file at 0
+    offset = 0
+    if first_start > 0:
+        offset = 1
+    else:
+        times = times[1:]
+
+    cmd = ['ffmpeg', '-y', '-i', input_filename, '-map', '0:v?', '-map', '0:a?', '-c', 'copy', '-to', str(valid_splits[-1][2])]
+    cmd += ['-f', 'segment', '-reset_timestamps', '1']
+    if times:
+        cmd += ['-segment_times', ','.join(str(t) for t in times)]
+    cmd += [output_pattern]
+    return cmd, offset
+
+def list_segment_files(output_pattern):
+    """Return the files the segment muxer wrote for output_pattern, in order."""
+    segments = []
+    while os.path.exists(output_pattern % len(segments)):
+        segments.append(output_pattern % len(segments))
+    return segments
+
 def split_video(video_url, splits, job_id=None, video_codec='libx264', video_preset='medium', 
-               video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+               video_crf=23, audio_codec='aac', audio_bitrate='128k', parallel=True, stream_copy=False):
     """
     Splits a video file into multiple segments with customizable encoding settings.
+
+    Splits are encoded concurrently (see get_split_parallelism), each ffmpeg
+    process seeking on the input side and limited to its share of the CPU.
+    With stream_copy the segments are not re-encoded, so they start on the
+    nearest keyframe; contiguous splits are then written in a single pass
+    with the segment muxer.
     
     Args:
         video_url (str): URL of the video file to split
@@ -66,6 +140,8 @@ def split_video(video_url, splits, job_id=None, video_codec='libx264', video_pre
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        parallel (bool, optional): Encode splits concurrently (default: True)
+        stream_copy (bool, optional): Copy streams instead of re-encoding (default: False)
         
     Returns:
         tuple: (list of output file paths, input file path)
@@ -84,19 +160,15 @@ def split_video(video_url, splits, job_id=None, video_codec='libx264', video_pre
         _, ext = os.path.splitext(input_filename)
         
         # Get the duration of the input file
-        probe_cmd = [
-            'ffprobe', 
-            '-v', 'error', 
-            '-show_entries', 'format=duration', 
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            input_filename
-        ]
-        duration_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        
         try:
-            file_duration = float(duration_result.stdout.strip())
+            file_duration = get_media_probe(input_filename).duration
+        except ProbeError as e:
+            logger.warning(str(e))
+            file_duration = None
+
+        if file_duration is not None:
             logger.info(f"File duration: {file_duration} seconds")
-        except (ValueError, IndexError):
+        else:
             logger.warning("Could not determine file duration, using a large value")
             file_duration = 86400  # 24 hours as a fallback
         
@@ -131,38 +203,83 @@ def split_video(video_url, splits, job_id=None, video_codec='libx264', video_pre
             
         logger.info(f"Processing {len(valid_splits)} valid splits")
         
-        # Process each split
-        for index, (split_index, start_seconds, end_seconds, split_data) in enumerate(valid_splits):
-            # Create output filename for this split
-            output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_split_{index+1}{ext}")
-            
-            # Create FFmpeg command to extract the segment
-            cmd = [
-                'ffmpeg',
-                '-i', input_filename,
-                '-ss', str(start_seconds),
-                '-to', str(end_seconds),
+        output_names = [
+            os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_split_{index+1}{ext}")
+            for index in range(len(valid_splits))
+        ]
+
+        if stream_copy and len(valid_splits) > 1 and is_contiguous(valid_splits):
+            # One demux pass writes every split
+            pattern = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_segment_%03d{ext}")
+            cmd, offset = build_segment_command(input_filename, valid_splits, pattern)
+            logger.info(f"Running FFmpeg segment command for {len(valid_splits)} contiguous splits: {' '.join(cmd)}")
+            process = run_ffmpeg(cmd, check=False, description="split segment")
+            if process.returncode != 0:
+                logger.error(f"Error segmenting video: {process.stderr}")
+                raise Exception(f"FFmpeg error while segmenting: {process.stderr}")
+
+            # The muxer only cuts on keyframes, so split times inside one GOP
+            # or past the last keyframe yield fewer files than splits
+            segments = list_segment_files(pattern)
+            if len(segments) == len(valid_splits) + offset:
+                for segment, output_filename in zip(segments[offset:], output_names):
+                    os.replace(segment, output_filename)
+                    output_files.append(output_filename)
+                for segment in segments[:offset]:
+                    os.remove(segment)
+                logger.info(f"Successfully created {len(output_files)} splits with the segment muxer")
+                return output_files, input_filename
+
+            logger.warning(
+                f"Segment muxer wrote {len(segments)} files for {len(valid_splits)} splits "
+                f"(offset {offset}), copying each split separately"
+            )
+            for segment in segments:
+                os.remove(segment)
+
+        if stream_copy:
+            encode_args = ['-map', '0:v?', '-map', '0:a?', '-c', 'copy']
+        else:
+            encode_args = [
                 '-c:v', video_codec,
                 '-preset', video_preset,
                 '-crf', str(video_crf),
                 '-c:a', audio_codec,
-                '-b:a', audio_bitrate,
-                '-avoid_negative_ts', 'make_zero',
-                output_filename
+                '-b:a', audio_bitrate
             ]
-            
+
+        if parallel:
+            workers, threads = get_split_parallelism(len(valid_splits))
+        else:
+            workers, threads = 1, None
+        logger.info(f"Processing splits with {workers} workers, {threads or 'default'} threads each")
+
+        def run_split(index):
+            _, start_seconds, end_seconds, _ = valid_splits[index]
+            cmd = build_split_command(
+                input_filename, start_seconds, end_seconds, output_names[index], encode_args,
+                threads=None if stream_copy else threads
+            )
             logger.info(f"Running FFmpeg command for split {index+1}: {' '.join(cmd)}")
-            
-            # Run the FFmpeg command
-            process = subprocess.run(cmd, capture_output=True, text=True)
-            
+            process = run_ffmpeg(cmd, check=False, description="split")
             if process.returncode != 0:
                 logger.error(f"Error processing split {index+1}: {process.stderr}")
                 raise Exception(f"FFmpeg error for split {index+1}: {process.stderr}")
-            
-            # Add the output file to the list
-            output_files.append(output_filename)
-            logger.info(f"Successfully created split {index+1}: {output_filename}")
+            logger.info(f"Successfully created split {index+1}: {output_names[index]}")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_split, index) for index in range(len(valid_splits))]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+
+        # Track every file that may exist so a failure cleans them all up
+        output_files.extend(output_names)
+        if errors:
+            raise errors[0]
         
         # Return the list of output files and the input filename
         return output_files, input_filename
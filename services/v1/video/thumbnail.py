@@ -17,8 +17,28 @@
 
 
 import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import ffmpeg
-from config import LOCAL_STORAGE_PATH
+from services.scratch_storage import get_scratch_path, get_job_scratch_dir, bind_job_scratch, SMALL_FILE_SIZE_HINT
+from services.media_probe import get_media_probe
+from services.ffmpeg_runner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on thumbnails per request
+MAX_THUMBNAILS = 1000
+
+# Timestamps seeked by one ffmpeg process (one input per timestamp)
+THUMBNAIL_BATCH_SIZE = 16
+
+# ffmpeg processes running at the same time
+THUMBNAIL_WORKERS = 4
+
+# Sprite sheet tile width and layout
+DEFAULT_TILE_WIDTH = 160
+DEFAULT_SPRITE_COLUMNS = 10
+SPRITE_MAX_ROWS = 10
 
 def extract_thumbnail(video_url, job_id, second=0):
     """
@@ -34,17 +54,18 @@ def extract_thumbnail(video_url, job_id, second=0):
         str: Path to the extracted thumbnail image
     """
     # Set output path for the thumbnail
-    thumbnail_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_thumbnail.jpg")
+    thumbnail_path = get_scratch_path(f"{job_id}_thumbnail.jpg", SMALL_FILE_SIZE_HINT)
 
     try:
         # Extract thumbnail directly from URL using ffmpeg streaming
         # analyzeduration and probesize are set low to reduce initial buffering
-        (
+        run_ffmpeg(
             ffmpeg
             .input(video_url, ss=second, analyzeduration='100K', probesize='100K')
             .output(thumbnail_path, vframes=1, update=1)
             .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+            .compile(),
+            description="thumbnail"
         )
 
         # Ensure the thumbnail file exists
@@ -59,3 +80,180 @@ def extract_thumbnail(video_url, job_id, second=0):
         if os.path.exists(thumbnail_path):
             os.remove(thumbnail_path)
         raise
+
+def get_interval_timestamps(duration, interval, max_count=MAX_THUMBNAILS):
+    """Timestamps every ``interval`` seconds from 0 up to (excluding) ``duration``."""
+    count = min(max_count, max(1, int((duration - 1e-6) // interval) + 1))
+    return [round(i * interval, 3) for i in range(count)]
+
+def get_tile_size(width, height, tile_width=DEFAULT_TILE_WIDTH):
+    """Tile size preserving the video aspect ratio; the height is rounded to an even number."""
+    if not width or not height:
+        return tile_width, max(2, int(round(tile_width * 9 / 16 / 2)) * 2)
+    return tile_width, max(2, int(round(tile_width * height / width / 2)) * 2)
+
+def build_thumbnail_batch_command(source, timestamps, image_paths=None, tile_paths=None, tile_size=None):
+    """
+    Build one ffmpeg command that grabs a frame at each timestamp.
+
+    Every timestamp is its own input with -ss before -i, so ffmpeg seeks to
+    the nearest keyframe and decodes only up to the requested frame.
+
+    Args:
+        source (str): Video URL or local path
+        timestamps (list): Seconds to capture
+        image_paths (list, optional): Full-resolution output per timestamp
+        tile_paths (list, optional): Sprite tile output per timestamp
+        tile_size (tuple, optional): (width, height) of the tiles
+    """
+    cmd = ['ffmpeg', '-y', '-v', 'error']
+    for second in timestamps:
+        cmd += ['-ss', str(second), '-i', source]
+
+    filters = []
+    if tile_paths:
+        filters = [f"[{i}:v:0]scale={tile_size[0]}:{tile_size[1]},setsar=1[t{i}]" for i in range(len(timestamps))]
+        cmd += ['-filter_complex', ';'.join(filters)]
+
+    for i in range(len(timestamps)):
+        if image_paths:
+            cmd += ['-map', f'{i}:v:0', '-frames:v', '1', '-update', '1', image_paths[i]]
+        if tile_paths:
+            cmd += ['-map', f'[t{i}]', '-frames:v', '1', '-update', '1', tile_paths[i]]
+    return cmd
+
+def plan_sprite_sheets(count, columns=DEFAULT_SPRITE_COLUMNS, max_rows=SPRITE_MAX_ROWS):
+    """
+    Split ``count`` tiles into sprite sheets of at most ``columns`` x ``max_rows``.
+
+    Returns:
+        list: (first tile index, tile count, rows) per sheet
+    """
+    per_sheet = columns * max_rows
+    sheets = []
+    for first in range(0, count, per_sheet):
+        tiles = min(per_sheet, count - first)
+        sheets.append((first, tiles, -(-tiles // columns)))
+    return sheets
+
+def format_vtt_time(seconds):
+    hours, remainder = divmod(max(0.0, seconds), 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+def build_thumbnail_vtt(timestamps, end_time, sheet_urls, tile_size, columns=DEFAULT_SPRITE_COLUMNS,
+                        max_rows=SPRITE_MAX_ROWS):
+    """
+    Build a WebVTT thumbnail track pointing at the sprite sheets.
+
+    Each cue lasts from its timestamp to the next one (the last one to
+    ``end_time``) and references its tile with a ``#xywh=`` media fragment.
+    """
+    per_sheet = columns * max_rows
+    lines = ["WEBVTT", ""]
+    for index, start in enumerate(timestamps):
+        end = timestamps[index + 1] if index + 1 < len(timestamps) else max(end_time, start)
+        position = index % per_sheet
+        x = (position % columns) * tile_size[0]
+        y = (position // columns) * tile_size[1]
+        lines.append(f"{format_vtt_time(start)} --> {format_vtt_time(end)}")
+        lines.append(f"{sheet_urls[index // per_sheet]}#xywh={x},{y},{tile_size[0]},{tile_size[1]}")
+        lines.append("")
+    return "\n".join(lines)
+
+def _run(cmd):
+    process = run_ffmpeg(cmd, check=False, description="thumbnails")
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg error: {process.stderr}")
+
+def extract_thumbnails(video_url, job_id, timestamps=None, interval=None, images=True, sprite=False,
+                       tile_width=DEFAULT_TILE_WIDTH, columns=DEFAULT_SPRITE_COLUMNS):
+    """
+    Extract thumbnails at many timestamps of a video in a single job.
+
+    Timestamps are seeked directly in the source (no full download), a batch
+    of them per ffmpeg process, with a few processes in parallel. Optionally
+    the frames are also scaled to tiles and joined into sprite sheets for a
+    WebVTT thumbnail track (see build_thumbnail_vtt).
+
+    Args:
+        video_url (str): URL of the video
+        job_id (str): Unique identifier for the job
+        timestamps (list, optional): Seconds to capture
+        interval (float, optional): Capture every ``interval`` seconds instead
+        images (bool): Produce a full-resolution JPEG per timestamp
+        sprite (bool): Produce sprite sheets
+        tile_width (int): Sprite tile width in pixels
+        columns (int): Tiles per sprite sheet row
+
+    Returns:
+        dict: {"timestamps": [...], "duration": float or None, "images": [paths],
+               "sprites": [paths], "tile_size": (w, h)}
+    """
+    probe = get_media_probe(video_url)
+    duration = probe.duration
+
+    if interval:
+        if not duration:
+            raise ValueError("Video duration is unknown, use explicit timestamps instead of an interval")
+        timestamps = get_interval_timestamps(duration, interval)
+    else:
+        timestamps = sorted(set(float(second) for second in timestamps))
+        if duration:
+            skipped = [second for second in timestamps if second >= duration]
+            if skipped:
+                logger.warning(f"Job {job_id}: Skipping timestamps past the end of the video: {skipped}")
+            timestamps = [second for second in timestamps if second < duration]
+        timestamps = timestamps[:MAX_THUMBNAILS]
+    if not timestamps:
+        raise ValueError("No timestamps within the video duration")
+
+    work_dir = os.path.join(get_job_scratch_dir(), f"{job_id}_thumbnails")
+    os.makedirs(work_dir, exist_ok=True)
+    tile_size = get_tile_size(probe.width, probe.height, tile_width) if sprite else None
+    image_paths = [os.path.join(work_dir, f"{job_id}_thumbnail_{i:04d}.jpg") for i in range(len(timestamps))] if images else None
+    tile_paths = [os.path.join(work_dir, f"tile_{i:04d}.jpg") for i in range(len(timestamps))] if sprite else None
+
+    commands = []
+    for first in range(0, len(timestamps), THUMBNAIL_BATCH_SIZE):
+        last = first + THUMBNAIL_BATCH_SIZE
+        commands.append(build_thumbnail_batch_command(
+            video_url,
+            timestamps[first:last],
+            image_paths[first:last] if images else None,
+            tile_paths[first:last] if sprite else None,
+            tile_size
+        ))
+
+    logger.info(f"Job {job_id}: Extracting {len(timestamps)} thumbnails in {len(commands)} ffmpeg runs")
+    with ThreadPoolExecutor(max_workers=min(THUMBNAIL_WORKERS, len(commands))) as executor:
+        list(executor.map(bind_job_scratch(_run), commands))
+
+    sprites = []
+    if sprite:
+        for sheet_index, (first, count, rows) in enumerate(plan_sprite_sheets(len(timestamps), columns)):
+            sprite_path = os.path.join(work_dir, f"{job_id}_sprite_{sheet_index:03d}.jpg")
+            _run([
+                'ffmpeg', '-y', '-v', 'error',
+                '-framerate', '1', '-start_number', str(first), '-i', os.path.join(work_dir, 'tile_%04d.jpg'),
+                '-vf', f"tile={columns}x{rows}",
+                '-frames:v', '1', '-q:v', '3',
+                sprite_path
+            ])
+            sprites.append(sprite_path)
+
+    return {
+        "timestamps": timestamps,
+        "duration": duration,
+        "images": image_paths or [],
+        "sprites": sprites,
+        "tile_size": tile_size
+    }
+
+def write_thumbnail_vtt(result, sprite_urls, job_id, columns=DEFAULT_SPRITE_COLUMNS):
+    """Write the WebVTT track for the uploaded sprite sheets and return its path."""
+    end_time = result["duration"] or result["timestamps"][-1]
+    vtt_path = os.path.join(get_job_scratch_dir(), f"{job_id}_thumbnails.vtt")
+    with open(vtt_path, 'w', encoding='utf-8') as f:
+        f.write(build_thumbnail_vtt(result["timestamps"], end_time, sprite_urls, result["tile_size"], columns))
+    return vtt_path
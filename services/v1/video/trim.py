@@ -18,11 +18,13 @@
 
 import os
 import json
-import subprocess
 import logging
 import uuid
 from services.file_management import download_file
 from services.cloud_storage import upload_file
+from services.media_probe import get_media_probe, ProbeError
+from services.v1.video.smart_cut import build_keyframe_index, smart_cut
+from services.ffmpeg_runner import run_ffmpeg
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -55,10 +57,78 @@ def time_to_seconds(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
+# copy: stream copy from the keyframe at or before the start (no encode)
+# accurate: frame-exact re-encode
+# smart: re-encode only up to the first keyframe, copy the rest
+TRIM_MODES = ('accurate', 'copy', 'smart')
+
+# In accurate mode the input is seeked to this many seconds before the start,
+# and the remainder is skipped precisely with an output seek
+ACCURATE_SEEK_MARGIN = 5.0
+
+# How far before the start to look for the keyframe a stream copy begins on
+KEYFRAME_SEARCH_WINDOW = 30.0
+
+def build_trim_command(input_filename, output_filename, start_seconds, end_seconds, file_duration,
+                       mode, encode_args):
+    """
+    Build the ffmpeg command for a trim.
+
+    Both modes seek on the input side, so the demuxer jumps to the keyframe
+    before the start instead of decoding everything in front of it.
+    """
+    cmd = ['ffmpeg', '-y']
+    duration = end_seconds - start_seconds
+    trim_end = end_seconds < file_duration
+
+    if mode == 'copy':
+        if start_seconds > 0:
+            cmd += ['-ss', str(start_seconds)]
+        cmd += ['-i', input_filename]
+        if trim_end:
+            cmd += ['-t', str(duration)]
+        cmd += ['-map', '0:v?', '-map', '0:a?', '-c', 'copy']
+    else:
+        coarse = max(0.0, start_seconds - ACCURATE_SEEK_MARGIN)
+        if coarse > 0:
+            cmd += ['-ss', str(coarse)]
+        cmd += ['-i', input_filename]
+        if start_seconds - coarse > 0:
+            cmd += ['-ss', str(round(start_seconds - coarse, 6))]
+        if trim_end:
+            cmd += ['-t', str(duration)]
+        cmd += encode_args
+
+    cmd += ['-avoid_negative_ts', 'make_zero', output_filename]
+    return cmd
+
+def find_copy_start(input_filename, start_seconds):
+    """Return the time of the keyframe a stream copy starting at start_seconds begins on."""
+    if start_seconds <= 0:
+        return 0.0
+    try:
+        keyframes = build_keyframe_index(
+            input_filename,
+            read_interval=(max(0.0, start_seconds - KEYFRAME_SEARCH_WINDOW), start_seconds)
+        )
+    except Exception as e:
+        logger.warning(f"Could not index keyframes, reporting the requested start: {str(e)}")
+        return start_seconds
+    before = [kf for kf in keyframes if kf <= start_seconds]
+    return before[-1] if before else start_seconds
+
 def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx264', video_preset='medium', 
-               video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+               video_crf=23, audio_codec='aac', audio_bitrate='128k', mode='accurate'):
     """
     Trims a video by removing specified portions from the beginning and/or end with customizable encoding settings.
+
+    Modes:
+        accurate: Re-encode, with a fast input seek and a precise output seek.
+        copy: Stream copy with -ss before -i. The output starts on the keyframe
+            at or before ``start``; nothing is re-encoded.
+        smart: Re-encode only the first, partial GOP and stream-copy the rest
+            (see services.v1.video.smart_cut). Falls back to accurate when the
+            source does not allow it.
     
     Args:
         video_url (str): URL of the video file to trim
@@ -70,10 +140,15 @@ def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx26
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        mode (str, optional): One of TRIM_MODES (default: 'accurate')
         
     Returns:
-        tuple: (output_filename, input_filename)
+        tuple: (output_filename, input_filename, trim_info) where trim_info
+        holds the mode used and the effective start/end in seconds
     """
+    if mode not in TRIM_MODES:
+        raise ValueError(f"Invalid trim mode '{mode}'. Expected one of: {', '.join(TRIM_MODES)}")
+
     logger.info(f"Starting video trim operation for {video_url}")
     if not job_id:
         job_id = str(uuid.uuid4())
@@ -88,20 +163,20 @@ def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx26
         # Create output filename
         output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output{ext}")
         
-        # Get the duration of the input file
-        probe_cmd = [
-            'ffprobe', 
-            '-v', 'error', 
-            '-show_entries', 'format=duration', 
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            input_filename
-        ]
-        duration_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        
+        # Get the duration and streams of the input file
         try:
-            file_duration = float(duration_result.stdout.strip())
+            probe = get_media_probe(input_filename)
+            known_duration = probe.duration
+            has_audio = probe.has_audio
+        except ProbeError as e:
+            logger.warning(str(e))
+            known_duration = None
+            has_audio = True
+
+        if known_duration is not None:
+            file_duration = known_duration
             logger.info(f"File duration: {file_duration} seconds")
-        except (ValueError, IndexError):
+        else:
             logger.warning("Could not determine file duration, using a large value")
             file_duration = 86400  # 24 hours as a fallback
         
@@ -121,49 +196,72 @@ def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx26
         if start_seconds is not None and end_seconds is not None and start_seconds >= end_seconds:
             raise ValueError(f"Invalid trim: start time ({start}) must be before end time ({end})")
         
-        # Prepare FFmpeg command based on trim parameters
-        cmd = ['ffmpeg', '-i', input_filename]
-        
-        filter_applied = False
-        
-        if start_seconds > 0 or end_seconds < file_duration:
-            # We need to trim the video
-            logger.info(f"Trimming video from {start_seconds}s to {end_seconds}s")
-            
-            if start_seconds > 0:
-                cmd.extend(['-ss', str(start_seconds)])
-                
-            if end_seconds < file_duration:
-                duration = end_seconds - (start_seconds or 0)
-                cmd.extend(['-t', str(duration)])
-                
-            filter_applied = True
-        
-        # Add encoding parameters
-        cmd.extend([
+        trims = start_seconds > 0 or end_seconds < file_duration
+        if trims:
+            logger.info(f"Trimming video from {start_seconds}s to {end_seconds}s ({mode} mode)")
+        else:
+            logger.info("No trimming needed, copying with encoder settings")
+
+        encode_args = [
             '-c:v', video_codec,
             '-preset', video_preset,
             '-crf', str(video_crf),
             '-c:a', audio_codec,
-            '-b:a', audio_bitrate,
-            '-avoid_negative_ts', 'make_zero',
-            output_filename
-        ])
-        
-        if not filter_applied:
-            logger.info("No trimming needed, copying with encoder settings")
-        
-        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-        
-        # Run the FFmpeg command
-        process = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if process.returncode != 0:
-            logger.error(f"Error during trim: {process.stderr}")
-            raise Exception(f"FFmpeg error: {process.stderr}")
-        
+            '-b:a', audio_bitrate
+        ]
+        effective_start = start_seconds
+
+        smart_report = None
+        if mode == 'smart' and trims:
+            try:
+                smart_report = smart_cut(
+                    input_filename,
+                    [(start_seconds, end_seconds)],
+                    output_filename,
+                    video_preset=video_preset,
+                    video_crf=video_crf,
+                    audio_codec=audio_codec,
+                    audio_bitrate=audio_bitrate,
+                    has_audio=has_audio,
+                    duration=known_duration
+                )
+            except Exception as e:
+                logger.warning(f"Smart trim failed, falling back to accurate mode: {str(e)}")
+            if smart_report is None:
+                mode = 'accurate'
+        elif mode == 'smart':
+            mode = 'accurate'
+
+        if not smart_report:
+            if mode == 'copy':
+                effective_start = find_copy_start(input_filename, start_seconds)
+
+            cmd = build_trim_command(
+                input_filename, output_filename, start_seconds, end_seconds, file_duration, mode, encode_args
+            )
+            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
+
+            # Run the FFmpeg command
+            process = run_ffmpeg(cmd, check=False, description="trim")
+
+            if process.returncode != 0:
+                logger.error(f"Error during trim: {process.stderr}")
+                raise Exception(f"FFmpeg error: {process.stderr}")
+
+        # An end at the 24 hour fallback is not a real boundary
+        end_known = known_duration is not None or end_seconds < file_duration
+        trim_info = {
+            "mode": mode,
+            "start": round(effective_start, 3),
+            "end": round(end_seconds, 3) if end_known else None,
+            "duration": round(end_seconds - effective_start, 3) if end_known else None
+        }
+        if smart_report:
+            trim_info["smart"] = smart_report
+        logger.info(f"Effective trim: {trim_info}")
+
         # Return the path to the output file (route will handle upload)
-        return output_filename, input_filename
+        return output_filename, input_filename, trim_info
         
     except Exception as e:
         logger.error(f"Video trim operation failed: {str(e)}")
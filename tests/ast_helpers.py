@@ -0,0 +1,58 @@
+# Copyright (c) 2025
+# Shared helpers for the structural tests
+
+"""
+Read repository sources and run selected functions of a service module
+without importing it, so the tests need neither FFmpeg, the cloud SDKs nor
+the API_KEY environment variable.
+"""
+
+import ast
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_source(*parts):
+    """Return the text of a file of the repository, e.g. read_source("services", "x.py")."""
+    with open(os.path.join(PROJECT_ROOT, *parts), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def get_function_params(source, func_name):
+    """Return the positional parameter names of a function defined in source."""
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.FunctionDef) and node.name == func_name:
+            return [arg.arg for arg in node.args.args]
+    return None
+
+
+def is_constant(node):
+    return isinstance(node, ast.Assign) and all(
+        isinstance(target, ast.Name) and target.id.isupper() for target in node.targets
+    )
+
+
+def load_functions(source, names, namespace=None):
+    """
+    Execute selected functions or classes and the module constants without the module's imports.
+
+    Definitions and upper-case constants are executed in source order. Names
+    the module imports must be supplied in ``namespace``; constants already
+    present in it are kept, and constants that need a name nobody supplied
+    are skipped.
+
+    Returns:
+        dict: The namespace the functions were defined in
+    """
+    namespace = {} if namespace is None else namespace
+    for node in ast.parse(source).body:
+        module = ast.Module(body=[node], type_ignores=[])
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in names:
+            exec(compile(module, "<source>", "exec"), namespace)
+        elif is_constant(node) and not any(target.id in namespace for target in node.targets):
+            try:
+                exec(compile(module, "<source>", "exec"), namespace)
+            except NameError:
+                pass
+    return namespace
@@ -0,0 +1,43 @@
+# Copyright (c) 2025
+# Tests for the audio concatenation planner
+
+"""Planning and filter graph of services/v1/audio/concatenate.py."""
+
+from collections import Counter
+
+from ast_helpers import load_functions, read_source
+
+
+class TestAudioConcatenatePlan:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "audio", "concatenate.py")
+        functions = load_functions(self.source, {"plan_audio_concatenation", "build_audio_concat_filter"}, {"Counter": Counter})
+        self.plan = functions["plan_audio_concatenation"]
+        self.build = functions["build_audio_concat_filter"]
+
+    def test_identical_inputs_are_copied(self):
+        plan = self.plan([("aac", 48000, 2, "fltp")] * 3)
+        assert plan["method"] == "copy"
+        assert plan["extension"] == "m4a"
+
+    def test_mixed_inputs_use_most_common_format(self):
+        plan = self.plan([("mp3", 44100, 1, "fltp"), ("mp3", 48000, 2, "fltp"), ("aac", 48000, 2, "fltp")])
+        assert plan["method"] == "reencode"
+        assert (plan["sample_rate"], plan["channels"], plan["extension"]) == (48000, 2, "mp3")
+
+    def test_missing_audio_is_rejected(self):
+        try:
+            self.plan([("mp3", 44100, 2, "fltp"), None])
+        except ValueError:
+            return
+        assert False, "expected ValueError"
+
+    def test_single_filter_graph_for_all_inputs(self):
+        graph = self.build(200, 48000, 2)
+        assert graph.count("aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo") == 200
+        assert graph.endswith("[a199]concat=n=200:v=0:a=1[outa]")
+
+    def test_route_reports_decision(self):
+        route = read_source("routes", "v1", "audio", "concatenate.py")
+        assert '"include_report": {"type": "boolean"}' in route
+        assert "download_files" in self.source
@@ -0,0 +1,53 @@
+# Copyright (c) 2025
+# Tests for looping the video track by concatenation
+
+"""Video looping by concat demuxer in services/audio_mixing.py."""
+
+import math
+import os
+
+from ast_helpers import load_functions, read_source
+
+
+class TestLoopByConcat:
+    def setup_method(self):
+        self.source = read_source("services", "audio_mixing.py")
+        self.build = load_functions(self.source, {"build_loop_list"}, {"os": os, "math": math})["build_loop_list"]
+
+    def test_partial_last_loop_has_outpoint(self):
+        lines = self.build("/tmp/clip.mp4", 10.0, 25.0)
+        assert lines == ["file '/tmp/clip.mp4'"] * 3 + ["outpoint 5.000000"]
+
+    def test_exact_multiple_has_no_outpoint(self):
+        lines = self.build("/tmp/clip.mp4", 10.0, 30.0)
+        assert lines == ["file '/tmp/clip.mp4'"] * 3
+
+    def test_hour_long_track(self):
+        lines = self.build("/tmp/clip.mp4", 7.5, 3600.0)
+        assert sum(1 for line in lines if line.startswith("file")) == 480
+
+
+class TestMixingCommand:
+    def setup_method(self):
+        self.source = read_source("services", "audio_mixing.py")
+        self.build = load_functions(self.source, {"build_mixing_command"})["build_mixing_command"]
+
+    def assert_video_copied(self, cmd):
+        assert cmd[cmd.index('-c:v') + 1] == 'copy'
+        assert cmd.count('-c:v') == 1
+        assert cmd[cmd.index('-map') + 1] == '0:v'
+
+    def test_looped_video_is_read_through_concat_and_copied(self):
+        cmd = self.build("v.mp4", "a.mp3", "out.mp4", 80, 'audio', 10.0, 25.0, concat_list_path="loop.txt")
+        assert cmd[2:8] == ['-f', 'concat', '-safe', '0', '-i', 'loop.txt']
+        assert 'v.mp4' not in cmd
+        self.assert_video_copied(cmd)
+        assert cmd[cmd.index('-filter_complex') + 1] == '[1:a]volume=0.8[a]'
+        assert cmd[-3:] == ['-t', '25.0', 'out.mp4']
+
+    def test_unlooped_video_is_copied(self):
+        cmd = self.build("v.mp4", "a.mp3", "out.mp4", 50, 'video', 10.0, 10.0)
+        assert cmd[2:6] == ['-i', 'v.mp4', '-i', 'a.mp3']
+        assert 'concat' not in cmd
+        self.assert_video_copied(cmd)
+        assert cmd[cmd.index('-filter_complex') + 1] == '[1:a]volume=0.5,atrim=duration=10.0[a]'
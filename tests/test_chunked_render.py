@@ -0,0 +1,280 @@
+# Copyright (c) 2025
+# Tests for chunked compose rendering across local processes and peers
+
+"""Chunk planning, commands and dispatch of services/v1/ffmpeg/chunked_render.py."""
+
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ast_helpers import load_functions, read_source
+
+
+def load_chunked_render():
+    namespace = {
+        "os": os, "time": time, "statistics": statistics, "deque": deque,
+        "ThreadPoolExecutor": ThreadPoolExecutor, "wait": wait, "FIRST_COMPLETED": FIRST_COMPLETED,
+        "logger": logging.getLogger("test_chunked_render"),
+    }
+    load_functions(read_source("services", "v1", "ffmpeg", "ffmpeg_compose.py"), {
+        "append_options", "get_output_extension", "get_extension_from_format"
+    }, namespace)
+    return load_functions(read_source("services", "v1", "ffmpeg", "chunked_render.py"), {
+        "split_output_options", "has_codec_option", "get_chunked_render_plan", "plan_render_chunks", "apply_chunk_offset",
+        "build_chunk_request", "build_local_chunk_command", "build_audio_command",
+        "build_render_stitch_command", "find_straggler", "dispatch_chunks"
+    }, namespace)
+
+
+def make_request(output_options, input_options=None, **extra):
+    data = {
+        "inputs": [{"file_url": "https://example.com/in.mp4", "options": input_options or []}],
+        "outputs": [{"options": output_options}],
+    }
+    data.update(extra)
+    return data
+
+
+X264 = [
+    {"option": "-c:v", "argument": "libx264"},
+    {"option": "-crf", "argument": 20},
+    {"option": "-vf", "argument": "scale=1280:-2,fade=in:0:30"},
+    {"option": "-c:a", "argument": "aac"},
+    {"option": "-b:a", "argument": "128k"},
+    {"option": "-movflags", "argument": "+faststart"},
+]
+
+
+class TestChunkedRenderPlan:
+    def setup_method(self):
+        self.ns = load_chunked_render()
+
+    def test_single_timeline_is_eligible(self):
+        plan, reason = self.ns["get_chunked_render_plan"](make_request(X264))
+        assert reason is None
+        assert [o["option"] for o in plan["video_options"]] == ["-c:v", "-crf", "-vf"]
+        assert [o["option"] for o in plan["audio_options"]] == ["-c:a", "-b:a"]
+        assert [o["option"] for o in plan["mux_options"]] == ["-movflags"]
+        assert plan["extension"] == "mp4" and plan["audio"]
+
+    def test_filter_graphs_and_several_outputs_are_not(self):
+        plan, _ = self.ns["get_chunked_render_plan"](make_request(X264, filters=[{"filter": "[0:v]null[v]"}]))
+        assert plan is None
+        data = make_request(X264)
+        data["outputs"].append({"options": X264})
+        assert self.ns["get_chunked_render_plan"](data)[0] is None
+
+    def test_timeline_options_are_not(self):
+        for option in ("-ss", "-t", "-map", "-frames:v", "-shortest"):
+            data = make_request(X264 + [{"option": option, "argument": "1"}])
+            assert self.ns["get_chunked_render_plan"](data)[0] is None, option
+        data = make_request(X264, input_options=[{"option": "-stream_loop", "argument": "2"}])
+        assert self.ns["get_chunked_render_plan"](data)[0] is None
+
+    def test_stream_copy_and_images_are_not(self):
+        assert self.ns["get_chunked_render_plan"](make_request([{"option": "-c", "argument": "copy"}]))[0] is None
+        assert self.ns["get_chunked_render_plan"](make_request([{"option": "-f", "argument": "gif"}]))[0] is None
+
+    def test_requested_codecs_are_kept(self):
+        plan, _ = self.ns["get_chunked_render_plan"](make_request([{"option": "-c:v", "argument": "libx265"},
+                                                                  {"option": "-acodec", "argument": "libmp3lame"}]))
+        assert plan["video_options"] == [{"option": "-c:v", "argument": "libx265"}]
+        assert plan["audio_options"] == [{"option": "-acodec", "argument": "libmp3lame"}]
+
+    def test_an_disables_audio(self):
+        plan, _ = self.ns["get_chunked_render_plan"](make_request(X264 + [{"option": "-an"}]))
+        assert plan["audio"] is False
+
+
+class TestPlanRenderChunks:
+    def setup_method(self):
+        self.plan = load_chunked_render()["plan_render_chunks"]
+
+    def test_chunks_start_on_keyframes(self):
+        keyframes = [i * 2.0 for i in range(60)]
+        assert self.plan(keyframes, 120.0, 30) == [(0.0, 30.0), (30.0, 60.0), (60.0, 90.0), (90.0, 120.0)]
+
+    def test_irregular_gops(self):
+        chunks = self.plan([0.0, 7.0, 31.5, 33.0, 64.0, 70.0], 100.0, 30)
+        assert chunks == [(0.0, 31.5), (31.5, 64.0), (64.0, 100.0)]
+
+    def test_short_tail_is_merged(self):
+        keyframes = [i * 5.0 for i in range(14)]
+        assert self.plan(keyframes, 70.0, 30) == [(0.0, 30.0), (30.0, 70.0)]
+
+    def test_contiguous_cover(self):
+        chunks = self.plan([i * 4.17 for i in range(900)], 3600.0, 30)
+        assert chunks[0][0] == 0.0 and chunks[-1][1] == 3600.0
+        assert all(chunks[i][1] == chunks[i + 1][0] for i in range(len(chunks) - 1))
+
+
+class TestChunkCommands:
+    def setup_method(self):
+        self.ns = load_chunked_render()
+        self.data = make_request(X264)
+        self.plan = self.ns["get_chunked_render_plan"](self.data)[0]
+
+    def test_filters_run_on_the_source_timeline(self):
+        options = self.ns["apply_chunk_offset"](self.plan["video_options"], 30.0)
+        vf = [o["argument"] for o in options if o["option"] == "-vf"][0]
+        assert vf == "setpts=PTS+30.000000/TB,scale=1280:-2,fade=in:0:30,setpts=PTS-STARTPTS"
+
+    def test_peer_request_is_a_compose_payload(self):
+        payload = self.ns["build_chunk_request"](self.data, self.plan, 30.0, 60.0)
+        assert payload["inputs"][0]["file_url"] == "https://example.com/in.mp4"
+        assert payload["inputs"][0]["options"] == [
+            {"option": "-ss", "argument": "30.000000"}, {"option": "-t", "argument": "30.000000"}
+        ]
+        options = [o["option"] for o in payload["outputs"][0]["options"]]
+        assert "-an" in options and "-movflags" not in options and "-c:a" not in options
+        assert "chunked_render" not in payload
+
+    def test_local_chunk_command(self):
+        cmd = self.ns["build_local_chunk_command"](self.data, "/tmp/in.mp4", self.plan, 0.0, 30.0, "/tmp/c.mkv", threads=4)
+        assert cmd.index('-ss') < cmd.index('-i')
+        assert cmd[-3:] == ['-f', 'matroska', '/tmp/c.mkv']
+        assert '-an' in cmd and '-c:a' not in cmd
+
+    def test_audio_and_stitch_commands(self):
+        audio = self.ns["build_audio_command"](self.data, "/tmp/in.mp4", self.plan, "/tmp/a.mka")
+        assert '-vn' in audio and '-c:a' in audio and '-vf' not in audio
+        stitch = self.ns["build_render_stitch_command"]("/tmp/list.txt", "/tmp/a.mka", self.plan, "/tmp/out.mp4")
+        assert stitch[stitch.index('-c') + 1] == 'copy'
+        assert '+faststart' in stitch and stitch[-1] == '/tmp/out.mp4'
+
+    def codecs(self, cmd):
+        return {name: cmd[i + 1] for i, name in enumerate(cmd) if name in ('-c:v', '-c:a', '-c')}
+
+    def test_codecless_request_gets_the_container_encoders(self):
+        for extension, expected in (("mp4", ("libx264", "aac")), ("webm", ("libvpx-vp9", "libopus"))):
+            data = make_request([{"option": "-crf", "argument": 23}, {"option": "-f", "argument": extension}])
+            plan, reason = self.ns["get_chunked_render_plan"](data)
+            assert reason is None
+            chunk = self.ns["build_local_chunk_command"](data, "/tmp/in", plan, 0.0, 30.0, "/tmp/c.mkv")
+            audio = self.ns["build_audio_command"](data, "/tmp/in", plan, "/tmp/a.mka")
+            stitch = self.ns["build_render_stitch_command"]("/tmp/list.txt", "/tmp/a.mka", plan, f"/tmp/out.{extension}")
+            assert self.codecs(chunk) == {"-c:v": expected[0]}
+            assert self.codecs(audio) == {"-c:a": expected[1]}
+            assert self.codecs(stitch) == {"-c": "copy"}
+
+    def test_mkv_keeps_the_matroska_defaults(self):
+        data = make_request([{"option": "-crf", "argument": 23}, {"option": "-f", "argument": "mkv"}])
+        plan, _ = self.ns["get_chunked_render_plan"](data)
+        assert plan["extension"] == "mkv"
+        assert not any(o["option"] in ("-c:v", "-c:a") for o in plan["video_options"] + plan["audio_options"])
+
+
+class TestDispatchChunks:
+    def setup_method(self):
+        self.dispatch = load_chunked_render()["dispatch_chunks"]
+
+    def test_results_are_in_chunk_order(self):
+        def run_chunk(index, slot, attempt):
+            time.sleep(0.01 * (5 - index))
+            return f"chunk{index}"
+        results, stats = self.dispatch([10] * 5, ["a", "b"], run_chunk, poll_interval=0.01)
+        assert results == [f"chunk{i}" for i in range(5)]
+        assert sum(stats["by_slot"].values()) == 5
+
+    def test_failed_chunk_is_retried(self):
+        failed = set()
+
+        def run_chunk(index, slot, attempt):
+            if index == 2 and index not in failed:
+                failed.add(index)
+                raise Exception("peer went away")
+            return index
+        results, stats = self.dispatch([10] * 4, ["a", "b"], run_chunk, poll_interval=0.01)
+        assert results == [0, 1, 2, 3]
+        assert stats["failed_attempts"] == 1
+
+    def test_chunk_failing_every_attempt_raises(self):
+        def run_chunk(index, slot, attempt):
+            if index == 1:
+                raise Exception("bad input")
+            return index
+        try:
+            self.dispatch([10] * 3, ["a", "b"], run_chunk, max_attempts=2, poll_interval=0.01)
+        except Exception as e:
+            assert "Chunk 1 failed 2 times" in str(e)
+        else:
+            raise AssertionError("expected failure")
+
+    def test_straggler_is_redispatched(self):
+        release = threading.Event()
+        cancelled = []
+
+        def run_chunk(index, slot, attempt):
+            if slot == "slow":
+                release.wait(5)
+                raise Exception("cancelled")
+            time.sleep(0.02)
+            return (index, slot)
+
+        def cancel_attempt(index, attempt):
+            cancelled.append((index, attempt))
+            release.set()
+
+        start = time.time()
+        results, stats = self.dispatch([10] * 6, ["slow", "fast"], run_chunk, cancel_attempt, poll_interval=0.01)
+        assert time.time() - start < 2
+        assert all(slot == "fast" for _, slot in results)
+        assert stats["redispatched"] >= 1 and cancelled
+
+
+class TestPeerChunks:
+    def load(self, download):
+        deleted = []
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"code": 200, "response": [{"file_url": "https://bucket.example.com/chunk.mkv"}]}
+
+        class Requests:
+            @staticmethod
+            def post(url, json, headers, timeout):
+                return Response()
+
+        ns = load_functions(read_source("services", "v1", "ffmpeg", "chunked_render.py"), {"render_chunk_on_peer"}, {
+            "requests": Requests, "API_KEY": "key", "LOCAL_STORAGE_PATH": "/tmp",
+            "download_file": download, "delete_file": deleted.append
+        })
+        return ns["render_chunk_on_peer"], deleted
+
+    def test_peer_chunk_object_is_deleted_after_download(self):
+        render, deleted = self.load(lambda url, path: "/tmp/chunk.mkv")
+        assert render("http://peer", {}) == "/tmp/chunk.mkv"
+        assert deleted == ["https://bucket.example.com/chunk.mkv"]
+
+    def test_peer_chunk_object_is_deleted_when_download_fails(self):
+        def download(url, path):
+            raise OSError("disk full")
+        render, deleted = self.load(download)
+        try:
+            render("http://peer", {})
+        except OSError:
+            pass
+        assert deleted == ["https://bucket.example.com/chunk.mkv"]
+
+
+class TestComposeIntegration:
+    def test_input_is_probed_before_download(self):
+        source = read_source("services", "v1", "ffmpeg", "chunked_render.py")
+        assert source.index("get_media_probe(input_url)") < source.index("download_file(input_url")
+        assert "process_ffmpeg_compose(data, job_id, local_paths={input_url: local_path})" in source
+
+    def test_route_exposes_chunked_render(self):
+        source = read_source("routes", "v1", "ffmpeg", "ffmpeg_compose.py")
+        assert '"chunked_render": {"type": "boolean"}' in source
+        assert "process_ffmpeg_compose_chunked(data, job_id)" in source
+
+    def test_peers_are_configurable(self):
+        source = read_source("config.py")
+        assert "COMPOSE_PEERS" in source and "COMPOSE_CHUNK_DURATION" in source
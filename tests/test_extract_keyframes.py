@@ -0,0 +1,33 @@
+# Copyright (c) 2025
+# Tests for keyframe extraction
+
+"""The keyframe extraction command of services/extract_keyframes.py."""
+
+from ast_helpers import load_functions, read_source
+
+
+class TestKeyframeCommand:
+    def setup_method(self):
+        self.source = read_source("services", "extract_keyframes.py")
+        self.build = load_functions(self.source, {"build_keyframe_command"})["build_keyframe_command"]
+
+    def test_decoder_skips_non_keyframes(self):
+        cmd = self.build("in.mp4", "out_%03d.jpg")
+        assert cmd.index('-skip_frame') < cmd.index('-i')
+        assert cmd[cmd.index('-skip_frame') + 1] == 'nokey'
+        assert "pict_type" not in cmd[cmd.index('-vf') + 1]
+        assert '-frames:v' not in cmd
+
+    def test_limits(self):
+        cmd = self.build("in.mp4", "out_%03d.jpg", max_count=10, min_spacing=2.5)
+        assert cmd[cmd.index('-frames:v') + 1] == '10'
+        assert "gte(t-prev_selected_t,2.5)" in cmd[cmd.index('-vf') + 1]
+        assert cmd[-1] == "out_%03d.jpg"
+
+    def test_route_uploads_concurrently(self):
+        route = read_source("routes", "extract_keyframes.py")
+        assert "upload_files(image_paths)" in route
+        assert '"max_count": {"type": "integer", "minimum": 1}' in route
+        assert '"min_spacing": {"type": "number", "minimum": 0}' in route
+        storage = read_source("services", "cloud_storage.py")
+        assert "def upload_files(file_paths, max_workers=UPLOAD_CONCURRENCY)" in storage
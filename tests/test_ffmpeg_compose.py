@@ -0,0 +1,126 @@
+# Copyright (c) 2025
+# Tests for concurrent downloads and parallel outputs in compose
+
+"""Downloads, parallel outputs and in-encode metadata of the compose service."""
+
+import os
+import re
+
+from ast_helpers import get_function_params, load_functions, read_source
+
+
+class TestComposeDownloads:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "ffmpeg", "ffmpeg_compose.py")
+        self.ns = load_functions(self.source, {"get_compose_urls", "outputs_are_independent"}, {"re": re, "os": os})
+
+    def test_distinct_urls_in_order(self):
+        data = {
+            "inputs": [{"file_url": "https://a/1.mp4"}, {"file_url": "https://a/2.mp4"}, {"file_url": "https://a/1.mp4"}],
+            "filters": [{"filter": "[0:v]subtitles='https://a/s.srt'[v]"}, {"filter": "[1:v]ass=\"https://a/s.ass\"[w]"}],
+        }
+        assert self.ns["get_compose_urls"](data) == [
+            "https://a/1.mp4", "https://a/2.mp4", "https://a/s.srt", "https://a/s.ass"
+        ]
+
+    def test_downloads_are_not_done_inside_re_sub(self):
+        assert "download_file(" not in self.source
+        assert "download_files(missing_urls, LOCAL_STORAGE_PATH)" in self.source
+        assert "if url not in local_paths" in self.source
+
+    def test_independent_outputs(self):
+        independent = self.ns["outputs_are_independent"]
+        two = [{"options": [{"option": "-s", "argument": "1280x720"}]}, {"options": [{"option": "-s", "argument": "640x360"}]}]
+        assert independent({"outputs": two})
+        assert not independent({"outputs": two[:1]})
+        assert not independent({"outputs": two, "filters": [{"filter": "[0:v]split[a][b]"}]})
+        assert not independent({"outputs": two, "global_options": [{"option": "-filter_complex", "argument": "x"}]})
+        assert not independent({"outputs": two + [{"options": [{"option": "-pass", "argument": 1}]}]})
+
+
+class TestConcurrentDownloadHelper:
+    def test_download_files_is_bounded_and_job_aware(self):
+        source = read_source("services", "file_management.py")
+        assert get_function_params(source, "download_files") == ["urls", "storage_path", "max_workers"]
+        assert "bind_job_scratch(download_file)" in source
+        scratch = read_source("services", "scratch_storage.py")
+        assert get_function_params(scratch, "bind_job_scratch") == ["func"]
+
+
+FFMPEG_LOG = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from '/tmp/in.mp4':
+  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p, 1920x1080
+  Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 48000 Hz, stereo
+Stream mapping:
+  Stream #0:0 -> #0:0 (h264 (native) -> hevc (libx265))
+Output #0, mp4, to '/tmp/job_output_0.mp4':
+  Stream #0:0(und): Video: hevc (hev1 / 0x31766568), yuv420p, 1280x720, q=2-31
+  Stream #0:1(und): Audio: opus (Opus / 0x7375704F), 48000 Hz, stereo
+Output #1, image2, to '/tmp/job_output_0_thumbnail.jpg':
+  Stream #1:0: Video: mjpeg, yuvj420p, 1280x720
+frame=  100 fps=50 q=28.0 size=     256kB time=00:00:03.20 bitrate= 655.4kbits/s speed=1.6x\r
+frame=  300 fps=50 q=28.0 Lsize=     912kB time=00:00:10.01 bitrate= 746.3kbits/s speed=1.7x
+"""
+
+
+class TestComposeMetadataFromEncode:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "ffmpeg", "ffmpeg_compose.py")
+        self.ns = load_functions(self.source, {
+            "parse_encode_stats", "plan_thumbnail_output", "get_pad_filter", "is_video_pad"
+        }, {"re": re, "os": os})
+
+    def test_parse_encode_stats(self):
+        stats = self.ns["parse_encode_stats"](FFMPEG_LOG)
+        assert stats["time"] == 10.01
+        assert stats["outputs"]["/tmp/job_output_0.mp4"] == {"video": "hevc", "audio": "opus"}
+        assert stats["outputs"]["/tmp/job_output_0_thumbnail.jpg"] == {"video": "mjpeg"}
+
+    def test_thumbnail_splits_a_video_pad(self):
+        graph = "[0:v]scale=1280:720[v];[0:a]volume=2[a]"
+        options = [{"option": "-map", "argument": "[v]"}, {"option": "-map", "argument": "[a]"}]
+        new_options, args, new_graph = self.ns["plan_thumbnail_output"](options, graph, 0, "t.jpg")
+        assert new_graph == graph + ";[v]split=2[v_main0][v_thumb0]"
+        assert new_options[0] == {"option": "-map", "argument": "[v_main0]"}
+        assert args[:2] == ['-map', '[v_thumb0]'] and args[-1] == "t.jpg"
+        assert '-frames:v' in args
+
+    def test_thumbnail_never_splits_an_audio_or_unknown_pad(self):
+        plan = self.ns["plan_thumbnail_output"]
+        assert plan([{"option": "-map", "argument": "[a]"}], "[0:a]atrim=0:5[a]", 0, "t.jpg") is None
+        assert plan([{"option": "-map", "argument": "[out]"}], "[0:v][0:a]concat=n=1:v=1:a=1[out]", 0, "t.jpg") is None
+        assert plan([], "[0:v]scale=640:-2", 0, "t.jpg") is None
+
+    def test_no_thumbnail_output_without_a_mandatory_video_map(self):
+        plan = self.ns["plan_thumbnail_output"]
+        # Automatic selection or an optional map may find no video, and an
+        # image output without a stream fails the whole encode
+        assert plan([{"option": "-b:a", "argument": "128k"}], None, 0, "t.jpg") is None
+        assert plan([{"option": "-map", "argument": "0:v?"}], None, 0, "t.jpg") is None
+        assert plan([{"option": "-map", "argument": "0:a"}], None, 0, "t.jpg") is None
+        _, args, _ = plan([{"option": "-map", "argument": "0:v:1"}], None, 0, "t.jpg")
+        assert args == ['-map', '0:v:1', '-frames:v', '1', '-an', '-sn', '-dn', 't.jpg']
+
+    def test_thread_budget_covers_the_encode_and_the_thumbnail(self):
+        load_functions(self.source, {"append_options"}, self.ns)
+        runner = load_functions(read_source("services", "ffmpeg_runner.py"), {
+            "_is_option", "find_output_indexes", "apply_thread_budget"
+        }, {"os": os})
+        options = [{"option": "-map", "argument": "0:v"}, {"option": "-map", "argument": "0:a"},
+                   {"option": "-c:v", "argument": "libx264"}, {"option": "-crf", "argument": 23}]
+        options, thumbnail_args, _ = self.ns["plan_thumbnail_output"](options, None, 0, "t.jpg")
+        output_args = []
+        self.ns["append_options"](output_args, options)
+        cmd = ['ffmpeg', '-y', '-i', 'in.mp4'] + output_args + ['out.mp4'] + thumbnail_args
+        cmd = runner["apply_thread_budget"](cmd, 3)
+        assert cmd[cmd.index('out.mp4') - 2:cmd.index('out.mp4')] == ['-threads', '3']
+        assert cmd[-3:] == ['-threads', '3', 't.jpg']
+
+    def test_thumbnail_for_stream_maps_copies_video_options(self):
+        options = [{"option": "-map", "argument": "1:v"}, {"option": "-vf", "argument": "scale=320:-2"}]
+        _, args, graph = self.ns["plan_thumbnail_output"](options, None, 0, "t.jpg")
+        assert graph is None
+        assert args[:4] == ['-map', '1:v:0', '-vf', 'scale=320:-2']
+
+    def test_probe_is_only_a_fallback(self):
+        assert "encode_info=encode_info.get(output_filename)" in self.source
+        assert "if (need_duration and not duration) or (metadata_requests.get('encoder') and not encoder):" in self.source
@@ -0,0 +1,129 @@
+# Copyright (c) 2025
+# Tests for the shared ffmpeg subprocess runner
+
+"""Thread budget, progress parsing and adoption of services/ffmpeg_runner.py."""
+
+import io
+import os
+import re
+
+from ast_helpers import PROJECT_ROOT, load_functions, read_source
+
+
+class TestThreadBudget:
+    def setup_method(self):
+        self.ns = load_functions(read_source("services", "ffmpeg_runner.py"), {
+            "get_thread_budget", "_is_option", "find_output_indexes", "apply_thread_budget"
+        }, {"os": os, "re": re, "FFMPEG_CPU_BUDGET": 8})
+
+    def test_budget_is_shared(self):
+        budget = self.ns["get_thread_budget"]
+        assert budget(1) == 8
+        assert budget(2) == 4
+        assert budget(3) == 2
+        assert budget(20) == 1
+
+    def test_threads_go_before_the_output(self):
+        cmd = self.ns["apply_thread_budget"](['ffmpeg', '-i', 'in.mp4', '-c:v', 'libx264', 'out.mp4'], 4)
+        assert cmd == ['ffmpeg', '-i', 'in.mp4', '-c:v', 'libx264', '-threads', '4', 'out.mp4']
+
+    def test_explicit_threads_and_other_tools_are_kept(self):
+        apply = self.ns["apply_thread_budget"]
+        cmd = ['ffmpeg', '-i', 'in.mp4', '-threads', '2', 'out.mp4']
+        assert apply(cmd, 4) == cmd
+        probe = ['ffprobe', '-v', 'error', 'in.mp4']
+        assert apply(probe, 4) == probe
+        assert apply(['ffmpeg', '-i', 'a', 'b'], None) == ['ffmpeg', '-i', 'a', 'b']
+
+    def test_threads_go_before_the_output_of_compiled_commands(self):
+        # ffmpeg-python's compile(overwrite_output=True) ends with -y, not the output
+        cmd = ['ffmpeg', '-i', 'in.mkv', '-preset', 'medium', 'out.mp4', '-y']
+        assert self.ns["apply_thread_budget"](cmd, 4) == [
+            'ffmpeg', '-i', 'in.mkv', '-preset', 'medium', '-threads', '4', 'out.mp4', '-y'
+        ]
+
+    def test_every_output_gets_threads(self):
+        cmd = ['ffmpeg', '-y', '-i', 'in.mp4', '-map', '0:v', '-an', '-c:v', 'libx264', 'a.mp4',
+               '-map', '0:a', '-vn', 'b.m4a', '-noautorotate', 'c.mp4']
+        assert self.ns["apply_thread_budget"](cmd, 2) == [
+            'ffmpeg', '-y', '-i', 'in.mp4', '-map', '0:v', '-an', '-c:v', 'libx264', '-threads', '2', 'a.mp4',
+            '-map', '0:a', '-vn', '-threads', '2', 'b.m4a', '-noautorotate', '-threads', '2', 'c.mp4'
+        ]
+
+    def test_unknown_flag_falls_back_to_the_last_output(self):
+        # -someflag takes no argument but is not in FLAG_OPTIONS: libx264 would look like an output
+        cmd = ['ffmpeg', '-i', 'in.mp4', '-someflag', '-c:v', 'libx264', 'out.mp4']
+        assert self.ns["find_output_indexes"](cmd) is None
+        assert self.ns["apply_thread_budget"](cmd, 4)[-3:] == ['-threads', '4', 'out.mp4']
+
+
+class TestProgress:
+    def setup_method(self):
+        self.ns = load_functions(read_source("services", "ffmpeg_runner.py"), {
+            "parse_time_value", "parse_progress", "split_stderr_lines"
+        }, {"os": os, "re": re, "FFMPEG_CPU_BUDGET": 8})
+
+    def test_stats_line(self):
+        line = "frame=  240 fps=120 q=28.0 size=     256kB time=00:00:08.00 bitrate= 262.1kbits/s speed=3.99x"
+        progress = self.ns["parse_progress"](line, duration=16)
+        assert progress == {"time": 8.0, "frame": 240, "fps": 120.0, "speed": 3.99, "percent": 50.0}
+
+    def test_other_lines_are_not_progress(self):
+        assert self.ns["parse_progress"]("[silencedetect @ 0x1] silence_start: 1.5") is None
+
+    def test_audio_only_stats(self):
+        progress = self.ns["parse_progress"]("size=N/A time=01:00:00.50 bitrate=N/A speed= 350x")
+        assert progress["time"] == 3600.5 and progress["speed"] == 350.0 and progress["frame"] is None
+
+    def test_carriage_returns_split_lines(self):
+        stream = io.BufferedReader(io.BytesIO(b"Input #0\nframe=1 time=00:00:01.00\rframe=2 time=00:00:02.00\rdone\n"))
+        assert list(self.ns["split_stderr_lines"](stream)) == [
+            "Input #0", "frame=1 time=00:00:01.00", "frame=2 time=00:00:02.00", "done"
+        ]
+
+
+class TestRunnerModule:
+    def setup_method(self):
+        self.source = read_source("services", "ffmpeg_runner.py")
+
+    def test_process_group_is_killed(self):
+        assert "start_new_session=True" in self.source
+        assert "os.killpg" in self.source
+
+    def test_stderr_is_bounded(self):
+        assert "capture_output" not in self.source
+        assert "deque(maxlen=STDERR_TAIL_LINES)" in self.source
+
+    def test_priority_and_deadline(self):
+        assert "os.setpriority" in self.source
+        assert "class FFmpegTimeout(FFmpegError)" in self.source
+
+    def test_settings_are_configurable(self):
+        config = read_source("config.py")
+        for name in ("FFMPEG_CPU_BUDGET", "FFMPEG_PRIORITY", "FFMPEG_TIMEOUT"):
+            assert name in config
+
+
+class TestServicesUseTheRunner:
+    def test_no_direct_ffmpeg_subprocesses(self):
+        """ffmpeg is only started by the runner; the remaining subprocesses run ffprobe or fc-list."""
+        callers = set()
+        for root, _, files in os.walk(os.path.join(PROJECT_ROOT, "services")):
+            for name in files:
+                if name.endswith(".py"):
+                    source = read_source(root, name)
+                    assert ".run(capture_stdout" not in source, name
+                    assert "ffmpeg.run(" not in source, name
+                    if re.search(r"subprocess\.(run|Popen)\(", source):
+                        callers.add(os.path.relpath(os.path.join(root, name), PROJECT_ROOT))
+        assert callers == {
+            os.path.join("services", "ffmpeg_runner.py"),
+            os.path.join("services", "media_probe.py"),
+            os.path.join("services", "caption_video.py"),
+            os.path.join("services", "v1", "ffmpeg", "ffmpeg_compose.py"),
+            os.path.join("services", "v1", "video", "smart_cut.py"),
+        }
+
+    def test_streaming_callers(self):
+        assert "start_ffmpeg(cmd, stdout=subprocess.PIPE" in read_source("services", "stream_output.py")
+        assert "start_ffmpeg(cmd, stdin=subprocess.PIPE" in read_source("services", "ken_burns.py")
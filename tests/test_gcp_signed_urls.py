@@ -0,0 +1,42 @@
+# Copyright (c) 2025
+# Tests for cached GCS signing credentials and batch signed URLs
+
+"""Cached GCS signing credentials and batch signed URLs."""
+
+from ast_helpers import get_function_params, read_source
+
+
+class TestCachedClient:
+    """The GCS client and signing credentials are built once per process."""
+
+    def setup_method(self):
+        self.source = read_source("services", "v1", "gcp", "signed_url.py")
+
+    def test_client_is_cached(self):
+        assert "_client_cache" in self.source
+        assert "_client_lock" in self.source
+
+    def test_upload_service_reuses_cached_client(self):
+        source = read_source("services", "v1", "gcp", "upload.py")
+        assert "get_gcs_client_with_credentials" in source
+        assert "from_service_account_info" not in source
+
+    def test_download_existence_check_is_optional(self):
+        params = get_function_params(self.source, "generate_signed_download_url")
+        assert "check_exists" in params
+
+
+class TestBatchSigning:
+    """Many URLs can be signed in one request."""
+
+    def test_batch_function(self):
+        source = read_source("services", "v1", "gcp", "signed_url.py")
+        assert get_function_params(source, "generate_signed_urls_batch") == [
+            "items", "bucket_name", "check_exists"
+        ]
+        assert "MAX_BATCH_SIZE = 500" in source
+
+    def test_batch_route(self):
+        source = read_source("routes", "v1", "gcp", "signed_urls.py")
+        assert "'/v1/gcp/signed-urls'" in source
+        assert '"maxItems": MAX_BATCH_SIZE' in source
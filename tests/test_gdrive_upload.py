@@ -0,0 +1,33 @@
+# Copyright (c) 2025
+# Tests for the pipelined, resumable Google Drive chunk upload
+
+"""Pipelined, resumable chunk uploads of routes/gdrive_upload.py."""
+
+from ast_helpers import get_function_params, read_source
+
+
+class TestGdriveUpload:
+    """Chunks are prefetched, sized adaptively and resumed from acknowledged bytes."""
+
+    def setup_method(self):
+        self.source = read_source("routes", "gdrive_upload.py")
+
+    def test_upload_signature(self):
+        assert get_function_params(self.source, "upload_file_in_chunks") == [
+            "file_url", "upload_url", "total_size", "job_id", "chunk_size", "adaptive"
+        ]
+
+    def test_prefetcher_is_double_buffered(self):
+        assert "class ChunkPrefetcher" in self.source
+        assert "queue.Queue(maxsize=1)" in self.source
+
+    def test_chunks_are_256k_aligned(self):
+        assert "CHUNK_ALIGNMENT = 256 * 1024" in self.source
+        assert get_function_params(self.source, "align_chunk_size") == ["chunk_size"]
+
+    def test_resume_uses_acknowledged_range(self):
+        assert "bytes */{total_size}" in self.source
+        assert get_function_params(self.source, "parse_acknowledged_bytes") == ["response"]
+
+    def test_schema_allows_disabling_adaptive_chunks(self):
+        assert '"adaptive_chunk_size": {"type": "boolean"}' in self.source
@@ -0,0 +1,45 @@
+# Copyright (c) 2025
+# Tests for the Ken Burns renderer
+
+"""Crop path and frame pipe of the Ken Burns renderer in services/ken_burns.py."""
+
+from ast_helpers import load_functions, read_source
+
+
+class TestKenBurnsGeometry:
+    def setup_method(self):
+        self.source = read_source("services", "ken_burns.py")
+        self.functions = load_functions(
+            self.source, {"get_output_size", "get_zoom", "get_crop_box", "choose_mip_level"}
+        )
+
+    def test_orientation(self):
+        assert self.functions["get_output_size"](4000, 3000) == (1920, 1080)
+        assert self.functions["get_output_size"](3000, 4000) == (1080, 1920)
+
+    def test_zoom_matches_zoompan_curve(self):
+        get_zoom = self.functions["get_zoom"]
+        # zoompan: min(1 + (speed * length) * on / (length * fps), 1 + speed * length)
+        assert get_zoom(0, 30, 0.03, 1.9) == 1
+        assert abs(get_zoom(450, 30, 0.03, 1.9) - 1.45) < 1e-9
+        assert get_zoom(10000, 30, 0.03, 1.9) == 1.9
+
+    def test_crop_box_is_centered_and_fractional(self):
+        left, upper, right, lower = self.functions["get_crop_box"](4000, 3000, 1.5)
+        assert abs((right - left) - 4000 / 1.5) < 1e-9
+        assert abs(left - (4000 - right)) < 1e-9
+        assert abs(upper - (3000 - lower)) < 1e-9
+        assert left != int(left)
+
+    def test_mip_level_keeps_supersampling(self):
+        choose = self.functions["choose_mip_level"]
+        sizes = [(8000, 6000), (4000, 3000), (2000, 1500)]
+        assert choose(sizes, 1.0, (1920, 1080)) == 1
+        assert choose(sizes, 1 / 1.9, (1920, 1080)) == 0
+        assert choose([(1000, 800)], 1.0, (1920, 1080)) == 0
+
+    def test_services_use_renderer(self):
+        for parts in (("services", "image_to_video.py"), ("services", "v1", "image", "convert", "image_to_video.py")):
+            source = read_source(*parts)
+            assert "render_ken_burns" in source
+            assert "7680" not in source
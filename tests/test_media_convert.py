@@ -0,0 +1,36 @@
+# Copyright (c) 2025
+# Tests for the media convert remux fast path
+
+"""Stream copy planning of services/v1/media/convert/media_convert.py."""
+
+from ast_helpers import load_functions, read_source
+
+
+class TestRemuxPlan:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "media", "convert", "media_convert.py")
+        self.plan = load_functions(self.source, {"plan_stream_handling"})["plan_stream_handling"]
+
+    def test_container_change_is_remuxed(self):
+        plan = self.plan('mp4', 'libx264', 'aac', 'h264', 'aac')
+        assert plan == {"video": "copy", "audio": "copy", "method": "remux"}
+
+    def test_only_mismatched_audio_is_encoded(self):
+        plan = self.plan('mp4', 'libx264', 'aac', 'h264', 'pcm_s16le')
+        assert plan == {"video": "copy", "audio": "encode", "method": "partial"}
+
+    def test_container_must_accept_codec(self):
+        plan = self.plan('webm', 'libx264', 'aac', 'h264', 'aac')
+        assert plan["method"] == "transcode"
+
+    def test_different_codec_is_transcoded(self):
+        assert self.plan('mp4', 'libx265', 'aac', 'h264', 'mp3')["method"] == "transcode"
+
+    def test_audio_only_output_ignores_video(self):
+        plan = self.plan('mp3', 'libx264', 'libmp3lame', 'h264', 'mp3')
+        assert plan == {"video": None, "audio": "copy", "method": "remux"}
+
+    def test_route_exposes_remux(self):
+        route = read_source("routes", "v1", "media", "convert", "media_convert.py")
+        assert '"remux": {"type": "boolean"}' in route
+        assert '"include_report": {"type": "boolean"}' in route
@@ -0,0 +1,87 @@
+# Copyright (c) 2025
+# Tests for single and batch media metadata
+
+"""Single and batch media metadata of services/v1/media/metadata.py."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from ast_helpers import load_functions, read_source
+from test_media_probe import FakeRequests, load_probe_cache
+
+
+PROBE_DATA = {
+    "format": {"size": "2097152", "duration": "90.5", "format_name": "mov,mp4", "bit_rate": "1500000"},
+    "streams": [
+        {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+         "r_frame_rate": "30000/1001", "pix_fmt": "yuv420p"},
+        {"codec_type": "audio", "codec_name": "aac", "channels": 2, "sample_rate": "48000"},
+    ],
+}
+
+
+class TestMediaMetadata:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "media", "metadata.py")
+        self.namespace = load_functions(
+            self.source,
+            {"build_media_metadata", "get_media_metadata_batch"},
+            {"logger": logging.getLogger("test"), "ThreadPoolExecutor": ThreadPoolExecutor,
+             "METADATA_CONCURRENCY": 4}
+        )
+
+    def test_metadata_fields(self):
+        metadata = self.namespace["build_media_metadata"](PROBE_DATA)
+        assert metadata["filesize"] == 2097152 and metadata["filesize_mb"] == 2.0
+        assert metadata["duration_formatted"] == "00:01:30.50"
+        assert metadata["resolution"] == "1920x1080"
+        assert metadata["fps"] == 29.97
+        assert metadata["audio_sample_rate_khz"] == 48.0
+        assert metadata["has_video"] and metadata["has_audio"]
+
+    def test_batch_keeps_order_and_isolates_errors(self):
+        def fake_metadata(media_url, job_id=None):
+            if "bad" in media_url:
+                raise Exception("ffprobe failed")
+            return {"url": media_url}
+
+        self.namespace["get_media_metadata"] = fake_metadata
+        urls = [f"https://example.com/{i}.mp4" for i in range(10)] + ["https://example.com/bad.mp4"]
+        results = self.namespace["get_media_metadata_batch"](urls, "job")
+        assert [item["media_url"] for item in results] == urls
+        assert results[0]["metadata"] == {"url": urls[0]}
+        assert results[-1] == {"media_url": "https://example.com/bad.mp4", "error": "ffprobe failed"}
+
+    def test_batch_is_served_from_the_store_of_another_worker(self, tmp_path):
+        store = str(tmp_path / "probes.sqlite3")
+        fake_requests, probes = FakeRequests(), []
+        urls = [f"https://example.com/{i}.mp4" for i in range(5)]
+
+        def run_batch():
+            probe_cache = load_probe_cache(store, fake_requests, probes)
+            self.namespace["get_media_probe"] = probe_cache["get_media_probe"]
+            load_functions(self.source, {"get_media_metadata"}, self.namespace)
+            return self.namespace["get_media_metadata_batch"](urls, "job")
+
+        fake_requests.headers = {"etag": '"v1"', "content-length": "1"}
+        first = run_batch()
+        assert len(probes) == 5
+        assert run_batch() == first
+        assert len(probes) == 5
+
+        # Same size, new content: a new ETag reports the new file
+        fake_requests.headers = {"etag": '"v2"', "content-length": "1"}
+        third = run_batch()
+        assert len(probes) == 10
+        assert third[0]["metadata"]["filesize"] != first[0]["metadata"]["filesize"]
+
+    def test_uses_cached_fast_probe(self):
+        assert "get_media_probe(media_url, fast=True)" in self.source
+        assert "subprocess" not in self.source
+        probe_source = read_source("services", "media_probe.py")
+        assert "def get_media_probe(source, timeout=60, fast=False)" in probe_source
+
+    def test_batch_route(self):
+        route = read_source("routes", "v1", "media", "metadata.py")
+        assert "'/v1/media/metadata/batch'" in route
+        assert '"maxItems": MAX_BATCH_URLS' in route
@@ -0,0 +1,150 @@
+# Copyright (c) 2025
+# Tests for the cached ffprobe service
+
+"""The ffprobe cache of services/media_probe.py and its call sites."""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ast_helpers import load_functions, read_source
+
+
+PROBE_JSON = {
+    "format": {"duration": "12.500000", "bit_rate": "800000"},
+    "streams": [
+        {"codec_type": "video", "codec_name": "mjpeg", "width": 600, "height": 600,
+         "disposition": {"attached_pic": 1}},
+        {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+         "avg_frame_rate": "0/0", "r_frame_rate": "30000/1001", "disposition": {"attached_pic": 0}},
+        {"codec_type": "audio", "codec_name": "aac"},
+    ],
+}
+
+
+class TestMediaProbe:
+    def setup_method(self):
+        self.source = read_source("services", "media_probe.py")
+        self.ns = load_functions(self.source, {"MediaProbe", "_parse_rate"})
+
+    def test_typed_accessors(self):
+        probe = self.ns["MediaProbe"](PROBE_JSON)
+        assert probe.duration == 12.5
+        assert probe.bit_rate == 800000
+        assert (probe.width, probe.height) == (1920, 1080)
+        assert probe.video_codec == "h264" and probe.audio_codec == "aac"
+        assert round(probe.frame_rate, 3) == 29.97
+
+    def test_missing_values(self):
+        probe = self.ns["MediaProbe"]({"format": {"duration": "N/A"}, "streams": []})
+        assert probe.duration is None
+        assert not probe.has_video and not probe.has_audio
+        assert (probe.width, probe.height) == (0, 0)
+
+
+class FakeRequests:
+    """Stands in for requests.head, returning the headers set by the test."""
+
+    class RequestException(Exception):
+        pass
+
+    def __init__(self):
+        self.headers = {}
+
+    def head(self, url, allow_redirects=True, timeout=None):
+        return type("Response", (), {"ok": True, "headers": self.headers})()
+
+
+def load_probe_cache(store_path, fake_requests, probes, ttl=300):
+    """A fresh copy of the probe cache, as a new worker process would have."""
+    def run_ffprobe(source, timeout, fast=False):
+        probes.append(source)
+        return {"format": {"size": str(len(probes)), "duration": "10.0"}, "streams": []}
+
+    namespace = load_functions(read_source("services", "media_probe.py"), {
+        "MediaProbe", "_is_url", "get_content_key", "_get_store", "_load_from_store",
+        "_save_to_store", "_remember", "get_media_probe", "get_probe_cache_stats",
+    }, {
+        "os": os, "json": json, "time": time, "sqlite3": sqlite3, "logger": logging.getLogger("test"),
+        "requests": fake_requests, "PROBE_CACHE_SIZE": 16, "PROBE_CACHE_URL_TTL": ttl,
+        "PROBE_CACHE_PATH": store_path, "PROBE_CACHE_STORE_SIZE": 100,
+        "_cache": OrderedDict(), "_cache_lock": threading.Lock(), "_store_local": threading.local(),
+        "_cache_stats": {"hits": 0, "store_hits": 0, "misses": 0, "evictions": 0, "store_writes": 0},
+    })
+    namespace["_run_ffprobe"] = run_ffprobe
+    return namespace
+
+
+class TestProbeCache:
+    url = "https://cdn.example.com/clip.mp4"
+
+    def setup_method(self):
+        self.requests = FakeRequests()
+        self.probes = []
+
+    def test_local_files_are_keyed_by_inode_mtime_and_size(self, tmp_path):
+        ns = load_probe_cache(str(tmp_path / "probes.sqlite3"), self.requests, self.probes)
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(b"a" * 10)
+        ns["get_media_probe"](str(path))
+        ns["get_media_probe"](str(path))
+        assert len(self.probes) == 1
+        path.write_bytes(b"b" * 20)
+        ns["get_media_probe"](str(path))
+        assert len(self.probes) == 2
+
+    def test_url_probes_survive_a_restart(self, tmp_path):
+        store = str(tmp_path / "probes.sqlite3")
+        self.requests.headers = {"etag": '"v1"'}
+        first = load_probe_cache(store, self.requests, self.probes)["get_media_probe"](self.url, fast=True)
+        worker = load_probe_cache(store, self.requests, self.probes)
+        second = worker["get_media_probe"](self.url, fast=True)
+        assert len(self.probes) == 1
+        assert second.data == first.data
+        assert worker["get_probe_cache_stats"]()["store_hits"] == 1
+
+    def test_a_new_etag_is_probed_again(self, tmp_path):
+        store = str(tmp_path / "probes.sqlite3")
+        self.requests.headers = {"etag": '"v1"'}
+        load_probe_cache(store, self.requests, self.probes)["get_media_probe"](self.url)
+        self.requests.headers = {"etag": '"v2"'}
+        load_probe_cache(store, self.requests, self.probes)["get_media_probe"](self.url)
+        assert len(self.probes) == 2
+
+    def test_content_length_is_not_a_validator(self, tmp_path):
+        store = str(tmp_path / "probes.sqlite3")
+        self.requests.headers = {"content-length": "1000"}
+        ns = load_probe_cache(store, self.requests, self.probes, ttl=0)
+        assert ns["get_content_key"](self.url) == (("url", self.url, None), False)
+        ns["get_media_probe"](self.url)
+        load_probe_cache(store, self.requests, self.probes, ttl=0)["get_media_probe"](self.url)
+        assert len(self.probes) == 2
+
+    def test_store_can_be_disabled(self, tmp_path):
+        self.requests.headers = {"etag": '"v1"'}
+        load_probe_cache("", self.requests, self.probes)["get_media_probe"](self.url)
+        load_probe_cache("", self.requests, self.probes)["get_media_probe"](self.url)
+        assert len(self.probes) == 2
+        assert os.listdir(tmp_path) == []
+
+
+class TestProbeCallSites:
+    """The services that used to run their own ffprobe go through the cache."""
+
+    def test_call_sites_use_the_cache(self):
+        for parts in [
+            ("services", "v1", "autoedit", "frame_extractor.py"),
+            ("services", "v1", "autoedit", "ffmpeg_builder.py"),
+            ("services", "v1", "video", "cut.py"),
+            ("services", "v1", "video", "split.py"),
+            ("services", "v1", "video", "trim.py"),
+            ("services", "ass_toolkit.py"),
+        ]:
+            source = read_source(*parts)
+            assert "get_media_probe(" in source, parts
+            assert "'ffprobe'" not in source and '"ffprobe"' not in source, parts
+            assert "ffmpeg.probe(" not in source, parts
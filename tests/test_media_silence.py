@@ -0,0 +1,53 @@
+# Copyright (c) 2025
+# Tests for the streaming silence detection engine
+
+"""The streaming silence detection of services/v1/media/silence.py."""
+
+import re
+from collections import deque
+
+from ast_helpers import load_functions, read_source
+
+
+class TestSilenceEngine:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "media", "silence.py")
+        self.functions = load_functions(
+            self.source, {"parse_time", "build_silence_command", "parse_silence_lines"},
+            {"re": re, "deque": deque}
+        )
+
+    def test_command_seeks_and_decodes_audio_only(self):
+        cmd = self.functions["build_silence_command"]("https://example.com/a.mp4", 600.0, 660.0, "-30dB", 0.5, True)
+        assert cmd.index('-ss') < cmd.index('-i')
+        assert cmd[cmd.index('-t') + 1] == '60.0'
+        assert '-vn' in cmd[:cmd.index('-i')]
+        assert cmd[cmd.index('-map') + 1] == '0:a:0'
+        assert cmd[cmd.index('-af') + 1] == "aresample=16000,aformat=channel_layouts=mono,silencedetect=noise=-30dB:d=0.5"
+
+    def test_no_window_has_no_seek(self):
+        cmd = self.functions["build_silence_command"]("a.mp3")
+        assert '-ss' not in cmd and '-t' not in cmd
+
+    def test_parse_time(self):
+        parse_time = self.functions["parse_time"]
+        assert parse_time("01:02:03.5") == 3723.5
+        assert parse_time("90.5") == 90.5
+        assert parse_time("bad") is None
+
+    def test_intervals_are_offset_and_closed(self):
+        lines = [
+            "[silencedetect @ 0x1] silence_start: 1.5",
+            "size=N/A time=00:00:02.00",
+            "[silencedetect @ 0x1] silence_end: 3.25 | silence_duration: 1.75",
+            "[silencedetect @ 0x1] silence_start: 55",
+        ]
+        intervals = list(self.functions["parse_silence_lines"](iter(lines), offset=600.0, window_end=660.0))
+        assert intervals == [
+            {"start": 601.5, "end": 603.25, "duration": 1.75},
+            {"start": 655.0, "end": 660.0, "duration": 5.0},
+        ]
+
+    def test_no_full_download(self):
+        assert "download_file" not in self.source
+        assert "start_ffmpeg(cmd, stream_stderr=True" in self.source
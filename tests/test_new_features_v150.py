@@ -379,12 +379,12 @@ class TestIntegration:
         for file_path in files:
             assert os.path.exists(file_path), f"File not found: {file_path}"
 
-    def test_ffmpeg_builder_uses_subprocess_for_ffprobe(self):
-        """Verify ffmpeg_builder uses subprocess to call ffprobe."""
+    def test_ffmpeg_builder_uses_cached_ffprobe(self):
+        """Verify ffmpeg_builder probes through the cached ffprobe service."""
         with open("services/v1/autoedit/ffmpeg_builder.py", "r") as f:
             content = f.read()
 
-        assert "subprocess" in content
+        assert "get_media_probe" in content
         assert "ffprobe" in content
 
     def test_project_stores_project_context(self):
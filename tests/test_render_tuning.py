@@ -0,0 +1,130 @@
+# Copyright (c) 2025
+# Tests for the host-specific render profile tuning
+
+"""Preset selection and loading of the render profile table in services/render_tuning.py."""
+
+import json
+import math
+import os
+import re
+import time
+
+from ast_helpers import load_functions, read_source
+
+
+HOST = {"cpu_count": 8, "cpu_model": "Test CPU"}
+
+
+class Logger:
+    def warning(self, message):
+        pass
+
+    info = warning
+
+
+def row(preset, threads, fps, cpu_seconds, size):
+    return {"preset": preset, "threads": threads, "fps": fps, "speed": fps / 30,
+            "cpu_seconds": cpu_seconds, "size": size}
+
+
+class TestSelection:
+    def setup_method(self):
+        self.ns = load_functions(read_source("services", "render_tuning.py"), {
+            "parse_min_speed", "pick_threads", "select_profile_settings", "build_profile_table",
+            "load_profile_table", "get_tuned_settings"
+        }, {"os": os, "re": re, "json": json, "math": math, "time": time, "logger": Logger(),
+            "get_host_info": lambda: dict(HOST)})
+
+    def test_min_speed_is_the_lower_bound(self):
+        parse = self.ns["parse_min_speed"]
+        assert parse("2-4x realtime") == 2.0
+        assert parse("0.5-1x realtime") == 0.5
+        assert parse(None) is None
+
+    def test_fewest_threads_near_the_best_fps(self):
+        rows = [row("fast", 1, 40, 10, 100), row("fast", 4, 140, 11, 100), row("fast", 8, 150, 14, 100)]
+        assert self.ns["pick_threads"](rows)["threads"] == 4
+
+    def test_slower_preset_needs_a_real_saving(self):
+        select = self.ns["select_profile_settings"]
+        # medium doubles the CPU time for 1% smaller output: not worth it
+        rows = [row("fast", 4, 300, 10, 1000), row("medium", 4, 150, 20, 990)]
+        assert select(rows)["preset"] == "fast"
+        # 10% smaller for one doubling is
+        rows = [row("fast", 4, 300, 10, 1000), row("medium", 4, 150, 20, 900)]
+        assert select(rows)["preset"] == "medium"
+
+    def test_speed_target_is_respected(self):
+        select = self.ns["select_profile_settings"]
+        rows = [row("fast", 4, 300, 10, 1000), row("slow", 4, 30, 40, 500)]
+        assert select(rows, min_speed=2)["preset"] == "fast"
+        # Nothing is fast enough: keep the hardcoded preset
+        assert select(rows, min_speed=50, default_preset="slow")["preset"] == "slow"
+        assert select(rows, min_speed=50) is None
+        assert select([]) is None
+
+    def test_lower_ssim_never_replaces_the_hardcoded_preset(self):
+        select = self.ns["select_profile_settings"]
+        slow = dict(row("slow", 4, 30, 40, 1000), ssim=0.985)
+        fast = dict(row("fast", 4, 120, 10, 1000), ssim=0.981)
+        medium = dict(row("medium", 4, 60, 20, 1000), ssim=0.986)
+        # fast is four times cheaper but loses quality at the same CRF
+        assert select([slow, fast], min_speed=0.5, default_preset="slow")["preset"] == "slow"
+        # medium is at least as good, so the cheaper preset wins
+        assert select([slow, fast, medium], min_speed=0.5, default_preset="slow")["preset"] == "medium"
+
+    def test_without_ssim_no_faster_preset_is_chosen(self):
+        select = self.ns["select_profile_settings"]
+        rows = [row("fast", 4, 120, 10, 900), row("slow", 4, 30, 40, 1000), row("slower", 4, 20, 60, 800)]
+        assert select(rows, min_speed=0.5, default_preset="slow")["preset"] == "slower"
+        rows = [row("fast", 4, 120, 10, 900), row("slow", 4, 30, 40, 1000)]
+        assert select(rows, min_speed=0.5, default_preset="slow")["preset"] == "slow"
+
+    def test_table_round_trip(self, tmp_path):
+        profiles = {"standard": {"crf": 23, "preset": "medium", "estimated_speed": "2-4x realtime"}}
+        results = {"standard": [row("fast", 4, 300, 10, 1000), row("medium", 4, 150, 20, 900)]}
+        table = self.ns["build_profile_table"](results, profiles, dict(HOST, ffmpeg="ffmpeg version 6"))
+        assert table["profiles"]["standard"]["preset"] == "medium"
+        assert table["profiles"]["standard"]["crf"] == 23
+
+        path = tmp_path / "render_profiles.json"
+        path.write_text(json.dumps(table))
+        loaded = self.ns["load_profile_table"](str(path))
+        assert loaded["standard"]["threads"] == 4
+
+        self.ns["_tuned_profiles"] = loaded
+        tuned = self.ns["get_tuned_settings"]
+        assert tuned("standard", "medium", 23) == {"preset": "medium", "threads": 4}
+        # Measured at another CRF or not tuned: keep the caller's preset
+        assert tuned("standard", "veryfast", 18) == {"preset": "veryfast", "threads": None}
+        assert tuned("high", "slow", 18) == {"preset": "slow", "threads": None}
+
+    def test_table_from_another_host_is_ignored(self, tmp_path):
+        path = tmp_path / "render_profiles.json"
+        path.write_text(json.dumps({"host": {"cpu_count": 64, "cpu_model": "Other CPU"},
+                                    "profiles": {"standard": {"preset": "fast", "crf": 23}}}))
+        assert self.ns["load_profile_table"](str(path)) == {}
+        assert self.ns["load_profile_table"](str(tmp_path / "missing.json")) == {}
+
+
+class TestIntegration:
+    def test_config_has_table_path(self):
+        assert "RENDER_PROFILE_TABLE" in read_source("config.py")
+
+    def test_render_profiles_are_tuned(self):
+        source = read_source("services", "v1", "autoedit", "ffmpeg_builder.py")
+        assert "get_tuned_settings(profile_name" in source
+        assert source.count('"-threads"') == 2
+
+    def test_route_defaults_are_tuned(self):
+        for parts in (("routes", "v1", "video", "cut.py"), ("routes", "v1", "video", "split.py"),
+                      ("routes", "v1", "video", "trim.py"),
+                      ("routes", "v1", "media", "convert", "media_convert.py")):
+            source = read_source(*parts)
+            assert "get_tuned_settings('standard', 'medium', video_crf)" in source, parts
+            assert "data.get('video_preset', 'medium')" not in source, parts
+
+    def test_benchmark_writes_the_table(self):
+        source = read_source("benchmarks", "render_profile_tuning.py")
+        assert "build_profile_table" in source
+        assert "testsrc2" in source and "sine" in source
@@ -0,0 +1,156 @@
+# Copyright (c) 2025
+# Tests for per-job scratch directories, disk quotas and the storage janitor
+
+"""Job scratch directories, disk quotas and the storage janitor."""
+
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+
+from ast_helpers import get_function_params, load_functions, read_source
+
+
+class TestScratchStorageModule:
+    """services/scratch_storage.py provides job scratch dirs and the janitor."""
+
+    def setup_method(self):
+        self.source = read_source("services", "scratch_storage.py")
+
+    def test_job_scratch_context_manager(self):
+        assert get_function_params(self.source, "job_scratch") == ["job_id", "quota_bytes"]
+        assert "@contextmanager" in self.source
+
+    def test_quota_exception(self):
+        assert "class DiskQuotaExceeded(Exception)" in self.source
+
+    def test_janitor_policies(self):
+        assert get_function_params(self.source, "run_janitor") == [
+            "max_age", "max_bytes", "storage_path", "scratch_root", "ram_root"
+        ]
+
+    def test_janitor_keeps_job_status_files(self):
+        assert "'jobs'" in self.source
+        assert "ACTIVE_JOB_STATUSES" in self.source
+
+    def test_janitor_is_single_sweeper(self):
+        assert "fcntl.flock" in self.source
+
+
+class TestJanitorSweep:
+    """run_janitor only removes what the toolkit created."""
+
+    def setup_method(self):
+        self.ns = load_functions(read_source("services", "scratch_storage.py"), {
+            "run_janitor", "_collect_candidates", "_is_job_active", "_remove",
+            "get_path_size", "get_last_modified"
+        }, {
+            "os": os, "re": re, "json": json, "time": time, "shutil": shutil,
+            "logger": logging.getLogger(__name__), "_active_jobs": {},
+            "_janitor_stats": {"runs": 0, "last_run": None, "last_duration_sec": None,
+                               "files_removed": 0, "bytes_reclaimed": 0},
+            "LOCAL_STORAGE_PATH": "/nonexistent", "RAM_SCRATCH_PATH": None,
+            "STORAGE_MAX_FILE_AGE": 0, "STORAGE_MAX_BYTES": 0
+        })
+
+    def test_persistent_stores_survive(self, tmp_path):
+        job_id = str(uuid.uuid4())
+        for name in ("projects", "workflows", "jobs", "faiss_indexes", "other_program"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "state.json").write_text("{}")
+        (tmp_path / f"{job_id}_input.mp4").write_text("x")
+        (tmp_path / f"{uuid.uuid4()}.mp4").write_text("x")  # download_file
+        (tmp_path / "other_program.sock").write_text("x")
+        (tmp_path / "success.txt").write_text("x")
+        (tmp_path / f"{job_id}_thumbnails").mkdir()
+        (tmp_path / "scratch" / job_id).mkdir(parents=True)
+
+        # Everything is older than max_age
+        old = time.time() - 3600
+        for dirpath, dirnames, filenames in os.walk(tmp_path):
+            for name in dirnames + filenames:
+                os.utime(os.path.join(dirpath, name), (old, old))
+
+        self.ns["run_janitor"](max_age=60, max_bytes=0, storage_path=str(tmp_path),
+                               scratch_root=str(tmp_path / "scratch"), ram_root=None)
+
+        remaining = sorted(os.listdir(tmp_path))
+        assert remaining == [
+            "faiss_indexes", "jobs", "other_program", "other_program.sock", "projects", "scratch",
+            "success.txt", "workflows"
+        ]
+        assert os.listdir(tmp_path / "scratch") == []
+        assert (tmp_path / "projects" / "state.json").exists()
+        assert (tmp_path / "workflows" / "state.json").exists()
+
+
+class TestRamTier:
+    """Small files go to a tmpfs scratch area with a memory budget."""
+
+    def setup_method(self):
+        self.source = read_source("services", "scratch_storage.py")
+
+    def test_allocator_functions(self):
+        assert get_function_params(self.source, "reserve_ram_scratch") == ["num_bytes"]
+        assert get_function_params(self.source, "get_scratch_path") == ["filename", "size_hint"]
+        assert get_function_params(self.source, "allocate_download_dir") == ["storage_path", "num_bytes"]
+
+    def test_budget_and_tmpfs_space_are_checked(self):
+        assert "RAM_SCRATCH_BUDGET_BYTES" in self.source
+        assert "shutil.disk_usage(RAM_SCRATCH_PATH)" in self.source
+
+    def test_download_uses_ram_tier(self):
+        source = read_source("services", "file_management.py")
+        assert "allocate_download_dir(" in source
+        assert "release_download_reservation(" in source
+
+    def test_small_outputs_use_scratch_path(self):
+        for parts in (
+            ("services", "v1", "video", "thumbnail.py"),
+            ("services", "v1", "media", "media_transcribe.py"),
+            ("services", "caption_video.py"),
+        ):
+            assert "get_scratch_path(" in read_source(*parts), parts
+
+
+class TestConfig:
+    """Janitor and quota settings are configurable."""
+
+    def test_config_constants_exist(self):
+        source = read_source("config.py")
+        for name in ("STORAGE_JANITOR_ENABLED", "STORAGE_JANITOR_INTERVAL",
+                     "STORAGE_MAX_FILE_AGE", "STORAGE_MAX_BYTES", "JOB_DISK_QUOTA_BYTES",
+                     "RAM_SCRATCH_PATH", "RAM_SCRATCH_MAX_FILE_BYTES", "RAM_SCRATCH_BUDGET_BYTES"):
+            assert f"{name} = " in source
+
+
+class TestIntegration:
+    """Jobs run inside a scratch directory and downloads respect the quota."""
+
+    def test_app_wraps_jobs(self):
+        source = read_source("app.py")
+        assert source.count("with job_scratch(job_id):") == 3
+        assert "start_storage_janitor()" in source
+
+    def test_download_charges_quota(self):
+        source = read_source("services", "file_management.py")
+        assert "charge_job_quota" in source
+        assert "release_job_quota" in source
+
+    def test_leaking_services_use_scratch_dir(self):
+        for parts in (
+            ("services", "extract_keyframes.py"),
+            ("services", "transcription.py"),
+            ("services", "v1", "ffmpeg", "ffmpeg_compose.py"),
+            ("services", "v1", "autoedit", "frame_extractor.py"),
+        ):
+            source = read_source(*parts)
+            assert "get_job_scratch_dir()" in source or "get_scratch_path(" in source, parts
+
+    def test_storage_route(self):
+        source = read_source("routes", "v1", "toolkit", "storage.py")
+        assert "'/v1/toolkit/storage'" in source
+        assert "get_storage_metrics()" in source
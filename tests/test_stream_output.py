@@ -0,0 +1,79 @@
+# Copyright (c) 2025
+# Tests for streaming ffmpeg output to cloud storage (upload-while-encoding)
+
+"""Streaming compose output to cloud storage while encoding."""
+
+import ast
+
+from ast_helpers import get_function_params, read_source
+
+
+def get_dict_assignment(source, name):
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == name for t in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    return None
+
+
+class TestStreamOutputModule:
+    """services/stream_output.py provides the streaming runner."""
+
+    def setup_method(self):
+        self.source = read_source("services", "stream_output.py")
+
+    def test_runner_signature(self):
+        assert get_function_params(self.source, "run_ffmpeg_to_storage") == [
+            "command", "filename", "content_type"
+        ]
+
+    def test_plan_helpers_exist(self):
+        assert get_function_params(self.source, "get_streaming_plan") == ["extension", "output_options"]
+        assert get_function_params(self.source, "build_streaming_options") == ["output_options", "plan"]
+
+    def test_faststart_is_not_streamable(self):
+        assert "'faststart'" in self.source
+        assert "SEEKABLE_MOVFLAGS" in self.source
+
+    def test_mp4_is_fragmented(self):
+        assert "frag_keyframe+empty_moov" in self.source
+
+    def test_output_goes_to_stdout(self):
+        assert "'pipe:1'" in self.source
+
+
+class TestStorageProviders:
+    """Both storage backends can upload a stream."""
+
+    def test_cloud_storage_upload_stream(self):
+        source = read_source("services", "cloud_storage.py")
+        assert get_function_params(source, "upload_stream") == [
+            "stream", "filename", "content_type", "should_commit"
+        ]
+        assert source.count("def upload_stream") == 4  # abstract, GCP, S3, module level
+
+    def test_gcs_stream_function(self):
+        source = read_source("services", "gcp_toolkit.py")
+        params = get_function_params(source, "stream_to_gcs")
+        assert params is not None and "should_commit" in params
+
+    def test_s3_stream_function_aborts(self):
+        source = read_source("services", "s3_toolkit.py")
+        params = get_function_params(source, "stream_to_s3")
+        assert params is not None and "should_commit" in params
+        assert "abort_multipart_upload" in source
+
+
+class TestComposeIntegration:
+    """The compose endpoint exposes stream_output with a file-mode fallback."""
+
+    def test_route_schema_has_stream_output(self):
+        source = read_source("routes", "v1", "ffmpeg", "ffmpeg_compose.py")
+        assert '"stream_output": {"type": "boolean"}' in source
+        assert "process_ffmpeg_compose_streaming" in source
+
+    def test_service_has_streaming_entry_point(self):
+        source = read_source("services", "v1", "ffmpeg", "ffmpeg_compose.py")
+        assert get_function_params(source, "process_ffmpeg_compose_streaming") == ["data", "job_id"]
+        assert get_function_params(source, "get_compose_streaming_plan") == ["data"]
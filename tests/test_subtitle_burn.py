@@ -0,0 +1,87 @@
+# Copyright (c) 2025
+# Tests for chunked parallel subtitle burn-in
+
+"""Chunk planning and commands of services/subtitle_burn.py and the caption routes."""
+
+import os
+
+from ast_helpers import load_functions, read_source
+
+
+class TestPlanBurnChunks:
+    def setup_method(self):
+        self.source = read_source("services", "subtitle_burn.py")
+        self.plan = load_functions(self.source, {"plan_burn_chunks"}, {"os": os})["plan_burn_chunks"]
+
+    def test_boundaries_are_keyframes(self):
+        keyframes = [i * 2.0 for i in range(60)]
+        chunks = self.plan(keyframes, 120.0, 4)
+        assert chunks == [(0.0, 30.0), (30.0, 60.0), (60.0, 90.0), (90.0, 120.0)]
+
+    def test_nearest_keyframe_is_used(self):
+        chunks = self.plan([0.0, 13.0, 28.0, 41.0], 60.0, 2)
+        assert chunks == [(0.0, 28.0), (28.0, 60.0)]
+
+    def test_chunks_are_contiguous(self):
+        keyframes = [i * 4.17 for i in range(200)]
+        chunks = self.plan(keyframes, 800.0, 8)
+        assert chunks[0][0] == 0.0 and chunks[-1][1] == 800.0
+        assert all(chunks[i][1] == chunks[i + 1][0] for i in range(len(chunks) - 1))
+
+    def test_short_video_uses_fewer_chunks(self):
+        keyframes = [i * 1.0 for i in range(25)]
+        assert len(self.plan(keyframes, 25.0, 8)) == 2
+
+    def test_sparse_keyframes_limit_chunks(self):
+        chunks = self.plan([0.0, 50.0], 100.0, 8)
+        assert chunks == [(0.0, 50.0), (50.0, 100.0)]
+
+    def test_no_keyframes_is_single_chunk(self):
+        assert self.plan([0.0], 100.0, 4) == [(0.0, 100.0)]
+
+    def test_chunk_count_is_capped(self):
+        keyframes = [i * 1.0 for i in range(4000)]
+        assert len(self.plan(keyframes, 4000.0, 100)) == 32
+
+
+class TestChunkCommands:
+    def setup_method(self):
+        self.source = read_source("services", "subtitle_burn.py")
+        self.ns = load_functions(self.source, {
+            "build_offset_subtitle_filter", "build_chunk_command", "build_stitch_command"
+        }, {"os": os})
+
+    def test_first_chunk_filter_is_unchanged(self):
+        assert self.ns["build_offset_subtitle_filter"]("subtitles='a.ass'", 0.0) == "subtitles='a.ass'"
+
+    def test_later_chunks_render_on_the_source_timeline(self):
+        vf = self.ns["build_offset_subtitle_filter"]("subtitles='a.ass'", 30.5)
+        assert vf == "setpts=PTS+30.500000/TB,subtitles='a.ass',setpts=PTS-STARTPTS"
+
+    def test_chunk_command_seeks_input_and_drops_audio(self):
+        cmd = self.ns["build_chunk_command"]("in.mp4", 30.0, 60.0, "subtitles='a.ass'", "c1.mp4", threads=4)
+        assert cmd.index('-ss') < cmd.index('-i')
+        assert cmd[cmd.index('-t') + 1] == "30.000000"
+        assert '-an' in cmd
+        assert cmd[cmd.index('-threads') + 1] == '4'
+        assert cmd[-1] == "c1.mp4"
+
+    def test_stitch_copies_chunks_and_source_audio(self):
+        cmd = self.ns["build_stitch_command"]("list.txt", "in.mp4", "out.mp4")
+        assert cmd[cmd.index('-f') + 1] == 'concat'
+        assert cmd[cmd.index('-c') + 1] == 'copy'
+        assert '1:a?' in cmd
+
+
+class TestCaptionIntegration:
+    def test_service_accepts_chunks(self):
+        source = read_source("services", "caption_video.py")
+        assert "def process_captioning(file_url, caption_srt, caption_type, options, job_id, chunks=1):" in source
+        assert "burn_subtitles(video_path, subtitle_filter, output_path, chunks=chunks)" in source
+
+    def test_routes_expose_chunks_and_report(self):
+        for parts in (("routes", "caption_video.py"), ("routes", "v1", "video", "caption_video.py")):
+            source = read_source(*parts)
+            assert '"chunks": {"type": "integer", "minimum": 1, "maximum": 32}' in source
+            assert '"include_report": {"type": "boolean"}' in source
+            assert "burn_subtitles" in source or "process_captioning" in source
@@ -0,0 +1,71 @@
+# Copyright (c) 2025
+# Tests for the video concatenation planner
+
+"""Stream copy planning and filter graph of services/v1/video/concatenate.py."""
+
+from collections import Counter
+
+from ast_helpers import load_functions, read_source
+
+
+class FakeProbe:
+    def __init__(self, width=1920, height=1080, fps="30/1", sample_rate="48000", channels=2,
+                 video=True, audio=True, duration=10.0):
+        self.video_stream = {
+            "codec_name": "h264", "profile": "High", "width": width, "height": height,
+            "pix_fmt": "yuv420p", "sample_aspect_ratio": "1:1", "r_frame_rate": fps
+        } if video else None
+        self.audio_stream = {
+            "codec_name": "aac", "sample_rate": sample_rate, "channels": channels
+        } if audio else None
+        self.has_video = video
+        self.has_audio = audio
+        self.duration = duration
+
+
+class TestConcatenatePlan:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "concatenate.py")
+        functions = load_functions(
+            self.source,
+            {"get_stream_signature", "plan_concatenation", "build_concat_filter", "_parse_channel_layout"},
+            {"Counter": Counter}
+        )
+        self.signature = functions["get_stream_signature"]
+        self.plan = functions["plan_concatenation"]
+        self.build = functions["build_concat_filter"]
+
+    def plan_for(self, probes):
+        return self.plan([self.signature(p) for p in probes])
+
+    def test_matching_inputs_are_copied(self):
+        plan = self.plan_for([FakeProbe(), FakeProbe(), FakeProbe()])
+        assert plan["method"] == "copy"
+
+    def test_majority_signature_is_reference(self):
+        plan = self.plan_for([FakeProbe(width=1280, height=720), FakeProbe(), FakeProbe()])
+        assert plan["method"] == "reencode"
+        assert plan["reference"] == 1
+        assert plan["normalize_video"] == [0]
+        assert plan["normalize_audio"] == []
+
+    def test_only_mismatched_inputs_are_filtered(self):
+        probes = [FakeProbe(), FakeProbe(fps="25/1", sample_rate="44100"), FakeProbe()]
+        filter_complex, has_video, has_audio = self.build(probes, self.plan_for(probes))
+        assert has_video and has_audio
+        assert "[0:v:0][0:a:0][v1][a1][2:v:0][2:a:0]concat=n=3:v=1:a=1[outv][outa]" in filter_complex
+        assert "[1:v:0]scale=1920:1080" in filter_complex
+        assert "fps=30/1" in filter_complex
+        assert "[1:a:0]aresample=48000" in filter_complex
+        assert "[0:v:0]scale" not in filter_complex
+
+    def test_missing_audio_is_filled_with_silence(self):
+        probes = [FakeProbe(), FakeProbe(audio=False, duration=4.5)]
+        filter_complex, _, has_audio = self.build(probes, self.plan_for(probes))
+        assert has_audio
+        assert "anullsrc=r=48000:cl=stereo,atrim=duration=4.500000[a1]" in filter_complex
+
+    def test_route_reports_decision(self):
+        route = read_source("routes", "v1", "video", "concatenate.py")
+        assert '"include_report": {"type": "boolean"}' in route
+        assert "download_files" in self.source
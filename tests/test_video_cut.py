@@ -0,0 +1,81 @@
+# Copyright (c) 2025
+# Tests for the single-pass video cut engine
+
+"""Single-pass filter graph and smart cut planning of services/v1/video/cut.py."""
+
+from ast_helpers import get_function_params, load_functions, read_source
+
+
+class TestCutEngine:
+    """Kept segments are joined by one filter graph in a single ffmpeg run."""
+
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "cut.py")
+        self.ns = load_functions(self.source, {
+            "get_kept_segments", "format_seconds", "build_cut_filter_graph"
+        })
+
+    def test_no_intermediate_segment_files(self):
+        assert "_segment_" not in self.source
+        assert "'-f', 'concat'" not in self.source
+
+    def test_kept_segments(self):
+        segments = self.ns["get_kept_segments"]([(10, 20), (30, 40)], 60)
+        assert segments == [(0, 10), (20, 30), (40, 60)]
+
+    def test_few_segments_use_input_seeking(self):
+        inputs, graph, maps = self.ns["build_cut_filter_graph"]("in.mp4", [(0, 10), (20, 30)])
+        assert inputs == ['-ss', '0', '-t', '10', '-i', 'in.mp4', '-ss', '20', '-t', '10', '-i', 'in.mp4']
+        assert graph.endswith("[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]")
+        assert maps == ['-map', '[outv]', '-map', '[outa]']
+
+    def test_many_segments_use_single_decode(self):
+        segments = [(i * 10 + 2, i * 10 + 5) for i in range(20)]
+        inputs, graph, _ = self.ns["build_cut_filter_graph"]("in.mp4", segments)
+        assert inputs.count('-i') == 1
+        assert inputs[:2] == ['-ss', '2']
+        assert "[0:v]split=20" in graph
+        assert "[vs1]trim=start=10:end=13,setpts=PTS-STARTPTS[v1]" in graph
+
+    def test_audio_only_graph(self):
+        _, graph, maps = self.ns["build_cut_filter_graph"]("in.mp3", [(0, 5)], has_video=False)
+        assert "concat=n=1:v=0:a=1[outa]" in graph
+        assert maps == ['-map', '[outa]']
+
+
+class TestSmartCut:
+    """Smart cut copies whole GOPs and re-encodes only cut boundaries."""
+
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "smart_cut.py")
+        self.ns = load_functions(self.source, {"plan_smart_cut"})
+        exec("from bisect import bisect_left, bisect_right", self.ns)
+
+    def test_boundaries_are_encoded_and_gops_copied(self):
+        pieces = self.ns["plan_smart_cut"]([(0, 5), (5.5, 6.5), (7, 10)], [0, 2, 4, 6, 8, 10])
+        assert [(p["type"], p["start"], p["end"]) for p in pieces] == [
+            ("copy", 0, 4), ("encode", 4, 5),
+            ("encode", 5.5, 6.5),
+            ("encode", 7, 8), ("copy", 8, 10),
+        ]
+
+    def test_range_reaching_the_end_copies_its_last_gop(self):
+        pieces = self.ns["plan_smart_cut"]([(3, 11)], [0, 2, 4, 6, 8, 10], duration=11)
+        assert [(p["type"], p["start"], p["end"]) for p in pieces] == [("encode", 3, 4), ("copy", 4, 11)]
+
+    def test_copies_are_split_in_one_pass_and_joined_with_concat_demuxer(self):
+        assert self.source.count("'-f', 'segment'") == 1
+        assert "'-f', 'concat'" in self.source
+        assert "packet=pts_time,flags" in self.source
+
+    def test_cut_media_falls_back_to_full_encode(self):
+        source = read_source("services", "v1", "video", "cut.py")
+        assert "smart_cut" in get_function_params(source, "cut_media")
+        assert "falling back to a full encode" in source
+        route = read_source("routes", "v1", "video", "cut.py")
+        assert '"smart_cut": {"type": "boolean"}' in route
+
+    def test_autoedit_final_render_option(self):
+        source = read_source("services", "v1", "autoedit", "preview.py")
+        assert "smart_render" in get_function_params(source, "generate_final_render")
+        assert get_function_params(source, "_smart_render") is not None
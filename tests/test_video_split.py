@@ -0,0 +1,107 @@
+# Copyright (c) 2025
+# Tests for parallel and stream-copy video splits
+
+"""Parallel and stream-copy splits of services/v1/video/split.py."""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from ast_helpers import get_function_params, load_functions, read_source
+
+
+class TestSplitPlanning:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "split.py")
+        self.ns = load_functions(self.source, {
+            "get_split_parallelism", "is_contiguous", "build_split_command", "build_segment_command",
+            "list_segment_files",
+        }, {"os": os})
+
+    def test_thread_budget_never_exceeds_cores(self):
+        for splits in (1, 3, 8, 50):
+            for cpus in (1, 2, 4, 16):
+                workers, threads = self.ns["get_split_parallelism"](splits, cpus)
+                assert 1 <= workers <= splits
+                assert workers * threads <= max(cpus, 1)
+
+    def test_single_split_gets_all_cores(self):
+        assert self.ns["get_split_parallelism"](1, 8) == (1, 8)
+
+    def test_input_side_seeking(self):
+        cmd = self.ns["build_split_command"]("in.mp4", 10.0, 25.0, "out.mp4", ['-c', 'copy'], threads=2)
+        assert cmd.index('-ss') < cmd.index('-i')
+        assert cmd[cmd.index('-t') + 1] == '15.0'
+        assert cmd.count('-threads') == 2
+
+    def test_contiguous_splits_use_segment_muxer(self):
+        splits = [(0, 5.0, 10.0, {}), (1, 10.0, 20.0, {}), (2, 20.0, 30.0, {})]
+        assert self.ns["is_contiguous"](splits)
+        assert not self.ns["is_contiguous"]([(0, 0.0, 5.0, {}), (1, 6.0, 8.0, {})])
+        cmd, offset = self.ns["build_segment_command"]("in.mp4", splits, "seg_%03d.mp4")
+        assert offset == 1
+        assert cmd[cmd.index('-segment_times') + 1] == '5.0,10.0,20.0'
+        assert cmd[cmd.index('-to') + 1] == '30.0'
+
+    def test_segment_files_are_listed_in_order(self, tmp_path):
+        pattern = str(tmp_path / "seg_%03d.mp4")
+        for n in (0, 1, 3):
+            open(pattern % n, "w").close()
+        assert self.ns["list_segment_files"](pattern) == [pattern % 0, pattern % 1]
+
+    def test_route_exposes_options(self):
+        route = read_source("routes", "v1", "video", "split.py")
+        assert '"parallel": {"type": "boolean"}' in route
+        assert '"stream_copy": {"type": "boolean"}' in route
+        params = get_function_params(self.source, "split_video")
+        assert params[-2:] == ["parallel", "stream_copy"]
+
+
+class TestSegmentFallback:
+    """Stream-copy splits fall back to one copy per split when the muxer writes too few files."""
+
+    def run_split(self, tmp_path, segments_written):
+        commands = []
+
+        def run_ffmpeg(cmd, check=False, description=None):
+            commands.append(cmd)
+            if "-segment_times" in cmd:
+                for n in range(segments_written):
+                    open(cmd[-1] % n, "w").close()
+            else:
+                open(cmd[-1], "w").close()
+            return SimpleNamespace(returncode=0, stderr="")
+
+        def download_file(url, path):
+            open(path + ".mp4", "w").close()
+            return path + ".mp4"
+
+        source = read_source("services", "v1", "video", "split.py")
+        ns = load_functions(source, {
+            "time_to_seconds", "get_split_parallelism", "is_contiguous", "build_split_command",
+            "build_segment_command", "list_segment_files", "split_video",
+        }, {
+            "os": os, "uuid": None, "logger": logging.getLogger("test"),
+            "ThreadPoolExecutor": ThreadPoolExecutor, "ProbeError": Exception,
+            "LOCAL_STORAGE_PATH": str(tmp_path), "download_file": download_file,
+            "get_media_probe": lambda path: SimpleNamespace(duration=60.0),
+            "run_ffmpeg": run_ffmpeg,
+        })
+        splits = [{"start": "5", "end": "10"}, {"start": "10", "end": "20"}, {"start": "20", "end": "30"}]
+        outputs, _ = ns["split_video"]("http://x/in.mp4", splits, job_id="job", stream_copy=True)
+        return outputs, commands
+
+    def test_matching_segments_are_renamed(self, tmp_path):
+        outputs, commands = self.run_split(tmp_path, 4)
+        assert len(commands) == 1
+        assert [os.path.basename(o) for o in outputs] == ["job_split_1.mp4", "job_split_2.mp4", "job_split_3.mp4"]
+        assert all(os.path.exists(o) for o in outputs)
+        assert not any(name.startswith("job_segment_") for name in os.listdir(tmp_path))
+
+    def test_missing_segments_fall_back_to_per_split_copies(self, tmp_path):
+        outputs, commands = self.run_split(tmp_path, 2)
+        assert len(commands) == 4
+        assert all(cmd[cmd.index("-c") + 1] == "copy" for cmd in commands[1:])
+        assert [cmd[-1] for cmd in commands[1:]] == outputs
+        assert not any(name.startswith("job_segment_") for name in os.listdir(tmp_path))
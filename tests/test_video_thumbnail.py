@@ -0,0 +1,51 @@
+# Copyright (c) 2025
+# Tests for multi-timestamp thumbnails and sprite sheets
+
+"""Timestamp selection and sprite sheets of services/v1/video/thumbnail.py."""
+
+from ast_helpers import load_functions, read_source
+
+
+class TestMultiThumbnails:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "thumbnail.py")
+        self.functions = load_functions(self.source, {
+            "get_interval_timestamps", "get_tile_size", "build_thumbnail_batch_command",
+            "plan_sprite_sheets", "format_vtt_time", "build_thumbnail_vtt"
+        })
+
+    def test_interval_timestamps_stay_inside_video(self):
+        get = self.functions["get_interval_timestamps"]
+        assert get(10.0, 5) == [0, 5]
+        assert get(10.5, 5) == [0, 5, 10]
+        assert len(get(100000.0, 1)) == self.functions["MAX_THUMBNAILS"]
+
+    def test_tile_size_is_even(self):
+        assert self.functions["get_tile_size"](1920, 1080, 160) == (160, 90)
+        assert self.functions["get_tile_size"](1080, 1920, 160) == (160, 284)
+
+    def test_batch_seeks_each_timestamp(self):
+        cmd = self.functions["build_thumbnail_batch_command"](
+            "https://example.com/v.mp4", [1.0, 5.0], ["a.jpg", "b.jpg"], ["t0.jpg", "t1.jpg"], (160, 90)
+        )
+        assert cmd.count('-i') == 2
+        assert cmd[cmd.index('-i') - 1] == '1.0'
+        assert "[1:v:0]scale=160:90,setsar=1[t1]" in cmd[cmd.index('-filter_complex') + 1]
+        assert cmd.count('-frames:v') == 4
+        assert cmd[-1] == "t1.jpg"
+
+    def test_sprite_sheets_are_split(self):
+        assert self.functions["plan_sprite_sheets"](250, 10) == [(0, 100, 10), (100, 100, 10), (200, 50, 5)]
+        assert self.functions["plan_sprite_sheets"](7, 10) == [(0, 7, 1)]
+
+    def test_vtt_cues(self):
+        vtt = self.functions["build_thumbnail_vtt"]([0, 5, 10], 12.5, ["s.jpg"], (160, 90), 2)
+        assert vtt.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:05.000\ns.jpg#xywh=0,0,160,90\n")
+        assert "00:00:05.000 --> 00:00:10.000\ns.jpg#xywh=160,0,160,90" in vtt
+        assert "00:00:10.000 --> 00:00:12.500\ns.jpg#xywh=0,90,160,90" in vtt
+
+    def test_route_has_multi_mode(self):
+        route = read_source("routes", "v1", "video", "thumbnail.py")
+        assert '"timestamps": {' in route
+        assert '"interval": {"type": "number", "exclusiveMinimum": 0}' in route
+        assert "def generate_thumbnails(job_id, data)" in route
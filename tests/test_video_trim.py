@@ -0,0 +1,117 @@
+# Copyright (c) 2025
+# Tests for the trim modes
+
+"""Copy, accurate and smart modes of services/v1/video/trim.py."""
+
+import logging
+import os
+from types import SimpleNamespace
+
+from ast_helpers import load_functions, read_source
+
+
+class TestTrimModes:
+    def setup_method(self):
+        self.source = read_source("services", "v1", "video", "trim.py")
+        self.build = load_functions(self.source, {"build_trim_command"})["build_trim_command"]
+        self.encode_args = ['-c:v', 'libx264']
+
+    def test_copy_seeks_on_input_without_encoding(self):
+        cmd = self.build("in.mp4", "out.mp4", 60.0, 180.0, 600.0, 'copy', self.encode_args)
+        assert cmd[:6] == ['ffmpeg', '-y', '-ss', '60.0', '-i', 'in.mp4']
+        assert cmd[cmd.index('-t') + 1] == '120.0'
+        assert 'libx264' not in cmd
+        assert cmd[cmd.index('-c') + 1] == 'copy'
+
+    def test_accurate_uses_input_and_output_seek(self):
+        cmd = self.build("in.mp4", "out.mp4", 60.0, 600.0, 600.0, 'accurate', self.encode_args)
+        input_index = cmd.index('-i')
+        assert cmd[2:4] == ['-ss', '55.0']
+        assert cmd[input_index + 2:input_index + 4] == ['-ss', '5.0']
+        assert '-t' not in cmd
+        assert 'libx264' in cmd
+
+    def test_accurate_near_start_has_no_input_seek(self):
+        cmd = self.build("in.mp4", "out.mp4", 2.0, 10.0, 600.0, 'accurate', self.encode_args)
+        assert cmd.index('-ss') > cmd.index('-i')
+
+    def test_route_reports_boundaries(self):
+        route = read_source("routes", "v1", "video", "trim.py")
+        assert '"mode": {"type": "string", "enum": ["accurate", "copy", "smart"]}' in route
+        assert "trim_info" in route
+        assert "TRIM_MODES = ('accurate', 'copy', 'smart')" in self.source
+
+
+class ProbeError(Exception):
+    pass
+
+
+class TestTrimVideo:
+    """trim_video with the download, probe, smart cut and ffmpeg replaced by fakes."""
+
+    def load(self, tmp_path, probe=None, keyframes=(), smart_report=None):
+        self.commands = []
+        self.smart_calls = []
+
+        def download_file(url, path):
+            open(path + ".mp4", "w").close()
+            return path + ".mp4"
+
+        def get_media_probe(path):
+            if probe is None:
+                raise ProbeError("no probe")
+            return probe
+
+        def smart_cut(*args, **kwargs):
+            self.smart_calls.append(kwargs)
+            return smart_report
+
+        def run_ffmpeg(cmd, check=False, description=None):
+            self.commands.append(cmd)
+            return SimpleNamespace(returncode=0, stderr="")
+
+        source = read_source("services", "v1", "video", "trim.py")
+        return load_functions(source, {
+            "time_to_seconds", "build_trim_command", "find_copy_start", "trim_video"
+        }, {
+            "os": os, "uuid": None, "logger": logging.getLogger("test"),
+            "LOCAL_STORAGE_PATH": str(tmp_path), "ProbeError": ProbeError,
+            "download_file": download_file, "get_media_probe": get_media_probe,
+            "build_keyframe_index": lambda path, read_interval=None: list(keyframes),
+            "smart_cut": smart_cut, "run_ffmpeg": run_ffmpeg,
+        })
+
+    def test_smart_mode_is_told_the_source_has_no_audio(self, tmp_path):
+        probe = SimpleNamespace(duration=120.0, has_audio=False)
+        ns = self.load(tmp_path, probe=probe, smart_report={"copied": 1})
+        _, _, info = ns["trim_video"]("http://x/in.mp4", start="10", end="60", job_id="job", mode="smart")
+        assert self.smart_calls[0]["has_audio"] is False
+        assert self.smart_calls[0]["duration"] == 120.0
+        assert self.commands == []
+        assert info == {"mode": "smart", "start": 10.0, "end": 60.0, "duration": 50.0, "smart": {"copied": 1}}
+
+    def test_failed_smart_cut_falls_back_to_accurate(self, tmp_path):
+        probe = SimpleNamespace(duration=120.0, has_audio=True)
+        ns = self.load(tmp_path, probe=probe, smart_report=None)
+        _, _, info = ns["trim_video"]("http://x/in.mp4", start="10", job_id="job", mode="smart")
+        assert info["mode"] == "accurate"
+        assert "libx264" in self.commands[0]
+
+    def test_unknown_duration_reports_no_end(self, tmp_path):
+        ns = self.load(tmp_path, probe=None)
+        _, _, info = ns["trim_video"]("http://x/in.mp4", start="10", job_id="job", mode="accurate")
+        assert "-t" not in self.commands[0]
+        assert info["end"] is None and info["duration"] is None
+
+    def test_requested_end_is_reported_without_duration(self, tmp_path):
+        ns = self.load(tmp_path, probe=None)
+        _, _, info = ns["trim_video"]("http://x/in.mp4", start="10", end="40", job_id="job", mode="accurate")
+        assert self.commands[0][self.commands[0].index("-t") + 1] == "30.0"
+        assert info["end"] == 40.0 and info["duration"] == 30.0
+
+    def test_copy_reports_the_keyframe_it_starts_on(self, tmp_path):
+        probe = SimpleNamespace(duration=120.0, has_audio=True)
+        ns = self.load(tmp_path, probe=probe, keyframes=[0.0, 8.0, 12.0])
+        _, _, info = ns["trim_video"]("http://x/in.mp4", start="10", end="60", job_id="job", mode="copy")
+        assert self.commands[0][self.commands[0].index("-c") + 1] == "copy"
+        assert info == {"mode": "copy", "start": 8.0, "end": 60.0, "duration": 52.0}